@@ -0,0 +1,444 @@
+"""
+Agendador das tarefas periódicas (coleção agendador).
+
+Trabalhos que precisam rodar de tempos em tempos não dependem mais de
+alguém abrir uma página: um processo separado, o agendador, verifica a
+cada INTERVALO_VERIFICACAO_SEGUNDOS quais tarefas estão na hora e as executa:
+
+    python agendador.py                           # agendador em loop
+    python agendador.py uma-vez                   # executa as tarefas na hora e sai (cron)
+    python agendador.py executar lembrete_eventos # executa agora, mesmo fora da hora
+    python agendador.py situacao                  # última execução de cada tarefa
+
+Cada tarefa de TAREFAS_PERIODICAS tem um documento:
+
+    {"_id": "lembrete_eventos", "proxima_execucao": ...,
+     "reservado_por": "host:pid", "reserva_ate": ...,
+     "ultima_execucao": {"inicio": ..., "fim": ..., "status": "ok",
+                         "resultado": {...}, "erro": None},
+     "execucoes": 12}
+
+A reserva (lease) impede que dois agendadores executem a mesma tarefa ao
+mesmo tempo e vale duracao_reserva; a tarefa a renova a cada passo. Se o
+agendador morrer no meio, a reserva expira e a tarefa volta a ser
+executada, sem trava esquecida no banco.
+
+Tarefas (TAREFAS_PERIODICAS): lembrete de eventos, registro diário do
+armazenamento (armazenamento.py) e limpeza da fila de tarefas
+(fila_tarefas.py). Nenhum outro cron é necessário.
+
+As páginas só leem o resultado (ultima_execucao).
+"""
+
+import datetime
+import os
+import socket
+import sys
+import time
+import traceback
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from armazenamento import registrar_armazenamento_diario
+from fila_emails import enfileirar_email
+from fila_tarefas import limpar_tarefas_terminadas
+from funcoes_auxiliares import consultar_status_projetos, gerar_email_lembrete_eventos
+from templates_email import LOGO_IEB
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_AGENDADOR = "agendador"
+
+
+OK = "ok"
+ERRO = "erro"
+
+
+# Intervalo entre as verificações do agendador em loop
+INTERVALO_VERIFICACAO_SEGUNDOS = 60
+
+# Depois de uma falha, a tarefa é tentada de novo nesse prazo (ou no intervalo, se for menor)
+ESPERA_APOS_ERRO = datetime.timedelta(minutes=15)
+
+
+
+
+###########################################################################################################
+# RESERVA (LEASE)
+###########################################################################################################
+
+def _garantir_documento(db, nome: str):
+    """
+    Cria o documento da tarefa, na hora de executar, se ainda não existir.
+    """
+
+    try:
+        db[COLECAO_AGENDADOR].update_one(
+            {"_id": nome},
+            {"$setOnInsert": {
+                "proxima_execucao": datetime.datetime.now(),
+                "reservado_por": None,
+                "reserva_ate": None,
+                "ultima_execucao": None,
+                "execucoes": 0,
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Outro agendador criou ao mesmo tempo
+        pass
+
+
+def adquirir_reserva(db, nome: str, dono: str, duracao: datetime.timedelta, forcar: bool = False) -> dict | None:
+    """
+    Reserva a tarefa para dono, se ela estiver na hora (ou forcar=True) e
+    sem reserva válida de outro agendador.
+
+    Retorna:
+        O documento da tarefa, ou None se não foi possível reservar.
+    """
+
+    _garantir_documento(db, nome)
+
+    agora = datetime.datetime.now()
+
+    filtro = {
+        "_id": nome,
+        "$or": [{"reserva_ate": None}, {"reserva_ate": {"$lt": agora}}],
+    }
+
+    if not forcar:
+        filtro["proxima_execucao"] = {"$lte": agora}
+
+    return db[COLECAO_AGENDADOR].find_one_and_update(
+        filtro,
+        {"$set": {"reservado_por": dono, "reserva_ate": agora + duracao, "inicio_execucao": agora}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def renovar_reserva(db, nome: str, dono: str, duracao: datetime.timedelta) -> bool:
+    """
+    Estende a reserva de uma tarefa em execução.
+
+    Retorna:
+        False se a reserva já não é do dono (expirou e outro agendador pegou).
+    """
+
+    resultado = db[COLECAO_AGENDADOR].update_one(
+        {"_id": nome, "reservado_por": dono},
+        {"$set": {"reserva_ate": datetime.datetime.now() + duracao}}
+    )
+
+    return resultado.matched_count == 1
+
+
+def registrar_execucao(db, reserva: dict, dono: str, intervalo: datetime.timedelta, resultado=None, erro=None):
+    """
+    Grava o resultado da execução, agenda a próxima e libera a reserva.
+    """
+
+    agora = datetime.datetime.now()
+
+    espera = intervalo if erro is None else min(intervalo, ESPERA_APOS_ERRO)
+
+    db[COLECAO_AGENDADOR].update_one(
+        {"_id": reserva["_id"], "reservado_por": dono},
+        {
+            "$set": {
+                "proxima_execucao": agora + espera,
+                "reservado_por": None,
+                "reserva_ate": None,
+                "ultima_execucao": {
+                    "inicio": reserva.get("inicio_execucao"),
+                    "fim": agora,
+                    "status": OK if erro is None else ERRO,
+                    "resultado": resultado,
+                    "erro": erro,
+                },
+            },
+            "$inc": {"execucoes": 1},
+        }
+    )
+
+
+
+
+###########################################################################################################
+# TAREFAS
+###########################################################################################################
+
+def enviar_lembretes_eventos(db, renovar) -> dict:
+    """
+    Lembrete de cadastro de eventos: para cada edital com
+    dias_intervalo_lembrete_eventos > 0 cujo último envio (email_enviado_em)
+    já passou do intervalo, coloca na caixa de saída um e-mail, em cópia
+    oculta, para os contatos dos projetos Em dia e Atrasados e os
+    administradores ativos.
+
+    Retorna:
+        {"editais": [códigos enviados], "destinatarios": total de destinatários}
+    """
+
+    agora = datetime.datetime.now()
+
+    editais = list(
+        db.editais.find(
+            {"dias_intervalo_lembrete_eventos": {"$gt": 0}},
+            {"_id": 1, "codigo_edital": 1, "dias_intervalo_lembrete_eventos": 1, "email_enviado_em": 1}
+        )
+    )
+
+    administradores = [
+        admin["e_mail"].strip().lower()
+        for admin in db.pessoas.find({"status": "ativo", "tipo_usuario": "admin"}, {"e_mail": 1})
+        if (admin.get("e_mail") or "").strip()
+    ]
+
+    # Trava do envio antigo, feito pela página inicial: podia ficar
+    # esquecida se a página caísse no meio do envio
+    db.editais.update_many({"envio_em_andamento": {"$exists": True}}, {"$unset": {"envio_em_andamento": ""}})
+
+    enviados = []
+    total_destinatarios = 0
+
+    for edital in editais:
+
+        intervalo_dias = int(edital.get("dias_intervalo_lembrete_eventos") or 0)
+
+        ultimo_envio = edital.get("email_enviado_em")
+
+        if ultimo_envio and (agora - ultimo_envio).days < intervalo_dias:
+            continue
+
+        # O status é calculado no próprio MongoDB: só voltam os contatos
+        # dos projetos Em dia e Atrasados.
+        projetos = consultar_status_projetos(
+            db,
+            filtro={"edital": edital["codigo_edital"]},
+            status=["Em dia", "Atrasado"],
+            campos=["contatos"]
+        )
+
+        if not projetos:
+            continue
+
+        destinatarios = set(administradores)
+
+        for projeto in projetos:
+
+            contatos = projeto.get("contatos")
+
+            if not isinstance(contatos, list):
+                continue
+
+            for contato in contatos:
+
+                if not isinstance(contato, dict):
+                    continue
+
+                email = (contato.get("email") or "").strip().lower()
+
+                if email:
+                    destinatarios.add(email)
+
+        if not destinatarios:
+            continue
+
+        enfileirar_email(
+            db,
+            gerar_email_lembrete_eventos(logo_url=LOGO_IEB),
+            sorted(destinatarios),
+            f"Lembrete de cadastro de Eventos - {edital['codigo_edital']} - Sistema Veredas",
+            copia_oculta=True,
+            origem="lembrete_eventos"
+        )
+
+        db.editais.update_one({"_id": edital["_id"]}, {"$set": {"email_enviado_em": agora}})
+
+        enviados.append(edital["codigo_edital"])
+        total_destinatarios += len(destinatarios)
+
+        renovar()
+
+    return {"editais": enviados, "destinatarios": total_destinatarios}
+
+
+def registrar_armazenamento(db, renovar) -> dict:
+    """
+    Registro diário do tamanho do banco e das coleções (armazenamento.py),
+    sem depender de alguém abrir a página de armazenamento.
+    """
+
+    documento = registrar_armazenamento_diario(db)
+
+    return {"data": documento["data"], "armazenamento_mb": round(documento["armazenamento_mb"], 1)}
+
+
+def limpar_fila_tarefas(db, renovar) -> dict:
+    """
+    Remove as tarefas terminadas antigas da fila de tarefas, com os arquivos.
+    """
+
+    return {"removidas": limpar_tarefas_terminadas(db)}
+
+
+# Nome -> função(db, renovar), intervalo entre execuções e validade da reserva.
+# renovar() estende a reserva e levanta exceção se ela foi perdida.
+TAREFAS_PERIODICAS = {
+    "lembrete_eventos": {
+        "descricao": "Lembrete de cadastro de eventos",
+        "executar": enviar_lembretes_eventos,
+        "intervalo": datetime.timedelta(hours=1),
+        "duracao_reserva": datetime.timedelta(minutes=10),
+    },
+    "armazenamento_diario": {
+        "descricao": "Registro diário do armazenamento do banco",
+        "executar": registrar_armazenamento,
+        "intervalo": datetime.timedelta(days=1),
+        "duracao_reserva": datetime.timedelta(minutes=10),
+    },
+    "limpeza_fila_tarefas": {
+        "descricao": "Limpeza das tarefas terminadas da fila de tarefas",
+        "executar": limpar_fila_tarefas,
+        "intervalo": datetime.timedelta(hours=23),
+        "duracao_reserva": datetime.timedelta(minutes=30),
+    },
+}
+
+
+
+
+###########################################################################################################
+# AGENDADOR
+###########################################################################################################
+
+def executar_tarefa_periodica(db, nome: str, dono: str, forcar: bool = False) -> str | None:
+    """
+    Executa a tarefa se ela estiver na hora e conseguir a reserva.
+
+    Retorna:
+        O status da execução (ok ou erro), ou None se não executou.
+    """
+
+    tarefa = TAREFAS_PERIODICAS[nome]
+
+    reserva = adquirir_reserva(db, nome, dono, tarefa["duracao_reserva"], forcar=forcar)
+
+    if reserva is None:
+        return None
+
+    def renovar():
+        if not renovar_reserva(db, nome, dono, tarefa["duracao_reserva"]):
+            raise RuntimeError(f"Reserva da tarefa {nome} perdida durante a execução.")
+
+    try:
+        resultado = tarefa["executar"](db, renovar)
+    except Exception as e:
+        registrar_execucao(
+            db, reserva, dono, tarefa["intervalo"],
+            erro=f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        )
+        return ERRO
+
+    registrar_execucao(db, reserva, dono, tarefa["intervalo"], resultado=resultado)
+
+    return OK
+
+
+def executar_agendador(db, uma_vez: bool = False):
+    """
+    Loop do agendador: a cada INTERVALO_VERIFICACAO_SEGUNDOS executa as
+    tarefas que estão na hora. Com uma_vez=True, passa uma vez e sai.
+    """
+
+    dono = f"{socket.gethostname()}:{os.getpid()}"
+
+    if not uma_vez:
+        print(f"Agendador {dono} iniciado.")
+
+    while True:
+
+        for nome in TAREFAS_PERIODICAS:
+
+            status = executar_tarefa_periodica(db, nome, dono)
+
+            if status is not None:
+                print(f"{datetime.datetime.now():%d/%m/%Y %H:%M:%S}  {nome}: {status}")
+
+        if uma_vez:
+            return
+
+        time.sleep(INTERVALO_VERIFICACAO_SEGUNDOS)
+
+
+
+
+###########################################################################################################
+# CONSULTA
+###########################################################################################################
+
+def situacao_tarefa_periodica(db, nome: str) -> dict | None:
+    """
+    Documento da tarefa (próxima execução, reserva e última execução), ou
+    None se ela nunca foi executada.
+    """
+
+    return db[COLECAO_AGENDADOR].find_one({"_id": nome})
+
+
+def agendador_atrasado(situacao: dict | None, nome: str) -> bool:
+    """
+    True quando a tarefa deveria ter rodado há mais de um intervalo, sinal
+    de que o agendador não está em execução.
+    """
+
+    if situacao is None:
+        return True
+
+    return situacao["proxima_execucao"] < datetime.datetime.now() - TAREFAS_PERIODICAS[nome]["intervalo"]
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "loop"
+
+    if comando == "situacao":
+
+        for nome in TAREFAS_PERIODICAS:
+
+            situacao = situacao_tarefa_periodica(db, nome) or {}
+            ultima = situacao.get("ultima_execucao") or {}
+
+            print(
+                f"{nome:<20} próxima: {situacao.get('proxima_execucao') or '-'}  "
+                f"última: {ultima.get('fim') or '-'} {ultima.get('status') or ''}  "
+                f"{ultima.get('resultado') or ultima.get('erro') or ''}"
+            )
+
+    elif comando == "executar":
+
+        dono = f"{socket.gethostname()}:{os.getpid()}"
+
+        for nome in sys.argv[2:] or TAREFAS_PERIODICAS:
+            print(f"{nome}: {executar_tarefa_periodica(db, nome, dono, forcar=True) or 'em execução em outro agendador'}")
+
+    else:
+
+        executar_agendador(db, uma_vez=comando == "uma-vez")
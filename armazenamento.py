@@ -0,0 +1,261 @@
+"""
+Uso de armazenamento do banco (página relatorio_armazenamento.py).
+
+- estatisticas_colecoes(db): collStats de cada coleção.
+- maiores_projetos(db): documentos de projetos ordenados pelo tamanho em BSON
+  ($bsonSize), com o tamanho de cada subárvore (plano_trabalho, financeiro...).
+- registrar_armazenamento_diario(db): guarda o tamanho do banco e das
+  coleções no documento do dia (coleção armazenamento_diario).
+- projetar_limite(df_historico): crescimento médio por dia e data prevista
+  para atingir o limite do plano do Atlas.
+
+O agendador (agendador.py, tarefa armazenamento_diario) registra o dia uma
+vez por dia; a página também registra ao ser aberta. Para registrar na
+hora, sem o agendador:
+
+    python armazenamento.py
+"""
+
+import datetime
+
+import pandas as pd
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_ARMAZENAMENTO_DIARIO = "armazenamento_diario"
+
+
+# Limite do plano gratuito do Mongo Atlas
+CAPACIDADE_ATLAS_MB = 500
+
+
+# Subárvores do projeto medidas separadamente
+SUBARVORES_PROJETO = ("plano_trabalho", "financeiro", "relatorios", "locais", "salvaguardas")
+
+
+# Dias usados para calcular o crescimento médio
+DIAS_PROJECAO = 30
+
+
+MB = 1024 * 1024
+
+
+
+
+###########################################################################################################
+# COLEÇÕES
+###########################################################################################################
+
+def estatisticas_colecoes(db) -> pd.DataFrame:
+    """
+    collStats de todas as coleções, da que ocupa mais espaço para a que ocupa menos.
+
+    Retorna:
+        DataFrame com colecao, documentos, dados_mb, armazenamento_mb,
+        indices_mb e tamanho_medio_kb.
+    """
+
+    linhas = []
+
+    for nome in db.list_collection_names():
+
+        if nome.startswith("system."):
+            continue
+
+        try:
+            stats = db.command("collStats", nome)
+        except OperationFailure:
+            continue
+
+        linhas.append({
+            "colecao": nome,
+            "documentos": stats.get("count", 0),
+            "dados_mb": stats.get("size", 0) / MB,
+            "armazenamento_mb": stats.get("storageSize", 0) / MB,
+            "indices_mb": stats.get("totalIndexSize", 0) / MB,
+            "tamanho_medio_kb": stats.get("avgObjSize", 0) / 1024,
+        })
+
+    df = pd.DataFrame(
+        linhas,
+        columns=["colecao", "documentos", "dados_mb", "armazenamento_mb", "indices_mb", "tamanho_medio_kb"]
+    )
+
+    return df.sort_values("armazenamento_mb", ascending=False, ignore_index=True)
+
+
+
+
+###########################################################################################################
+# PROJETOS
+###########################################################################################################
+
+def maiores_projetos(db, limite: int = 20) -> pd.DataFrame:
+    """
+    Maiores documentos da coleção projetos, medidos no servidor com $bsonSize.
+
+    Cada subárvore é medida dentro de um documento {"v": ...}, porque
+    $bsonSize só aceita documentos (relatorios é uma lista). O acréscimo
+    de poucos bytes não muda a comparação.
+
+    Retorna:
+        DataFrame com codigo, sigla, total_kb e uma coluna <subárvore>_kb
+        para cada item de SUBARVORES_PROJETO.
+    """
+
+    tamanhos = {
+        f"{subarvore}_kb": {"$divide": [{"$bsonSize": {"v": f"${subarvore}"}}, 1024]}
+        for subarvore in SUBARVORES_PROJETO
+    }
+
+    documentos = list(db["projetos"].aggregate([
+        {"$project": {
+            "_id": 0,
+            "codigo": 1,
+            "sigla": 1,
+            "total_kb": {"$divide": [{"$bsonSize": "$$ROOT"}, 1024]},
+            **tamanhos,
+        }},
+        {"$sort": {"total_kb": -1}},
+        {"$limit": limite},
+    ]))
+
+    return pd.DataFrame(
+        documentos,
+        columns=["codigo", "sigla", "total_kb", *tamanhos]
+    )
+
+
+
+
+###########################################################################################################
+# HISTÓRICO DIÁRIO E PROJEÇÃO
+###########################################################################################################
+
+def registrar_armazenamento_diario(db, df_colecoes: pd.DataFrame | None = None) -> dict:
+    """
+    Grava (ou substitui) o tamanho do banco e de cada coleção no documento de hoje.
+
+    Retorna:
+        O documento gravado.
+    """
+
+    hoje = datetime.date.today()
+
+    stats = db.command("dbStats")
+
+    if df_colecoes is None:
+        df_colecoes = estatisticas_colecoes(db)
+
+    documento = {
+        "data": datetime.datetime(hoje.year, hoje.month, hoje.day),
+        "armazenamento_mb": stats.get("storageSize", 0) / MB,
+        "dados_mb": stats.get("dataSize", 0) / MB,
+        "indices_mb": stats.get("indexSize", 0) / MB,
+        # Os nomes das coleções não têm ponto nem $, podem ser chaves
+        "por_colecao": dict(zip(df_colecoes["colecao"], df_colecoes["armazenamento_mb"])),
+        "registrado_em": datetime.datetime.now(),
+    }
+
+    db[COLECAO_ARMAZENAMENTO_DIARIO].replace_one(
+        {"data": documento["data"]},
+        documento,
+        upsert=True
+    )
+
+    return documento
+
+
+def carregar_armazenamento_diario(db, inicio: datetime.date | None = None) -> pd.DataFrame:
+    """
+    Histórico diário a partir de inicio (todo o período se None), em ordem de data.
+    """
+
+    filtro = {}
+
+    if inicio:
+        filtro["data"] = {"$gte": datetime.datetime(inicio.year, inicio.month, inicio.day)}
+
+    documentos = list(
+        db[COLECAO_ARMAZENAMENTO_DIARIO]
+        .find(filtro, {"_id": 0, "registrado_em": 0})
+        .sort("data", ASCENDING)
+    )
+
+    return pd.DataFrame(
+        documentos,
+        columns=["data", "armazenamento_mb", "dados_mb", "indices_mb", "por_colecao"]
+    )
+
+
+def projetar_limite(
+    df_historico: pd.DataFrame,
+    capacidade_mb: float = CAPACIDADE_ATLAS_MB,
+    coluna: str = "armazenamento_mb"
+) -> dict:
+    """
+    Crescimento médio por dia nos últimos DIAS_PROJECAO dias do histórico
+    (primeiro e último registro do intervalo) e data prevista para atingir
+    a capacidade.
+
+    Retorna:
+        {"crescimento_mb_dia": float | None, "dias_restantes": int | None,
+         "data_prevista": datetime.date | None}
+        dias_restantes e data_prevista são None sem histórico suficiente
+        ou sem crescimento.
+    """
+
+    sem_projecao = {"crescimento_mb_dia": None, "dias_restantes": None, "data_prevista": None}
+
+    if df_historico.empty:
+        return sem_projecao
+
+    ultimo = df_historico.iloc[-1]
+    ultima_data = pd.Timestamp(ultimo["data"])
+
+    recentes = df_historico[
+        pd.to_datetime(df_historico["data"]) >= ultima_data - pd.Timedelta(days=DIAS_PROJECAO)
+    ]
+
+    primeiro = recentes.iloc[0]
+    dias = (ultima_data - pd.Timestamp(primeiro["data"])).days
+
+    if dias < 1:
+        return sem_projecao
+
+    crescimento = (ultimo[coluna] - primeiro[coluna]) / dias
+
+    if crescimento <= 0:
+        return {**sem_projecao, "crescimento_mb_dia": crescimento}
+
+    dias_restantes = max(0, int((capacidade_mb - ultimo[coluna]) / crescimento))
+
+    return {
+        "crescimento_mb_dia": crescimento,
+        "dias_restantes": dias_restantes,
+        "data_prevista": ultima_data.date() + datetime.timedelta(days=dias_restantes),
+    }
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    documento = registrar_armazenamento_diario(db)
+
+    print(f"{documento['data']:%d/%m/%Y}: {documento['armazenamento_mb']:.1f} MB de {CAPACIDADE_ATLAS_MB} MB.")
@@ -0,0 +1,279 @@
+"""
+Arquivo de projetos concluídos e cancelados (coleção projetos_arquivo).
+
+Projetos com status "Concluído" ou "Cancelado" (pipeline_status_projetos)
+podem sair da coleção projetos, para não pesar nas consultas do portfólio
+nem no armazenamento. Cada projeto arquivado vira um documento com os
+campos de identificação e um instantâneo comprimido (BSON + zlib) com o
+projeto, os relatos e os lançamentos:
+
+    {"_id": <_id do projeto>, "codigo": ..., "sigla": ..., "status": "Concluído",
+     "arquivado_em": ..., "arquivado_por": ..., "tamanho_original": ...,
+     "tamanho_comprimido": ..., "instantaneo": Binary(...)}
+
+O resumo do projeto continua em projetos_resumo, marcado com arquivado=True.
+As páginas do portfólio não mostram os arquivados, a não ser que o toggle
+"Incluir arquivados" esteja ligado. A leitura do arquivo é só para consulta
+(página projetos_arquivados.py); para editar, o projeto é restaurado.
+
+Linha de comando:
+
+    python arquivo_projetos.py listar
+    python arquivo_projetos.py arquivar            # todos os concluídos e cancelados
+    python arquivo_projetos.py arquivar COD1 COD2
+    python arquivo_projetos.py restaurar COD1
+"""
+
+import datetime
+import sys
+import zlib
+
+import bson
+import streamlit as st
+from bson.binary import Binary
+
+from funcoes_auxiliares import consultar_status_projetos
+from historico_projetos import COLECAO_RELATOS, COLECAO_LANCAMENTOS
+from pendencias import COLECAO_PENDENCIAS
+from resumo_projetos import COLECAO_RESUMO, atualizar_resumo_projeto
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_ARQUIVO = "projetos_arquivo"
+
+
+STATUS_ARQUIVAVEIS = ["Concluído", "Cancelado"]
+
+
+# Campos do projeto repetidos fora do instantâneo, para listar sem descomprimir
+CAMPOS_IDENTIFICACAO = ("codigo", "sigla", "nome_do_projeto", "edital", "id_organizacao")
+
+
+# Chave de st.session_state do toggle "Incluir arquivados" das páginas do portfólio
+CHAVE_INCLUIR_ARQUIVADOS = "incluir_arquivados"
+
+# Chave de st.session_state com o código aberto na página projetos_arquivados.py
+CHAVE_PROJETO_ARQUIVADO = "projeto_arquivado"
+
+
+
+
+###########################################################################################################
+# INSTANTÂNEO COMPRIMIDO
+###########################################################################################################
+
+def _comprimir(conteudo: dict) -> bytes:
+    return zlib.compress(bson.encode(conteudo), 9)
+
+
+def _descomprimir(dados: bytes) -> dict:
+    return bson.decode(zlib.decompress(dados))
+
+
+def carregar_instantaneo(db, codigo: str) -> dict | None:
+    """
+    Conteúdo arquivado de um projeto: {"projeto": {...}, "relatos": [...],
+    "lancamentos": [...]}. None se o projeto não estiver arquivado.
+    """
+
+    arquivado = db[COLECAO_ARQUIVO].find_one({"codigo": codigo}, {"instantaneo": 1})
+
+    if not arquivado:
+        return None
+
+    return _descomprimir(arquivado["instantaneo"])
+
+
+
+
+###########################################################################################################
+# ARQUIVAR E RESTAURAR
+###########################################################################################################
+
+def projetos_arquivaveis(db) -> list[dict]:
+    """
+    Projetos ainda na coleção projetos com status Concluído ou Cancelado.
+    """
+
+    return consultar_status_projetos(db, status=STATUS_ARQUIVAVEIS)
+
+
+def arquivar_projeto(db, codigo: str, usuario: str | None = None) -> bool:
+    """
+    Move o projeto, os relatos e os lançamentos para projetos_arquivo.
+
+    O documento do arquivo é gravado antes de qualquer exclusão: se algo
+    falhar no meio, o projeto continua na coleção projetos e a operação
+    pode ser repetida.
+
+    Retorna:
+        True se arquivou. False se o projeto não existe ou não está
+        concluído nem cancelado.
+    """
+
+    status = consultar_status_projetos(db, filtro={"codigo": codigo}, status=STATUS_ARQUIVAVEIS)
+
+    if not status:
+        return False
+
+    projeto = db["projetos"].find_one({"codigo": codigo})
+
+    if projeto is None:
+        return False
+
+    conteudo = {
+        "projeto": projeto,
+        "relatos": list(db[COLECAO_RELATOS].find({"codigo": codigo})),
+        "lancamentos": list(db[COLECAO_LANCAMENTOS].find({"codigo": codigo})),
+    }
+
+    dados = _comprimir(conteudo)
+
+    db[COLECAO_ARQUIVO].replace_one(
+        {"_id": projeto["_id"]},
+        {
+            "_id": projeto["_id"],
+            **{campo: projeto.get(campo) for campo in CAMPOS_IDENTIFICACAO},
+            "status": status[0]["status"],
+            "arquivado_em": datetime.datetime.now(),
+            "arquivado_por": usuario,
+            "qtd_relatos": len(conteudo["relatos"]),
+            "qtd_lancamentos": len(conteudo["lancamentos"]),
+            "tamanho_original": len(bson.encode(conteudo)),
+            "tamanho_comprimido": len(dados),
+            "instantaneo": Binary(dados),
+        },
+        upsert=True
+    )
+
+    db[COLECAO_RELATOS].delete_many({"codigo": codigo})
+    db[COLECAO_LANCAMENTOS].delete_many({"codigo": codigo})
+    db[COLECAO_PENDENCIAS].delete_many({"codigo": codigo})
+    db["projetos"].delete_one({"_id": projeto["_id"]})
+
+    db[COLECAO_RESUMO].update_one({"_id": projeto["_id"]}, {"$set": {"arquivado": True}})
+
+    return True
+
+
+def restaurar_projeto(db, codigo: str) -> bool:
+    """
+    Devolve o projeto arquivado (com relatos e lançamentos) às coleções de
+    origem, com os mesmos _id, e recalcula o resumo.
+
+    Retorna:
+        True se restaurou. False se o projeto não está arquivado.
+    """
+
+    conteudo = carregar_instantaneo(db, codigo)
+
+    if conteudo is None:
+        return False
+
+    projeto = conteudo["projeto"]
+
+    db["projetos"].replace_one({"_id": projeto["_id"]}, projeto, upsert=True)
+
+    for colecao, documentos in ((COLECAO_RELATOS, conteudo["relatos"]), (COLECAO_LANCAMENTOS, conteudo["lancamentos"])):
+
+        db[colecao].delete_many({"codigo": codigo})
+
+        if documentos:
+            db[colecao].insert_many(documentos, ordered=False)
+
+    db[COLECAO_ARQUIVO].delete_one({"_id": projeto["_id"]})
+
+    # O resumo recalculado volta com arquivado=False
+    atualizar_resumo_projeto(db, codigo)
+
+    return True
+
+
+def arquivar_projetos_concluidos(db, usuario: str | None = None) -> list[str]:
+    """
+    Arquiva todos os projetos concluídos e cancelados.
+
+    Retorna:
+        Códigos dos projetos arquivados.
+    """
+
+    arquivados = []
+
+    for projeto in projetos_arquivaveis(db):
+
+        if arquivar_projeto(db, projeto["codigo"], usuario):
+            arquivados.append(projeto["codigo"])
+
+    return arquivados
+
+
+
+
+###########################################################################################################
+# CONSULTA
+###########################################################################################################
+
+def listar_arquivados(db) -> list[dict]:
+    """
+    Projetos arquivados, sem o instantâneo, em ordem de código.
+    """
+
+    return list(
+        db[COLECAO_ARQUIVO].find({}, {"instantaneo": 0}).sort("codigo", 1)
+    )
+
+
+def toggle_incluir_arquivados() -> bool:
+    """
+    Toggle "Incluir arquivados" na barra lateral das páginas do portfólio.
+    Deve ser chamado antes de carregar os resumos.
+    """
+
+    return st.sidebar.toggle(
+        "Incluir arquivados",
+        key=CHAVE_INCLUIR_ARQUIVADOS,
+        help="Mostra também os projetos concluídos e cancelados que foram arquivados."
+    )
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    comando, codigos = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ("listar", [])
+
+    if comando == "arquivar":
+
+        if codigos:
+            arquivados = [c for c in codigos if arquivar_projeto(db, c, "linha de comando")]
+        else:
+            arquivados = arquivar_projetos_concluidos(db, "linha de comando")
+
+        print(f"{len(arquivados)} projetos arquivados: {', '.join(arquivados)}")
+
+    elif comando == "restaurar":
+
+        for codigo in codigos:
+            print(f"{codigo}: {'restaurado' if restaurar_projeto(db, codigo) else 'não está arquivado'}")
+
+    else:
+
+        for arquivado in listar_arquivados(db):
+            print(
+                f"{arquivado['codigo']}  {arquivado.get('sigla') or ''}  {arquivado['status']}  "
+                f"{arquivado['arquivado_em']:%d/%m/%Y}  "
+                f"{arquivado['tamanho_original'] / 1024:.0f} KB -> {arquivado['tamanho_comprimido'] / 1024:.0f} KB"
+            )
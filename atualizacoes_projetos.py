@@ -0,0 +1,206 @@
+"""
+Montagem de atualizações direcionadas a itens de listas do projeto.
+
+Em vez de regravar a lista inteira ({"$set": {"relatorios": projeto["relatorios"]}}),
+as telas descrevem só o que mudou em um item, identificado por um filtro
+(ex.: o relatório de número 2 ou a despesa de id_despesa X). Cada função
+devolve uma parte com a atualização e os arrayFilters correspondentes:
+
+    parte = definir_no_item(
+        "relatorios", {"numero": 2}, {"status_relatorio": "aprovado"}, identificador="r"
+    )
+    # {"atualizacao": {"$set": {"relatorios.$[r].status_relatorio": "aprovado"}},
+    #  "array_filters": [{"r.numero": 2}]}
+
+As partes são juntadas com combinar_atualizacoes e gravadas com
+aplicar_atualizacoes, que passa por escrita_projetos.atualizar_projeto:
+
+    aplicar_atualizacoes(
+        col_projetos,
+        {"codigo": codigo},
+        definir_no_item("relatorios", {"numero": 2}, {...}, identificador="r"),
+        adicionar_ao_item("relatorios", {"numero": 2}, "devolucao", devolucao, identificador="r"),
+    )
+"""
+
+import re
+
+from escrita_projetos import atualizar_projeto
+
+
+
+
+###########################################################################################################
+# FUNÇÕES INTERNAS
+###########################################################################################################
+
+# O MongoDB exige identificadores de arrayFilters iniciados por letra minúscula
+_IDENTIFICADOR_VALIDO = re.compile(r"^[a-z][a-zA-Z0-9]*$")
+
+
+def _caminho_item(caminho_lista: str, identificador: str) -> str:
+
+    if not _IDENTIFICADOR_VALIDO.match(identificador):
+        raise ValueError(f"Identificador inválido para arrayFilters: {identificador!r}")
+
+    return f"{caminho_lista}.$[{identificador}]"
+
+
+def _filtro_item(filtro_item: dict, identificador: str) -> dict:
+
+    if not filtro_item:
+        raise ValueError("O filtro do item não pode ser vazio.")
+
+    return {f"{identificador}.{campo}": valor for campo, valor in filtro_item.items()}
+
+
+def _parte(operador: str, campos: dict, array_filters: list[dict]) -> dict:
+
+    return {"atualizacao": {operador: campos}, "array_filters": array_filters}
+
+
+
+
+###########################################################################################################
+# PARTES DE UMA ATUALIZAÇÃO
+###########################################################################################################
+
+def definir_no_item(
+    caminho_lista: str,
+    filtro_item: dict,
+    campos: dict,
+    identificador: str = "item"
+) -> dict:
+    """
+    $set de campos do item (ou itens) da lista que atendem ao filtro.
+    """
+
+    caminho = _caminho_item(caminho_lista, identificador)
+
+    return _parte(
+        "$set",
+        {f"{caminho}.{campo}": valor for campo, valor in campos.items()},
+        [_filtro_item(filtro_item, identificador)]
+    )
+
+
+def remover_do_item(
+    caminho_lista: str,
+    filtro_item: dict,
+    campos,
+    identificador: str = "item"
+) -> dict:
+    """
+    $unset de campos do item da lista que atende ao filtro.
+    """
+
+    caminho = _caminho_item(caminho_lista, identificador)
+
+    return _parte(
+        "$unset",
+        {f"{caminho}.{campo}": "" for campo in campos},
+        [_filtro_item(filtro_item, identificador)]
+    )
+
+
+def adicionar_ao_item(
+    caminho_lista: str,
+    filtro_item: dict,
+    campo_lista: str,
+    valores,
+    identificador: str = "item"
+) -> dict:
+    """
+    $push de um ou mais valores em uma lista interna do item.
+    valores pode ser um valor único ou uma lista de valores.
+    """
+
+    caminho = _caminho_item(caminho_lista, identificador)
+
+    if not isinstance(valores, list):
+        valores = [valores]
+
+    return _parte(
+        "$push",
+        {f"{caminho}.{campo_lista}": {"$each": valores}},
+        [_filtro_item(filtro_item, identificador)]
+    )
+
+
+def retirar_do_item(
+    caminho_lista: str,
+    filtro_item: dict,
+    campo_lista: str,
+    condicao,
+    identificador: str = "item"
+) -> dict:
+    """
+    $pull dos elementos de uma lista interna do item que atendem à condição
+    (um valor igual ao elemento ou uma condição de consulta).
+    """
+
+    caminho = _caminho_item(caminho_lista, identificador)
+
+    return _parte(
+        "$pull",
+        {f"{caminho}.{campo_lista}": condicao},
+        [_filtro_item(filtro_item, identificador)]
+    )
+
+
+
+
+###########################################################################################################
+# COMBINAÇÃO E GRAVAÇÃO
+###########################################################################################################
+
+def combinar_atualizacoes(*partes) -> tuple[dict, list[dict]]:
+    """
+    Junta as partes em uma única atualização.
+
+    Partes que usam o mesmo identificador precisam usar o mesmo filtro.
+
+    Retorna:
+        (atualização, array_filters)
+    """
+
+    atualizacao = {}
+    filtros_por_identificador = {}
+
+    for parte in partes:
+
+        for operador, campos in parte["atualizacao"].items():
+            atualizacao.setdefault(operador, {}).update(campos)
+
+        for filtro in parte["array_filters"]:
+
+            identificador = next(iter(filtro)).split(".", 1)[0]
+            existente = filtros_por_identificador.get(identificador)
+
+            if existente is not None and existente != filtro:
+                raise ValueError(
+                    f"O identificador {identificador!r} foi usado com filtros diferentes."
+                )
+
+            filtros_por_identificador[identificador] = filtro
+
+    return atualizacao, list(filtros_por_identificador.values())
+
+
+def aplicar_atualizacoes(col_projetos, filtro: dict, *partes):
+    """
+    Grava as partes em um único update_one no projeto do filtro.
+
+    Retorna:
+        O UpdateResult de atualizar_projeto (None se não houver partes).
+    """
+
+    if not partes:
+        return None
+
+    atualizacao, array_filters = combinar_atualizacoes(*partes)
+
+    if array_filters:
+        return atualizar_projeto(col_projetos, filtro, atualizacao, array_filters=array_filters)
+
+    return atualizar_projeto(col_projetos, filtro, atualizacao)
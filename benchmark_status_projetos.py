@@ -0,0 +1,238 @@
+"""
+Benchmark de calcular_status_projetos.
+
+Gera carteiras sintéticas de projetos, compara o resultado da versão colunar
+(funcoes_auxiliares.calcular_status_projetos) com a versão original linha a
+linha e mede o tempo das duas para tamanhos crescentes.
+
+Uso:
+
+    python benchmark_status_projetos.py
+    python benchmark_status_projetos.py 100 1000 10000
+"""
+
+import sys
+import time
+import random
+import datetime
+
+import pandas as pd
+
+from funcoes_auxiliares import calcular_status_projetos
+
+
+
+
+###########################################################################################################
+# VERSÃO ORIGINAL (LINHA A LINHA), MANTIDA APENAS COMO REFERÊNCIA
+###########################################################################################################
+
+def calcular_status_projetos_linha_a_linha(df_projetos: pd.DataFrame, hoje: datetime.date) -> pd.DataFrame:
+
+    if df_projetos.empty:
+        return df_projetos
+
+    for col in ["status", "dias_atraso", "proximo_evento", "data_proximo_evento", "notificacao"]:
+        if col not in df_projetos.columns:
+            df_projetos[col] = None
+
+    def parse_data_br(valor):
+        return pd.to_datetime(valor, format="%d/%m/%Y", errors="coerce")
+
+    for idx, projeto in df_projetos.iterrows():
+
+        df_projetos.at[idx, "notificacao"] = None
+
+        if projeto.get("status") == "Cancelado":
+            df_projetos.at[idx, "status"] = "Cancelado"
+            df_projetos.at[idx, "dias_atraso"] = None
+            df_projetos.at[idx, "proximo_evento"] = None
+            df_projetos.at[idx, "data_proximo_evento"] = None
+            continue
+
+        financeiro = projeto.get("financeiro")
+        if not isinstance(financeiro, dict):
+            financeiro = {}
+
+        parcelas = financeiro.get("parcelas")
+        if not isinstance(parcelas, list):
+            parcelas = []
+
+        relatorios = projeto.get("relatorios")
+        if not isinstance(relatorios, list):
+            relatorios = []
+
+        if not parcelas or not relatorios:
+            df_projetos.at[idx, "notificacao"] = "O projeto não possui parcelas e/ou relatórios cadastrados. "
+            df_projetos.at[idx, "status"] = "Sem cronograma"
+            df_projetos.at[idx, "dias_atraso"] = None
+            df_projetos.at[idx, "proximo_evento"] = None
+            df_projetos.at[idx, "data_proximo_evento"] = None
+            continue
+
+        eventos = []
+
+        for p in parcelas:
+            if isinstance(p, dict):
+                eventos.append({
+                    "tipo": "Parcela",
+                    "numero": p.get("numero"),
+                    "data_prevista": parse_data_br(p.get("data_prevista")),
+                    "realizado": p.get("data_realizada") is not None
+                })
+
+        for r in relatorios:
+            if isinstance(r, dict):
+                eventos.append({
+                    "tipo": "Relatório",
+                    "numero": r.get("numero"),
+                    "data_prevista": parse_data_br(r.get("data_prevista")),
+                    "realizado": r.get("data_envio") is not None
+                })
+
+        eventos = [e for e in eventos if pd.notna(e["data_prevista"])]
+
+        if not eventos:
+            df_projetos.at[idx, "notificacao"] = "O projeto não possui eventos com data válida."
+            df_projetos.at[idx, "status"] = "Sem cronograma"
+            df_projetos.at[idx, "dias_atraso"] = None
+            df_projetos.at[idx, "proximo_evento"] = None
+            df_projetos.at[idx, "data_proximo_evento"] = None
+            continue
+
+        eventos.sort(key=lambda x: x["data_prevista"])
+
+        proximo = next((e for e in eventos if not e["realizado"]), None)
+
+        if not proximo:
+            df_projetos.at[idx, "status"] = "Concluído"
+            df_projetos.at[idx, "dias_atraso"] = 0
+            df_projetos.at[idx, "proximo_evento"] = None
+            df_projetos.at[idx, "data_proximo_evento"] = None
+            continue
+
+        data_prevista = proximo["data_prevista"].date()
+        dias_atraso = (hoje - data_prevista).days
+
+        df_projetos.at[idx, "status"] = "Atrasado" if dias_atraso > 0 else "Em dia"
+        df_projetos.at[idx, "dias_atraso"] = dias_atraso
+        df_projetos.at[idx, "proximo_evento"] = f"{proximo['tipo']} {proximo['numero']}"
+        df_projetos.at[idx, "data_proximo_evento"] = data_prevista
+
+    return df_projetos
+
+
+
+
+###########################################################################################################
+# CARTEIRA SINTÉTICA
+###########################################################################################################
+
+def gerar_projetos(quantidade: int, semente: int = 42) -> list[dict]:
+    """
+    Gera projetos com os casos que aparecem na base: cancelados, sem
+    financeiro, listas vazias, datas inválidas, empates de data e
+    eventos já realizados.
+    """
+
+    aleatorio = random.Random(semente)
+    inicio = datetime.date(2024, 1, 1)
+
+    def data_aleatoria():
+        sorteio = aleatorio.random()
+        if sorteio < 0.03:
+            return None
+        if sorteio < 0.05:
+            return "31/02/2025"
+        return (inicio + datetime.timedelta(days=aleatorio.randint(0, 1200))).strftime("%d/%m/%Y")
+
+    projetos = []
+
+    for i in range(quantidade):
+
+        projeto = {"codigo": f"CEPF-{i:05d}", "sigla": f"P{i}"}
+
+        sorteio = aleatorio.random()
+
+        if sorteio < 0.05:
+            projeto["status"] = "Cancelado"
+        elif sorteio < 0.10:
+            projeto["status"] = "Em andamento"
+
+        if aleatorio.random() < 0.05:
+            projetos.append(projeto)
+            continue
+
+        parcelas = [
+            {
+                "numero": n,
+                "data_prevista": data_aleatoria(),
+                "data_realizada": "01/01/2024" if aleatorio.random() < 0.5 else None
+            }
+            for n in range(1, aleatorio.randint(0, 5) + 1)
+        ]
+
+        relatorios = [
+            {
+                "numero": n,
+                "data_prevista": data_aleatoria(),
+                **({"data_envio": "01/01/2024"} if aleatorio.random() < 0.4 else {})
+            }
+            for n in range(1, aleatorio.randint(0, 5) + 1)
+        ]
+
+        # Empate de datas entre parcela e relatório
+        if parcelas and relatorios and aleatorio.random() < 0.2:
+            relatorios[0]["data_prevista"] = parcelas[0]["data_prevista"]
+
+        projeto["financeiro"] = {"parcelas": parcelas}
+        projeto["relatorios"] = relatorios
+
+        projetos.append(projeto)
+
+    return projetos
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO
+###########################################################################################################
+
+COLUNAS_RESULTADO = ["status", "dias_atraso", "proximo_evento", "data_proximo_evento", "notificacao"]
+
+
+def executar(tamanhos: list[int]):
+
+    hoje = datetime.date(2026, 4, 30)
+
+    print(f"{'projetos':>10} {'linha a linha (s)':>18} {'colunar (s)':>12} {'ganho':>8}  resultado")
+
+    for tamanho in tamanhos:
+
+        projetos = gerar_projetos(tamanho)
+
+        inicio = time.perf_counter()
+        referencia = calcular_status_projetos_linha_a_linha(pd.DataFrame(projetos), hoje)
+        tempo_referencia = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        colunar = calcular_status_projetos(pd.DataFrame(projetos), hoje=hoje)
+        tempo_colunar = time.perf_counter() - inicio
+
+        identico = all(
+            referencia[coluna].tolist() == colunar[coluna].tolist()
+            for coluna in COLUNAS_RESULTADO
+        )
+
+        print(
+            f"{tamanho:>10} {tempo_referencia:>18.3f} {tempo_colunar:>12.3f} "
+            f"{tempo_referencia / tempo_colunar:>7.1f}x  {'idêntico' if identico else 'DIFERENTE'}"
+        )
+
+
+if __name__ == "__main__":
+
+    tamanhos = [int(t) for t in sys.argv[1:]] or [100, 1000, 5000, 20000]
+
+    executar(tamanhos)
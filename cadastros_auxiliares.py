@@ -1,10 +1,10 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_colecao_referencia, invalidar_cache_referencia  # Função personalizada para conectar ao MongoDB
 import pandas as pd
 from bson import ObjectId
-import time
 import streamlit_shadcn_ui as ui
 from streamlit_sortables import sort_items
+from mensagens_flash import agendar_mensagem
 # import uuid
 
 
@@ -53,7 +53,7 @@ col_editais = db["editais"]
 ###########################################################################################################
 
 # Editais
-df_editais = pd.DataFrame(list(col_editais.find()))
+df_editais = pd.DataFrame(carregar_colecao_referencia(db, "editais"))
 
 #  Converte id para string
 df_editais["_id"] = df_editais["_id"].astype(str)
@@ -222,11 +222,11 @@ def formulario_nova_pergunta(perguntas, edital_selecionado):
             {"codigo_edital": edital_selecionado},
             {"$push": {"perguntas_relatorio": nova_pergunta}}
         )
+        invalidar_cache_referencia("editais")
 
 
         # Feedback
-        st.success("Pergunta adicionada com sucesso!", icon=":material/check:")
-        time.sleep(3)
+        agendar_mensagem("Pergunta adicionada com sucesso!", icon=":material/check:")
 
         # Limpa campos dinâmicos
         for chave in [
@@ -270,9 +270,9 @@ def confirmar_exclusao_pergunta(pergunta_atual, perguntas, edital_selecionado):
                 {"codigo_edital": edital_selecionado},
                 {"$set": {"perguntas_relatorio": novas}}
             )
+            invalidar_cache_referencia("editais")
 
-            st.success("Pergunta excluída com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Pergunta excluída com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -602,9 +602,9 @@ with aba_perguntas:
                                     {"codigo_edital": edital_selecionado_perguntas},
                                     {"$set": {"perguntas_relatorio": perguntas_atualizadas}}
                                 )
+                                invalidar_cache_referencia("editais")
 
-                                st.success(":material/check: Pergunta atualizada!")
-                                time.sleep(3)
+                                agendar_mensagem(":material/check: Pergunta atualizada!")
                                 st.rerun()
 
                         # -------- EXCLUIR --------
@@ -660,9 +660,9 @@ with aba_perguntas:
                         {"codigo_edital": edital_selecionado_perguntas},
                         {"$set": {"perguntas_relatorio": novas_perguntas}}
                     )
+                    invalidar_cache_referencia("editais")
 
-                    st.success(":material/check: Ordem atualizada com sucesso!", icon=":material/check:")
-                    time.sleep(3)
+                    agendar_mensagem(":material/check: Ordem atualizada com sucesso!", icon=":material/check:")
                     st.rerun()
 
 
@@ -812,9 +812,9 @@ with aba_pesquisas:
                                 }
                             }
                         )
+                        invalidar_cache_referencia("editais")
 
-                        st.success(":material/check: Pesquisa cadastrada com sucesso!", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem(":material/check: Pesquisa cadastrada com sucesso!", icon=":material/check:")
                         st.rerun()
 
 
@@ -899,9 +899,9 @@ with aba_pesquisas:
                                 {"codigo_edital": edital_selecionado_pesquisas},
                                 {"$set": {"pesquisas_relatorio": pesquisas_atualizadas}}
                             )
+                            invalidar_cache_referencia("editais")
 
-                            st.success(":material/check: Pesquisa atualizada com sucesso!", icon=":material/check:")
-                            time.sleep(3)
+                            agendar_mensagem(":material/check: Pesquisa atualizada com sucesso!", icon=":material/check:")
                             st.rerun()
 
                     # -------- EXCLUIR --------
@@ -920,9 +920,9 @@ with aba_pesquisas:
                             {"codigo_edital": edital_selecionado_pesquisas},
                             {"$set": {"pesquisas_relatorio": pesquisas_atualizadas}}
                         )
+                        invalidar_cache_referencia("editais")
 
-                        st.success(":material/check: Pesquisa excluída com sucesso!", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem(":material/check: Pesquisa excluída com sucesso!", icon=":material/check:")
                         st.rerun()
 
 
@@ -1057,9 +1057,9 @@ with aba_direcoes:
                                 {"codigo_edital": edital_selecionado_direcoes},
                                 {"$push": {"direcoes_estrategicas": nova_direcao}}
                             )
+                            invalidar_cache_referencia("editais")
 
-                            st.success("Direção estratégica cadastrada com sucesso!", icon=":material/check:")
-                            time.sleep(2)
+                            agendar_mensagem("Direção estratégica cadastrada com sucesso!", icon=":material/check:")
                             st.rerun()
 
             # -------------------------
@@ -1131,9 +1131,9 @@ with aba_direcoes:
                                     {"codigo_edital": edital_selecionado_direcoes},
                                     {"$set": {"direcoes_estrategicas": direcoes_atualizadas}}
                                 )
+                                invalidar_cache_referencia("editais")
 
-                                st.success("Direção estratégica atualizada com sucesso!", icon=":material/check:")
-                                time.sleep(3)
+                                agendar_mensagem("Direção estratégica atualizada com sucesso!", icon=":material/check:")
                                 st.rerun()
 
                         # --------------------------------------------------
@@ -1176,11 +1176,11 @@ with aba_direcoes:
                                     {"codigo_edital": edital_selecionado_direcoes},
                                     {"$set": {"direcoes_estrategicas": direcoes_atualizadas}}
                                 )
+                                invalidar_cache_referencia("editais")
 
                                 st.session_state[confirm_key] = False
 
-                                st.success("Direção estratégica excluída com sucesso!", icon=":material/check:")
-                                time.sleep(2)
+                                agendar_mensagem("Direção estratégica excluída com sucesso!", icon=":material/check:")
                                 st.rerun()
 
                             if st.button(
@@ -1188,7 +1188,6 @@ with aba_direcoes:
                                 key=f"cancelar_btn_{direcao_atual['id']}"
                             ):
                                 st.session_state[confirm_key] = False
-                                time.sleep(3)
                                 st.rerun()
 
 
@@ -1292,9 +1291,9 @@ with aba_direcoes:
                     {"codigo_edital": edital_selecionado_direcoes},
                     {"$set": {"direcoes_estrategicas": direcoes_atualizadas}}
                 )
+                invalidar_cache_referencia("editais")
 
-                st.success("Prioridades de investimento atualizadas com sucesso!", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Prioridades de investimento atualizadas com sucesso!", icon=":material/check:")
                 st.rerun()
 
 
@@ -1492,9 +1491,9 @@ with aba_indicadores:
                     {"codigo_edital": edital_selecionado_indicadores},
                     {"$set": {"indicadores": estrutura_final}}
                 )
+                invalidar_cache_referencia("editais")
 
-                st.success("Indicadores atualizados com sucesso!", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Indicadores atualizados com sucesso!", icon=":material/check:")
                 st.rerun()
 
 
@@ -1515,8 +1514,8 @@ with aba_publicos:
     st.write('')
 
     # 1) Carrega documentos da coleção (ordenados)
-    dados_publicos = list(
-        col_publicos.find({}, {"publico": 1}).sort("publico", 1)
+    dados_publicos = carregar_colecao_referencia(
+        db, "publicos", projecao={"publico": 1}, ordenacao=[("publico", 1)]
     )
 
     df_publicos = pd.DataFrame(dados_publicos)
@@ -1621,11 +1620,13 @@ with aba_publicos:
             for publico in valores_editados - valores_orig:
                 if col_publicos.find_one({"publico": publico}):
                     st.error(f"O valor '{publico}' já existe e não será inserido.")
+                    invalidar_cache_referencia("publicos")
                     st.stop()
                 col_publicos.insert_one({"publico": publico})
 
-            st.success("Beneficiários atualizados com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            invalidar_cache_referencia("publicos")
+
+            agendar_mensagem("Beneficiários atualizados com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -1649,8 +1650,8 @@ with aba_beneficios:
     st.write('')
 
     # 1) Carrega documentos da coleção (ordenados)
-    dados_beneficios = list(
-        col_beneficios.find({}, {"beneficio": 1}).sort("beneficio", 1)
+    dados_beneficios = carregar_colecao_referencia(
+        db, "beneficios", projecao={"beneficio": 1}, ordenacao=[("beneficio", 1)]
     )
 
     df_beneficios = pd.DataFrame(dados_beneficios)
@@ -1760,12 +1761,14 @@ with aba_beneficios:
                         f"O valor '{beneficio}' já existe "
                         "e não será inserido."
                     )
+                    invalidar_cache_referencia("beneficios")
                     st.stop()
 
                 col_beneficios.insert_one({"beneficio": beneficio})
 
-            st.success("Tipos de benefício atualizados com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            invalidar_cache_referencia("beneficios")
+
+            agendar_mensagem("Tipos de benefício atualizados com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -1784,8 +1787,8 @@ with aba_categorias_despesa:
     st.write("")
 
     # 1) Carrega documentos da coleção (ordenados)
-    dados_categorias = list(
-        col_categorias_despesa.find({}, {"categoria": 1}).sort("categoria", 1)
+    dados_categorias = carregar_colecao_referencia(
+        db, "categorias_despesa", projecao={"categoria": 1}, ordenacao=[("categoria", 1)]
     )
 
     df_categorias = pd.DataFrame(dados_categorias)
@@ -2011,9 +2014,9 @@ with aba_categorias_despesa:
                         }
                     )
 
-            st.success("Categorias de despesa atualizadas com sucesso!", icon=":material/check:")
+            invalidar_cache_referencia("categorias_despesa")
 
-            time.sleep(3)
+            agendar_mensagem("Categorias de despesa atualizadas com sucesso!", icon=":material/check:")
 
             st.rerun()
 
@@ -2039,11 +2042,11 @@ with aba_corredores:
     # -----------------------------------
     # Carregar dados da coleção
     # -----------------------------------
-    dados_corredores = list(
-        col_corredores.find(
-            {},
-            {"id_corredor": 1, "nome_corredor": 1}
-        ).sort("nome_corredor", 1)
+    dados_corredores = carregar_colecao_referencia(
+        db,
+        "corredores",
+        projecao={"id_corredor": 1, "nome_corredor": 1},
+        ordenacao=[("nome_corredor", 1)]
     )
 
     df_corredores = pd.DataFrame(dados_corredores)
@@ -2202,9 +2205,9 @@ with aba_corredores:
             col_corredores.insert_many(
                 df_salvar.to_dict(orient="records")
             )
+            invalidar_cache_referencia("corredores")
 
-            st.success("Corredores atualizados com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Corredores atualizados com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -2224,11 +2227,11 @@ with aba_kbas:
     # -----------------------------------
     # Carregar dados da coleção
     # -----------------------------------
-    dados_kbas = list(
-        col_kbas.find(
-            {},
-            {"id_kba": 1, "nome_kba": 1}
-        ).sort("nome_kba", 1)
+    dados_kbas = carregar_colecao_referencia(
+        db,
+        "kbas",
+        projecao={"id_kba": 1, "nome_kba": 1},
+        ordenacao=[("nome_kba", 1)]
     )
 
     df_kbas = pd.DataFrame(dados_kbas)
@@ -2389,9 +2392,9 @@ with aba_kbas:
             col_kbas.insert_many(
                 df_salvar.to_dict(orient="records")
             )
+            invalidar_cache_referencia("kbas")
 
-            st.success("KBAs atualizadas com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("KBAs atualizadas com sucesso!", icon=":material/check:")
             st.rerun()
 
 
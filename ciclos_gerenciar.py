@@ -1,9 +1,9 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_colecao_referencia, invalidar_cache_referencia  # Função personalizada para conectar ao MongoDB
 import pandas as pd
-import time
 import datetime
 from st_rsuite import date_picker
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -20,16 +20,16 @@ db = conectar_mongo_cepf_gestao()
 
 
 col_ciclos = db["ciclos_investimento"]
-df_ciclos = pd.DataFrame(list(col_ciclos.find()))
+df_ciclos = pd.DataFrame(carregar_colecao_referencia(db, "ciclos_investimento"))
 
 col_editais = db["editais"]
-df_editais = pd.DataFrame(list(col_editais.find()))
+df_editais = pd.DataFrame(carregar_colecao_referencia(db, "editais"))
 
 col_investidores = db["investidores"]
-df_investidores = pd.DataFrame(list(col_investidores.find()))
+df_investidores = pd.DataFrame(carregar_colecao_referencia(db, "investidores"))
 
 col_doadores = db["doadores"]
-df_doadores = pd.DataFrame(list(col_doadores.find()))
+df_doadores = pd.DataFrame(carregar_colecao_referencia(db, "doadores"))
 
 # Define as coleções específicas que serão utilizadas a partir do banco
 # col_pessoas = db["pessoas"]
@@ -136,8 +136,8 @@ with tab1:
                             "nome_investidor": nome_investidor
                         }
                         col_investidores.insert_one(novo_investidor)
-                        st.success("Investidor cadastrado com sucesso!", icon=":material/check:")
-                        time.sleep(2)
+                        invalidar_cache_referencia("investidores")
+                        agendar_mensagem("Investidor cadastrado com sucesso!", icon=":material/check:")
                         st.rerun()
 
     # ----------------------------------------
@@ -196,9 +196,9 @@ with tab1:
                                     "nome_investidor": nome_investidor
                                 }}
                             )
+                            invalidar_cache_referencia("investidores")
 
-                            st.success("Investidor atualizado com sucesso!", icon=":material/check:")
-                            time.sleep(2)
+                            agendar_mensagem("Investidor atualizado com sucesso!", icon=":material/check:")
                             st.rerun()
             else:
                 st.warning("Não foi possível localizar o investidor selecionado.")
@@ -249,8 +249,8 @@ with tab2:
                             "nome_doador": nome_doador,
                         }
                         col_doadores.insert_one(novo_doador)
-                        st.success("Doador cadastrado com sucesso!", icon=":material/check:")
-                        time.sleep(2)
+                        invalidar_cache_referencia("doadores")
+                        agendar_mensagem("Doador cadastrado com sucesso!", icon=":material/check:")
                         st.rerun()
 
     # ----------------------------------------
@@ -303,9 +303,9 @@ with tab2:
                                 {"_id": doador["_id"]},
                                 {"$set": {"nome_doador": nome_doador}}
                             )
+                            invalidar_cache_referencia("doadores")
 
-                            st.success("Doador atualizado com sucesso!", icon=":material/check:")
-                            time.sleep(2)
+                            agendar_mensagem("Doador atualizado com sucesso!", icon=":material/check:")
                             st.rerun()
             else:
                 st.warning("Não foi possível localizar o doador selecionado.")
@@ -380,9 +380,9 @@ with tab3:
                             "doadores": doador,
                             }
                         col_ciclos.insert_one(novo_ciclo)
-                        st.success("Ciclo de Investimento cadastrado com sucesso!", icon=":material/check:")
+                        invalidar_cache_referencia("ciclos_investimento")
+                        agendar_mensagem("Ciclo de Investimento cadastrado com sucesso!", icon=":material/check:")
 
-                        time.sleep(2)
                         st.rerun()
 
     elif opcao_ciclos == "Editar Ciclo de Investimento":
@@ -457,9 +457,9 @@ with tab3:
                                     "doadores": doador
                                 }}
                             )
+                            invalidar_cache_referencia("ciclos_investimento")
 
-                            st.success("Ciclo de Investimento atualizado com sucesso!", icon=":material/check:")
-                            time.sleep(2)
+                            agendar_mensagem("Ciclo de Investimento atualizado com sucesso!", icon=":material/check:")
                             st.rerun()
 
 
@@ -534,9 +534,9 @@ with tab4:
 
                         }
                         col_editais.insert_one(novo_edital)
-                        st.success("Edital cadastrado com sucesso!", icon=":material/check:")
+                        invalidar_cache_referencia("editais")
+                        agendar_mensagem("Edital cadastrado com sucesso!", icon=":material/check:")
 
-                        time.sleep(2)
                         st.rerun()
 
 
@@ -639,9 +639,9 @@ with tab4:
 
                                 }}
                             )
+                            invalidar_cache_referencia("editais")
 
-                            st.success("Edital atualizado com sucesso!", icon=":material/check:")
-                            time.sleep(2)
+                            agendar_mensagem("Edital atualizado com sucesso!", icon=":material/check:")
                             st.rerun()
             else:
                 st.warning("Não foi possível localizar o edital selecionado.")
@@ -1,5 +1,5 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_colecao_referencia  # Função personalizada para conectar ao MongoDB
 import pandas as pd
 import time
 import datetime
@@ -18,22 +18,21 @@ db = conectar_mongo_cepf_gestao()
 
 
 col_ciclos = db["ciclos_investimento"]
-df_ciclos = pd.DataFrame(list(col_ciclos.find()))
+df_ciclos = pd.DataFrame(carregar_colecao_referencia(db, "ciclos_investimento"))
 
 col_editais = db["editais"]
 
 # Carrega somente algumas colunas da coleção de editais
 df_editais = pd.DataFrame(
-    list(
-        col_editais.find(
-            {},
-            {
-                "codigo_edital": 1,
-                "nome_edital": 1,
-                "data_lancamento": 1,
-                "ciclo_investimento": 1
-            }
-        )
+    carregar_colecao_referencia(
+        db,
+        "editais",
+        projecao={
+            "codigo_edital": 1,
+            "nome_edital": 1,
+            "data_lancamento": 1,
+            "ciclo_investimento": 1
+        }
     )
 )
 
@@ -41,10 +40,10 @@ df_editais = pd.DataFrame(
 
 
 col_investidores = db["investidores"]
-df_investidores = pd.DataFrame(list(col_investidores.find()))
+df_investidores = pd.DataFrame(carregar_colecao_referencia(db, "investidores"))
 
 col_doadores = db["doadores"]
-df_doadores = pd.DataFrame(list(col_doadores.find()))
+df_doadores = pd.DataFrame(carregar_colecao_referencia(db, "doadores"))
 
 # Define as coleções específicas que serão utilizadas a partir do banco
 # col_pessoas = db["pessoas"]
@@ -0,0 +1,226 @@
+"""
+Contadores de identificadores sequenciais por projeto (coleção contadores).
+
+Os ids relato_001, relato_002... e despesa_001, despesa_002... são gerados por
+projeto. Em vez de percorrer todo o histórico do projeto para achar o maior
+número, cada projeto/tipo tem um documento contador incrementado
+atomicamente com find_one_and_update($inc), o que também evita ids repetidos
+em envios simultâneos.
+
+    id_relato = proximo_id(db, codigo, "relato")      # "relato_012"
+    id_lanc = proximo_id(db, codigo, "despesa")       # "despesa_007"
+
+Um contador que ainda não existe é criado a partir dos ids já gravados no
+projeto. Para criar todos de uma vez (carga inicial):
+
+    python contadores.py
+"""
+
+import re
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from historico_projetos import COLECAO_RELATOS, COLECAO_LANCAMENTOS
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_CONTADORES = "contadores"
+
+
+# Para cada tipo: coleção e campo onde os ids ficam e caminho dos ids ainda
+# guardados dentro do projeto (antes da migração do histórico)
+TIPOS_IDS = {
+    "relato": {
+        "colecao": COLECAO_RELATOS,
+        "campo": "id_relato",
+        "caminho_no_projeto": "plano_trabalho.componentes.entregas.atividades.relatos.id_relato",
+    },
+    "despesa": {
+        "colecao": COLECAO_LANCAMENTOS,
+        "campo": "id_lanc_despesa",
+        "caminho_no_projeto": "financeiro.orcamento.lancamentos.id_lanc_despesa",
+    },
+}
+
+
+
+
+###########################################################################################################
+# FUNÇÕES INTERNAS
+###########################################################################################################
+
+def _chave_contador(codigo: str, tipo: str) -> str:
+    return f"{codigo}:{tipo}"
+
+
+def _numero_do_id(tipo: str, id_existente) -> int:
+    """
+    Número de um id no formato <tipo>_NNN (0 se estiver em outro formato).
+    """
+
+    if not isinstance(id_existente, str):
+        return 0
+
+    encontrado = re.fullmatch(rf"{tipo}_(\d+)", id_existente)
+
+    return int(encontrado.group(1)) if encontrado else 0
+
+
+def _valores_do_caminho(documento, partes):
+    """
+    Valores de um caminho com listas no meio (como a notação de ponto do MongoDB).
+    """
+
+    if not partes:
+        yield documento
+        return
+
+    if isinstance(documento, list):
+        for item in documento:
+            yield from _valores_do_caminho(item, partes)
+
+    elif isinstance(documento, dict) and partes[0] in documento:
+        yield from _valores_do_caminho(documento[partes[0]], partes[1:])
+
+
+def maior_numero_existente(db, codigo: str, tipo: str) -> int:
+    """
+    Maior número já usado nos ids do tipo no projeto, na coleção do histórico
+    e no documento do projeto.
+    """
+
+    definicao = TIPOS_IDS[tipo]
+    campo = definicao["campo"]
+
+    maior = 0
+
+    for documento in db[definicao["colecao"]].find(
+        {"codigo": codigo, campo: {"$regex": f"^{tipo}_"}},
+        {campo: 1}
+    ):
+        maior = max(maior, _numero_do_id(tipo, documento.get(campo)))
+
+    caminho = definicao["caminho_no_projeto"]
+    projeto = db["projetos"].find_one({"codigo": codigo}, {caminho: 1})
+
+    for id_existente in _valores_do_caminho(projeto, caminho.split(".")):
+        maior = max(maior, _numero_do_id(tipo, id_existente))
+
+    return maior
+
+
+def _semear_contador(db, codigo: str, tipo: str) -> int:
+    """
+    Garante que o contador seja pelo menos o maior número já usado.
+    """
+
+    maior = maior_numero_existente(db, codigo, tipo)
+
+    try:
+        db[COLECAO_CONTADORES].update_one(
+            {"_id": _chave_contador(codigo, tipo)},
+            {"$max": {"valor": maior}, "$setOnInsert": {"codigo": codigo, "tipo": tipo}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Outro processo criou o contador ao mesmo tempo
+        pass
+
+    return maior
+
+
+
+
+###########################################################################################################
+# GERAÇÃO DE IDS
+###########################################################################################################
+
+def proximo_numero(db, codigo: str, tipo: str) -> int:
+    """
+    Reserva e devolve o próximo número do tipo ("relato" ou "despesa") no projeto.
+    """
+
+    if tipo not in TIPOS_IDS:
+        raise ValueError(f"Tipo de id desconhecido: {tipo}")
+
+    col_contadores = db[COLECAO_CONTADORES]
+    chave = _chave_contador(codigo, tipo)
+
+    contador = col_contadores.find_one_and_update(
+        {"_id": chave},
+        {"$inc": {"valor": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+
+    if contador is None:
+
+        _semear_contador(db, codigo, tipo)
+
+        contador = col_contadores.find_one_and_update(
+            {"_id": chave},
+            {"$inc": {"valor": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    return contador["valor"]
+
+
+def proximo_id(db, codigo: str, tipo: str) -> str:
+    """
+    Próximo id do tipo no projeto, no formato <tipo>_NNN (ex.: relato_012).
+    """
+
+    return f"{tipo}_{proximo_numero(db, codigo, tipo):03d}"
+
+
+
+
+###########################################################################################################
+# CARGA INICIAL
+###########################################################################################################
+
+def semear_contadores(db) -> int:
+    """
+    Cria ou ajusta os contadores de todos os projetos a partir dos ids
+    existentes. Pode ser executada mais de uma vez.
+
+    Retorna:
+        Quantidade de contadores verificados.
+    """
+
+    total = 0
+
+    for codigo in db["projetos"].distinct("codigo"):
+
+        if not codigo:
+            continue
+
+        for tipo in TIPOS_IDS:
+            maior = _semear_contador(db, codigo, tipo)
+            print(f"{codigo}: {tipo}_{maior:03d}")
+            total += 1
+
+    return total
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    total = semear_contadores(db)
+
+    print(f"\n{total} contadores verificados.")
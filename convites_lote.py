@@ -0,0 +1,593 @@
+"""
+Convite em massa de pessoas (coleção convites_lote).
+
+A planilha validada em pessoas_cadastrar.py vira um lote: um documento com
+uma linha por pessoa e a situação de cada etapa. O lote é processado pela
+fila de tarefas (tarefa convites_lote em fila_tarefas.py), fora da página,
+em três etapas:
+
+    1. cadastro:   insert_many das pessoas ainda não cadastradas
+    2. convite:    e-mails de convite na caixa de saída (enfileirar_emails),
+                   enviados pelo enviador em uma única conexão SMTP
+    3. permissoes: uma consulta $in para os projetos de todas as linhas e as
+                   permissões de leitura nas pastas do Drive em requisições
+                   em lote (new_batch_http_request)
+
+    {"_id": ..., "status": "pendente", "criado_em": ..., "criado_por": ...,
+     "linhas": [{"linha": 1, "pessoa": {...}, "cadastro": "ok",
+                 "convite": "ok", "id_email": "convite_lote:...:1:0",
+                 "entrega": "enviado", "permissoes": "erro",
+                 "erros": ["ABC-01: ..."]}]}
+
+Cada etapa grava a situação das linhas assim que termina, e só trata as
+linhas que ainda estão pendentes. Se o processamento for interrompido, ou
+se alguma linha falhar, o lote pode ser continuado (continuar_lote) sem
+cadastrar nem convidar de novo quem já foi atendido. O _id de cada convite
+na caixa de saída é derivado do lote e da linha (id_email_convite): se o
+processamento cair depois de enfileirar e antes de gravar as linhas, a
+retomada grava as mesmas mensagens de novo, sem duplicar os convites.
+
+convite "ok" quer dizer que o e-mail está na caixa de saída. A entrega é
+acompanhada por atualizar_entregas, que copia para cada linha a situação
+da mensagem (campo entrega) e marca como erro os convites que o enviador
+desistiu de enviar. O lote fica aguardando_entrega até todos os convites
+serem enviados.
+
+Linha de comando:
+
+    python convites_lote.py                 # lotes recentes
+    python convites_lote.py processar ID    # processa (ou continua) um lote aqui mesmo
+"""
+
+import datetime
+import sys
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from fila_emails import ENVIADO as EMAIL_ENVIADO, ERRO as EMAIL_ERRO, enfileirar_emails, situacao_emails
+from funcoes_auxiliares import obter_servico_drive, obter_pasta_projeto
+from metricas_prometheus import medir, registrar_falha, DURACAO_DRIVE
+from resumo_projetos import atualizar_resumos_por_codigos
+from templates_email import renderizar_email, renderizar_emails
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_LOTES_CONVITE = "convites_lote"
+
+
+# Status do lote
+PENDENTE = "pendente"
+EM_ANDAMENTO = "em_andamento"
+AGUARDANDO_ENTREGA = "aguardando_entrega"
+CONCLUIDO = "concluido"
+COM_FALHAS = "com_falhas"
+
+# Situação de cada etapa de uma linha
+SITUACAO_PENDENTE = "pendente"
+SITUACAO_OK = "ok"
+SITUACAO_ERRO = "erro"
+
+ETAPAS = ("cadastro", "convite", "permissoes")
+
+
+# Máximo de chamadas por requisição em lote da API do Google
+CHAMADAS_POR_LOTE_DRIVE = 100
+
+
+ASSUNTO_CONVITE = "Convite para o sistema Veredas"
+
+
+# Chave de st.session_state com o id da tarefa que processa o lote
+CHAVE_TAREFA_LOTE = "tarefa_convites_lote"
+
+
+
+
+###########################################################################################################
+# E-MAIL DE CONVITE
+###########################################################################################################
+
+def gerar_email_convite(nome_completo, codigo):
+    """
+    Corpo HTML do e-mail de convite com o código de 6 dígitos
+    (templates_email/convite.html).
+    """
+
+    return renderizar_email("convite.html", nome_completo=nome_completo, codigo=codigo)
+
+
+
+
+###########################################################################################################
+# LOTE
+###########################################################################################################
+
+def criar_lote(db, pessoas: list[dict], usuario: str | None = None) -> ObjectId:
+    """
+    Grava um lote com os documentos das pessoas a convidar (no formato da
+    coleção pessoas, já com codigo_convite).
+    """
+
+    agora = datetime.datetime.now()
+
+    return db[COLECAO_LOTES_CONVITE].insert_one({
+        "status": PENDENTE,
+        "criado_em": agora,
+        "criado_por": usuario,
+        "atualizado_em": agora,
+        "total": len(pessoas),
+        "linhas": [
+            {
+                "linha": i,
+                "pessoa": pessoa,
+                **{etapa: SITUACAO_PENDENTE for etapa in ETAPAS},
+                "id_email": None,
+                "entrega": None,
+                "reenvios_convite": 0,
+                "erros": [],
+            }
+            for i, pessoa in enumerate(pessoas, start=1)
+        ],
+    }).inserted_id
+
+
+def _gravar_linhas(db, lote: dict, **campos):
+    """
+    Grava a situação das linhas depois de uma etapa.
+    """
+
+    db[COLECAO_LOTES_CONVITE].update_one(
+        {"_id": lote["_id"]},
+        {"$set": {"linhas": lote["linhas"], "atualizado_em": datetime.datetime.now(), **campos}}
+    )
+
+
+def _pendentes(lote: dict, etapa: str) -> list[dict]:
+    """
+    Linhas com a etapa pendente. As etapas seguintes ao cadastro só tratam
+    pessoas cadastradas.
+    """
+
+    return [
+        linha for linha in lote["linhas"]
+        if linha[etapa] == SITUACAO_PENDENTE
+        and (etapa == "cadastro" or linha["cadastro"] == SITUACAO_OK)
+    ]
+
+
+def _marcar_erro(linha: dict, etapa: str, mensagem: str):
+
+    linha[etapa] = SITUACAO_ERRO
+    linha["erros"].append(mensagem)
+
+
+
+
+###########################################################################################################
+# ETAPAS
+###########################################################################################################
+
+def cadastrar_pessoas(db, lote: dict):
+    """
+    Insere as pessoas pendentes com um único insert_many.
+
+    Um e-mail que já está na coleção pessoas com o mesmo codigo_convite foi
+    cadastrado por uma execução anterior interrompida e conta como ok.
+    """
+
+    linhas = _pendentes(lote, "cadastro")
+
+    if not linhas:
+        return
+
+    existentes = {
+        pessoa["e_mail"]: pessoa.get("codigo_convite")
+        for pessoa in db["pessoas"].find(
+            {"e_mail": {"$in": [linha["pessoa"]["e_mail"] for linha in linhas]}},
+            {"e_mail": 1, "codigo_convite": 1}
+        )
+    }
+
+    inserir = []
+
+    for linha in linhas:
+
+        email = linha["pessoa"]["e_mail"]
+
+        if email not in existentes:
+            inserir.append(linha)
+        elif existentes[email] == linha["pessoa"]["codigo_convite"]:
+            linha["cadastro"] = SITUACAO_OK
+        else:
+            _marcar_erro(linha, "cadastro", "E-mail já cadastrado.")
+
+    if inserir:
+
+        erros = {}
+
+        try:
+            # Cópias: insert_many acrescenta _id aos documentos
+            db["pessoas"].insert_many([dict(linha["pessoa"]) for linha in inserir], ordered=False)
+        except BulkWriteError as e:
+            erros = {erro["index"]: erro.get("errmsg", "") for erro in e.details.get("writeErrors", [])}
+
+        for i, linha in enumerate(inserir):
+            if i in erros:
+                _marcar_erro(linha, "cadastro", f"Falha no cadastro: {erros[i]}")
+            else:
+                linha["cadastro"] = SITUACAO_OK
+
+    _gravar_linhas(db, lote)
+
+    # Padrinhos e madrinhas aparecem no resumo dos projetos
+    atualizar_resumos_por_codigos(
+        db,
+        [codigo for linha in linhas if linha["cadastro"] == SITUACAO_OK for codigo in linha["pessoa"].get("projetos", [])]
+    )
+
+
+def id_email_convite(lote: dict, linha: dict) -> str:
+    """
+    _id do convite da linha na caixa de saída. Só muda quando o convite é
+    reenviado depois de uma falha de entrega (reenvios_convite).
+    """
+
+    return f"convite_lote:{lote['_id']}:{linha['linha']}:{linha.get('reenvios_convite', 0)}"
+
+
+def enfileirar_convites(db, lote: dict):
+    """
+    Coloca os convites pendentes na caixa de saída com uma única escrita
+    em lote, com _id determinístico (id_email_convite).
+    """
+
+    linhas = _pendentes(lote, "convite")
+
+    if not linhas:
+        return
+
+    corpos = renderizar_emails(
+        "convite.html",
+        [{"nome_completo": linha["pessoa"]["nome_completo"], "codigo": linha["pessoa"]["codigo_convite"]} for linha in linhas]
+    )
+
+    ids = enfileirar_emails(db, [
+        {
+            "_id": id_email_convite(lote, linha),
+            "corpo_html": corpo_html,
+            "destinatarios": [linha["pessoa"]["e_mail"]],
+            "assunto": ASSUNTO_CONVITE,
+            "origem": "convites_lote",
+        }
+        for linha, corpo_html in zip(linhas, corpos)
+    ])
+
+    for linha, id_email in zip(linhas, ids):
+        linha["convite"] = SITUACAO_OK
+        linha["id_email"] = id_email
+        linha["entrega"] = None
+
+    _gravar_linhas(db, lote)
+
+
+def conceder_permissoes(db, lote: dict, servico=None):
+    """
+    Dá às pessoas pendentes permissão de leitura nas pastas dos seus
+    projetos: os projetos vêm de uma só consulta e as permissões são
+    criadas em requisições em lote de até CHAMADAS_POR_LOTE_DRIVE chamadas.
+    """
+
+    linhas = _pendentes(lote, "permissoes")
+
+    if not linhas:
+        return
+
+    codigos = sorted({codigo for linha in linhas for codigo in linha["pessoa"].get("projetos", [])})
+
+    siglas = {
+        projeto["codigo"]: projeto.get("sigla", "")
+        for projeto in db["projetos"].find({"codigo": {"$in": codigos}}, {"codigo": 1, "sigla": 1})
+    }
+
+    if codigos:
+        servico = servico or obter_servico_drive()
+
+    # Pasta de cada projeto (registrada em pastas_drive; só procura no Drive na primeira vez)
+    pastas = {}
+
+    for codigo in codigos:
+
+        if codigo not in siglas:
+            continue
+
+        try:
+            pastas[codigo] = obter_pasta_projeto(servico, codigo, siglas[codigo])
+        except Exception as e:
+            registrar_falha("drive")
+            pastas[codigo] = e
+
+    # Chamadas a fazer: (índice da linha, código do projeto)
+    chamadas = []
+
+    for i, linha in enumerate(linhas):
+
+        for codigo in linha["pessoa"].get("projetos", []):
+
+            if codigo not in siglas:
+                linha["erros"].append(f"{codigo}: projeto não encontrado.")
+            elif isinstance(pastas[codigo], Exception):
+                linha["erros"].append(f"{codigo}: pasta do projeto indisponível ({pastas[codigo]}).")
+            else:
+                chamadas.append((i, codigo))
+
+    # Linhas com alguma permissão não concedida
+    com_falha = {i for i, linha in enumerate(linhas) if linha["erros"]}
+
+    def ao_criar(id_requisicao, resposta, erro):
+        if erro is not None:
+            i, codigo = id_requisicao.split("|", 1)
+            linhas[int(i)]["erros"].append(f"{codigo}: {erro}")
+            com_falha.add(int(i))
+
+    for inicio in range(0, len(chamadas), CHAMADAS_POR_LOTE_DRIVE):
+
+        lote_drive = servico.new_batch_http_request(callback=ao_criar)
+
+        for i, codigo in chamadas[inicio:inicio + CHAMADAS_POR_LOTE_DRIVE]:
+            lote_drive.add(
+                servico.permissions().create(
+                    fileId=pastas[codigo],
+                    body={"type": "user", "role": "reader", "emailAddress": linhas[i]["pessoa"]["e_mail"]},
+                    sendNotificationEmail=False,
+                    supportsAllDrives=True
+                ),
+                request_id=f"{i}|{codigo}"
+            )
+
+        try:
+            with medir(DURACAO_DRIVE, operacao="add_permissao_lote"):
+                lote_drive.execute()
+        except Exception as e:
+            registrar_falha("drive")
+            for i, codigo in chamadas[inicio:inicio + CHAMADAS_POR_LOTE_DRIVE]:
+                linhas[i]["erros"].append(f"{codigo}: {e}")
+                com_falha.add(i)
+
+    for i, linha in enumerate(linhas):
+        linha["permissoes"] = SITUACAO_ERRO if i in com_falha else SITUACAO_OK
+
+    _gravar_linhas(db, lote)
+
+
+
+
+###########################################################################################################
+# PROCESSAMENTO
+###########################################################################################################
+
+def processar_lote(db, id_lote, ao_concluir_etapa=None) -> dict:
+    """
+    Executa as etapas pendentes do lote, na ordem cadastro, convite e
+    permissões. ao_concluir_etapa(etapa) é chamada depois de cada etapa
+    (a tarefa da fila renova a reserva).
+
+    Retorna:
+        Contagem por etapa e situação (resumo_lote).
+    """
+
+    lote = db[COLECAO_LOTES_CONVITE].find_one({"_id": ObjectId(id_lote)})
+
+    if lote is None:
+        raise ValueError(f"Lote de convites {id_lote} não encontrado.")
+
+    _gravar_linhas(db, lote, status=EM_ANDAMENTO)
+
+    for etapa, executar in (
+        ("cadastro", cadastrar_pessoas),
+        ("convite", enfileirar_convites),
+        ("permissoes", conceder_permissoes),
+    ):
+        executar(db, lote)
+
+        if ao_concluir_etapa:
+            ao_concluir_etapa(etapa)
+
+    resumo = resumo_lote(lote)
+
+    falhou = any(resumo[etapa][SITUACAO_ERRO] for etapa in ETAPAS)
+
+    lote["status"] = COM_FALHAS if falhou else AGUARDANDO_ENTREGA
+
+    _gravar_linhas(db, lote, status=lote["status"])
+
+    # Convites que o enviador já mandou (ou desistiu de mandar)
+    atualizar_entregas(db, lote)
+
+    return resumo
+
+
+def atualizar_entregas(db, lote: dict) -> dict:
+    """
+    Copia para cada linha a situação do seu convite na caixa de saída
+    (situacao_emails). Convites com erro de envio passam a convite "erro",
+    para serem reenviados por continuar_lote. Um lote aguardando entrega
+    fica concluído quando todos os convites foram enviados.
+
+    Retorna:
+        O lote atualizado.
+    """
+
+    linhas = [linha for linha in lote["linhas"] if linha["convite"] == SITUACAO_OK and linha.get("id_email")]
+
+    if not linhas:
+        return lote
+
+    situacoes = situacao_emails(db, [linha["id_email"] for linha in linhas])
+
+    alterado = False
+
+    for linha in linhas:
+
+        entrega = situacoes.get(linha["id_email"])
+
+        if entrega == linha.get("entrega"):
+            continue
+
+        linha["entrega"] = entrega
+        alterado = True
+
+        if entrega == EMAIL_ERRO:
+            _marcar_erro(linha, "convite", "E-mail de convite não enviado (erro no envio, ver caixa de saída)")
+
+    if any(linha[etapa] == SITUACAO_ERRO for linha in lote["linhas"] for etapa in ETAPAS):
+        status = COM_FALHAS if lote["status"] != EM_ANDAMENTO else lote["status"]
+    elif lote["status"] == AGUARDANDO_ENTREGA and all(
+        linha.get("entrega") == EMAIL_ENVIADO for linha in lote["linhas"] if linha["convite"] == SITUACAO_OK
+    ):
+        status = CONCLUIDO
+    else:
+        status = lote["status"]
+
+    if alterado or status != lote["status"]:
+        lote["status"] = status
+        _gravar_linhas(db, lote, status=status)
+
+    return lote
+
+
+def continuar_lote(db, id_lote):
+    """
+    Volta a pendente as etapas com erro, para que o próximo processamento
+    tente de novo só essas linhas.
+    """
+
+    lote = db[COLECAO_LOTES_CONVITE].find_one({"_id": ObjectId(id_lote)})
+
+    if lote is None:
+        return
+
+    for linha in lote["linhas"]:
+
+        if any(linha[etapa] == SITUACAO_ERRO for etapa in ETAPAS):
+
+            # Convite que não foi entregue: o reenvio é uma nova mensagem
+            if linha["convite"] == SITUACAO_ERRO and linha.get("entrega") == EMAIL_ERRO:
+                linha["reenvios_convite"] = linha.get("reenvios_convite", 0) + 1
+                linha["id_email"] = None
+                linha["entrega"] = None
+
+            for etapa in ETAPAS:
+                if linha[etapa] == SITUACAO_ERRO:
+                    linha[etapa] = SITUACAO_PENDENTE
+
+            linha["erros"] = []
+
+    _gravar_linhas(db, lote, status=PENDENTE)
+
+
+
+
+###########################################################################################################
+# CONSULTA
+###########################################################################################################
+
+def resumo_lote(lote: dict) -> dict:
+    """
+    {etapa: {situação: quantidade}} das linhas do lote.
+    """
+
+    resumo = {etapa: {SITUACAO_PENDENTE: 0, SITUACAO_OK: 0, SITUACAO_ERRO: 0} for etapa in ETAPAS}
+
+    for linha in lote["linhas"]:
+        for etapa in ETAPAS:
+            resumo[etapa][linha[etapa]] += 1
+
+    return resumo
+
+
+def convites_entregues(lote: dict) -> int:
+    """
+    Quantidade de convites já enviados pelo enviador (segundo a última
+    atualizar_entregas).
+    """
+
+    return sum(1 for linha in lote["linhas"] if linha.get("entrega") == EMAIL_ENVIADO)
+
+
+def linhas_com_falha(lote: dict) -> list[dict]:
+    """
+    Linhas com alguma etapa em erro, para mostrar na página.
+    """
+
+    return [
+        {
+            "linha": linha["linha"],
+            "e_mail": linha["pessoa"]["e_mail"],
+            **{etapa: linha[etapa] for etapa in ETAPAS},
+            "entrega": linha.get("entrega") or "-",
+            "erros": "; ".join(linha["erros"]),
+        }
+        for linha in lote["linhas"]
+        if any(linha[etapa] == SITUACAO_ERRO for etapa in ETAPAS)
+    ]
+
+
+def lotes_inacabados(db) -> list[dict]:
+    """
+    Lotes pendentes, em andamento, aguardando a entrega dos convites ou com
+    falhas, do mais recente para o mais antigo.
+    """
+
+    return list(
+        db[COLECAO_LOTES_CONVITE].find({"status": {"$ne": CONCLUIDO}}).sort("criado_em", -1)
+    )
+
+
+def lote_parado(lote: dict, minutos: int = 10) -> bool:
+    """
+    False para um lote em andamento atualizado há pouco (ainda sendo
+    processado por um trabalhador), True para os demais.
+    """
+
+    return (
+        lote["status"] != EM_ANDAMENTO
+        or lote["atualizado_em"] < datetime.datetime.now() - datetime.timedelta(minutes=minutos)
+    )
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "listar"
+
+    if comando == "processar":
+
+        for id_lote in sys.argv[2:]:
+            continuar_lote(db, id_lote)
+            print(f"{id_lote}: {processar_lote(db, id_lote)}")
+
+    else:
+
+        for lote in db[COLECAO_LOTES_CONVITE].find({}).sort("criado_em", -1).limit(20):
+            lote = atualizar_entregas(db, lote)
+            resumo = resumo_lote(lote)
+            print(
+                f"{lote['_id']}  {lote['criado_em']:%d/%m/%Y %H:%M}  {lote['status']:<18}  "
+                + "  ".join(f"{etapa}: {resumo[etapa][SITUACAO_OK]}/{lote['total']}" for etapa in ETAPAS)
+                + f"  entregues: {convites_entregues(lote)}/{lote['total']}"
+            )
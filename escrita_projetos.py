@@ -0,0 +1,363 @@
+"""
+Funções de escrita na coleção projetos.
+
+Toda alteração de projeto feita pelas páginas passa por aqui, para que:
+
+- relatos e lançamentos sejam gravados nas coleções próprias, fora do
+  documento do projeto (ver historico_projetos.py);
+- a coleção materializada projetos_resumo (ver resumo_projetos.py) acompanhe
+  cada escrita;
+- o campo versao do projeto seja incrementado a cada escrita;
+- nenhuma escrita leve o documento para perto do limite de 16 MB do MongoDB
+  (ver tamanho_projetos.py).
+
+    atualizar_projeto(col_projetos, {"codigo": codigo}, {"$set": {...}})
+    inserir_projeto(col_projetos, documento)
+
+Telas que regravam subárvores inteiras (plano de trabalho, orçamento,
+relatórios...) a partir do projeto carregado usam atualizar_projeto_versionado,
+que só grava se ninguém alterou o projeto desde a leitura:
+
+    if not atualizar_projeto_versionado(col_projetos, projeto, {"$set": {...}}):
+        st.warning(MENSAGEM_CONFLITO_VERSAO)
+"""
+
+from pymongo.errors import PyMongoError
+
+from historico_projetos import (
+    CAMINHOS_COM_HISTORICO,
+    anexar_historico,
+    gravar_historico,
+    separar_historico,
+)
+from resumo_projetos import (
+    CAMINHOS_RELEVANTES_RESUMO,
+    CAMPOS_COPIADOS_RESUMO,
+    atualizar_resumo_projeto,
+    copiar_campos_para_resumo,
+)
+from tamanho_projetos import verificar_tamanho, verificar_tamanho_documento
+
+
+
+
+###########################################################################################################
+# CAMINHOS ALTERADOS POR UMA ATUALIZAÇÃO
+###########################################################################################################
+
+def _caminhos_alterados(atualizacao) -> list[str] | None:
+    """
+    Caminhos tocados pelos operadores da atualização ($set, $push, $pull...).
+    Retorna None para atualizações em pipeline, cujo efeito não dá para
+    deduzir sem executá-las.
+    """
+
+    if not isinstance(atualizacao, dict):
+        return None
+
+    caminhos = []
+
+    for operador, campos in atualizacao.items():
+
+        if not operador.startswith("$") or not isinstance(campos, dict):
+            return None
+
+        caminhos.extend(campos.keys())
+
+    return caminhos
+
+
+def _caminho_relevante(caminho: str) -> bool:
+    """
+    True quando o caminho é, contém ou está dentro de um caminho usado no resumo.
+    """
+
+    return any(
+        caminho == relevante
+        or caminho.startswith(relevante + ".")
+        or relevante.startswith(caminho + ".")
+        for relevante in CAMINHOS_RELEVANTES_RESUMO
+    )
+
+
+
+
+###########################################################################################################
+# SINCRONIZAÇÃO DO RESUMO
+###########################################################################################################
+
+def _codigo_do_filtro(col_projetos, filtro) -> str | None:
+
+    if isinstance(filtro.get("codigo"), str):
+        return filtro["codigo"]
+
+    projeto = col_projetos.find_one(filtro, {"codigo": 1})
+
+    return projeto.get("codigo") if projeto else None
+
+
+def _sincronizar_resumo(col_projetos, codigo, atualizacao):
+    """
+    Atualiza o resumo do projeto depois de uma escrita.
+
+    Uma falha aqui não desfaz nem interrompe a escrita do projeto: o resumo
+    fica desatualizado até a próxima escrita ou até a reconstrução completa
+    (python resumo_projetos.py).
+    """
+
+    if not codigo:
+        return
+
+    db = col_projetos.database
+
+    try:
+
+        # $set apenas de campos copiados: repete no resumo sem recalcular
+        if (
+            isinstance(atualizacao, dict)
+            and list(atualizacao.keys()) == ["$set"]
+            and set(atualizacao["$set"].keys()) <= CAMPOS_COPIADOS_RESUMO
+        ):
+            copiar_campos_para_resumo(db, codigo, atualizacao["$set"])
+            return
+
+        atualizar_resumo_projeto(db, codigo)
+
+    except PyMongoError:
+        pass
+
+
+
+
+###########################################################################################################
+# VERSÃO DO PROJETO
+###########################################################################################################
+
+CAMPO_VERSAO = "versao"
+
+
+MENSAGEM_CONFLITO_VERSAO = (
+    "Outra pessoa salvou alterações neste projeto enquanto você editava. "
+    "Os dados foram atualizados: revise e salve novamente."
+)
+
+
+def _com_incremento_versao(atualizacao):
+    """
+    Acrescenta o incremento de versao à atualização ($inc ou, em pipeline, $set).
+    """
+
+    if isinstance(atualizacao, list):
+        return [
+            *atualizacao,
+            {"$set": {CAMPO_VERSAO: {"$add": [{"$ifNull": [f"${CAMPO_VERSAO}", 0]}, 1]}}},
+        ]
+
+    return {**atualizacao, "$inc": {**atualizacao.get("$inc", {}), CAMPO_VERSAO: 1}}
+
+
+def versao_do_projeto(projeto) -> int | None:
+    """
+    Versão do projeto carregado pela página (dict ou linha de DataFrame).
+    None para projetos ainda sem o campo.
+    """
+
+    versao = projeto.get(CAMPO_VERSAO)
+
+    if versao is None or versao != versao:  # NaN vindo do DataFrame
+        return None
+
+    return int(versao)
+
+
+def subarvores_alteradas(atualizacao) -> list[str]:
+    """
+    Subárvores do projeto tocadas pela atualização: o caminho de cada campo
+    até o primeiro operador posicional ou índice.
+
+        "relatorios.$[r].status_relatorio" -> "relatorios"
+        "financeiro.orcamento"             -> "financeiro.orcamento"
+    """
+
+    subarvores = []
+
+    for caminho in _caminhos_alterados(atualizacao) or []:
+
+        partes = []
+
+        for parte in caminho.split("."):
+            if parte.startswith("$") or parte.isdigit():
+                break
+            partes.append(parte)
+
+        subarvore = ".".join(partes)
+
+        if subarvore and subarvore != CAMPO_VERSAO and subarvore not in subarvores:
+            subarvores.append(subarvore)
+
+    return subarvores
+
+
+def _substituir_no_lugar(destino, caminho: str, valor):
+    """
+    Grava valor em destino[caminho] reaproveitando listas e dicionários
+    existentes, para que referências já guardadas pela página vejam o novo valor.
+    """
+
+    partes = caminho.split(".")
+
+    for parte in partes[:-1]:
+
+        proximo = destino.get(parte)
+
+        if not isinstance(proximo, dict):
+            proximo = {}
+            destino[parte] = proximo
+
+        destino = proximo
+
+    existente = destino.get(partes[-1])
+
+    if isinstance(existente, list):
+        existente[:] = valor if isinstance(valor, list) else []
+
+    elif isinstance(existente, dict):
+        existente.clear()
+        existente.update(valor if isinstance(valor, dict) else {})
+
+    else:
+        destino[partes[-1]] = valor
+
+
+def recarregar_subarvores(col_projetos, projeto, subarvores) -> None:
+    """
+    Relê do banco apenas as subárvores informadas (e a versão) e as grava no
+    projeto da página, com relatos e lançamentos anexados quando for o caso.
+    """
+
+    projecao = {"codigo": 1, CAMPO_VERSAO: 1, **{s: 1 for s in subarvores}}
+
+    atual = col_projetos.find_one({"codigo": projeto["codigo"]}, projecao)
+
+    if atual is None:
+        return
+
+    anexar_historico(
+        col_projetos.database,
+        atual,
+        relatos=any(s.startswith("plano_trabalho") for s in subarvores),
+        lancamentos=any(s.startswith("financeiro") for s in subarvores),
+    )
+
+    for subarvore in subarvores:
+
+        valor = atual
+
+        for parte in subarvore.split("."):
+            valor = valor.get(parte) if isinstance(valor, dict) else None
+
+        _substituir_no_lugar(projeto, subarvore, valor)
+
+    projeto[CAMPO_VERSAO] = atual.get(CAMPO_VERSAO)
+
+
+
+
+###########################################################################################################
+# ESCRITAS
+###########################################################################################################
+
+def atualizar_projeto(col_projetos, filtro: dict, atualizacao, **kwargs):
+    """
+    Executa col_projetos.update_one, incrementa a versao do projeto e mantém
+    relatos, lançamentos e projetos_resumo em dia.
+
+    Aceita os mesmos argumentos de update_one (array_filters, upsert...) e
+    devolve o mesmo UpdateResult.
+
+    Levanta tamanho_projetos.ProjetoGrandeDemaisError, sem gravar nada, se o
+    projeto ficaria grande demais.
+    """
+
+    caminhos = _caminhos_alterados(atualizacao)
+
+    relevante = caminhos is None or any(_caminho_relevante(c) for c in caminhos)
+
+    com_historico = bool(caminhos) and any(c in CAMINHOS_COM_HISTORICO for c in caminhos)
+
+    # O código é lido antes da escrita, pois ela pode alterar os campos do filtro
+    codigo = _codigo_do_filtro(col_projetos, filtro) if relevante or com_historico else None
+
+    # Relatos e lançamentos vão para as coleções próprias, depois da escrita do projeto
+    atualizacao, historico = separar_historico(atualizacao) if codigo else (atualizacao, [])
+
+    verificar_tamanho(col_projetos, filtro, atualizacao, codigo)
+
+    resultado = col_projetos.update_one(filtro, _com_incremento_versao(atualizacao), **kwargs)
+
+    escreveu = resultado.matched_count or resultado.upserted_id is not None
+
+    historico_alterado = gravar_historico(col_projetos.database, codigo, historico) if escreveu else False
+
+    if relevante and (resultado.modified_count or resultado.upserted_id is not None or historico_alterado):
+
+        if codigo is None and resultado.upserted_id is not None:
+            codigo = _codigo_do_filtro(col_projetos, {"_id": resultado.upserted_id})
+
+        _sincronizar_resumo(col_projetos, codigo, atualizacao)
+
+    return resultado
+
+
+def atualizar_projeto_versionado(col_projetos, projeto, atualizacao, subarvores=None, **kwargs) -> bool:
+    """
+    Executa atualizar_projeto apenas se o projeto ainda estiver na versão
+    carregada pela página (projeto["versao"]), para que uma escrita feita por
+    outra pessoa no meio da edição não seja sobrescrita.
+
+    Se gravar, avança projeto["versao"] e devolve True.
+
+    Se houver conflito, não grava, relê apenas as subárvores alteradas (ou as
+    informadas em subarvores) para dentro de projeto e devolve False.
+    """
+
+    versao = versao_do_projeto(projeto)
+
+    resultado = atualizar_projeto(
+        col_projetos,
+        {"codigo": projeto["codigo"], CAMPO_VERSAO: versao},
+        atualizacao,
+        **kwargs
+    )
+
+    if resultado.matched_count:
+        projeto[CAMPO_VERSAO] = (versao or 0) + 1
+        return True
+
+    recarregar_subarvores(col_projetos, projeto, subarvores or subarvores_alteradas(atualizacao))
+
+    return False
+
+
+def inserir_projeto(col_projetos, documento: dict):
+    """
+    Executa col_projetos.insert_one e cria o resumo do novo projeto.
+    """
+
+    codigo = documento.get("codigo")
+
+    atualizacao, historico = separar_historico(
+        {"$set": {campo: documento[campo] for campo in ("plano_trabalho", "financeiro") if campo in documento}}
+    )
+
+    documento = {**documento, **atualizacao["$set"], CAMPO_VERSAO: 1}
+
+    verificar_tamanho_documento(col_projetos, documento)
+
+    resultado = col_projetos.insert_one(documento)
+
+    gravar_historico(col_projetos.database, codigo, historico)
+
+    _sincronizar_resumo(col_projetos, codigo, None)
+
+    return resultado
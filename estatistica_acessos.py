@@ -0,0 +1,198 @@
+"""
+Contagem diária de sessões (coleção acessos_diarios).
+
+Cada dia é um documento com a data real e os contadores por tipo de usuário:
+
+    {"data": datetime(2026, 10, 18), "equipe": 12, "benef": 30, "visit": 4}
+
+Uma nova sessão é contada com um único upsert com $inc no documento do dia
+(registrar_acesso). O relatório de acessos lê só o intervalo pedido pelo
+índice único em data (carregar_acessos).
+
+Os dados antigos ficavam no array total_sessoes do documento
+estatistica/controle_acessos, com a data em texto dd/mm/aaaa. A migração
+grava os totais antigos de cada dia em campos à parte (legado_equipe,
+legado_benef, legado_visit), somados aos contadores na leitura. É feita por
+migrar_acessos_legados, chamada automaticamente pelo relatório de acessos,
+ou pela linha de comando:
+
+    python estatistica_acessos.py
+"""
+
+import datetime
+
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_ACESSOS = "acessos_diarios"
+
+
+# Documento antigo com o array total_sessoes
+COLECAO_ESTATISTICA_LEGADA = "estatistica"
+ID_CONTROLE_ACESSOS_LEGADO = "controle_acessos"
+
+
+# Contador incrementado para cada tipo de usuário
+CAMPO_POR_TIPO_USUARIO = {
+    "admin": "equipe",
+    "equipe": "equipe",
+    "beneficiario": "benef",
+}
+
+CAMPOS_CONTADORES = ("equipe", "benef", "visit")
+
+# Totais migrados do array antigo (um campo por contador)
+CAMPOS_LEGADOS = {c: f"legado_{c}" for c in CAMPOS_CONTADORES}
+
+
+
+
+###########################################################################################################
+# REGISTRO
+###########################################################################################################
+
+def _inicio_do_dia(dia: datetime.date) -> datetime.datetime:
+    return datetime.datetime(dia.year, dia.month, dia.day)
+
+
+def registrar_acesso(db, tipo_usuario: str | None, dia: datetime.date | None = None):
+    """
+    Conta uma sessão do tipo de usuário no dia (hoje, se não informado).
+    Cria o documento do dia, com os três contadores, na primeira sessão.
+    """
+
+    if dia is None:
+        dia = datetime.date.today()
+
+    campo = CAMPO_POR_TIPO_USUARIO.get(tipo_usuario, "visit")
+
+    db[COLECAO_ACESSOS].update_one(
+        {"data": _inicio_do_dia(dia)},
+        {"$inc": {c: int(c == campo) for c in CAMPOS_CONTADORES}},
+        upsert=True
+    )
+
+
+
+
+###########################################################################################################
+# CONSULTA
+###########################################################################################################
+
+def carregar_acessos(db, inicio: datetime.date | None = None) -> pd.DataFrame:
+    """
+    Sessões por dia a partir de inicio (todo o período se None), em ordem de data.
+
+    Retorna:
+        DataFrame com as colunas data, equipe, benef e visit.
+    """
+
+    col_acessos = db[COLECAO_ACESSOS]
+
+    # Uma leitura pelo _id quando não há mais nada a migrar
+    migrar_acessos_legados(db)
+
+    filtro = {"data": {"$gte": _inicio_do_dia(inicio)}} if inicio else {}
+
+    projecao = {"_id": 0, "data": 1, **{c: 1 for c in CAMPOS_CONTADORES}, **{c: 1 for c in CAMPOS_LEGADOS.values()}}
+
+    documentos = list(col_acessos.find(filtro, projecao).sort("data", ASCENDING))
+
+    df = pd.DataFrame(documentos, columns=["data", *CAMPOS_CONTADORES, *CAMPOS_LEGADOS.values()]).fillna(0)
+
+    # Soma os totais migrados do array antigo
+    for campo, campo_legado in CAMPOS_LEGADOS.items():
+        df[campo] = df[campo] + df[campo_legado]
+
+    return df[["data", *CAMPOS_CONTADORES]]
+
+
+
+
+###########################################################################################################
+# MIGRAÇÃO DO ARRAY ANTIGO
+###########################################################################################################
+
+def migrar_acessos_legados(db) -> int:
+    """
+    Grava os registros de estatistica/controle_acessos.total_sessoes nos
+    documentos diários, nos campos CAMPOS_LEGADOS. A gravação é um $set
+    dos totais de cada dia: repeti-la (migração interrompida ou duas
+    sessões migrando ao mesmo tempo) dá o mesmo resultado. O documento
+    antigo só é marcado como migrado depois que a gravação termina.
+
+    Retorna:
+        Quantidade de dias migrados.
+    """
+
+    col_legada = db[COLECAO_ESTATISTICA_LEGADA]
+
+    legado = col_legada.find_one(
+        {"_id": ID_CONTROLE_ACESSOS_LEGADO, "migrado_em": {"$exists": False}},
+        {"total_sessoes": 1}
+    )
+
+    if not legado:
+        return 0
+
+    # Totais por dia (o array antigo pode repetir a data)
+    totais = {}
+
+    for registro in legado.get("total_sessoes") or []:
+
+        try:
+            dia = datetime.datetime.strptime(registro.get("data", ""), "%d/%m/%Y")
+        except (TypeError, ValueError):
+            continue
+
+        total_dia = totais.setdefault(dia, dict.fromkeys(CAMPOS_CONTADORES, 0))
+
+        for c in CAMPOS_CONTADORES:
+            total_dia[c] += int(registro.get(c) or 0)
+
+    operacoes = [
+        UpdateOne(
+            {"data": dia},
+            {
+                "$set": {CAMPOS_LEGADOS[c]: total_dia[c] for c in CAMPOS_CONTADORES},
+                # Contadores de sessões novas começam em zero
+                "$setOnInsert": dict.fromkeys(CAMPOS_CONTADORES, 0),
+            },
+            upsert=True
+        )
+        for dia, total_dia in totais.items()
+    ]
+
+    if operacoes:
+        db[COLECAO_ACESSOS].bulk_write(operacoes, ordered=False)
+
+    col_legada.update_one(
+        {"_id": ID_CONTROLE_ACESSOS_LEGADO},
+        {"$set": {"migrado_em": datetime.datetime.now()}}
+    )
+
+    return len(operacoes)
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    dias = migrar_acessos_legados(db)
+
+    print(f"{dias} dias migrados para {COLECAO_ACESSOS}.")
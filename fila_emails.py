@@ -0,0 +1,580 @@
+"""
+Caixa de saída de e-mails (coleção email_outbox) e o processo que envia.
+
+As páginas não abrem mais conexão SMTP: enfileirar_email grava a mensagem
+e retorna. O enviador, um processo separado, mantém uma única conexão
+autenticada (STARTTLS + login) e envia as mensagens em sequência:
+
+    python fila_emails.py                              # enviador em loop
+    python fila_emails.py situacao                     # quantidade por status
+    python fila_emails.py --servidor localhost:1025    # servidor SMTP local de teste
+
+Para testar sem enviar e-mails de verdade, um servidor de depuração local
+imprime as mensagens recebidas (sem TLS e sem login):
+
+    python -m aiosmtpd -n -l localhost:1025
+
+Cada mensagem é um documento:
+
+    {"destinatarios": [...], "assunto": ..., "corpo_html": ..., "copia_oculta": False,
+     "origem": "enviar_email_relatorio_aprovado", "status": "pendente",
+     "tentativas": 0, "disponivel_em": ..., "enviado_em": ..., "recusados": {...}, "erro": ...}
+
+Status: pendente -> enviando -> enviado. Falhas temporárias (conexão
+perdida, respostas 4xx do servidor) voltam a pendente com espera
+crescente; falhas permanentes (5xx, todos os destinatários recusados) e
+mensagens que esgotam as tentativas ficam com status erro.
+
+O enviador respeita EMAILS_POR_MINUTO e fecha a conexão depois de
+SEGUNDOS_CONEXAO_OCIOSA sem mensagens.
+"""
+
+import datetime
+import os
+import smtplib
+import socket
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+import streamlit as st
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from metricas_prometheus import medir, registrar_falha, iniciar_servidor_metricas, DURACAO_SMTP
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_EMAILS = "email_outbox"
+
+
+PENDENTE = "pendente"
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+ERRO = "erro"
+
+
+NOME_REMETENTE = "Sistema Veredas"
+
+
+MAX_TENTATIVAS = 5
+
+# Espera antes de tentar de novo: dobra a cada falha, até o máximo
+ESPERA_INICIAL_SEGUNDOS = 60
+ESPERA_MAXIMA_SEGUNDOS = 60 * 60
+
+# Mensagem reservada por um enviador que parou volta à fila depois desse prazo
+DURACAO_RESERVA = datetime.timedelta(minutes=5)
+
+# Limite de envios (o Gmail bloqueia remetentes que enviam rápido demais)
+EMAILS_POR_MINUTO = 20
+
+# Intervalo entre consultas com a caixa vazia
+INTERVALO_CONSULTA_SEGUNDOS = 2
+
+# Conexão sem uso por mais tempo que isso é fechada (o servidor fecharia)
+SEGUNDOS_CONEXAO_OCIOSA = 60
+
+# Espera depois de não conseguir conectar ao servidor SMTP
+ESPERA_CONEXAO_SEGUNDOS = 30
+
+
+# Erros de conexão: a mensagem volta à fila e a conexão é reaberta
+ERROS_CONEXAO = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    socket.timeout,
+    ConnectionError,
+)
+
+
+
+###########################################################################################################
+# ENFILEIRAMENTO (PÁGINAS)
+###########################################################################################################
+
+def _documento_email(corpo_html, destinatarios, assunto, copia_oculta=False, origem=None) -> dict:
+
+    agora = datetime.datetime.now()
+
+    return {
+        "destinatarios": list(destinatarios),
+        "assunto": assunto,
+        "corpo_html": corpo_html,
+        "copia_oculta": copia_oculta,
+        "origem": origem,
+        "status": PENDENTE,
+        "tentativas": 0,
+        "max_tentativas": MAX_TENTATIVAS,
+        "disponivel_em": agora,
+        "reservado_por": None,
+        "reserva_ate": None,
+        "criado_em": agora,
+        "enviado_em": None,
+        "recusados": None,
+        "erro": None,
+    }
+
+
+def enfileirar_email(
+    db,
+    corpo_html: str,
+    destinatarios: list[str],
+    assunto: str,
+    copia_oculta: bool = False,
+    origem: str | None = None
+):
+    """
+    Grava a mensagem na caixa de saída. O envio é feito pelo enviador.
+
+    Parâmetros:
+        copia_oculta: Quando True, os destinatários vão em cópia oculta
+            (o campo "Para" mostra o próprio remetente).
+        origem: Função que pediu o envio, para as métricas e a consulta.
+
+    Retorna:
+        O _id da mensagem.
+    """
+
+    return db[COLECAO_EMAILS].insert_one(
+        _documento_email(corpo_html, destinatarios, assunto, copia_oculta, origem)
+    ).inserted_id
+
+
+def enfileirar_emails(db, mensagens: list[dict]) -> list:
+    """
+    Grava várias mensagens de uma vez (um insert_many).
+
+    mensagens: dicionários com os parâmetros de enfileirar_email
+    (corpo_html, destinatarios, assunto e, opcionalmente, copia_oculta e origem).
+
+    Uma mensagem pode trazer o próprio _id (ex.: derivado do lote e da linha
+    de um convite em massa). Nesse caso a gravação é um upsert com
+    $setOnInsert: gravar de novo a mesma mensagem, ao retomar um
+    processamento interrompido, não duplica o envio.
+
+    Retorna:
+        Os _id, na ordem das mensagens.
+    """
+
+    if not mensagens:
+        return []
+
+    documentos = []
+
+    for mensagem in mensagens:
+
+        mensagem = dict(mensagem)
+        id_email = mensagem.pop("_id", None)
+
+        documentos.append((id_email, _documento_email(**mensagem)))
+
+    if all(id_email is None for id_email, _ in documentos):
+        return db[COLECAO_EMAILS].insert_many([documento for _, documento in documentos]).inserted_ids
+
+    ids = [ObjectId() if id_email is None else id_email for id_email, _ in documentos]
+
+    db[COLECAO_EMAILS].bulk_write(
+        [
+            UpdateOne({"_id": id_email}, {"$setOnInsert": documento}, upsert=True)
+            for id_email, (_, documento) in zip(ids, documentos)
+        ],
+        ordered=False
+    )
+
+    return ids
+
+
+def situacao_emails(db, ids: list) -> dict:
+    """
+    {_id: status} das mensagens informadas.
+    """
+
+    return {
+        documento["_id"]: documento["status"]
+        for documento in db[COLECAO_EMAILS].find({"_id": {"$in": list(ids)}}, {"status": 1})
+    }
+
+
+
+
+###########################################################################################################
+# CAIXA DE SAÍDA (ENVIADOR)
+###########################################################################################################
+
+def reservar_email(db, enviador: str) -> dict | None:
+    """
+    Reserva a próxima mensagem disponível (pendente cuja espera já passou,
+    ou enviando com a reserva expirada e tentativas sobrando; as que
+    esgotaram as tentativas ficam para encerrar_reservas_esgotadas).
+    """
+
+    agora = datetime.datetime.now()
+
+    return db[COLECAO_EMAILS].find_one_and_update(
+        {
+            "$or": [
+                {"status": PENDENTE, "disponivel_em": {"$lte": agora}},
+                {"status": ENVIANDO, "reserva_ate": {"$lt": agora}, "tentativas": {"$lt": MAX_TENTATIVAS}},
+            ]
+        },
+        {
+            "$set": {
+                "status": ENVIANDO,
+                "reservado_por": enviador,
+                "reserva_ate": agora + DURACAO_RESERVA,
+            },
+            "$inc": {"tentativas": 1},
+        },
+        sort=[("disponivel_em", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _filtro_reserva(mensagem: dict) -> dict:
+    return {"_id": mensagem["_id"], "status": ENVIANDO, "reservado_por": mensagem["reservado_por"]}
+
+
+def registrar_envio(db, mensagem: dict, recusados: dict):
+    """
+    Marca como enviada. recusados: {endereço: (código, resposta)} dos
+    destinatários que o servidor recusou (os demais receberam).
+    """
+
+    db[COLECAO_EMAILS].update_one(
+        _filtro_reserva(mensagem),
+        {"$set": {
+            "status": ENVIADO,
+            "enviado_em": datetime.datetime.now(),
+            "recusados": {
+                endereco.replace(".", "_"): f"{codigo} {resposta!r}"
+                for endereco, (codigo, resposta) in (recusados or {}).items()
+            } or None,
+            "reserva_ate": None,
+            "erro": None,
+        }}
+    )
+
+
+def espera_apos_falha(tentativas: int) -> datetime.timedelta:
+
+    segundos = ESPERA_INICIAL_SEGUNDOS * 2 ** max(0, tentativas - 1)
+
+    return datetime.timedelta(seconds=min(segundos, ESPERA_MAXIMA_SEGUNDOS))
+
+
+def registrar_falha_envio(db, mensagem: dict, erro: str, temporaria: bool) -> str:
+    """
+    Falha temporária: volta à fila com espera crescente (até esgotar as
+    tentativas). Falha permanente: erro.
+
+    Retorna:
+        O novo status.
+    """
+
+    agora = datetime.datetime.now()
+
+    if temporaria and mensagem["tentativas"] < mensagem["max_tentativas"]:
+        status = PENDENTE
+        definir = {"disponivel_em": agora + espera_apos_falha(mensagem["tentativas"])}
+    else:
+        status = ERRO
+        definir = {}
+
+    db[COLECAO_EMAILS].update_one(
+        _filtro_reserva(mensagem),
+        {"$set": {**definir, "status": status, "erro": erro, "reserva_ate": None}}
+    )
+
+    return status
+
+
+def encerrar_reservas_esgotadas(db) -> int:
+    """
+    Marca como erro as mensagens cuja reserva expirou na última tentativa:
+    o enviador parou (ou travou) durante o envio todas as vezes, e a
+    mensagem não deve ser tentada de novo.
+
+    Retorna:
+        Quantidade de mensagens encerradas.
+    """
+
+    agora = datetime.datetime.now()
+
+    return db[COLECAO_EMAILS].update_many(
+        {"status": ENVIANDO, "reserva_ate": {"$lt": agora}, "tentativas": {"$gte": MAX_TENTATIVAS}},
+        {"$set": {
+            "status": ERRO,
+            "erro": "Reserva expirada em todas as tentativas (o enviador parou durante o envio).",
+            "reserva_ate": None,
+        }}
+    ).modified_count
+
+
+def devolver_email(db, mensagem: dict, erro: str):
+    """
+    Devolve a mensagem à fila sem contar a tentativa (o servidor SMTP
+    estava fora do ar, a mensagem não chegou a ser enviada).
+    """
+
+    db[COLECAO_EMAILS].update_one(
+        _filtro_reserva(mensagem),
+        {
+            "$set": {
+                "status": PENDENTE,
+                "disponivel_em": datetime.datetime.now() + datetime.timedelta(seconds=ESPERA_CONEXAO_SEGUNDOS),
+                "erro": erro,
+                "reserva_ate": None,
+            },
+            "$inc": {"tentativas": -1},
+        }
+    )
+
+
+def falha_temporaria(erro: Exception) -> bool:
+    """
+    True para erros de conexão e de rede e para respostas 4xx do servidor.
+    """
+
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        # Todos os destinatários recusados: temporário só se todas as recusas forem 4xx
+        return all(400 <= codigo < 500 for codigo, _ in erro.recipients.values())
+
+    if isinstance(erro, smtplib.SMTPResponseException):
+        return 400 <= erro.smtp_code < 500
+
+    if isinstance(erro, smtplib.SMTPException):
+        return isinstance(erro, ERROS_CONEXAO)
+
+    # Demais OSError: falhas de rede
+    return isinstance(erro, OSError)
+
+
+
+###########################################################################################################
+# CONEXÃO SMTP
+###########################################################################################################
+
+def configuracao_smtp(servidor_teste: str | None = None) -> dict:
+    """
+    Servidor e credenciais de st.secrets["senhas"]. Com servidor_teste
+    ("host:porta"), usa um servidor local sem TLS e sem login.
+    """
+
+    endereco_email = st.secrets["senhas"]["endereco_email"]
+
+    if servidor_teste:
+        host, _, porta = servidor_teste.partition(":")
+        return {"servidor": host, "porta": int(porta or 25), "remetente": endereco_email, "senha": None, "tls": False}
+
+    return {
+        "servidor": st.secrets["senhas"]["smtp_server"],
+        "porta": int(st.secrets["senhas"]["port"]),
+        "remetente": endereco_email,
+        "senha": st.secrets["senhas"]["senha_email"],
+        "tls": True,
+    }
+
+
+def abrir_conexao(configuracao: dict) -> smtplib.SMTP:
+
+    conexao = smtplib.SMTP(configuracao["servidor"], configuracao["porta"], timeout=30)
+
+    if configuracao["tls"]:
+        conexao.starttls()
+
+    if configuracao["senha"]:
+        conexao.login(configuracao["remetente"], configuracao["senha"])
+
+    return conexao
+
+
+def fechar_conexao(conexao):
+
+    if conexao is None:
+        return
+
+    try:
+        conexao.quit()
+    except Exception:
+        conexao.close()
+
+
+def montar_mensagem(mensagem: dict, remetente: str) -> MIMEMultipart:
+
+    msg = MIMEMultipart()
+
+    msg["From"] = formataddr((NOME_REMETENTE, remetente))
+
+    # Em cópia oculta, o "Para" mostra o próprio remetente
+    msg["To"] = remetente if mensagem.get("copia_oculta") else ", ".join(mensagem["destinatarios"])
+
+    msg["Subject"] = mensagem["assunto"]
+
+    msg.attach(MIMEText(mensagem["corpo_html"], "html", "utf-8"))
+
+    return msg
+
+
+
+
+###########################################################################################################
+# ENVIADOR
+###########################################################################################################
+
+def enviar_mensagem(conexao: smtplib.SMTP, mensagem: dict, remetente: str) -> dict:
+    """
+    Envia uma mensagem pela conexão aberta.
+
+    Retorna:
+        Os destinatários recusados ({} se todos receberam).
+    """
+
+    with medir(DURACAO_SMTP, origem=mensagem.get("origem") or "email_outbox"):
+        return conexao.sendmail(
+            remetente,
+            mensagem["destinatarios"],
+            montar_mensagem(mensagem, remetente).as_string()
+        )
+
+
+def executar_enviador(db, servidor_teste: str | None = None, uma_vez: bool = False):
+    """
+    Loop do enviador: uma conexão SMTP reaproveitada entre as mensagens,
+    reaberta quando cai ou depois de ficar ociosa. Com uma_vez=True, para
+    quando a caixa esvazia.
+    """
+
+    configuracao = configuracao_smtp(servidor_teste)
+    remetente = configuracao["remetente"]
+
+    enviador = f"{socket.gethostname()}:{os.getpid()}"
+
+    intervalo_envios = 60 / EMAILS_POR_MINUTO
+
+    conexao = None
+    ultimo_uso = 0.0
+
+    print(f"Enviador {enviador} iniciado ({configuracao['servidor']}:{configuracao['porta']}).")
+
+    # Duração dos envios por SMTP e falhas, medidas neste processo
+    porta_metricas = iniciar_servidor_metricas("porta_enviador")
+
+    if porta_metricas is None:
+        print("Porta das métricas ocupada: métricas do enviador indisponíveis.")
+    else:
+        print(f"Métricas em http://{socket.gethostname()}:{porta_metricas}/metrics")
+
+    try:
+
+        while True:
+
+            mensagem = reservar_email(db, enviador)
+
+            if mensagem is None:
+
+                encerradas = encerrar_reservas_esgotadas(db)
+
+                if encerradas:
+                    registrar_falha("smtp")
+                    print(f"{encerradas} mensagem(ns) com a reserva expirada em todas as tentativas: erro.")
+
+                if conexao is not None and time.monotonic() - ultimo_uso > SEGUNDOS_CONEXAO_OCIOSA:
+                    fechar_conexao(conexao)
+                    conexao = None
+
+                if uma_vez:
+                    return
+
+                time.sleep(INTERVALO_CONSULTA_SEGUNDOS)
+                continue
+
+            # Limite de envios por minuto
+            espera = intervalo_envios - (time.monotonic() - ultimo_uso)
+
+            if espera > 0:
+                time.sleep(espera)
+
+            # Conexão: uma falha aqui (rede, login) não é culpa da mensagem
+            if conexao is None:
+
+                try:
+                    conexao = abrir_conexao(configuracao)
+
+                except Exception as e:
+
+                    registrar_falha("smtp")
+                    devolver_email(db, mensagem, f"Conexão: {type(e).__name__}: {e}")
+
+                    print(f"Falha ao conectar ao servidor SMTP: {e}")
+
+                    time.sleep(ESPERA_CONEXAO_SEGUNDOS)
+                    continue
+
+            try:
+
+                recusados = enviar_mensagem(conexao, mensagem, remetente)
+
+                registrar_envio(db, mensagem, recusados)
+
+                status = ENVIADO
+
+            except Exception as e:
+
+                registrar_falha("smtp")
+
+                status = registrar_falha_envio(db, mensagem, f"{type(e).__name__}: {e}", falha_temporaria(e))
+
+                # Depois de erro de conexão, a próxima mensagem abre outra
+                if not isinstance(e, smtplib.SMTPResponseException) and not isinstance(e, smtplib.SMTPRecipientsRefused):
+                    fechar_conexao(conexao)
+                    conexao = None
+
+            ultimo_uso = time.monotonic()
+
+            print(
+                f"{datetime.datetime.now():%d/%m/%Y %H:%M:%S}  {mensagem['_id']}  "
+                f"{mensagem.get('origem') or '-'}  {len(mensagem['destinatarios'])} destinatário(s)  {status}"
+            )
+
+    finally:
+        fechar_conexao(conexao)
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    argumentos = sys.argv[1:]
+
+    if argumentos[:1] == ["situacao"]:
+
+        for linha in db[COLECAO_EMAILS].aggregate([
+            {"$group": {"_id": "$status", "quantidade": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ]):
+            print(f"{linha['_id']:<10} {linha['quantidade']}")
+
+    else:
+
+        servidor_teste = None
+
+        if "--servidor" in argumentos:
+            servidor_teste = argumentos[argumentos.index("--servidor") + 1]
+
+        executar_enviador(db, servidor_teste=servidor_teste)
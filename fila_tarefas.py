@@ -0,0 +1,774 @@
+"""
+Fila de tarefas em segundo plano (coleção fila_tarefas).
+
+Trabalhos demorados saem da execução da página: a página grava o pedido
+(enfileirar_tarefa) e retorna, e um processo separado, o trabalhador,
+executa as tarefas:
+
+    python fila_tarefas.py             # trabalhador em loop
+    python fila_tarefas.py situacao    # quantidade de tarefas por tipo e status
+    python fila_tarefas.py limpar      # remove tarefas terminadas antigas (o agendador faz isso todo dia)
+    python fila_tarefas.py reenfileirar <id>  # devolve à fila uma tarefa com erro
+
+Cada tarefa é um documento:
+
+    {"tipo": "envio_drive", "parametros": {...}, "codigo": <projeto>,
+     "status": "pendente", "tentativas": 0, "max_tentativas": 5,
+     "disponivel_em": ..., "reservada_por": ..., "reserva_ate": ...,
+     "progresso": ..., "resultado": ..., "erro": ...}
+
+Status: pendente -> em_execucao -> concluida. Quando a execução falha, a
+tarefa volta a pendente com espera crescente (espera_apos_falha) e, depois
+de max_tentativas, fica com status erro.
+
+A reserva (lease) de uma tarefa vale DURACAO_RESERVA. Se o trabalhador
+morrer no meio, a tarefa volta a ser reservável quando a reserva expira;
+tarefas longas renovam a reserva a cada passo (renovar_reserva), o que
+permite rodar mais de um trabalhador.
+
+Os arquivos que as páginas recebem e os documentos gerados ficam no GridFS
+(bucket fila_arquivos) até a tarefa terminar ou até a limpeza. Envios ao
+Drive com erro não são limpos: os arquivos são a única cópia do que a
+pessoa enviou, e a página de relatórios mostra a falha e permite
+reenfileirar a tarefa (reenfileirar_tarefa).
+
+Tipos de tarefa (EXECUTORES):
+- envio_drive: cria as pastas e envia ao Drive os arquivos de um relato,
+  gravando o ID de cada arquivo no item correspondente (anexos, fotos).
+- docx_relatorio: gera o .docx de exportação de um relatório.
+- xlsx_tabela: gera uma planilha .xlsx a partir de linhas.
+- convites_lote: processa um lote de convite em massa (convites_lote.py).
+"""
+
+import datetime
+import os
+import socket
+import sys
+import time
+import traceback
+from io import BytesIO
+
+import gridfs
+import pandas as pd
+import streamlit as st
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from documentos_relatorio import MIME_DOCX, gerar_docx_relatorio, nome_arquivo_docx_relatorio
+from funcoes_auxiliares import (
+    obter_servico_drive,
+    obter_ou_criar_pasta,
+    obter_pasta_projeto,
+    enviar_arquivo_drive_direto,
+    garantir_permissao_publica_leitura,
+)
+from historico_projetos import anexar_historico
+from convites_lote import processar_lote
+from metricas_prometheus import iniciar_servidor_metricas, registrar_falha
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_TAREFAS = "fila_tarefas"
+
+BUCKET_ARQUIVOS = "fila_arquivos"
+
+
+PENDENTE = "pendente"
+EM_EXECUCAO = "em_execucao"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+STATUS_TERMINADOS = (CONCLUIDA, ERRO)
+
+
+MAX_TENTATIVAS = 5
+
+# Validade da reserva de uma tarefa pelo trabalhador
+DURACAO_RESERVA = datetime.timedelta(minutes=5)
+
+# Espera antes de tentar de novo: dobra a cada falha, até o máximo
+ESPERA_INICIAL_SEGUNDOS = 30
+ESPERA_MAXIMA_SEGUNDOS = 30 * 60
+
+# Intervalo entre consultas do trabalhador quando a fila está vazia
+INTERVALO_CONSULTA_SEGUNDOS = 2
+
+# Intervalo de atualização das páginas que acompanham uma tarefa
+INTERVALO_ACOMPANHAMENTO_SEGUNDOS = 2
+
+# Tarefas terminadas (e seus arquivos) são removidas depois desse prazo
+DIAS_GUARDAR_TERMINADAS = 7
+
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+
+
+###########################################################################################################
+# ARQUIVOS DAS TAREFAS (GRIDFS)
+###########################################################################################################
+
+def _bucket(db):
+    return gridfs.GridFSBucket(db, bucket_name=BUCKET_ARQUIVOS)
+
+
+def guardar_arquivo(db, dados: bytes, nome: str, tipo: str | None = None) -> ObjectId:
+    """
+    Guarda o conteúdo de um arquivo para uma tarefa. Retorna o id no GridFS.
+    """
+
+    return _bucket(db).upload_from_stream(nome, dados, metadata={"tipo": tipo})
+
+
+def guardar_arquivo_enviado(db, arquivo) -> ObjectId:
+    """
+    Guarda um arquivo recebido por st.file_uploader.
+    """
+
+    return guardar_arquivo(db, arquivo.getvalue(), arquivo.name, arquivo.type)
+
+
+def ler_arquivo(db, id_arquivo) -> BytesIO:
+    """
+    Conteúdo de um arquivo guardado, com name e type (como um UploadedFile).
+    """
+
+    saida = _bucket(db).open_download_stream(id_arquivo)
+
+    arquivo = BytesIO(saida.read())
+    arquivo.name = saida.filename
+    arquivo.type = (saida.metadata or {}).get("tipo")
+
+    return arquivo
+
+
+def excluir_arquivo(db, id_arquivo):
+
+    try:
+        _bucket(db).delete(id_arquivo)
+    except gridfs.errors.NoFile:
+        pass
+
+
+
+
+###########################################################################################################
+# FILA
+###########################################################################################################
+
+def enfileirar_tarefa(
+    db,
+    tipo: str,
+    parametros: dict,
+    codigo=None,
+    usuario=None,
+    max_tentativas: int = MAX_TENTATIVAS
+) -> ObjectId:
+    """
+    Grava uma tarefa pendente, disponível imediatamente. Retorna o _id.
+    """
+
+    agora = datetime.datetime.now()
+
+    return db[COLECAO_TAREFAS].insert_one({
+        "tipo": tipo,
+        "parametros": parametros,
+        "codigo": codigo,
+        "usuario": usuario,
+        "status": PENDENTE,
+        "tentativas": 0,
+        "max_tentativas": max_tentativas,
+        "disponivel_em": agora,
+        "reservada_por": None,
+        "reserva_ate": None,
+        "progresso": None,
+        "resultado": None,
+        "erro": None,
+        "criada_em": agora,
+        "atualizada_em": agora,
+        "concluida_em": None,
+    }).inserted_id
+
+
+def reservar_tarefa(db, trabalhador: str, tipos=None) -> dict | None:
+    """
+    Reserva a próxima tarefa disponível: pendente cuja espera já passou, ou
+    em execução com a reserva expirada (trabalhador que parou no meio).
+
+    Retorna:
+        A tarefa reservada (com tentativas já incrementado) ou None.
+    """
+
+    agora = datetime.datetime.now()
+
+    filtro = {
+        "$or": [
+            {"status": PENDENTE, "disponivel_em": {"$lte": agora}},
+            {"status": EM_EXECUCAO, "reserva_ate": {"$lt": agora}},
+        ]
+    }
+
+    if tipos:
+        filtro["tipo"] = {"$in": list(tipos)}
+
+    return db[COLECAO_TAREFAS].find_one_and_update(
+        filtro,
+        {
+            "$set": {
+                "status": EM_EXECUCAO,
+                "reservada_por": trabalhador,
+                "reserva_ate": agora + DURACAO_RESERVA,
+                "atualizada_em": agora,
+            },
+            "$inc": {"tentativas": 1},
+        },
+        sort=[("disponivel_em", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _filtro_reserva(tarefa: dict) -> dict:
+    """
+    Só o trabalhador que detém a reserva pode alterar a tarefa.
+    """
+
+    return {"_id": tarefa["_id"], "status": EM_EXECUCAO, "reservada_por": tarefa["reservada_por"]}
+
+
+def renovar_reserva(db, tarefa: dict, progresso=None) -> bool:
+    """
+    Estende a reserva e, se informado, grava o progresso (usado para não
+    repetir passos já feitos quando a tarefa é tentada de novo).
+
+    Retorna:
+        False se a reserva foi perdida (expirou e outro trabalhador pegou).
+    """
+
+    agora = datetime.datetime.now()
+
+    definir = {"reserva_ate": agora + DURACAO_RESERVA, "atualizada_em": agora}
+
+    if progresso is not None:
+        definir["progresso"] = progresso
+
+    return db[COLECAO_TAREFAS].update_one(_filtro_reserva(tarefa), {"$set": definir}).matched_count == 1
+
+
+def concluir_tarefa(db, tarefa: dict, resultado=None):
+
+    agora = datetime.datetime.now()
+
+    db[COLECAO_TAREFAS].update_one(
+        _filtro_reserva(tarefa),
+        {"$set": {
+            "status": CONCLUIDA,
+            "resultado": resultado,
+            "erro": None,
+            "reserva_ate": None,
+            "atualizada_em": agora,
+            "concluida_em": agora,
+        }}
+    )
+
+
+def reenfileirar_tarefa(db, id_tarefa) -> bool:
+    """
+    Devolve à fila uma tarefa com erro, com as tentativas zeradas. O
+    progresso é mantido (envio_drive não repete os arquivos já enviados).
+
+    Retorna:
+        False se a tarefa não estava com erro.
+    """
+
+    agora = datetime.datetime.now()
+
+    return db[COLECAO_TAREFAS].update_one(
+        {"_id": ObjectId(id_tarefa), "status": ERRO},
+        {"$set": {
+            "status": PENDENTE,
+            "tentativas": 0,
+            "disponivel_em": agora,
+            "erro": None,
+            "atualizada_em": agora,
+            "concluida_em": None,
+        }}
+    ).modified_count == 1
+
+
+def espera_apos_falha(tentativas: int) -> datetime.timedelta:
+    """
+    30 s, 1 min, 2 min, 4 min... até ESPERA_MAXIMA_SEGUNDOS.
+    """
+
+    segundos = ESPERA_INICIAL_SEGUNDOS * 2 ** max(0, tentativas - 1)
+
+    return datetime.timedelta(seconds=min(segundos, ESPERA_MAXIMA_SEGUNDOS))
+
+
+def falhar_tarefa(db, tarefa: dict, erro: str) -> str:
+    """
+    Devolve a tarefa à fila com espera crescente ou, esgotadas as
+    tentativas, marca como erro (contado nas métricas como
+    tarefa_<tipo>; envios ao Drive com erro aparecem na página de
+    relatórios, ver envios_com_erro).
+
+    Retorna:
+        O novo status.
+    """
+
+    agora = datetime.datetime.now()
+
+    if tarefa["tentativas"] >= tarefa["max_tentativas"]:
+        status = ERRO
+        definir = {"concluida_em": agora}
+        registrar_falha(f"tarefa_{tarefa['tipo']}")
+    else:
+        status = PENDENTE
+        definir = {"disponivel_em": agora + espera_apos_falha(tarefa["tentativas"])}
+
+    db[COLECAO_TAREFAS].update_one(
+        _filtro_reserva(tarefa),
+        {"$set": {
+            **definir,
+            "status": status,
+            "erro": erro,
+            "reserva_ate": None,
+            "atualizada_em": agora,
+        }}
+    )
+
+    return status
+
+
+
+
+###########################################################################################################
+# TAREFAS
+###########################################################################################################
+
+def _executar_envio_drive(db, tarefa: dict) -> dict:
+    """
+    Envia ao Drive os arquivos de um documento (ex.: um relato) e grava o ID
+    de cada um no item correspondente.
+
+    parametros:
+        {"codigo", "sigla", "colecao", "filtro",
+         "grupos": [{"campo": "anexos", "pastas": ["Relatos_atividades", "R-1", "anexos"],
+                     "permissao_publica": False,
+                     "arquivos": [{"id_envio", "id_gridfs", "nome"}]}]}
+
+    Cada item da lista <campo> do documento tem o id_envio do arquivo e
+    envio_pendente=True até o arquivo chegar ao Drive.
+    """
+
+    parametros = tarefa["parametros"]
+    codigo = parametros["codigo"]
+
+    colecao = db[parametros["colecao"]]
+
+    servico = obter_servico_drive()
+
+    pasta_projeto_id = obter_pasta_projeto(servico, codigo, parametros["sigla"])
+
+    # Arquivos já enviados em tentativas anteriores: {id_envio: id no Drive}
+    enviados = dict(tarefa.get("progresso") or {})
+
+    for grupo in parametros["grupos"]:
+
+        pasta_id = pasta_projeto_id
+
+        for nome_pasta in grupo["pastas"]:
+            pasta_id = obter_ou_criar_pasta(servico, nome_pasta, pasta_id, codigo)
+
+        if grupo.get("permissao_publica"):
+            garantir_permissao_publica_leitura(servico, pasta_id)
+
+        campo = grupo["campo"]
+
+        for item in grupo["arquivos"]:
+
+            id_envio = item["id_envio"]
+
+            if id_envio not in enviados:
+
+                enviados[id_envio] = enviar_arquivo_drive_direto(
+                    servico,
+                    pasta_id,
+                    ler_arquivo(db, item["id_gridfs"])
+                )
+
+                if not renovar_reserva(db, tarefa, progresso=enviados):
+                    raise RuntimeError("Reserva da tarefa perdida durante o envio.")
+
+            colecao.update_one(
+                {**parametros["filtro"], f"{campo}.id_envio": id_envio},
+                {
+                    "$set": {f"{campo}.$.id_arquivo": enviados[id_envio]},
+                    "$unset": {f"{campo}.$.envio_pendente": ""},
+                }
+            )
+
+    # Confere os IDs gravados. Uma página que regravou o plano de trabalho ao
+    # mesmo tempo pode ter reinserido o documento sem eles: nesse caso a
+    # tarefa falha e é tentada de novo (os arquivos já enviados estão no
+    # progresso e não são reenviados). Os arquivos guardados só são
+    # excluídos depois da confirmação.
+    documento = colecao.find_one(parametros["filtro"])
+
+    if documento is not None:
+
+        for grupo in parametros["grupos"]:
+
+            gravados = {
+                item.get("id_envio"): item.get("id_arquivo")
+                for item in documento.get(grupo["campo"]) or []
+                if isinstance(item, dict)
+            }
+
+            # Itens que não estão mais no documento foram removidos pela pessoa
+            faltando = [
+                item["id_envio"] for item in grupo["arquivos"]
+                if item["id_envio"] in gravados and gravados[item["id_envio"]] != enviados[item["id_envio"]]
+            ]
+
+            if faltando:
+                raise RuntimeError(f"IDs do Drive não gravados em {grupo['campo']}: {', '.join(faltando)}")
+
+    # Muda a versão do projeto: uma tela aberta antes do envio, ao gravar
+    # com atualizar_projeto_versionado, relê o projeto com os IDs novos
+    db["projetos"].update_one({"codigo": codigo}, {"$inc": {"versao": 1}})
+
+    for grupo in parametros["grupos"]:
+        for item in grupo["arquivos"]:
+            excluir_arquivo(db, item["id_gridfs"])
+
+    return {"enviados": len(enviados)}
+
+
+def _executar_docx_relatorio(db, tarefa: dict) -> dict:
+    """
+    parametros: {"codigo", "numero"}
+
+    Resultado: {"id_gridfs", "nome_arquivo", "tipo"} do documento gerado.
+    """
+
+    parametros = tarefa["parametros"]
+
+    projeto = db["projetos"].find_one({"codigo": parametros["codigo"]})
+
+    if projeto is None:
+        raise ValueError(f"Projeto {parametros['codigo']} não encontrado.")
+
+    projeto = anexar_historico(db, projeto)
+
+    relatorio = next(
+        (r for r in projeto.get("relatorios", []) if r.get("numero") == parametros["numero"]),
+        None
+    )
+
+    if relatorio is None:
+        raise ValueError(f"Relatório {parametros['numero']} não encontrado.")
+
+    doc = gerar_docx_relatorio(db, relatorio, projeto)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+
+    organizacao = db["organizacoes"].find_one({"_id": projeto.get("id_organizacao")})
+
+    nome_arquivo = nome_arquivo_docx_relatorio(relatorio, projeto, organizacao)
+
+    return {
+        "id_gridfs": guardar_arquivo(db, buffer.getvalue(), nome_arquivo, MIME_DOCX),
+        "nome_arquivo": nome_arquivo,
+        "tipo": MIME_DOCX,
+    }
+
+
+def _executar_xlsx_tabela(db, tarefa: dict) -> dict:
+    """
+    parametros: {"linhas": [{...}], "colunas": [...], "aba", "nome_arquivo"}
+
+    Resultado: {"id_gridfs", "nome_arquivo", "tipo"} da planilha gerada.
+    """
+
+    parametros = tarefa["parametros"]
+
+    df = pd.DataFrame(parametros["linhas"], columns=parametros.get("colunas"))
+
+    buffer = BytesIO()
+
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name=parametros.get("aba") or "Planilha")
+
+    return {
+        "id_gridfs": guardar_arquivo(db, buffer.getvalue(), parametros["nome_arquivo"], MIME_XLSX),
+        "nome_arquivo": parametros["nome_arquivo"],
+        "tipo": MIME_XLSX,
+    }
+
+
+def _executar_convites_lote(db, tarefa: dict) -> dict:
+    """
+    parametros: {"id_lote"}
+
+    O lote guarda a situação de cada linha: uma nova tentativa (ou uma
+    tarefa nova para o mesmo lote) só trata o que ainda está pendente.
+
+    Resultado: contagem por etapa e situação.
+    """
+
+    def ao_concluir_etapa(etapa):
+        if not renovar_reserva(db, tarefa, progresso=etapa):
+            raise RuntimeError("Reserva da tarefa perdida durante o lote de convites.")
+
+    return processar_lote(db, tarefa["parametros"]["id_lote"], ao_concluir_etapa)
+
+
+# Tipo da tarefa -> função(db, tarefa) que a executa e retorna o resultado
+EXECUTORES = {
+    "envio_drive": _executar_envio_drive,
+    "docx_relatorio": _executar_docx_relatorio,
+    "xlsx_tabela": _executar_xlsx_tabela,
+    "convites_lote": _executar_convites_lote,
+}
+
+
+
+
+###########################################################################################################
+# TRABALHADOR
+###########################################################################################################
+
+def processar_tarefa(db, tarefa: dict) -> str:
+    """
+    Executa uma tarefa reservada e registra o resultado ou a falha.
+
+    Retorna:
+        O status final da tentativa (concluida, pendente ou erro).
+    """
+
+    executor = EXECUTORES.get(tarefa["tipo"])
+
+    if executor is None:
+        return falhar_tarefa(db, {**tarefa, "tentativas": tarefa["max_tentativas"]}, f"Tipo de tarefa desconhecido: {tarefa['tipo']}")
+
+    try:
+        resultado = executor(db, tarefa)
+    except Exception as e:
+        return falhar_tarefa(db, tarefa, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}")
+
+    concluir_tarefa(db, tarefa, resultado)
+
+    return CONCLUIDA
+
+
+def executar_trabalhador(db, tipos=None, uma_vez: bool = False):
+    """
+    Loop do trabalhador: reserva e executa tarefas; com a fila vazia, espera
+    INTERVALO_CONSULTA_SEGUNDOS. Com uma_vez=True, para quando a fila esvazia.
+    """
+
+    trabalhador = f"{socket.gethostname()}:{os.getpid()}"
+
+    print(f"Trabalhador {trabalhador} iniciado.")
+
+    # Chamadas ao Drive e falhas, medidas neste processo
+    porta_metricas = iniciar_servidor_metricas("porta_trabalhador")
+
+    if porta_metricas is None:
+        print("Porta das métricas ocupada: métricas do trabalhador indisponíveis.")
+    else:
+        print(f"Métricas em http://{socket.gethostname()}:{porta_metricas}/metrics")
+
+    while True:
+
+        tarefa = reservar_tarefa(db, trabalhador, tipos)
+
+        if tarefa is None:
+
+            if uma_vez:
+                return
+
+            time.sleep(INTERVALO_CONSULTA_SEGUNDOS)
+            continue
+
+        inicio = time.perf_counter()
+
+        status = processar_tarefa(db, tarefa)
+
+        print(
+            f"{datetime.datetime.now():%d/%m/%Y %H:%M:%S}  {tarefa['tipo']}  {tarefa['_id']}  "
+            f"tentativa {tarefa['tentativas']}  {status}  {time.perf_counter() - inicio:.1f} s"
+        )
+
+
+def limpar_tarefas_terminadas(db, dias: int = DIAS_GUARDAR_TERMINADAS) -> int:
+    """
+    Remove as tarefas terminadas há mais de dias, com os arquivos gerados.
+
+    Envios ao Drive com erro ficam (com os arquivos recebidos) até serem
+    reenfileirados e concluídos.
+
+    Retorna:
+        Quantidade de tarefas removidas.
+    """
+
+    limite = datetime.datetime.now() - datetime.timedelta(days=dias)
+
+    filtro = {
+        "status": {"$in": list(STATUS_TERMINADOS)},
+        "concluida_em": {"$lt": limite},
+        "$nor": [{"tipo": "envio_drive", "status": ERRO}],
+    }
+
+    for tarefa in db[COLECAO_TAREFAS].find(filtro, {"parametros": 1, "resultado": 1}):
+
+        if (tarefa.get("resultado") or {}).get("id_gridfs"):
+            excluir_arquivo(db, tarefa["resultado"]["id_gridfs"])
+
+        for grupo in (tarefa.get("parametros") or {}).get("grupos", []):
+            for item in grupo.get("arquivos", []):
+                excluir_arquivo(db, item["id_gridfs"])
+
+    return db[COLECAO_TAREFAS].delete_many(filtro).deleted_count
+
+
+
+
+###########################################################################################################
+# ACOMPANHAMENTO NAS PÁGINAS
+###########################################################################################################
+
+def consultar_tarefa(db, id_tarefa) -> dict | None:
+
+    if not id_tarefa:
+        return None
+
+    return db[COLECAO_TAREFAS].find_one({"_id": ObjectId(id_tarefa)}, {"parametros": 0})
+
+
+def baixar_resultado(db, tarefa: dict) -> bytes:
+    """
+    Conteúdo do arquivo gerado por uma tarefa concluída (docx_relatorio, xlsx_tabela).
+    """
+
+    return ler_arquivo(db, tarefa["resultado"]["id_gridfs"]).getvalue()
+
+
+def iniciar_tarefa_da_sessao(db, chave: str, tipo: str, parametros: dict, codigo=None):
+    """
+    Enfileira uma tarefa, guarda o id em st.session_state[chave] e faz um
+    rerun para ligar a atualização automática do fragment que acompanha.
+    """
+
+    st.session_state[chave] = enfileirar_tarefa(
+        db, tipo, parametros, codigo=codigo, usuario=st.session_state.get("nome")
+    )
+    st.session_state[f"{chave}_acompanhando"] = True
+
+    st.rerun()
+
+
+def intervalo_acompanhamento(chave: str):
+    """
+    run_every para o st.fragment que acompanha a tarefa de st.session_state[chave]:
+    atualiza a cada INTERVALO_ACOMPANHAMENTO_SEGUNDOS só enquanto ela não termina.
+    """
+
+    if st.session_state.get(f"{chave}_acompanhando"):
+        return INTERVALO_ACOMPANHAMENTO_SEGUNDOS
+
+    return None
+
+
+def acompanhar_tarefa(db, chave: str) -> dict | None:
+    """
+    Tarefa de st.session_state[chave] (None se não houver). Quando ela
+    termina, faz um rerun completo para desligar a atualização automática.
+    """
+
+    tarefa = consultar_tarefa(db, st.session_state.get(chave))
+
+    terminou = tarefa is None or tarefa["status"] in STATUS_TERMINADOS
+
+    if terminou and st.session_state.get(f"{chave}_acompanhando"):
+        st.session_state[f"{chave}_acompanhando"] = False
+        st.rerun()
+
+    return tarefa
+
+
+def envios_pendentes(db, codigo: str) -> int:
+    """
+    Quantidade de envios ao Drive do projeto ainda não concluídos.
+    """
+
+    return db[COLECAO_TAREFAS].count_documents({
+        "tipo": "envio_drive",
+        "codigo": codigo,
+        "status": {"$in": [PENDENTE, EM_EXECUCAO]},
+    })
+
+
+def envios_com_erro(db, codigo: str) -> dict:
+    """
+    Envios ao Drive do projeto que esgotaram as tentativas.
+
+    Retorna:
+        {id_envio: _id da tarefa} de cada arquivo dessas tarefas.
+    """
+
+    com_erro = {}
+
+    for tarefa in db[COLECAO_TAREFAS].find(
+        {"tipo": "envio_drive", "codigo": codigo, "status": ERRO},
+        {"parametros.grupos.arquivos.id_envio": 1}
+    ):
+        for grupo in tarefa["parametros"]["grupos"]:
+            for item in grupo["arquivos"]:
+                com_erro[item["id_envio"]] = tarefa["_id"]
+
+    return com_erro
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "trabalhar"
+
+    if comando == "situacao":
+
+        for linha in db[COLECAO_TAREFAS].aggregate([
+            {"$group": {"_id": {"tipo": "$tipo", "status": "$status"}, "quantidade": {"$sum": 1}}},
+            {"$sort": {"_id.tipo": 1, "_id.status": 1}},
+        ]):
+            print(f"{linha['_id']['tipo']:<16} {linha['_id']['status']:<12} {linha['quantidade']}")
+
+    elif comando == "limpar":
+
+        print(f"{limpar_tarefas_terminadas(db)} tarefas removidas.")
+
+    elif comando == "reenfileirar":
+
+        for id_tarefa in sys.argv[2:]:
+            print(f"{id_tarefa}: {'reenfileirada' if reenfileirar_tarefa(db, id_tarefa) else 'não está com erro'}")
+
+    else:
+
+        executar_trabalhador(db, tipos=sys.argv[2:] or None)
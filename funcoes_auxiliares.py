@@ -2,23 +2,31 @@ import streamlit as st
 from pymongo import MongoClient
 import datetime
 import pandas as pd
+import numpy as np
 import io
 import re
-from num2words import num2words
-from pymongo import ReturnDocument
+import copy
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from num2words import num2words
+from pymongo import UpdateOne
+from indices_mongo import garantir_indices
+from estatistica_acessos import registrar_acesso
+from monitor_mongo import MONITOR_COMANDOS
+from metricas_prometheus import medir, registrar_falha, DURACAO_DRIVE, UPLOADS_DRIVE
+from mensagens_flash import agendar_mensagem
 
 
 # Google Drive API
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload
 
-# Envio de e-mail
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
+# Envio de e-mail (caixa de saída)
+from fila_emails import enfileirar_email, enfileirar_emails
+from templates_email import renderizar_email
 
 
 
@@ -33,539 +41,11 @@ def gerar_email_lembrete_eventos(
     logo_url: str
 ):
     """
-    Gera o corpo HTML do e-mail de lembrete para cadastro de eventos.
-    """
-
-    return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{
-            font-family: Arial, Helvetica, sans-serif;
-            background-color: #f5f5f5;
-            margin: 0;
-            padding: 0;
-        }}
-
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-top: 6px solid #A0C256;
-            padding: 30px;
-        }}
-
-        .logo {{
-            text-align: center;
-            margin-bottom: 30px;
-        }}
-
-        .content {{
-            color: #333;
-            font-size: 15px;
-            line-height: 1.6;
-        }}
-
-        .footer {{
-            margin-top: 40px;
-            font-size: 12px;
-            color: #777;
-            text-align: center;
-        }}
-
-        .highlight {{
-            color: #A0C256;
-            font-weight: bold;
-        }}
-
-    </style>
-</head>
-
-<body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo_url}" height="70" alt="IEB">
-        </div>
-
-        <div class="content">
-
-            <p>
-                Olá,
-            </p>
-
-            <p>
-                Esta é uma mensagem automática para lembrar que é necessário cadastrar os
-                <span class="highlight">Eventos</span> relacionados ao projeto apoiado pelo IEB
-                na página de Eventos do Sistema Veredas.
-            </p>
-
-            <p>
-                Quando os eventos são divulgados, todas as organizações apoiadas têm acesso às
-                informações por meio da agenda compartilhada do sistema.
-            </p>
-
-            <p>
-                Atenciosamente,
-            </p>
-
-            <p>
-                <a
-                    href="https://veredas.streamlit.app/"
-                    target="_blank"
-                    style="text-decoration: none;"
-                >
-                    Sistema Veredas
-                </a>
-            </p>
-
-        </div>
-
-        <div class="footer">
-            Este é um e-mail automático. Não responda.
-        </div>
-
-    </div>
-
-</body>
-
-</html>
-"""
-
-
-
-
-###########################################################################################################
-# VERIFICA A NECESSIDADE DE ENVIO DOS LEMBRETES DE EVENTOS
-###########################################################################################################
-
-def verificar_envio_lembrete_eventos(
-    db
-):
-    """
-    Verifica se já passou o intervalo configurado para envio do
-    lembrete de cadastro de eventos e, quando necessário,
-    adquire um lock atômico para impedir envios simultâneos.
+    Gera o corpo HTML do e-mail de lembrete para cadastro de eventos
+    (templates_email/lembrete_eventos.html).
     """
 
-
-    ###################################################################################################
-    # CARREGA OS EDITAIS
-    ###################################################################################################
-
-    editais = list(
-
-        db.editais.find(
-
-            {},
-
-            {
-
-                "_id": 1,
-
-                "codigo_edital": 1,
-
-                "dias_intervalo_lembrete_eventos": 1,
-
-                "email_enviado_em": 1,
-
-                "envio_em_andamento": 1
-
-            }
-
-        )
-
-    )
-
-    if not editais:
-        return
-
-
-    ###################################################################################################
-    # CARREGA OS ADMINISTRADORES ATIVOS
-    ###################################################################################################
-
-    administradores = list(
-
-        db.pessoas.find(
-
-            {
-                "status": "ativo",
-                "tipo_usuario": "admin"
-            },
-
-            {
-                "e_mail": 1
-            }
-
-        )
-
-    )
-
-
-
-    ###################################################################################################
-    # PROCESSA CADA EDITAL
-    ###################################################################################################
-
-    for edital in editais:
-
-
-        intervalo_dias = int(
-
-            edital.get(
-
-                "dias_intervalo_lembrete_eventos",
-
-                0
-
-            )
-
-        )
-
-
-
-
-        ###################################################################################################
-        # LEMBRETE DESATIVADO
-        ###################################################################################################
-
-        if intervalo_dias == 0:
-            continue
-
-        ###################################################################################################
-        # VERIFICA SE JÁ EXISTE UM ENVIO EM ANDAMENTO
-        ###################################################################################################
-
-        if edital.get("envio_em_andamento"):
-            continue
-
-        ###################################################################################################
-        # VERIFICA O INTERVALO DESDE O ÚLTIMO ENVIO
-        ###################################################################################################
-
-        agora = datetime.datetime.now()
-
-        # # Data fixa para testes
-        # agora = datetime.datetime(
-        #     2026,
-        #     6,
-        #     22
-        # )
-
-
-
-        ultimo_envio = edital.get(
-            "email_enviado_em"
-        )
-
-        if ultimo_envio:
-
-            dias_desde_ultimo_envio = (
-                agora - ultimo_envio
-            ).days
-
-            if dias_desde_ultimo_envio < intervalo_dias:
-                continue
-
-        ###################################################################################################
-        # ADQUIRE O LOCK ATÔMICO
-        ###################################################################################################
-
-
-        filtro = {
-
-            "_id": edital["_id"],
-
-            "dias_intervalo_lembrete_eventos": {
-                "$gt": 0
-            },
-
-            "envio_em_andamento": {
-                "$exists": False
-            }
-
-        }
-
-
-
-
-        limite = (
-            agora -
-            datetime.timedelta(
-                days=intervalo_dias
-            )
-        )
-
-        filtro["$or"] = [
-
-            {
-                "email_enviado_em": {
-                    "$exists": False
-                }
-            },
-
-            {
-                "email_enviado_em": {
-                    "$lte": limite
-                }
-            }
-
-        ]
-
-
-
-
-        config_lock = db.editais.find_one_and_update(
-            filtro,
-
-            {
-                "$set": {
-                    "envio_em_andamento": agora
-                }
-            },
-
-            return_document=ReturnDocument.AFTER
-
-        )
-
-        ###################################################################################################
-        # OUTRO USUÁRIO JÁ ADQUIRIU O LOCK
-        ###################################################################################################
-
-        if config_lock is None:
-            continue
-
-        ###################################################################################################
-        # ENVIO DOS E-MAILS
-        ###################################################################################################
-
-        with st.spinner(
-            "Enviando e-mails de lembrete de Eventos. Aguarde, não recarregue a página."
-        ):
-
-
-            try:
-
-                ###################################################################################################
-                # CARREGA OS PROJETOS DO EDITAL
-                ###################################################################################################
-
-                projetos = list(
-
-                    db.projetos.find(
-
-                        {
-
-                            "edital": edital["codigo_edital"]
-
-                        },
-
-                        {
-
-                            "codigo": 1,
-                            "sigla": 1,
-                            "status": 1,
-                            "financeiro.parcelas": 1,
-                            "relatorios": 1,
-                            "contatos": 1
-
-                        }
-
-                    )
-
-                )
-
-
-
-                if not projetos:
-
-                    continue
-
-                ###################################################################################################
-                # CALCULA O STATUS DOS PROJETOS
-                ###################################################################################################
-
-                df_projetos = pd.DataFrame(projetos)
-
-                df_projetos = calcular_status_projetos(
-                    df_projetos
-                )
-
-                ###################################################################################################
-                # FILTRA APENAS PROJETOS EM DIA E ATRASADOS
-                ###################################################################################################
-
-                df_projetos = df_projetos[
-                    df_projetos["status"].isin(
-                        [
-                            "Em dia",
-                            "Atrasado"
-                        ]
-                    )
-                ]
-
-                if df_projetos.empty:
-
-                    continue
-
-                ###################################################################################################
-                # MONTA A LISTA DE DESTINATÁRIOS DOS PROJETOS
-                ###################################################################################################
-
-                destinatarios = set()
-
-                for _, projeto in df_projetos.iterrows():
-
-                    contatos = projeto.get("contatos")
-
-                    if not isinstance(contatos, list):
-                        continue
-
-                    for contato in contatos:
-
-                        if not isinstance(contato, dict):
-                            continue
-
-                        email = (
-                            contato.get("email", "")
-                            .strip()
-                            .lower()
-                        )
-
-                        if not email:
-                            continue
-
-                        destinatarios.add(email)
-
-                ###################################################################################################
-                # ADICIONA OS ADMINISTRADORES ATIVOS
-                ###################################################################################################
-
-                for admin in administradores:
-
-                    email = (
-                        admin.get("e_mail", "")
-                        .strip()
-                        .lower()
-                    )
-
-                    if not email:
-                        continue
-
-                    destinatarios.add(email)
-
-                ###################################################################################################
-                # VERIFICA SE EXISTEM DESTINATÁRIOS
-                ###################################################################################################
-
-                if not destinatarios:
-
-
-                    continue
-
-
-
-                ###################################################################################################
-                # ENVIA O E-MAIL
-                ###################################################################################################
-
-                assunto = (
-                    f"Lembrete de cadastro de Eventos - {edital['codigo_edital']} - Sistema Veredas"
-                )
-
-                logo_url = "https://iieb.org.br/wp-content/uploads/2021/02/IEB-logo.svg"
-
-                corpo_html = gerar_email_lembrete_eventos(
-                    logo_url=logo_url
-                )
-
-                envio_ok = enviar_email(
-
-                    corpo_html=corpo_html,
-
-                    destinatarios=sorted(
-                        destinatarios
-                    ),
-
-                    assunto=assunto,
-
-                    copia_oculta=True
-
-                )
-
-
-                ###################################################################################################
-                # FINALIZA O PROCESSAMENTO
-                ###################################################################################################
-
-
-                if envio_ok:
-
-                    ###################################################################################################
-                    # REGISTRA A DATA DO ÚLTIMO ENVIO
-                    ###################################################################################################
-
-                    db.editais.update_one(
-
-                        {
-                            "_id": edital["_id"]
-                        },
-
-                        {
-                            "$set": {
-
-                                "email_enviado_em": agora
-
-                            }
-
-                        }
-
-                    )
-
-                    st.success(
-                        "E-mails de lembrete de Eventos enviados com sucesso.",
-                        icon=":material/mail:"
-                    )
-
-                    time.sleep(3)
-
-                else:
-
-
-
-                    st.error(
-                        "Ocorreu um erro durante o envio dos e-mails."
-                    )
-
-                    time.sleep(3)
-
-
-            finally:
-
-                ###################################################################################################
-                # LIBERA O LOCK DO EDITAL
-                ###################################################################################################
-
-                db.editais.update_one(
-
-                    {
-                        "_id": edital["_id"]
-                    },
-
-                    {
-                        "$unset": {
-
-                            "envio_em_andamento": ""
-
-                        }
-
-                    }
-
-                )
+    return renderizar_email("lembrete_eventos.html", logo_url=logo_url)
 
 
 
@@ -618,81 +98,12 @@ def registrar_estatistica_sessao(db):
     # Executa apenas se ainda não foi contabilizado
     if not st.session_state.visita_contabilizada:
 
-        # --------------------------------------------------------------------------------------------------
-        # PREPARAÇÃO DA DATA ATUAL
-        # --------------------------------------------------------------------------------------------------
-
-        # Obtém a data atual no formato desejado
-        data_hoje = datetime.datetime.now().strftime("%d/%m/%Y")
-
-        # --------------------------------------------------------------------------------------------------
-        # GARANTIA DA EXISTÊNCIA DA COLEÇÃO E DOCUMENTO
-        # --------------------------------------------------------------------------------------------------
-
-        # Acessa a coleção 'estatistica'
-        colecao = db["estatistica"]
-
-        # Tenta encontrar o documento principal
-        doc = colecao.find_one({"_id": "controle_acessos"})
-
-        # Caso o documento não exista, cria com estrutura inicial
-        if not doc:
-            colecao.insert_one({
-                "_id": "controle_acessos",
-                "total_sessoes": []
-            })
-            doc = colecao.find_one({"_id": "controle_acessos"})
-
-        # --------------------------------------------------------------------------------------------------
-        # VERIFICAÇÃO DO REGISTRO DO DIA
-        # --------------------------------------------------------------------------------------------------
-
-        lista_sessoes = doc.get("total_sessoes", [])
-
-        # Procura se já existe registro para a data atual
-        registro_hoje = next((item for item in lista_sessoes if item["data"] == data_hoje), None)
-
-        # Caso não exista, cria um novo registro para o dia
-        if not registro_hoje:
-            novo_registro = {
-                "data": data_hoje,
-                "equipe": 0,
-                "benef": 0,
-                "visit": 0
-            }
-
-            colecao.update_one(
-                {"_id": "controle_acessos"},
-                {"$push": {"total_sessoes": novo_registro}}
-            )
-
-            # Atualiza variável local para uso posterior
-            registro_hoje = novo_registro
-
         # --------------------------------------------------------------------------------------------------
         # INCREMENTO DE SESSÕES POR TIPO DE USUÁRIO
         # --------------------------------------------------------------------------------------------------
 
-        tipo_usuario = st.session_state.get("tipo_usuario", "visitante")
-
-        # Define qual campo será incrementado
-        if tipo_usuario in ["equipe", "admin"]:
-            campo_incremento = "total_sessoes.$.equipe"
-        elif tipo_usuario == "beneficiario":
-            campo_incremento = "total_sessoes.$.benef"
-        else:
-            campo_incremento = "total_sessoes.$.visit"
-
-        # Atualiza o contador diretamente no MongoDB
-        colecao.update_one(
-            {
-                "_id": "controle_acessos",
-                "total_sessoes.data": data_hoje
-            },
-            {
-                "$inc": {campo_incremento: 1}
-            }
-        )
+        # Um único upsert com $inc no documento do dia (ver estatistica_acessos.py)
+        registrar_acesso(db, st.session_state.get("tipo_usuario", "visitante"))
 
         # --------------------------------------------------------------------------------------------------
         # FINALIZAÇÃO DO PROCESSO
@@ -887,89 +298,86 @@ def enviar_email(
     corpo_html: str,
     destinatarios: list[str],
     assunto: str,
+    origem: str,
     copia_oculta: bool = False
 ):
     """
-    Envia e-mail em HTML usando configurações do st.secrets.
+    Coloca um e-mail em HTML na caixa de saída (fila_emails.py). O envio
+    por SMTP é feito pelo enviador, fora da execução da página.
 
     Parâmetros:
         corpo_html (str): Conteúdo do e-mail em HTML.
         destinatarios (list[str]): Lista de destinatários.
         assunto (str): Assunto do e-mail.
+        origem (str): Quem pediu o envio (ex.: enviar_email_remanejamento_aprovado),
+            gravado na caixa de saída e usado como rótulo da métrica de
+            duração do SMTP.
         copia_oculta (bool): Quando True, envia utilizando BCC.
-    """
 
-    # Lendo segredos
-    smtp_server = st.secrets["senhas"]["smtp_server"]
-    port = st.secrets["senhas"]["port"]
-    endereco_email = st.secrets["senhas"]["endereco_email"]
-    senha_email = st.secrets["senhas"]["senha_email"]
+    Retorna:
+        True se a mensagem foi gravada na caixa de saída.
+    """
 
-    # Criando mensagem
-    msg = MIMEMultipart()
+    try:
 
-    msg["From"] = formataddr(
-        (
-            "Sistema Veredas",
-            endereco_email
+        enfileirar_email(
+            conectar_mongo_cepf_gestao(),
+            corpo_html,
+            destinatarios,
+            assunto,
+            copia_oculta=copia_oculta,
+            origem=origem
         )
-    )
-
-    # Define destinatários visíveis
-    if copia_oculta:
 
-        msg["To"] = endereco_email
-
-    else:
+        return True
 
-        msg["To"] = ", ".join(destinatarios)
+    except Exception as e:
 
-    msg["Subject"] = assunto
+        registrar_falha("smtp")
 
-    msg.attach(
-        MIMEText(
-            corpo_html,
-            "html"
+        # Agendada: as páginas costumam chamar st.rerun() logo depois do envio
+        agendar_mensagem(
+            f"Erro ao enviar e-mail: {e}",
+            icon=":material/error:",
+            tipo="error"
         )
-    )
 
-    # Enviando
-    try:
+        return False
 
-        with smtplib.SMTP(
-            smtp_server,
-            port
-        ) as server:
 
-            server.starttls()
 
-            server.login(
-                endereco_email,
-                senha_email
-            )
+def enviar_emails(mensagens: list[dict], origem: str):
+    """
+    Coloca vários e-mails na caixa de saída de uma vez, por exemplo um por
+    destinatário quando o mesmo aviso vai para várias pessoas.
 
-            if copia_oculta:
+    Parâmetros:
+        mensagens (list[dict]): dicionários com corpo_html, destinatarios,
+            assunto e, opcionalmente, copia_oculta.
+        origem (str): Quem pediu o envio (rótulo da métrica, como em enviar_email).
 
-                server.sendmail(
-                    endereco_email,
-                    destinatarios,
-                    msg.as_string()
-                )
+    Retorna:
+        True se as mensagens foram gravadas na caixa de saída.
+    """
 
-            else:
+    try:
 
-                server.sendmail(
-                    endereco_email,
-                    destinatarios,
-                    msg.as_string()
-                )
+        enfileirar_emails(
+            conectar_mongo_cepf_gestao(),
+            [{**mensagem, "origem": origem} for mensagem in mensagens]
+        )
 
         return True
 
     except Exception as e:
 
-        st.error(
-            f"Erro ao enviar e-mail: {e}"
+        registrar_falha("smtp")
+
+        # Agendada: as páginas costumam chamar st.rerun() logo depois do envio
+        agendar_mensagem(
+            f"Erro ao enviar e-mails: {e}",
+            icon=":material/error:",
+            tipo="error"
         )
 
         return False
@@ -1033,20 +441,46 @@ def add_permissao_drive(servico, pasta_id, contato):
         return
 
     try:
-        servico.permissions().create(
-            fileId=pasta_id,
-            body={
-                "type": "user",
-                "role": "reader",
-                "emailAddress": email
-            },
-            sendNotificationEmail=False,
-            supportsAllDrives=True
-        ).execute()
+        with medir(DURACAO_DRIVE, operacao="add_permissao"):
+            servico.permissions().create(
+                fileId=pasta_id,
+                body={
+                    "type": "user",
+                    "role": "reader",
+                    "emailAddress": email
+                },
+                sendNotificationEmail=False,
+                supportsAllDrives=True
+            ).execute()
 
     except Exception:
         # Falha não interrompe o fluxo
-        pass
+        registrar_falha("drive")
+
+
+
+# Permissão pública de leitura para a pasta de fotos dos relatos, dada no ato da criação da pasta
+def garantir_permissao_publica_leitura(servico, pasta_id):
+    """
+    Define permissão:
+    Qualquer pessoa com o link → Leitor
+    (somente se ainda não existir)
+    """
+
+    try:
+        with medir(DURACAO_DRIVE, operacao="permissao_publica"):
+            servico.permissions().create(
+                fileId=pasta_id,
+                body={
+                    "type": "anyone",
+                    "role": "reader"
+                },
+                supportsAllDrives=True
+            ).execute()
+    except Exception as e:
+        registrar_falha("drive")
+        st.error(f"Erro ao definir permissão: {str(e)}")
+        raise
 
 
 
@@ -1056,117 +490,360 @@ def add_permissao_drive(servico, pasta_id, contato):
 # FUNÇÕES DE PASTAS NO GOOGLE DRIVE
 ###########################################################################################################
 
-def obter_ou_criar_pasta(servico, nome_pasta, id_pasta_pai):
+# Registro dos ids das pastas do Drive (coleção pastas_drive).
+#
+# Cada pasta é guardada pela pasta pai e pelo nome ({"_id": "<id_pai>/<nome>",
+# "pasta_id": ..., "codigo": ...}); a pasta raiz de cada projeto também é
+# guardada pelo código ({"_id": "projeto:<codigo>"}), para não depender da
+# sigla. Com o registro, as pastas só são procuradas no Drive na primeira vez
+# em que são usadas; depois disso, o id vem da memória do processo ou do
+# MongoDB. projeto_novo.py cria toda a estrutura de pastas ao cadastrar o projeto.
+#
+# Todas as pastas (inclusive as subpastas criadas sob demanda) são gravadas
+# com o código do projeto, para que esquecer_pastas_projeto alcance todas.
+# Se uma pasta registrada for apagada no Drive, o primeiro envio que receber
+# 404 chama reencontrar_pasta, que esquece a pasta (e as subpastas
+# registradas dentro dela) e a procura ou cria de novo pelo nome.
+
+COLECAO_PASTAS_DRIVE = "pastas_drive"
+
+
+# Subpastas padrão dentro da pasta de cada projeto
+SUBPASTAS_PROJETO = (
+    "Contratos",
+    "Extratos_bancarios",
+    "Locais",
+    "Pesquisas",
+    "Planos_mitigacao",
+    "Recibos",
+    "Relatorios",
+    "Relatos_atividades",
+    "Relatos_financeiros",
+)
+
+
+MIME_PASTA_DRIVE = "application/vnd.google-apps.folder"
+
+
+# Cópia em memória do registro, compartilhada pelas sessões do processo
+_pastas_em_memoria = {}
+_trava_pastas = threading.Lock()
+
+
+def chave_pasta_drive(id_pasta_pai, nome_pasta) -> str:
+    return f"{id_pasta_pai}/{nome_pasta}"
+
+
+def _chave_pasta_projeto(codigo) -> str:
+    return f"projeto:{codigo}"
+
+
+def pasta_registrada(chave: str) -> str | None:
     """
-    Busca uma pasta com o nome especificado dentro da pasta pai no Google Drive.
-    Se não existir, cria a pasta.
+    Id da pasta registrada com a chave (memória do processo ou MongoDB).
+    """
+
+    with _trava_pastas:
+        pasta_id = _pastas_em_memoria.get(chave)
+
+    if pasta_id:
+        return pasta_id
+
+    registro = conectar_mongo_cepf_gestao()[COLECAO_PASTAS_DRIVE].find_one({"_id": chave}, {"pasta_id": 1})
+
+    if not registro:
+        return None
+
+    with _trava_pastas:
+        _pastas_em_memoria[chave] = registro["pasta_id"]
+
+    return registro["pasta_id"]
 
-    Retorna o ID da pasta.
+
+def registrar_pastas(pastas: dict, codigo=None):
+    """
+    Grava no registro {chave: pasta_id}, com o código do projeto (se houver).
+    """
+
+    if not pastas:
+        return
+
+    with _trava_pastas:
+        _pastas_em_memoria.update(pastas)
+
+    agora = datetime.datetime.now()
+
+    conectar_mongo_cepf_gestao()[COLECAO_PASTAS_DRIVE].bulk_write(
+        [
+            UpdateOne(
+                {"_id": chave},
+                {"$set": {"pasta_id": pasta_id, "codigo": codigo, "registrado_em": agora}},
+                upsert=True
+            )
+            for chave, pasta_id in pastas.items()
+        ],
+        ordered=False
+    )
+
+
+def esquecer_pastas_projeto(codigo):
+    """
+    Remove do registro as pastas de um projeto (ex.: pasta apagada no Drive),
+    para que sejam procuradas ou criadas de novo no próximo uso.
+    """
+
+    db = conectar_mongo_cepf_gestao()
+
+    chaves = [r["_id"] for r in db[COLECAO_PASTAS_DRIVE].find({"codigo": codigo}, {"_id": 1})]
+
+    with _trava_pastas:
+        for chave in chaves:
+            _pastas_em_memoria.pop(chave, None)
+
+    db[COLECAO_PASTAS_DRIVE].delete_many({"codigo": codigo})
+
+
+def _pasta_nao_encontrada(erro) -> bool:
+    """
+    True para o 404 do Drive (pasta apagada, ou sem acesso).
+    """
+
+    return isinstance(erro, HttpError) and erro.resp.status == 404
+
+
+def reencontrar_pasta(servico, pasta_id) -> str | None:
+    """
+    Chamada quando o Drive responde 404 para uma pasta registrada.
+
+    Esquece do registro a pasta (todas as chaves com esse id) e as
+    subpastas registradas dentro dela, e procura ou cria de novo a pasta
+    pelo nome, dentro da pasta pai (que também é reencontrada, se tiver
+    sido apagada).
+
+    Retorna:
+        O novo id, ou None se a pasta não estava no registro.
+    """
+
+    colecao = conectar_mongo_cepf_gestao()[COLECAO_PASTAS_DRIVE]
+
+    registros = list(colecao.find({"pasta_id": pasta_id}, {"_id": 1, "codigo": 1}))
+
+    if not registros:
+        return None
+
+    chaves = [r["_id"] for r in registros] + [
+        r["_id"] for r in colecao.find({"_id": {"$regex": f"^{re.escape(pasta_id)}/"}}, {"_id": 1})
+    ]
+
+    with _trava_pastas:
+        for chave in chaves:
+            _pastas_em_memoria.pop(chave, None)
+
+    colecao.delete_many({"_id": {"$in": chaves}})
+
+    # A chave "<id_pai>/<nome>" diz onde procurar; "projeto:<codigo>" só aponta para ela
+    por_nome = [r for r in registros if not r["_id"].startswith(_chave_pasta_projeto(""))]
+
+    if not por_nome:
+        return None
+
+    id_pasta_pai, nome_pasta = por_nome[0]["_id"].split("/", 1)
+    codigo = por_nome[0].get("codigo")
+
+    novo_id = obter_ou_criar_pasta(servico, nome_pasta, id_pasta_pai, codigo)
+
+    registrar_pastas({r["_id"]: novo_id for r in registros if r not in por_nome}, codigo)
+
+    return novo_id
+
+
+def _buscar_ou_criar_pasta_drive(servico, nome_pasta, id_pasta_pai):
+    """
+    Procura a pasta no Drive e cria se não existir (sem usar o registro).
     """
 
     consulta = (
         f"name='{nome_pasta}' and "
         f"'{id_pasta_pai}' in parents and "
-        f"mimeType='application/vnd.google-apps.folder' and trashed=false"
+        f"mimeType='{MIME_PASTA_DRIVE}' and trashed=false"
     )
 
-    resultado = servico.files().list(
-        q=consulta,
-        fields="files(id)",
-        includeItemsFromAllDrives=True,
-        supportsAllDrives=True
-    ).execute()
+    with medir(DURACAO_DRIVE, operacao="obter_ou_criar_pasta"):
 
-    arquivos = resultado.get("files", [])
+        resultado = servico.files().list(
+            q=consulta,
+            fields="files(id)",
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True
+        ).execute()
 
-    if arquivos:
-        return arquivos[0]["id"]
+        arquivos = resultado.get("files", [])
 
-    pasta = servico.files().create(
-        body={
-            "name": nome_pasta,
-            "parents": [id_pasta_pai],
-            "mimeType": "application/vnd.google-apps.folder"
-        },
-        fields="id",
-        supportsAllDrives=True
-    ).execute()
+        if arquivos:
+            return arquivos[0]["id"]
+
+        pasta = servico.files().create(
+            body={
+                "name": nome_pasta,
+                "parents": [id_pasta_pai],
+                "mimeType": MIME_PASTA_DRIVE
+            },
+            fields="id",
+            supportsAllDrives=True
+        ).execute()
 
     return pasta["id"]
 
 
+def obter_ou_criar_pasta(servico, nome_pasta, id_pasta_pai, codigo=None):
+    """
+    Retorna o ID da pasta com o nome especificado dentro da pasta pai.
+
+    Consulta primeiro o registro de pastas; só procura (e cria, se não
+    existir) no Google Drive quando a pasta ainda não foi registrada.
+    Se a pasta pai registrada tiver sido apagada, ela é reencontrada
+    (reencontrar_pasta) e a busca é feita de novo.
+    """
+
+    chave = chave_pasta_drive(id_pasta_pai, nome_pasta)
+
+    pasta_id = pasta_registrada(chave)
+
+    if pasta_id:
+        return pasta_id
+
+    try:
+        pasta_id = _buscar_ou_criar_pasta_drive(servico, nome_pasta, id_pasta_pai)
+
+    except HttpError as e:
+
+        if not _pasta_nao_encontrada(e):
+            raise
+
+        novo_pai = reencontrar_pasta(servico, id_pasta_pai)
+
+        if not novo_pai:
+            raise
+
+        chave = chave_pasta_drive(novo_pai, nome_pasta)
+
+        pasta_id = _buscar_ou_criar_pasta_drive(servico, nome_pasta, novo_pai)
+
+    registrar_pastas({chave: pasta_id}, codigo)
+
+    return pasta_id
+
+
 def obter_pasta_projeto(servico, codigo, sigla):
     """
     Retorna o ID da pasta do projeto no Google Drive.
     Cria se não existir.
 
-    Usa session_state para evitar duplicação.
+    A pasta fica registrada pelo código do projeto.
     """
 
-    chave = f"pasta_projeto_{codigo}"
+    chave = _chave_pasta_projeto(codigo)
 
-    if chave in st.session_state:
-        return st.session_state[chave]
+    pasta_id = pasta_registrada(chave)
+
+    if pasta_id:
+        return pasta_id
 
     pasta_id = obter_ou_criar_pasta(
         servico,
         f"{codigo} - {sigla}",
-        st.secrets["drive"]["pasta_drive_projetos"]
+        st.secrets["drive"]["pasta_drive_projetos"],
+        codigo
     )
 
-    st.session_state[chave] = pasta_id
-    return pasta_id
+    registrar_pastas({chave: pasta_id}, codigo)
 
+    return pasta_id
 
-# Função para obter o ID da pasta 'Locais' no Drive, para salvar os anexos dos locais.
 
-def obter_pasta_locais(servico, pasta_projeto_id):
+def criar_estrutura_pastas_projeto(servico, codigo, sigla) -> dict:
     """
-    Retorna o ID da subpasta 'Locais' dentro da pasta do projeto.
+    Cria (ou encontra) a pasta do projeto e todas as SUBPASTAS_PROJETO e
+    registra os ids, para que os envios de arquivos não precisem procurar
+    pastas no Drive.
 
-    Também usa cache no session_state para evitar múltiplas criações.
+    As subpastas que faltam são criadas em uma única requisição em lote.
+
+    Retorna:
+        {nome da subpasta: id} e a pasta do projeto em "".
     """
 
-    if "pasta_locais_id" in st.session_state:
-        return st.session_state["pasta_locais_id"]
+    pasta_projeto_id = obter_pasta_projeto(servico, codigo, sigla)
 
-    pasta_id = obter_ou_criar_pasta(
-        servico,
-        "Locais",
-        pasta_projeto_id
+    pastas = {"": pasta_projeto_id}
+
+    # Subpastas já existentes (uma consulta para todas)
+    with medir(DURACAO_DRIVE, operacao="listar_subpastas"):
+        existentes = servico.files().list(
+            q=f"'{pasta_projeto_id}' in parents and mimeType='{MIME_PASTA_DRIVE}' and trashed=false",
+            fields="files(id, name)",
+            pageSize=1000,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True
+        ).execute().get("files", [])
+
+    for arquivo in existentes:
+        if arquivo["name"] in SUBPASTAS_PROJETO:
+            pastas.setdefault(arquivo["name"], arquivo["id"])
+
+    faltantes = [nome for nome in SUBPASTAS_PROJETO if nome not in pastas]
+
+    if faltantes:
+
+        def ao_criar(id_requisicao, resposta, erro):
+            if erro is None:
+                pastas[id_requisicao] = resposta["id"]
+
+        lote = servico.new_batch_http_request(callback=ao_criar)
+
+        for nome in faltantes:
+            lote.add(
+                servico.files().create(
+                    body={"name": nome, "parents": [pasta_projeto_id], "mimeType": MIME_PASTA_DRIVE},
+                    fields="id",
+                    supportsAllDrives=True
+                ),
+                request_id=nome
+            )
+
+        with medir(DURACAO_DRIVE, operacao="criar_subpastas"):
+            lote.execute()
+
+    registrar_pastas(
+        {chave_pasta_drive(pasta_projeto_id, nome): pasta_id for nome, pasta_id in pastas.items() if nome},
+        codigo
     )
 
-    st.session_state["pasta_locais_id"] = pasta_id
-    return pasta_id
+    return pastas
+
+
+# Funções para obter as subpastas padrão do projeto.
+
+def obter_pasta_locais(servico, pasta_projeto_id, codigo=None):
+    """
+    Retorna o ID da subpasta 'Locais' dentro da pasta do projeto.
+    """
+
+    return obter_ou_criar_pasta(servico, "Locais", pasta_projeto_id, codigo)
 
 
 def obter_pasta_extratos_bancarios(
     servico,
-    pasta_projeto_id
+    pasta_projeto_id,
+    codigo=None
 ):
     """
     Retorna o ID da subpasta
     'Extratos_bancarios'
     dentro da pasta do projeto.
-
-    Usa cache no session_state
-    para evitar múltiplas consultas/criações.
     """
 
-    chave = f"pasta_extratos_{pasta_projeto_id}"
-
-    if chave in st.session_state:
-        return st.session_state[chave]
-
-    pasta_id = obter_ou_criar_pasta(
-        servico,
-        "Extratos_bancarios",
-        pasta_projeto_id
-    )
-
-    st.session_state[chave] = pasta_id
-
-    return pasta_id
+    return obter_ou_criar_pasta(servico, "Extratos_bancarios", pasta_projeto_id, codigo)
 
 
 # Função para obter o ID da pasta 'Pesquisas' no Drive, para salvar os anexos das pesquisas.
@@ -1175,164 +852,242 @@ def obter_pasta_pesquisas(servico, pasta_projeto_id, codigo_projeto):
     Retorna o ID da pasta 'Pesquisas' dentro da pasta do projeto.
 
     - Cria a pasta se não existir
-    - Cache separado por projeto
     - Garante parent válido
     """
 
-    # Cache por projeto (NUNCA global)
-    chave = f"pasta_pesquisas_{codigo_projeto}"
-
-    if chave in st.session_state:
-        return st.session_state[chave]
-
     if not pasta_projeto_id:
         raise ValueError("ID da pasta do projeto inválido")
 
-    pasta_id = obter_ou_criar_pasta(
+    return obter_ou_criar_pasta(servico, "Pesquisas", pasta_projeto_id, codigo_projeto)
+
+# Função para obter o ID da pasta 'Relatos_atividades' no Drive, para salvar os anexos das atividades.
+def obter_pasta_relatos_atividades(servico, pasta_projeto_id, codigo=None):
+    """
+    Retorna o ID da pasta 'Relatos_atividades' dentro da pasta do projeto.
+    """
+
+    return obter_ou_criar_pasta(servico, "Relatos_atividades", pasta_projeto_id, codigo)
+
+
+def obter_pasta_relatos_financeiros(servico, pasta_projeto_id, codigo=None):
+    return obter_ou_criar_pasta(
         servico,
-        "Pesquisas",
-        pasta_projeto_id
+        "Relatos_financeiros",
+        pasta_projeto_id,
+        codigo
     )
 
-    # Guarda no session_state
-    st.session_state[chave] = pasta_id
-    return pasta_id
+def obter_pasta_relatorios(servico, pasta_projeto_id, codigo=None):
+    """
+    Retorna o ID da subpasta 'Relatorios' dentro da pasta do projeto.
+    Cria se não existir.
+    """
+
+    return obter_ou_criar_pasta(servico, "Relatorios", pasta_projeto_id, codigo)
+
+
+def obter_pasta_recibos(servico, pasta_projeto_id, codigo=None):
+    """
+    Retorna o ID da subpasta 'Recibos' dentro da pasta do projeto.
+    Cria se não existir.
+    """
+
+    return obter_ou_criar_pasta(servico, "Recibos", pasta_projeto_id, codigo)
+
+# Função para obter o ID da pasta 'Planos_mitigacao' no Drive.
+
+def obter_pasta_planos_mitigacao(servico, pasta_projeto_id, codigo=None):
+    """
+    Retorna o ID da subpasta 'Planos_mitigacao' dentro da pasta do projeto.
+    """
+
+    return obter_ou_criar_pasta(servico, "Planos_mitigacao", pasta_projeto_id, codigo)
+
+
+
+###########################################################################################################
+# UPLOAD E LINK DE ARQUIVOS
+###########################################################################################################
+
+def enviar_arquivo_drive_direto(servico, id_pasta, arquivo):
+    """
+    Upload de um arquivo sem tratamento de erro (para uso fora da UI, como
+    no trabalhador da fila de tarefas). Retorna o ID no Drive.
+
+    O arquivo precisa ter name, type e seek (UploadedFile do Streamlit ou
+    BytesIO com esses atributos).
+
+    Se a pasta registrada tiver sido apagada no Drive (404), ela é
+    reencontrada (reencontrar_pasta) e o envio é repetido uma vez.
+    """
+
+    def enviar(id_pasta):
+
+        # Garante que o ponteiro do arquivo está no início
+        arquivo.seek(0)
+
+        media = MediaIoBaseUpload(
+            arquivo,
+            mimetype=arquivo.type,
+            resumable=True
+        )
+
+        with medir(DURACAO_DRIVE, operacao="enviar_arquivo"):
+            return servico.files().create(
+                body={
+                    "name": arquivo.name,
+                    "parents": [id_pasta]
+                },
+                media_body=media,
+                fields="id",
+                supportsAllDrives=True
+            ).execute()
+
+    try:
+        arq = enviar(id_pasta)
+
+    except HttpError as e:
+
+        if not _pasta_nao_encontrada(e):
+            raise
+
+        nova_pasta = reencontrar_pasta(servico, id_pasta)
+
+        if not nova_pasta:
+            raise
+
+        arq = enviar(nova_pasta)
+
+    UPLOADS_DRIVE.inc()
+
+    return arq["id"]
+
+
+def enviar_arquivo_drive(servico, id_pasta, arquivo):
+    """
+    Faz upload seguro de um arquivo do Streamlit para o Google Drive.
+
+    - Usa upload resumable (mais estável)
+    - Trata erros de rede/SSL
+    - NÃO propaga exceção para a UI
+    - Retorna None em caso de erro; a mensagem de erro é agendada
+      (mensagens_flash) e aparece depois do st.rerun() da página
+    """
+
+    try:
+        return enviar_arquivo_drive_direto(servico, id_pasta, arquivo)
+
+    except Exception as e:
+        registrar_falha("drive")
+        agendar_mensagem(
+            "Erro temporário ao enviar arquivo. Tente novamente mais tarde.",
+            icon=":material/error:",
+            tipo="error"
+        )
+
+        # Retorna None para a camada de UI decidir o que fazer
+        return None
 
-# Função para obter o ID da pasta 'Relatos_atividades' no Drive, para salvar os anexos das atividades.
-def obter_pasta_relatos_atividades(servico, pasta_projeto_id):
-    """
-    Retorna o ID da pasta 'Relatos_atividades' dentro da pasta do projeto.
 
-    - Cria a pasta se não existir
-    - Usa cache no session_state
-    """
 
-    if "pasta_relatos_atividades_id" in st.session_state:
-        return st.session_state["pasta_relatos_atividades_id"]
+# Envio de vários arquivos em paralelo.
+#
+# O cliente do googleapiclient (httplib2) não pode ser usado por duas threads
+# ao mesmo tempo, por isso cada thread do pool monta o próprio cliente, uma
+# vez, e o reaproveita. O pool é do processo e limita o total de envios
+# simultâneos ao Drive, somando todas as sessões.
 
-    pasta_id = obter_ou_criar_pasta(
-        servico,
-        "Relatos_atividades",
-        pasta_projeto_id
-    )
+MAX_ENVIOS_SIMULTANEOS_DRIVE = 4
 
-    st.session_state["pasta_relatos_atividades_id"] = pasta_id
-    return pasta_id
+_pool_envios_drive = ThreadPoolExecutor(
+    max_workers=MAX_ENVIOS_SIMULTANEOS_DRIVE,
+    thread_name_prefix="envio_drive"
+)
 
+_cliente_drive_da_thread = threading.local()
 
-def obter_pasta_relatos_financeiros(servico, pasta_projeto_id):
-    return obter_ou_criar_pasta(
-        servico,
-        "Relatos_financeiros",
-        pasta_projeto_id
-    )
 
-def obter_pasta_relatorios(servico, pasta_projeto_id):
+def _servico_drive_da_thread(info_credenciais: dict):
     """
-    Retorna o ID da subpasta 'Relatorios' dentro da pasta do projeto.
-    Cria se não existir.
+    Cliente do Drive exclusivo da thread atual do pool.
     """
 
-    chave = f"pasta_relatorios_{pasta_projeto_id}"
-
-    if chave in st.session_state:
-        return st.session_state[chave]
+    servico = getattr(_cliente_drive_da_thread, "servico", None)
 
-    pasta_id = obter_ou_criar_pasta(
-        servico,
-        "Relatorios",
-        pasta_projeto_id
-    )
+    if servico is None:
+        credenciais = Credentials.from_service_account_info(info_credenciais, scopes=ESCOPO_DRIVE)
+        servico = build("drive", "v3", credentials=credenciais, cache_discovery=False)
+        _cliente_drive_da_thread.servico = servico
 
-    st.session_state[chave] = pasta_id
-    return pasta_id
+    return servico
 
 
-def obter_pasta_recibos(servico, pasta_projeto_id):
+def _enviar_arquivo_no_pool(info_credenciais: dict, id_pasta, arquivo):
     """
-    Retorna o ID da subpasta 'Recibos' dentro da pasta do projeto.
-    Cria se não existir.
-
-    Usa cache no session_state para evitar múltiplas criações.
+    Executado nas threads do pool: não chama st.* e não propaga exceção.
     """
 
-    if "pasta_recibos_id" in st.session_state:
-        return st.session_state["pasta_recibos_id"]
+    try:
+        return enviar_arquivo_drive_direto(_servico_drive_da_thread(info_credenciais), id_pasta, arquivo)
+    except Exception:
+        registrar_falha("drive")
+        return None
 
-    pasta_id = obter_ou_criar_pasta(
-        servico,
-        "Recibos",
-        pasta_projeto_id
-    )
 
-    st.session_state["pasta_recibos_id"] = pasta_id
-    return pasta_id
+def enviar_arquivos_drive(envios, mostrar_progresso: bool = True) -> list:
+    """
+    Faz upload de vários arquivos ao mesmo tempo (até
+    MAX_ENVIOS_SIMULTANEOS_DRIVE por vez).
 
-# Função para obter o ID da pasta 'Planos_mitigacao' no Drive.
+    Parâmetros:
+        envios: lista de (id_pasta, arquivo).
+        mostrar_progresso: exibe uma barra com o total de arquivos enviados.
 
-def obter_pasta_planos_mitigacao(servico, pasta_projeto_id):
+    Retorna:
+        Lista com o ID de cada arquivo no Drive, na mesma ordem de envios
+        (None para os que falharam). Como em enviar_arquivo_drive, as falhas
+        não são propagadas: a mensagem de erro é agendada (aparece depois do
+        st.rerun() da página) e a página decide o que fazer com os itens None.
     """
-    Retorna o ID da subpasta 'Planos_mitigacao' dentro da pasta do projeto.
 
-    Também utiliza cache no session_state para evitar múltiplas buscas/criações.
-    """
+    envios = list(envios)
 
-    if "pasta_planos_mitigacao_id" in st.session_state:
-        return st.session_state["pasta_planos_mitigacao_id"]
+    if not envios:
+        return []
 
-    pasta_id = obter_ou_criar_pasta(
-        servico,
-        "Planos_mitigacao",
-        pasta_projeto_id
-    )
+    # st.secrets é lido aqui, na thread da página
+    info_credenciais = dict(st.secrets["gcp_service_account"])
 
-    st.session_state["pasta_planos_mitigacao_id"] = pasta_id
+    futuros = {
+        _pool_envios_drive.submit(_enviar_arquivo_no_pool, info_credenciais, id_pasta, arquivo): indice
+        for indice, (id_pasta, arquivo) in enumerate(envios)
+    }
 
-    return pasta_id
+    total = len(envios)
+    resultados = [None] * total
 
+    barra = st.progress(0.0, text=f"Enviando arquivos: 0 de {total}") if mostrar_progresso else None
 
+    for concluidos, futuro in enumerate(as_completed(futuros), start=1):
 
-###########################################################################################################
-# UPLOAD E LINK DE ARQUIVOS
-###########################################################################################################
+        resultados[futuros[futuro]] = futuro.result()
 
-def enviar_arquivo_drive(servico, id_pasta, arquivo):
-    """
-    Faz upload seguro de um arquivo do Streamlit para o Google Drive.
+        if barra is not None:
+            barra.progress(concluidos / total, text=f"Enviando arquivos: {concluidos} de {total}")
 
-    - Usa upload resumable (mais estável)
-    - Trata erros de rede/SSL
-    - NÃO propaga exceção para a UI
-    - Retorna None em caso de erro
-    """
+    if barra is not None:
+        barra.empty()
 
-    try:
-        # Garante que o ponteiro do arquivo está no início
-        arquivo.seek(0)
+    falhas = sum(1 for resultado in resultados if resultado is None)
 
-        media = MediaIoBaseUpload(
-            arquivo,
-            mimetype=arquivo.type,
-            resumable=True
+    if falhas:
+        agendar_mensagem(
+            f"Erro temporário ao enviar {falhas} de {total} arquivo(s). Tente novamente mais tarde.",
+            icon=":material/error:",
+            tipo="error"
         )
 
-        arq = servico.files().create(
-            body={
-                "name": arquivo.name,
-                "parents": [id_pasta]
-            },
-            media_body=media,
-            fields="id",
-            supportsAllDrives=True
-        ).execute()
-
-        return arq["id"]
-
-    except Exception as e:
-        st.error("Erro temporário ao enviar arquivo. Tente novamente mais tarde.")
-
-        # Retorna None para a camada de UI decidir o que fazer
-        return None
+    return resultados
 
 
 
@@ -1423,16 +1178,229 @@ def gerar_cronograma_financeiro(parcelas: list, relatorios: list) -> pd.DataFram
 
 
 
+# Resultado da última criação de índices feita em conectar_mongo_cepf_gestao
+RESULTADO_CRIACAO_INDICES = []
+
+
 @st.cache_resource
 def conectar_mongo_cepf_gestao():
     # CONEXÃO LOCAL
-    cliente = MongoClient(st.secrets["senhas"]["senha_mongo_cepf_gestao"])
+    # O monitor conta comandos, bytes e tempo de cada execução de página (monitor_mongo.py)
+    cliente = MongoClient(
+        st.secrets["senhas"]["senha_mongo_cepf_gestao"],
+        event_listeners=[MONITOR_COMANDOS]
+    )
     db_cepf_gestao = cliente["cepf_gestao"] 
+
+    # Cria os índices uma vez por processo (a função é cacheada).
+    # O resultado fica disponível para a página de armazenamento.
+    try:
+        resultado_indices = garantir_indices(db_cepf_gestao)
+    except Exception as e:
+        resultado_indices = [{"colecao": "-", "nome": "-", "ok": False, "erro": str(e)}]
+
+    RESULTADO_CRIACAO_INDICES[:] = resultado_indices
+
     return db_cepf_gestao
 
 
 
 
+###########################################################################################################
+# CACHE DE DADOS DE REFERÊNCIA
+###########################################################################################################
+
+# Coleções auxiliares que mudam pouco e são lidas por quase todas as páginas.
+# As páginas que as alteram (cadastros_auxiliares.py, ciclos_gerenciar.py, organizações...)
+# invalidam o cache logo após cada escrita. Escritas feitas fora do app (agendador.py,
+# trabalhadores, scripts) não alcançam o cache deste processo: para elas vale o prazo
+# TTL_CACHE_REFERENCIA_SEGUNDOS.
+COLECOES_REFERENCIA = (
+    "publicos",
+    "beneficios",
+    "categorias_despesa",
+    "corredores",
+    "kbas",
+    "editais",
+    "ciclos_investimento",
+    "investidores",
+    "doadores",
+    "organizacoes",
+    "ufs_municipios",
+)
+
+# Validade de cada entrada do cache, para escritas feitas por outros processos
+TTL_CACHE_REFERENCIA_SEGUNDOS = 300
+
+
+@st.cache_resource
+def _obter_cache_referencias():
+    """
+    Retorna o armazenamento do cache de referências, compartilhado
+    por todas as sessões do processo.
+
+    entradas: chave da consulta -> (documentos, momento da leitura).
+    geracoes: coleção -> contador incrementado a cada invalidação; uma
+    leitura iniciada antes de uma invalidação não é guardada.
+    """
+    return {
+        "lock": threading.Lock(),
+        "entradas": {},
+        "geracoes": {}
+    }
+
+
+def carregar_colecao_referencia(
+    db,
+    nome_colecao: str,
+    filtro: dict | None = None,
+    projecao: dict | None = None,
+    ordenacao: list | None = None
+) -> list[dict]:
+    """
+    Retorna os documentos de uma coleção de referência usando o cache do processo.
+
+    A consulta só vai ao MongoDB na primeira leitura, depois de uma
+    invalidação da coleção (invalidar_cache_referencia) ou quando a entrada
+    passa de TTL_CACHE_REFERENCIA_SEGUNDOS. Cada chamada
+    recebe uma cópia dos documentos, então a página pode alterá-los
+    livremente.
+
+    Parâmetros:
+        nome_colecao (str): Uma das COLECOES_REFERENCIA.
+        filtro (dict): Filtro da consulta (padrão: todos os documentos).
+        projecao (dict): Projeção da consulta.
+        ordenacao (list): Lista de (campo, direção), como no sort do pymongo.
+    """
+
+    if nome_colecao not in COLECOES_REFERENCIA:
+        raise ValueError(f"Coleção '{nome_colecao}' não é uma coleção de referência.")
+
+    cache = _obter_cache_referencias()
+
+    chave = (
+        nome_colecao,
+        repr(filtro or {}),
+        repr(projecao),
+        repr(ordenacao)
+    )
+
+    with cache["lock"]:
+        entrada = cache["entradas"].get(chave)
+        geracao = cache["geracoes"].get(nome_colecao, 0)
+
+    if entrada is not None and time.monotonic() - entrada[1] < TTL_CACHE_REFERENCIA_SEGUNDOS:
+        return copy.deepcopy(entrada[0])
+
+    lido_em = time.monotonic()
+
+    cursor = db[nome_colecao].find(filtro or {}, projecao)
+
+    if ordenacao:
+        cursor = cursor.sort(ordenacao)
+
+    documentos = list(cursor)
+
+    with cache["lock"]:
+        # Se houve invalidação durante a consulta, o resultado pode ser
+        # anterior à escrita: é usado nesta chamada, mas não guardado
+        if cache["geracoes"].get(nome_colecao, 0) == geracao:
+            cache["entradas"][chave] = (documentos, lido_em)
+
+    return copy.deepcopy(documentos)
+
+
+def invalidar_cache_referencia(*nomes_colecoes: str):
+    """
+    Descarta as entradas em cache das coleções informadas.
+    Sem argumentos, limpa o cache inteiro.
+
+    Deve ser chamada logo após qualquer escrita nas COLECOES_REFERENCIA.
+    """
+
+    cache = _obter_cache_referencias()
+
+    with cache["lock"]:
+
+        if not nomes_colecoes:
+            nomes_colecoes = COLECOES_REFERENCIA
+
+        for nome_colecao in nomes_colecoes:
+            cache["geracoes"][nome_colecao] = cache["geracoes"].get(nome_colecao, 0) + 1
+
+        for chave in list(cache["entradas"]):
+            if chave[0] in nomes_colecoes:
+                del cache["entradas"][chave]
+
+
+
+
+###########################################################################################################
+# PROJEÇÕES DAS PÁGINAS DE PORTFÓLIO
+###########################################################################################################
+
+# Campos do projeto lidos por calcular_status_projetos
+CAMPOS_STATUS_PROJETO = {
+    "status": 1,
+    "financeiro.parcelas.numero": 1,
+    "financeiro.parcelas.data_prevista": 1,
+    "financeiro.parcelas.data_realizada": 1,
+    "relatorios.numero": 1,
+    "relatorios.data_prevista": 1,
+    "relatorios.data_envio": 1,
+}
+
+# Catálogo de projeções: cada página de portfólio declara aqui apenas os campos
+# de projetos que renderiza. Subárvores grandes (plano_trabalho, lançamentos,
+# relatos, salvaguardas) só são lidas pelas páginas do projeto.
+PROJECOES_PORTFOLIO = {
+
+    "organizacao_nova": {
+        "codigo": 1,
+    },
+
+    "pessoas_cadastrar": {
+        "codigo": 1,
+        "sigla": 1,
+    },
+
+    "pessoas_convites": {
+        "codigo": 1,
+    },
+}
+
+
+def carregar_projetos_portfolio(
+    db,
+    pagina: str,
+    filtro: dict | None = None
+) -> pd.DataFrame:
+    """
+    Carrega os projetos de uma página de portfólio usando a projeção
+    declarada para ela em PROJECOES_PORTFOLIO.
+
+    Parâmetros:
+        pagina (str): Chave da página no catálogo (nome do arquivo sem .py).
+        filtro (dict): Filtro opcional da consulta.
+
+    Retorna:
+        DataFrame com um projeto por linha e apenas os campos projetados.
+    """
+
+    if pagina not in PROJECOES_PORTFOLIO:
+        raise KeyError(f"Página '{pagina}' não possui projeção cadastrada.")
+
+    return pd.DataFrame(
+        list(
+            db["projetos"].find(
+                filtro or {},
+                PROJECOES_PORTFOLIO[pagina]
+            )
+        )
+    )
+
+
+
 def ajustar_altura_dataframe(
     df_nao_atualizado,
     linhas_adicionais=0,
@@ -1515,7 +1483,10 @@ def ajustar_altura_data_editor(df, linhas_adicionais=1):
 
 
 
-def calcular_status_projetos(df_projetos: pd.DataFrame) -> pd.DataFrame:
+def calcular_status_projetos(
+    df_projetos: pd.DataFrame,
+    hoje: datetime.date | None = None
+) -> pd.DataFrame:
     """
     Calcula o status dos projetos com base em parcelas e relatórios.
 
@@ -1524,152 +1495,160 @@ def calcular_status_projetos(df_projetos: pd.DataFrame) -> pd.DataFrame:
     - Se NÃO houver parcelas OU relatórios → "Sem cronograma".
     - Se houver ambos, calcula normalmente.
     - Totalmente seguro contra campos ausentes, None ou NaN.
+
+    O cálculo é colunar: parcelas e relatórios de todos os projetos são
+    explodidos em uma única tabela de eventos, as datas são convertidas de
+    uma só vez e o próximo evento de cada projeto sai de uma ordenação
+    seguida de agrupamento. Não há iterrows nem escrita célula a célula.
+
+    Parâmetros:
+        df_projetos: Projetos (precisa de status, financeiro.parcelas e relatorios).
+        hoje: Data de referência. Padrão: data atual.
     """
 
     if df_projetos.empty:
         return df_projetos
 
-    # Garante colunas necessárias
-    for col in [
-        "status",
-        "dias_atraso",
-        "proximo_evento",
-        "data_proximo_evento",
-        "notificacao"
-    ]:
-        if col not in df_projetos.columns:
-            df_projetos[col] = None
+    if hoje is None:
+        # hoje = datetime.date(2026, 4, 30)
+        hoje = datetime.date.today()
+
+    total = len(df_projetos)
 
     ###################################################################################################
-    # FUNÇÃO AUXILIAR PARA CONVERSÃO DE DATAS (PADRÃO BR)
+    # COLETA SEGURA DOS DADOS
     ###################################################################################################
-    def parse_data_br(valor):
-        """
-        Converte string no formato dd/mm/yyyy para datetime.
-        Retorna NaT em caso de erro ou valor inválido.
-        """
-        return pd.to_datetime(
-            valor,
-            format="%d/%m/%Y",
-            errors="coerce"
-        )
 
-    # hoje = datetime.date(2026, 4, 30)
-    hoje = datetime.date.today()
-
-    for idx, projeto in df_projetos.iterrows():
-
-        codigo = projeto.get("codigo")
-        sigla = projeto.get("sigla")
-
-        # Limpa a notificação do projeto antes do processamento
-        df_projetos.at[idx, "notificacao"] = None
-
-        # ----------------------------------------------------------
-        # MANTÉM STATUS CANCELADO
-        # ----------------------------------------------------------
-        if projeto.get("status") == "Cancelado":
-            df_projetos.at[idx, "status"] = "Cancelado"
-            df_projetos.at[idx, "dias_atraso"] = None
-            df_projetos.at[idx, "proximo_evento"] = None
-            df_projetos.at[idx, "data_proximo_evento"] = None
-            continueverificar_envio_lembrete_eventos
-
-        # ----------------------------------------------------------
-        # COLETA SEGURA DOS DADOS
-        # ----------------------------------------------------------
-        financeiro = projeto.get("financeiro")
-        if not isinstance(financeiro, dict):
-            financeiro = {}
-
-        parcelas = financeiro.get("parcelas")
-        if not isinstance(parcelas, list):
-            parcelas = []
-
-        relatorios = projeto.get("relatorios")
-        if not isinstance(relatorios, list):
-            relatorios = []
-
-        # ----------------------------------------------------------
-        # REGRA: precisa ter parcelas E relatórios
-        # ----------------------------------------------------------
-        if not parcelas or not relatorios:
-
-            df_projetos.at[idx, "notificacao"] = (
-                "O projeto não possui parcelas e/ou relatórios cadastrados. "
-                # "Não é possível determinar o status."
-            )
+    def coluna(nome):
+        if nome in df_projetos.columns:
+            return df_projetos[nome].to_numpy(dtype=object)
+        return np.full(total, None, dtype=object)
 
+    status_atual = coluna("status")
 
-            df_projetos.at[idx, "status"] = "Sem cronograma"
-            df_projetos.at[idx, "dias_atraso"] = None
-            df_projetos.at[idx, "proximo_evento"] = None
-            df_projetos.at[idx, "data_proximo_evento"] = None
-            continue
-
-        # ----------------------------------------------------------
-        # MONTA EVENTOS
-        # ----------------------------------------------------------
-        eventos = []
-
-        for p in parcelas:
-            if isinstance(p, dict):
-                eventos.append({
-                    "tipo": "Parcela",
-                    "numero": p.get("numero"),
-                    "data_prevista": parse_data_br(p.get("data_prevista")),
-                    "realizado": p.get("data_realizada") is not None
-                })
-
-        for r in relatorios:
-            if isinstance(r, dict):
-                eventos.append({
-                    "tipo": "Relatório",
-                    "numero": r.get("numero"),
-                    "data_prevista": parse_data_br(r.get("data_prevista")),
-                    "realizado": r.get("data_envio") is not None
-                })
-
-        # Remove eventos inválidos
-        eventos = [e for e in eventos if pd.notna(e["data_prevista"])]
-
-        if not eventos:
-            df_projetos.at[idx, "notificacao"] = (
-                "O projeto não possui eventos com data válida."
-            )
+    parcelas_por_projeto = [
+        f.get("parcelas") if isinstance(f, dict) else None
+        for f in coluna("financeiro")
+    ]
+    parcelas_por_projeto = [p if isinstance(p, list) else [] for p in parcelas_por_projeto]
+
+    relatorios_por_projeto = [r if isinstance(r, list) else [] for r in coluna("relatorios")]
+
+    cancelado = np.array([s == "Cancelado" for s in status_atual], dtype=bool)
+
+    # REGRA: precisa ter parcelas E relatórios
+    tem_cronograma = np.array(
+        [bool(p) and bool(r) for p, r in zip(parcelas_por_projeto, relatorios_por_projeto)],
+        dtype=bool
+    )
+
+    calcular = ~cancelado & tem_cronograma
+
+    ###################################################################################################
+    # MONTA A TABELA DE EVENTOS (UMA LINHA POR PARCELA OU RELATÓRIO)
+    ###################################################################################################
+
+    def explodir_eventos(listas, tipo, ordem_tipo, campo_realizado):
+
+        serie = pd.Series(listas, dtype=object)[calcular].explode()
+        serie = serie[serie.map(lambda item: isinstance(item, dict)).astype(bool)]
+
+        itens = serie.to_list()
+
+        return pd.DataFrame({
+            "posicao": serie.index.to_numpy(),
+            "ordem_tipo": ordem_tipo,
+            "ordem_item": serie.groupby(level=0).cumcount().to_numpy(),
+            "tipo": tipo,
+            "numero": pd.Series([item.get("numero") for item in itens], dtype=object),
+            "data_bruta": pd.Series([item.get("data_prevista") for item in itens], dtype=object),
+            "realizado": np.array([item.get(campo_realizado) is not None for item in itens], dtype=bool),
+        })
+
+    eventos = pd.concat(
+        [
+            explodir_eventos(parcelas_por_projeto, "Parcela", 0, "data_realizada"),
+            explodir_eventos(relatorios_por_projeto, "Relatório", 1, "data_envio"),
+        ],
+        ignore_index=True
+    )
+
+    # Conversão das datas (padrão BR) de uma só vez
+    eventos["data_prevista"] = pd.to_datetime(
+        eventos["data_bruta"],
+        format="%d/%m/%Y",
+        errors="coerce"
+    )
+
+    # Remove eventos inválidos
+    eventos = eventos[eventos["data_prevista"].notna()]
+
+    # Ordena por data mantendo a ordem original (parcelas antes de relatórios) nos empates
+    eventos = eventos.sort_values(
+        ["posicao", "data_prevista", "ordem_tipo", "ordem_item"],
+        kind="stable"
+    )
+
+    tem_evento_valido = np.zeros(total, dtype=bool)
+    tem_evento_valido[eventos["posicao"].unique()] = True
+
+    # Próximo evento: primeiro evento não realizado de cada projeto
+    proximos = eventos[~eventos["realizado"]].drop_duplicates("posicao", keep="first")
+
+    tem_pendente = np.zeros(total, dtype=bool)
+    tem_pendente[proximos["posicao"].to_numpy()] = True
+
+    ###################################################################################################
+    # CALCULA STATUS
+    ###################################################################################################
+
+    novo_status = np.full(total, None, dtype=object)
+    dias_atraso = np.full(total, None, dtype=object)
+    proximo_evento = np.full(total, None, dtype=object)
+    data_proximo_evento = np.full(total, None, dtype=object)
+    notificacao = np.full(total, None, dtype=object)
+
+    novo_status[cancelado] = "Cancelado"
+
+    sem_parcelas_ou_relatorios = ~cancelado & ~tem_cronograma
+    novo_status[sem_parcelas_ou_relatorios] = "Sem cronograma"
+    notificacao[sem_parcelas_ou_relatorios] = (
+        "O projeto não possui parcelas e/ou relatórios cadastrados. "
+        # "Não é possível determinar o status."
+    )
 
-            df_projetos.at[idx, "status"] = "Sem cronograma"
-            df_projetos.at[idx, "dias_atraso"] = None
-            df_projetos.at[idx, "proximo_evento"] = None
-            df_projetos.at[idx, "data_proximo_evento"] = None
-            continue
+    sem_data_valida = calcular & ~tem_evento_valido
+    novo_status[sem_data_valida] = "Sem cronograma"
+    notificacao[sem_data_valida] = "O projeto não possui eventos com data válida."
 
-        # ----------------------------------------------------------
-        # ORDENA E DEFINE PRÓXIMO EVENTO
-        # ----------------------------------------------------------
-        eventos.sort(key=lambda x: x["data_prevista"])
+    concluido = calcular & tem_evento_valido & ~tem_pendente
+    novo_status[concluido] = "Concluído"
+    dias_atraso[concluido] = 0
 
-        proximo = next((e for e in eventos if not e["realizado"]), None)
+    if not proximos.empty:
 
-        if not proximo:
-            df_projetos.at[idx, "status"] = "Concluído"
-            df_projetos.at[idx, "dias_atraso"] = 0
-            df_projetos.at[idx, "proximo_evento"] = None
-            df_projetos.at[idx, "data_proximo_evento"] = None
-            continue
+        posicoes = proximos["posicao"].to_numpy()
 
-        # ----------------------------------------------------------
-        # CALCULA STATUS
-        # ----------------------------------------------------------
-        data_prevista = proximo["data_prevista"].date()
-        dias_atraso = (hoje - data_prevista).days
+        datas = proximos["data_prevista"].dt.normalize()
+        atraso = (pd.Timestamp(hoje) - datas).dt.days.to_numpy()
 
-        status = "Atrasado" if dias_atraso > 0 else "Em dia"
+        novo_status[posicoes] = np.where(atraso > 0, "Atrasado", "Em dia")
+        dias_atraso[posicoes] = atraso.astype(object)
+        proximo_evento[posicoes] = [
+            f"{tipo} {numero}"
+            for tipo, numero in zip(proximos["tipo"], proximos["numero"])
+        ]
+        data_proximo_evento[posicoes] = datas.dt.date.to_numpy(dtype=object)
+
+    ###################################################################################################
+    # ESCREVE AS COLUNAS DE RESULTADO
+    ###################################################################################################
 
-        df_projetos.at[idx, "status"] = status
-        df_projetos.at[idx, "dias_atraso"] = dias_atraso
-        df_projetos.at[idx, "proximo_evento"] = f"{proximo['tipo']} {proximo['numero']}"
-        df_projetos.at[idx, "data_proximo_evento"] = data_prevista
+    df_projetos["status"] = novo_status
+    df_projetos["dias_atraso"] = dias_atraso
+    df_projetos["proximo_evento"] = proximo_evento
+    df_projetos["data_proximo_evento"] = data_proximo_evento
+    df_projetos["notificacao"] = notificacao
 
     return df_projetos
 
@@ -1680,6 +1659,281 @@ def calcular_status_projetos(df_projetos: pd.DataFrame) -> pd.DataFrame:
 
 
 
+###########################################################################################################
+# STATUS DOS PROJETOS CALCULADO NO MONGODB
+###########################################################################################################
+
+def _eventos_do_cronograma(campo_lista, tipo, ordem_tipo, campo_realizado):
+    """
+    Expressão de agregação que transforma uma lista (parcelas ou relatórios)
+    em eventos {tipo, ordem_tipo, ordem_item, numero, data, realizado}.
+    Itens que não são documentos são descartados, como em calcular_status_projetos.
+    """
+
+    item = {"$arrayElemAt": [campo_lista, "$$i"]}
+
+    return {
+        "$filter": {
+            "input": {
+                "$map": {
+                    "input": {"$range": [0, {"$size": campo_lista}]},
+                    "as": "i",
+                    "in": {
+                        "$let": {
+                            "vars": {"item": item},
+                            "in": {
+                                "tipo": tipo,
+                                "ordem_tipo": ordem_tipo,
+                                "ordem_item": "$$i",
+                                "e_documento": {"$eq": [{"$type": "$$item"}, "object"]},
+                                "numero": "$$item.numero",
+                                "data": {
+                                    "$switch": {
+                                        "branches": [
+                                            {
+                                                "case": {"$eq": [{"$type": "$$item.data_prevista"}, "date"]},
+                                                "then": "$$item.data_prevista"
+                                            },
+                                            {
+                                                "case": {"$eq": [{"$type": "$$item.data_prevista"}, "string"]},
+                                                "then": {
+                                                    "$dateFromString": {
+                                                        "dateString": "$$item.data_prevista",
+                                                        "format": "%d/%m/%Y",
+                                                        "onError": None,
+                                                        "onNull": None
+                                                    }
+                                                }
+                                            }
+                                        ],
+                                        "default": None
+                                    }
+                                },
+                                "realizado": {
+                                    "$not": [{"$in": [{"$type": f"$$item.{campo_realizado}"}, ["missing", "null"]]}]
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "as": "evento",
+            "cond": "$$evento.e_documento"
+        }
+    }
+
+
+def pipeline_status_projetos(
+    hoje: datetime.date,
+    filtro: dict | None = None,
+    status: list[str] | None = None,
+    campos: list[str] | None = None
+) -> list[dict]:
+    """
+    Monta o pipeline de agregação que calcula, no servidor, os mesmos campos de
+    calcular_status_projetos: status, dias_atraso, proximo_evento,
+    data_proximo_evento e notificacao.
+
+    Parâmetros:
+        hoje: Data de referência para o cálculo do atraso.
+        filtro: Filtro aplicado aos projetos antes do cálculo (ex.: {"edital": "X"}).
+        status: Quando informado, devolve apenas projetos com esses status.
+        campos: Campos extras do projeto a devolver (além de codigo, sigla e edital).
+    """
+
+    hoje_dt = datetime.datetime(hoje.year, hoje.month, hoje.day)
+
+    parcelas = {"$cond": [{"$isArray": "$financeiro.parcelas"}, "$financeiro.parcelas", []]}
+    relatorios = {"$cond": [{"$isArray": "$relatorios"}, "$relatorios", []]}
+
+    pipeline = []
+
+    if filtro:
+        pipeline.append({"$match": filtro})
+
+    pipeline += [
+
+        # Listas seguras de parcelas e relatórios
+        {"$set": {"_parcelas": parcelas, "_relatorios": relatorios}},
+
+        # Eventos com data válida, na ordem do cronograma
+        {"$set": {
+            "_eventos": {
+                "$filter": {
+                    "input": {
+                        "$concatArrays": [
+                            _eventos_do_cronograma("$_parcelas", "Parcela", 0, "data_realizada"),
+                            _eventos_do_cronograma("$_relatorios", "Relatório", 1, "data_envio")
+                        ]
+                    },
+                    "as": "evento",
+                    "cond": {"$ne": ["$$evento.data", None]}
+                }
+            }
+        }},
+
+        # Próximo evento: primeiro não realizado (empates mantêm parcelas antes de relatórios)
+        {"$set": {
+            "_proximo": {
+                "$first": {
+                    "$sortArray": {
+                        "input": {
+                            "$filter": {
+                                "input": "$_eventos",
+                                "as": "evento",
+                                "cond": {"$not": ["$$evento.realizado"]}
+                            }
+                        },
+                        "sortBy": {"data": 1, "ordem_tipo": 1, "ordem_item": 1}
+                    }
+                }
+            }
+        }},
+
+        {"$set": {
+            "_dias_atraso": {
+                "$cond": [
+                    {"$eq": [{"$type": "$_proximo"}, "object"]},
+                    {"$dateDiff": {"startDate": "$_proximo.data", "endDate": hoje_dt, "unit": "day"}},
+                    None
+                ]
+            },
+            "_situacao": {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$status", "Cancelado"]}, "then": "cancelado"},
+                        {"case": {"$or": [
+                            {"$eq": [{"$size": "$_parcelas"}, 0]},
+                            {"$eq": [{"$size": "$_relatorios"}, 0]}
+                        ]}, "then": "sem_parcelas_ou_relatorios"},
+                        {"case": {"$eq": [{"$size": "$_eventos"}, 0]}, "then": "sem_data_valida"},
+                        {"case": {"$ne": [{"$type": "$_proximo"}, "object"]}, "then": "concluido"},
+                    ],
+                    "default": "com_proximo_evento"
+                }
+            }
+        }},
+
+        {"$set": {
+            "status": {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$_situacao", "cancelado"]}, "then": "Cancelado"},
+                        {"case": {"$in": ["$_situacao", ["sem_parcelas_ou_relatorios", "sem_data_valida"]]}, "then": "Sem cronograma"},
+                        {"case": {"$eq": ["$_situacao", "concluido"]}, "then": "Concluído"},
+                        {"case": {"$gt": ["$_dias_atraso", 0]}, "then": "Atrasado"},
+                    ],
+                    "default": "Em dia"
+                }
+            },
+            "dias_atraso": {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$_situacao", "concluido"]}, "then": 0},
+                        {"case": {"$eq": ["$_situacao", "com_proximo_evento"]}, "then": "$_dias_atraso"},
+                    ],
+                    "default": None
+                }
+            },
+            "proximo_evento": {
+                "$cond": [
+                    {"$eq": ["$_situacao", "com_proximo_evento"]},
+                    {"$concat": [
+                        "$_proximo.tipo",
+                        " ",
+                        {"$ifNull": [{"$toString": "$_proximo.numero"}, "None"]}
+                    ]},
+                    None
+                ]
+            },
+            "data_proximo_evento": {
+                "$cond": [
+                    {"$eq": ["$_situacao", "com_proximo_evento"]},
+                    {"$dateTrunc": {"date": "$_proximo.data", "unit": "day"}},
+                    None
+                ]
+            },
+            "notificacao": {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$_situacao", "sem_parcelas_ou_relatorios"]},
+                         "then": "O projeto não possui parcelas e/ou relatórios cadastrados. "},
+                        {"case": {"$eq": ["$_situacao", "sem_data_valida"]},
+                         "then": "O projeto não possui eventos com data válida."},
+                    ],
+                    "default": None
+                }
+            }
+        }},
+    ]
+
+    if status:
+        pipeline.append({"$match": {"status": {"$in": status}}})
+
+    projecao = {
+        "codigo": 1,
+        "sigla": 1,
+        "edital": 1,
+        "status": 1,
+        "dias_atraso": 1,
+        "proximo_evento": 1,
+        "data_proximo_evento": 1,
+        "notificacao": 1,
+    }
+
+    for campo in campos or []:
+        projecao[campo] = 1
+
+    pipeline.append({"$project": projecao})
+
+    return pipeline
+
+
+def consultar_status_projetos(
+    db,
+    hoje: datetime.date | None = None,
+    filtro: dict | None = None,
+    status: list[str] | None = None,
+    campos: list[str] | None = None
+) -> list[dict]:
+    """
+    Executa pipeline_status_projetos e devolve os projetos com o status já
+    calculado pelo MongoDB. Apenas os campos pedidos trafegam pela rede.
+
+    data_proximo_evento é devolvida como datetime.date, igual a
+    calcular_status_projetos.
+
+    Exemplo: projetos atrasados do edital X
+
+        consultar_status_projetos(db, filtro={"edital": "X"}, status=["Atrasado"])
+    """
+
+    if hoje is None:
+        hoje = datetime.date.today()
+
+    projetos = list(
+        db["projetos"].aggregate(
+            pipeline_status_projetos(
+                hoje,
+                filtro=filtro,
+                status=status,
+                campos=campos
+            )
+        )
+    )
+
+    for projeto in projetos:
+        if isinstance(projeto.get("data_proximo_evento"), datetime.datetime):
+            projeto["data_proximo_evento"] = projeto["data_proximo_evento"].date()
+
+    return projetos
+
+
+
+
+
+
+
 # ###################################################################################################
 # SIDEBAR DA PÁGINA DO PROJETO
 # ###################################################################################################
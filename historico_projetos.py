@@ -0,0 +1,638 @@
+"""
+Histórico dos projetos em coleções próprias: relatos e lancamentos.
+
+Os relatos de atividades ficavam em
+plano_trabalho.componentes[].entregas[].atividades[].relatos[] e os
+lançamentos de despesas em financeiro.orcamento[].lancamentos[]. Agora cada
+relato é um documento da coleção relatos e cada lançamento um documento da
+coleção lancamentos, indexados por projeto, atividade/despesa e número do
+relatório. O documento do projeto deixa de crescer com o histórico.
+
+Leitura:
+- carregar_relatos / carregar_lancamentos: apenas o histórico que a tela exibe.
+- anexar_historico: devolve o projeto no formato antigo (relatos dentro das
+  atividades e lançamentos dentro das despesas), para as telas que percorrem
+  e alteram o plano de trabalho e o orçamento inteiros. Com relatorio_numero,
+  anexa apenas o histórico desse relatório (página de relatórios).
+
+Escrita:
+- separar_historico / gravar_historico: chamadas por
+  escrita_projetos.atualizar_projeto. Quando uma atualização grava
+  plano_trabalho.componentes ou financeiro.orcamento, os relatos e
+  lançamentos são retirados do valor gravado no projeto e, depois que a
+  escrita do projeto dá certo, sincronizados nas coleções. Atividades e despesas sem a chave "relatos" ou
+  "lancamentos" (projeto carregado sem anexar_historico) não têm o histórico
+  alterado. Atividades e despesas marcadas com CAMPO_RELATORIO_HISTORICO
+  (histórico de um só relatório) só têm regravados os itens desse relatório.
+- inserir_relato: grava um relato novo, sem regravar o plano de trabalho.
+- inserir_lancamento / atualizar_lancamento / excluir_lancamento: gravam um
+  único lançamento, sem regravar o orçamento do projeto.
+
+Os dados antigos são movidos com python migrar_historico.py.
+"""
+
+import copy
+
+from pymongo import ASCENDING, DeleteMany, InsertOne
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_RELATOS = "relatos"
+COLECAO_LANCAMENTOS = "lancamentos"
+
+
+# Campos de controle gravados junto com cada item e retirados na leitura.
+# Os lançamentos já trazem id_despesa, que é mantido.
+CAMPOS_CONTROLE_RELATOS = ("_id", "codigo", "id_atividade", "ordem")
+CAMPOS_CONTROLE_LANCAMENTOS = ("_id", "codigo", "ordem")
+
+
+# Marca, em cada atividade/despesa, o relatório cujo histórico foi anexado
+# (anexar_historico com relatorio_numero). Não é gravada no projeto.
+CAMPO_RELATORIO_HISTORICO = "relatorio_historico"
+
+
+# Caminhos de $set que carregam relatos ou lançamentos
+CAMINHOS_COM_HISTORICO = (
+    "plano_trabalho",
+    "plano_trabalho.componentes",
+    "financeiro",
+    "financeiro.orcamento",
+)
+
+
+
+
+###########################################################################################################
+# FUNÇÕES INTERNAS
+###########################################################################################################
+
+def _lista(valor):
+    return valor if isinstance(valor, list) else []
+
+
+def _chave_atividade(atividade: dict):
+    return atividade.get("id") or atividade.get("atividade")
+
+
+def _chave_despesa(despesa: dict):
+    return despesa.get("id_despesa") or despesa.get("nome_despesa")
+
+
+def _iterar_atividades(componentes):
+    for componente in _lista(componentes):
+        if not isinstance(componente, dict):
+            continue
+        for entrega in _lista(componente.get("entregas")):
+            if not isinstance(entrega, dict):
+                continue
+            for atividade in _lista(entrega.get("atividades")):
+                if isinstance(atividade, dict):
+                    yield atividade
+
+
+def _iterar_despesas(orcamento):
+    for despesa in _lista(orcamento):
+        if isinstance(despesa, dict):
+            yield despesa
+
+
+def _sem_campos(documento: dict, campos) -> dict:
+    return {k: v for k, v in documento.items() if k not in campos}
+
+
+
+
+###########################################################################################################
+# LEITURA
+###########################################################################################################
+
+def carregar_relatos(
+    db,
+    codigo: str,
+    relatorio_numero=None,
+    id_atividade=None,
+    filtro_extra: dict | None = None
+) -> list[dict]:
+    """
+    Relatos de um projeto, na ordem em que foram registrados em cada atividade.
+
+    Parâmetros:
+        relatorio_numero: Apenas relatos desse relatório.
+        id_atividade: Apenas relatos dessa atividade.
+        filtro_extra: Condições adicionais (ex.: {"fotos.0": {"$exists": True}}).
+
+    Retorna:
+        Lista de relatos, cada um com id_atividade.
+    """
+
+    filtro = {"codigo": codigo, **(filtro_extra or {})}
+
+    if relatorio_numero is not None:
+        filtro["relatorio_numero"] = relatorio_numero
+
+    if id_atividade is not None:
+        filtro["id_atividade"] = id_atividade
+
+    return list(
+        db[COLECAO_RELATOS]
+        .find(filtro, {"_id": 0, "codigo": 0, "ordem": 0})
+        .sort([("id_atividade", ASCENDING), ("ordem", ASCENDING)])
+    )
+
+
+def carregar_lancamentos(
+    db,
+    codigo: str,
+    relatorio_numero=None,
+    id_despesa=None
+) -> list[dict]:
+    """
+    Lançamentos de despesas de um projeto, na ordem de registro em cada despesa.
+    """
+
+    filtro = {"codigo": codigo}
+
+    if relatorio_numero is not None:
+        filtro["relatorio_numero"] = relatorio_numero
+
+    if id_despesa is not None:
+        filtro["id_despesa"] = id_despesa
+
+    return list(
+        db[COLECAO_LANCAMENTOS]
+        .find(filtro, {"_id": 0, "codigo": 0, "ordem": 0})
+        .sort([("id_despesa", ASCENDING), ("ordem", ASCENDING)])
+    )
+
+
+def somar_lancamentos_por_projeto(db, codigos: list[str]) -> dict:
+    """
+    Soma de valor_despesa dos lançamentos de cada projeto.
+
+    Retorna:
+        {codigo: soma}
+    """
+
+    resultado = db[COLECAO_LANCAMENTOS].aggregate([
+        {"$match": {"codigo": {"$in": list(codigos)}}},
+        {"$group": {"_id": "$codigo", "total": {"$sum": "$valor_despesa"}}},
+    ])
+
+    return {item["_id"]: item["total"] for item in resultado}
+
+
+def contar_fotos_por_projeto(db, codigos: list[str]) -> dict:
+    """
+    Quantidade de fotos dos relatos de cada projeto.
+
+    Retorna:
+        {codigo: quantidade}
+    """
+
+    resultado = db[COLECAO_RELATOS].aggregate([
+        {"$match": {"codigo": {"$in": list(codigos)}, "fotos.0": {"$exists": True}}},
+        {"$group": {
+            "_id": "$codigo",
+            "total": {"$sum": {"$cond": [{"$isArray": "$fotos"}, {"$size": "$fotos"}, 0]}}
+        }},
+    ])
+
+    return {item["_id"]: item["total"] for item in resultado}
+
+
+def anexar_historico(
+    db,
+    projeto: dict,
+    relatos: bool = True,
+    lancamentos: bool = True,
+    relatorio_numero=None
+) -> dict:
+    """
+    Coloca os relatos dentro das atividades e os lançamentos dentro das
+    despesas do projeto, no formato usado antes da separação do histórico.
+    Toda atividade/despesa recebe a lista (vazia se não houver histórico).
+
+    Com relatorio_numero, anexa apenas os relatos e lançamentos desse
+    relatório e marca as atividades/despesas (CAMPO_RELATORIO_HISTORICO):
+    ao gravar o projeto, os itens dos outros relatórios são preservados.
+
+    Altera e devolve o próprio dicionário do projeto.
+    """
+
+    codigo = projeto.get("codigo")
+
+    if relatos:
+
+        por_atividade = {}
+
+        if relatorio_numero is None:
+            documentos = db[COLECAO_RELATOS].find({"codigo": codigo}).sort("ordem", ASCENDING)
+        else:
+            documentos = carregar_relatos(db, codigo, relatorio_numero=relatorio_numero)
+
+        for relato in documentos:
+            por_atividade.setdefault(relato.get("id_atividade"), []).append(
+                _sem_campos(relato, CAMPOS_CONTROLE_RELATOS)
+            )
+
+        componentes = (projeto.get("plano_trabalho") or {}).get("componentes")
+
+        for atividade in _iterar_atividades(componentes):
+            atividade["relatos"] = (
+                _lista(atividade.get("relatos"))
+                + por_atividade.get(_chave_atividade(atividade), [])
+            )
+            if relatorio_numero is not None:
+                atividade[CAMPO_RELATORIO_HISTORICO] = relatorio_numero
+
+    if lancamentos:
+
+        por_despesa = {}
+
+        if relatorio_numero is None:
+            documentos = db[COLECAO_LANCAMENTOS].find({"codigo": codigo}).sort("ordem", ASCENDING)
+        else:
+            documentos = carregar_lancamentos(db, codigo, relatorio_numero=relatorio_numero)
+
+        for lancamento in documentos:
+            por_despesa.setdefault(lancamento.get("id_despesa"), []).append(
+                _sem_campos(lancamento, CAMPOS_CONTROLE_LANCAMENTOS)
+            )
+
+        orcamento = (projeto.get("financeiro") or {}).get("orcamento")
+
+        for despesa in _iterar_despesas(orcamento):
+            despesa["lancamentos"] = (
+                _lista(despesa.get("lancamentos"))
+                + por_despesa.get(_chave_despesa(despesa), [])
+            )
+            if relatorio_numero is not None:
+                despesa[CAMPO_RELATORIO_HISTORICO] = relatorio_numero
+
+    return projeto
+
+
+
+
+###########################################################################################################
+# ESCRITA
+###########################################################################################################
+
+def _arquivos_enviados(documentos) -> dict:
+    """
+    {id_envio: id_arquivo} dos arquivos (anexos, fotos...) dos itens gravados
+    que o trabalhador da fila de tarefas já enviou ao Drive.
+    """
+
+    enviados = {}
+
+    for documento in documentos:
+        for valor in documento.values():
+            for arquivo in _lista(valor):
+                if isinstance(arquivo, dict) and arquivo.get("id_envio") and arquivo.get("id_arquivo"):
+                    enviados[arquivo["id_envio"]] = arquivo["id_arquivo"]
+
+    return enviados
+
+
+def _preservar_envios(item: dict, enviados: dict):
+    """
+    O trabalhador grava o id_arquivo direto na coleção. Uma cópia do item
+    lida antes disso ainda tem o arquivo com envio_pendente: mantém o
+    id_arquivo gravado, em vez de desfazer o envio.
+    """
+
+    for valor in item.values():
+        for arquivo in _lista(valor):
+            if (
+                isinstance(arquivo, dict)
+                and not arquivo.get("id_arquivo")
+                and arquivo.get("id_envio") in enviados
+            ):
+                arquivo["id_arquivo"] = enviados[arquivo["id_envio"]]
+                arquivo.pop("envio_pendente", None)
+
+
+def _mesclar_relatorio(atuais: list, itens: list, relatorio_numero, campos_controle) -> list:
+    """
+    Lista completa de um grupo cujo histórico foi carregado para um só
+    relatório: os itens gravados dos outros relatórios ficam como estão e os
+    desse relatório são trocados por itens, na posição do primeiro deles
+    (ou no fim, se ainda não havia nenhum).
+    """
+
+    outros = []
+    posicao = None
+
+    for item in atuais:
+        if item.get("relatorio_numero") == relatorio_numero:
+            if posicao is None:
+                posicao = len(outros)
+        else:
+            outros.append(_sem_campos(item, campos_controle))
+
+    if posicao is None:
+        posicao = len(outros)
+
+    return outros[:posicao] + list(itens) + outros[posicao:]
+
+
+def _sincronizar(colecao, codigo, campo_chave, itens_por_chave, chaves_existentes, campos_controle, relatorios=None):
+    """
+    Regrava, por atividade (ou despesa), apenas os grupos que mudaram.
+
+    itens_por_chave: {chave: [itens]} das atividades/despesas que trouxeram a lista.
+    chaves_existentes: todas as chaves presentes no valor gravado; grupos de
+    chaves que deixaram de existir são removidos.
+    relatorios: {chave: relatorio_numero} dos grupos carregados para um só
+    relatório; os itens dos demais relatórios desses grupos são mantidos.
+
+    Arquivos que o trabalhador da fila de tarefas já enviou ao Drive mantêm
+    o id_arquivo gravado, mesmo que o valor recebido seja anterior ao envio.
+
+    Retorna True se algo foi gravado.
+    """
+
+    relatorios = relatorios or {}
+
+    atuais = {}
+
+    for documento in colecao.find({"codigo": codigo}).sort("ordem", ASCENDING):
+        atuais.setdefault(documento.get(campo_chave), []).append(
+            _sem_campos(documento, ("_id",))
+        )
+
+    enviados = _arquivos_enviados(item for itens in atuais.values() for item in itens)
+
+    operacoes = []
+
+    removidas = [chave for chave in atuais if chave not in chaves_existentes]
+
+    if removidas:
+        operacoes.append(DeleteMany({"codigo": codigo, campo_chave: {"$in": removidas}}))
+
+    for chave, itens in itens_por_chave.items():
+
+        if chave in relatorios:
+            itens = _mesclar_relatorio(atuais.get(chave, []), itens, relatorios[chave], campos_controle)
+
+        for item in itens:
+            if isinstance(item, dict):
+                _preservar_envios(item, enviados)
+
+        novos = [
+            {**_sem_campos(item, campos_controle), "codigo": codigo, campo_chave: chave, "ordem": ordem}
+            for ordem, item in enumerate(itens)
+            if isinstance(item, dict)
+        ]
+
+        if novos == atuais.get(chave, []):
+            continue
+
+        operacoes.append(DeleteMany({"codigo": codigo, campo_chave: chave}))
+        operacoes.extend(InsertOne(item) for item in novos)
+
+    if operacoes:
+        colecao.bulk_write(operacoes, ordered=True)
+
+    return bool(operacoes)
+
+
+def _separar_relatos(componentes) -> tuple[list, dict]:
+
+    componentes = copy.deepcopy(componentes)
+
+    relatos_por_atividade = {}
+    relatorios = {}
+    chaves = set()
+
+    for atividade in _iterar_atividades(componentes):
+
+        chave = _chave_atividade(atividade)
+        chaves.add(chave)
+
+        if CAMPO_RELATORIO_HISTORICO in atividade:
+            relatorios[chave] = atividade.pop(CAMPO_RELATORIO_HISTORICO)
+
+        if "relatos" in atividade:
+            relatos_por_atividade.setdefault(chave, []).extend(_lista(atividade.pop("relatos")))
+
+    return componentes, {
+        "colecao": COLECAO_RELATOS,
+        "campo_chave": "id_atividade",
+        "itens_por_chave": relatos_por_atividade,
+        "chaves_existentes": chaves,
+        "campos_controle": CAMPOS_CONTROLE_RELATOS,
+        "relatorios": relatorios,
+    }
+
+
+def _separar_lancamentos(orcamento) -> tuple[list, dict]:
+
+    orcamento = copy.deepcopy(orcamento)
+
+    lancamentos_por_despesa = {}
+    relatorios = {}
+    chaves = set()
+
+    for despesa in _iterar_despesas(orcamento):
+
+        chave = _chave_despesa(despesa)
+        chaves.add(chave)
+
+        if CAMPO_RELATORIO_HISTORICO in despesa:
+            relatorios[chave] = despesa.pop(CAMPO_RELATORIO_HISTORICO)
+
+        if "lancamentos" in despesa:
+            lancamentos_por_despesa.setdefault(chave, []).extend(_lista(despesa.pop("lancamentos")))
+
+    return orcamento, {
+        "colecao": COLECAO_LANCAMENTOS,
+        "campo_chave": "id_despesa",
+        "itens_por_chave": lancamentos_por_despesa,
+        "chaves_existentes": chaves,
+        "campos_controle": CAMPOS_CONTROLE_LANCAMENTOS,
+        "relatorios": relatorios,
+    }
+
+
+def separar_historico(atualizacao) -> tuple[dict, list[dict]]:
+    """
+    Retira relatos e lançamentos de um $set de plano_trabalho(.componentes)
+    ou financeiro(.orcamento) e devolve a atualização que deve ir para o
+    documento do projeto, junto com o histórico a gravar por gravar_historico
+    depois que a escrita do projeto der certo.
+
+    O valor recebido não é alterado (as telas continuam usando o projeto
+    com o histórico anexado).
+
+    Retorna:
+        (atualização sem histórico, histórico separado)
+    """
+
+    if not isinstance(atualizacao, dict) or not isinstance(atualizacao.get("$set"), dict):
+        return atualizacao, []
+
+    campos = dict(atualizacao["$set"])
+    historico = []
+
+    for caminho, valor in atualizacao["$set"].items():
+
+        if caminho == "plano_trabalho.componentes" and isinstance(valor, list):
+            campos[caminho], relatos = _separar_relatos(valor)
+            historico.append(relatos)
+
+        elif caminho == "plano_trabalho" and isinstance(valor, dict) and isinstance(valor.get("componentes"), list):
+            componentes, relatos = _separar_relatos(valor["componentes"])
+            campos[caminho] = {**valor, "componentes": componentes}
+            historico.append(relatos)
+
+        elif caminho == "financeiro.orcamento" and isinstance(valor, list):
+            campos[caminho], lancamentos = _separar_lancamentos(valor)
+            historico.append(lancamentos)
+
+        elif caminho == "financeiro" and isinstance(valor, dict) and isinstance(valor.get("orcamento"), list):
+            orcamento, lancamentos = _separar_lancamentos(valor["orcamento"])
+            campos[caminho] = {**valor, "orcamento": orcamento}
+            historico.append(lancamentos)
+
+    if not historico:
+        return atualizacao, []
+
+    return {**atualizacao, "$set": campos}, historico
+
+
+def gravar_historico(db, codigo: str, historico: list[dict]) -> bool:
+    """
+    Sincroniza nas coleções próprias o histórico devolvido por separar_historico.
+
+    Retorna:
+        True se relatos/lançamentos mudaram.
+    """
+
+    if not codigo:
+        return False
+
+    alterou = False
+
+    for grupo in historico:
+
+        alterou = _sincronizar(
+            db[grupo["colecao"]],
+            codigo,
+            grupo["campo_chave"],
+            grupo["itens_por_chave"],
+            grupo["chaves_existentes"],
+            grupo["campos_controle"],
+            grupo.get("relatorios"),
+        ) or alterou
+
+    return alterou
+
+
+def excluir_relatos_atividade(db, codigo: str, id_atividade):
+    """
+    Remove os relatos de uma atividade excluída do plano de trabalho.
+    """
+
+    db[COLECAO_RELATOS].delete_many({"codigo": codigo, "id_atividade": id_atividade})
+
+
+def inserir_relato(db, codigo: str, id_atividade, relato: dict):
+    """
+    Registra um relato no fim da lista da sua atividade, sem regravar o
+    plano de trabalho do projeto.
+    """
+
+    ultimo = db[COLECAO_RELATOS].find_one(
+        {"codigo": codigo, "id_atividade": id_atividade},
+        {"ordem": 1},
+        sort=[("ordem", -1)]
+    )
+
+    documento = _sem_campos(relato, CAMPOS_CONTROLE_RELATOS)
+
+    documento["codigo"] = codigo
+    documento["id_atividade"] = id_atividade
+    documento["ordem"] = ultimo["ordem"] + 1 if ultimo else 0
+
+    return db[COLECAO_RELATOS].insert_one(documento)
+
+
+
+
+###########################################################################################################
+# ESCRITA DE UM LANÇAMENTO
+###########################################################################################################
+
+def _proxima_ordem_lancamento(db, codigo: str, id_despesa) -> int:
+
+    ultimo = db[COLECAO_LANCAMENTOS].find_one(
+        {"codigo": codigo, "id_despesa": id_despesa},
+        {"ordem": 1},
+        sort=[("ordem", -1)]
+    )
+
+    return ultimo["ordem"] + 1 if ultimo else 0
+
+
+def inserir_lancamento(db, codigo: str, lancamento: dict):
+    """
+    Registra um lançamento no fim da lista da sua despesa (lancamento["id_despesa"]),
+    sem regravar o orçamento do projeto.
+    """
+
+    documento = _sem_campos(lancamento, CAMPOS_CONTROLE_LANCAMENTOS)
+
+    documento["codigo"] = codigo
+    documento["ordem"] = _proxima_ordem_lancamento(db, codigo, lancamento["id_despesa"])
+
+    return db[COLECAO_LANCAMENTOS].insert_one(documento)
+
+
+def atualizar_lancamento(db, codigo: str, id_lanc_despesa: str, definir: dict | None = None, remover=()):
+    """
+    Altera campos de um lançamento pelo id_lanc_despesa.
+
+    Quando id_despesa muda (lançamento movido para outra despesa), o
+    lançamento vai para o fim da lista da nova despesa.
+    """
+
+    definir = _sem_campos(definir or {}, CAMPOS_CONTROLE_LANCAMENTOS)
+
+    col_lancamentos = db[COLECAO_LANCAMENTOS]
+    filtro = {"codigo": codigo, "id_lanc_despesa": id_lanc_despesa}
+
+    if "id_despesa" in definir:
+
+        atual = col_lancamentos.find_one(filtro, {"id_despesa": 1})
+
+        if atual and atual.get("id_despesa") != definir["id_despesa"]:
+            definir["ordem"] = _proxima_ordem_lancamento(db, codigo, definir["id_despesa"])
+
+    atualizacao = {}
+
+    if definir:
+        atualizacao["$set"] = definir
+
+    if remover:
+        atualizacao["$unset"] = {campo: "" for campo in remover}
+
+    if not atualizacao:
+        return None
+
+    return col_lancamentos.update_one(filtro, atualizacao)
+
+
+def excluir_lancamento(db, codigo: str, id_lanc_despesa: str):
+    """
+    Remove um lançamento pelo id_lanc_despesa.
+    """
+
+    return db[COLECAO_LANCAMENTOS].delete_one({"codigo": codigo, "id_lanc_despesa": id_lanc_despesa})
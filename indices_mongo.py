@@ -0,0 +1,329 @@
+"""
+Gerenciamento dos índices do banco cepf_gestao.
+
+- garantir_indices(db): cria (de forma idempotente) os índices usados pelos filtros
+  mais frequentes da aplicação. É chamada uma vez por processo a partir de
+  funcoes_auxiliares.conectar_mongo_cepf_gestao.
+- relatorio_indices(db): lista índices faltantes, índices sem uso e o plano de
+  execução das consultas mais frequentes.
+
+Também pode ser executado diretamente para imprimir o relatório:
+
+    python indices_mongo.py
+"""
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+
+
+###########################################################################################################
+# DEFINIÇÃO DOS ÍNDICES
+###########################################################################################################
+
+# Índices únicos só valem para documentos que têm o campo preenchido como texto,
+# para não conflitar com registros antigos sem CNPJ, sigla ou e-mail.
+def _somente_texto(campo):
+    return {campo: {"$type": "string"}}
+
+
+# Cada entrada: (coleção, nome do índice, chaves, opções)
+INDICES = [
+
+    # Projetos
+    ("projetos", "codigo_unico", [("codigo", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("codigo")}),
+    ("projetos", "sigla_unica", [("sigla", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("sigla")}),
+    ("projetos", "edital", [("edital", ASCENDING)], {}),
+    ("projetos", "id_organizacao", [("id_organizacao", ASCENDING)], {}),
+
+    # Resumo dos projetos (resumo_projetos.py)
+    ("projetos_resumo", "codigo_unico", [("codigo", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("codigo")}),
+    ("projetos_resumo", "edital", [("edital", ASCENDING)], {}),
+    ("projetos_resumo", "id_organizacao", [("id_organizacao", ASCENDING)], {}),
+    ("projetos_resumo", "padrinhos", [("padrinhos", ASCENDING)], {}),
+
+    # Pendências de monitoramento (pendencias.py)
+    ("pendencias", "codigo", [("codigo", ASCENDING)], {}),
+    ("pendencias", "padrinho_ordem", [("padrinho", ASCENDING), ("ordem_tipo", ASCENDING), ("codigo", ASCENDING), ("numero", ASCENDING)], {}),
+    ("pendencias", "edital_padrinho_ordem", [("edital", ASCENDING), ("padrinho", ASCENDING), ("ordem_tipo", ASCENDING), ("codigo", ASCENDING), ("numero", ASCENDING)], {}),
+    ("pendencias", "padrinhos_edital", [("padrinhos", ASCENDING), ("edital", ASCENDING), ("padrinho", ASCENDING), ("ordem_tipo", ASCENDING)], {}),
+
+    # Relatos e lançamentos (historico_projetos.py)
+    ("relatos", "codigo_atividade_ordem", [("codigo", ASCENDING), ("id_atividade", ASCENDING), ("ordem", ASCENDING)], {}),
+    ("relatos", "codigo_relatorio", [("codigo", ASCENDING), ("relatorio_numero", ASCENDING)], {}),
+    ("lancamentos", "codigo_despesa_ordem", [("codigo", ASCENDING), ("id_despesa", ASCENDING), ("ordem", ASCENDING)], {}),
+    ("lancamentos", "codigo_relatorio", [("codigo", ASCENDING), ("relatorio_numero", ASCENDING)], {}),
+    ("lancamentos", "codigo_lancamento", [("codigo", ASCENDING), ("id_lanc_despesa", ASCENDING)], {}),
+
+    # Acessos por dia (estatistica_acessos.py)
+    ("acessos_diarios", "data_unica", [("data", ASCENDING)], {"unique": True}),
+
+    # Consultas por execução de página (monitor_mongo.py)
+    ("metricas_paginas", "data_pagina_unica", [("data", ASCENDING), ("pagina", ASCENDING)], {"unique": True}),
+
+    # Tamanho do banco por dia (armazenamento.py)
+    ("armazenamento_diario", "data_unica", [("data", ASCENDING)], {"unique": True}),
+
+    # Escritas recusadas pelo tamanho do projeto (tamanho_projetos.py)
+    ("alertas_tamanho_projetos", "codigo_unico", [("codigo", ASCENDING)], {"unique": True}),
+
+    # Projetos arquivados (arquivo_projetos.py)
+    ("projetos_arquivo", "codigo_unico", [("codigo", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("codigo")}),
+
+    # Registro das pastas do Google Drive (funcoes_auxiliares.py)
+    ("pastas_drive", "codigo", [("codigo", ASCENDING)], {}),
+
+    # Fila de tarefas em segundo plano (fila_tarefas.py)
+    ("fila_tarefas", "status_disponivel", [("status", ASCENDING), ("disponivel_em", ASCENDING)], {}),
+    ("fila_tarefas", "status_reserva", [("status", ASCENDING), ("reserva_ate", ASCENDING)], {}),
+    ("fila_tarefas", "codigo_tipo_status", [("codigo", ASCENDING), ("tipo", ASCENDING), ("status", ASCENDING)], {}),
+
+    # Caixa de saída de e-mails (fila_emails.py)
+    ("email_outbox", "status_disponivel", [("status", ASCENDING), ("disponivel_em", ASCENDING)], {}),
+    ("email_outbox", "status_reserva", [("status", ASCENDING), ("reserva_ate", ASCENDING)], {}),
+
+    # Lotes de convite em massa (convites_lote.py)
+    ("convites_lote", "status_criado", [("status", ASCENDING), ("criado_em", ASCENDING)], {}),
+
+    # Pessoas
+    ("pessoas", "e_mail_unico", [("e_mail", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("e_mail")}),
+    ("pessoas", "tipo_usuario", [("tipo_usuario", ASCENDING)], {}),
+    ("pessoas", "projetos", [("projetos", ASCENDING)], {}),
+
+    # Organizações
+    ("organizacoes", "cnpj_unico", [("cnpj", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("cnpj")}),
+    ("organizacoes", "sigla_organizacao_unica", [("sigla_organizacao", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("sigla_organizacao")}),
+
+    # Editais, ciclos, investidores e doadores
+    ("editais", "codigo_edital_unico", [("codigo_edital", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("codigo_edital")}),
+    ("ciclos_investimento", "codigo_ciclo_unico", [("codigo_ciclo", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("codigo_ciclo")}),
+    ("investidores", "sigla_investidor_unica", [("sigla_investidor", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("sigla_investidor")}),
+    ("doadores", "sigla_doador_unica", [("sigla_doador", ASCENDING)], {"unique": True, "partialFilterExpression": _somente_texto("sigla_doador")}),
+]
+
+
+# Consultas mais frequentes da aplicação, usadas no relatório de planos de execução.
+# Os valores são apenas exemplos: o que importa é o formato do filtro.
+CONSULTAS_FREQUENTES = [
+    ("projetos", {"codigo": "X"}),
+    ("projetos", {"edital": "X"}),
+    ("projetos", {"id_organizacao": None}),
+    ("projetos_resumo", {"edital": "X"}),
+    ("pendencias", {"edital": "X"}),
+    ("pendencias", {"padrinhos": "X"}),
+    ("relatos", {"codigo": "X", "relatorio_numero": 1}),
+    ("lancamentos", {"codigo": "X", "relatorio_numero": 1}),
+    ("lancamentos", {"codigo": "X", "id_lanc_despesa": "X"}),
+    ("acessos_diarios", {"data": {"$gte": None}}),
+    ("metricas_paginas", {"data": {"$gte": None}}),
+    ("armazenamento_diario", {"data": {"$gte": None}}),
+    ("projetos_arquivo", {"codigo": "X"}),
+    ("pastas_drive", {"codigo": "X"}),
+    ("fila_tarefas", {"status": "pendente", "disponivel_em": {"$lte": None}}),
+    ("fila_tarefas", {"codigo": "X", "tipo": "envio_drive", "status": {"$in": ["pendente", "em_execucao"]}}),
+    ("fila_tarefas", {"codigo": "X", "tipo": "envio_drive", "status": "erro"}),
+    ("email_outbox", {"status": "pendente", "disponivel_em": {"$lte": None}}),
+    ("convites_lote", {"status": {"$ne": "concluido"}}),
+    ("pessoas", {"e_mail": "x@x"}),
+    ("pessoas", {"tipo_usuario": "admin", "status": "ativo"}),
+    ("pessoas", {"projetos": "X"}),
+    ("organizacoes", {"cnpj": "X"}),
+    ("organizacoes", {"sigla_organizacao": "X"}),
+    ("editais", {"codigo_edital": "X"}),
+    ("ciclos_investimento", {"codigo_ciclo": "X"}),
+]
+
+
+
+
+###########################################################################################################
+# CRIAÇÃO DOS ÍNDICES
+###########################################################################################################
+
+def garantir_indices(db) -> list[dict]:
+    """
+    Cria os índices definidos em INDICES, caso ainda não existam.
+
+    É idempotente: índices já existentes com a mesma definição são ignorados
+    pelo MongoDB. Falhas (por exemplo, dados duplicados que impedem um índice
+    único) não interrompem a aplicação e são devolvidas na lista de resultado.
+
+    Retorna:
+        Lista com um dicionário por índice: coleção, nome, ok e erro.
+    """
+
+    resultados = []
+
+    for colecao, nome, chaves, opcoes in INDICES:
+
+        try:
+            db[colecao].create_index(chaves, name=nome, **opcoes)
+            resultados.append({"colecao": colecao, "nome": nome, "ok": True, "erro": None})
+
+        except PyMongoError as e:
+            resultados.append({"colecao": colecao, "nome": nome, "ok": False, "erro": str(e)})
+
+    return resultados
+
+
+
+
+###########################################################################################################
+# RELATÓRIO DE ÍNDICES
+###########################################################################################################
+
+def listar_indices_faltantes(db) -> list[dict]:
+    """
+    Retorna os índices de INDICES que não existem no banco.
+    """
+
+    faltantes = []
+
+    for colecao, nome, chaves, opcoes in INDICES:
+
+        existentes = db[colecao].index_information()
+
+        if nome not in existentes:
+            faltantes.append({
+                "colecao": colecao,
+                "nome": nome,
+                "chaves": ", ".join(campo for campo, _ in chaves),
+                "unico": bool(opcoes.get("unique"))
+            })
+
+    return faltantes
+
+
+def listar_indices_sem_uso(db) -> list[dict]:
+    """
+    Retorna os índices (exceto _id) que não foram usados desde o último
+    reinício do servidor, segundo $indexStats.
+    """
+
+    sem_uso = []
+
+    colecoes = sorted({colecao for colecao, _, _, _ in INDICES})
+
+    for colecao in colecoes:
+
+        try:
+            estatisticas = list(db[colecao].aggregate([{"$indexStats": {}}]))
+        except OperationFailure:
+            # $indexStats pode não estar disponível para o usuário do banco
+            continue
+
+        for estatistica in estatisticas:
+
+            if estatistica["name"] == "_id_":
+                continue
+
+            if estatistica.get("accesses", {}).get("ops", 0) == 0:
+                sem_uso.append({
+                    "colecao": colecao,
+                    "nome": estatistica["name"],
+                    "desde": estatistica.get("accesses", {}).get("since")
+                })
+
+    return sem_uso
+
+
+def _estagio_vencedor(plano):
+    """
+    Percorre o plano vencedor do explain e devolve os estágios em ordem,
+    por exemplo "FETCH > IXSCAN (codigo_unico)" ou "COLLSCAN".
+    """
+
+    estagios = []
+
+    while plano:
+
+        estagio = plano.get("stage", "")
+
+        if plano.get("indexName"):
+            estagio = f"{estagio} ({plano['indexName']})"
+
+        estagios.append(estagio)
+
+        plano = plano.get("inputStage")
+
+    return " > ".join(estagios)
+
+
+def explicar_consultas_frequentes(db) -> list[dict]:
+    """
+    Executa explain nas CONSULTAS_FREQUENTES e resume o plano vencedor.
+    """
+
+    planos = []
+
+    for colecao, filtro in CONSULTAS_FREQUENTES:
+
+        try:
+            explicacao = db.command(
+                "explain",
+                {"find": colecao, "filter": filtro},
+                verbosity="executionStats"
+            )
+        except OperationFailure as e:
+            planos.append({"colecao": colecao, "filtro": str(filtro), "plano": f"Erro: {e}", "usa_indice": False})
+            continue
+
+        plano_vencedor = explicacao.get("queryPlanner", {}).get("winningPlan", {})
+        estatisticas = explicacao.get("executionStats", {})
+
+        resumo = _estagio_vencedor(plano_vencedor)
+
+        planos.append({
+            "colecao": colecao,
+            "filtro": ", ".join(filtro.keys()),
+            "plano": resumo,
+            "usa_indice": "IXSCAN" in resumo or "IDHACK" in resumo,
+            "docs_examinados": estatisticas.get("totalDocsExamined")
+        })
+
+    return planos
+
+
+def relatorio_indices(db) -> dict:
+    """
+    Monta o relatório completo de índices: faltantes, sem uso e planos
+    das consultas frequentes.
+    """
+
+    return {
+        "faltantes": listar_indices_faltantes(db),
+        "sem_uso": listar_indices_sem_uso(db),
+        "planos": explicar_consultas_frequentes(db)
+    }
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    for resultado in garantir_indices(db):
+        situacao = "ok" if resultado["ok"] else f"ERRO: {resultado['erro']}"
+        print(f"{resultado['colecao']}.{resultado['nome']}: {situacao}")
+
+    relatorio = relatorio_indices(db)
+
+    print("\nÍndices faltantes:")
+    for item in relatorio["faltantes"] or [{"colecao": "-", "nome": "nenhum"}]:
+        print(f"  {item['colecao']}.{item['nome']}")
+
+    print("\nÍndices sem uso:")
+    for item in relatorio["sem_uso"] or [{"colecao": "-", "nome": "nenhum"}]:
+        print(f"  {item['colecao']}.{item['nome']}")
+
+    print("\nPlanos das consultas frequentes:")
+    for item in relatorio["planos"]:
+        print(f"  {item['colecao']} [{item['filtro']}]: {item['plano']}")
@@ -1,12 +1,14 @@
 import streamlit as st  
 # from pymongo import MongoClient  
-import time 
 import random  
-import smtplib  
-from email.mime.text import MIMEText  
 from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from monitor_mongo import iniciar_execucao, finalizar_execucao, arquivo_da_pagina, exibir_painel_mongo
+from metricas_prometheus import iniciar_servidor_metricas, registrar_falha
+from fila_emails import enfileirar_email
+from templates_email import renderizar_email
+from tamanho_projetos import ProjetoGrandeDemaisError
 import bcrypt
-from email.utils import formataddr
+from mensagens_flash import agendar_mensagem, exibir_mensagens_agendadas
 
 
 
@@ -26,6 +28,9 @@ st.set_page_config(layout="wide", page_title="Veredas - IEB", page_icon=":materi
 # Conecta ao banco de dados MongoDB usando função importada (com cache para otimizar desempenho)
 db = conectar_mongo_cepf_gestao()
 
+# Servidor das métricas do Prometheus em porta à parte (uma vez por processo)
+iniciar_servidor_metricas()
+
 # Define a coleção a ser utilizada
 col_pessoas = db["pessoas"]
 
@@ -54,38 +59,18 @@ def encontrar_usuario_por_email(pessoas, email_busca):
     return None, None  # Caso não encontre
 
 
-# Função para enviar um e_mail com código de verificação
+# Função para enviar um e_mail com código de verificação (pela caixa de saída, fila_emails.py)
 def enviar_email(destinatario, codigo):
-    # Dados de autenticação, retirados do arquivo secrets.toml
-    remetente = st.secrets["senhas"]["endereco_email"]
-    senha = st.secrets["senhas"]["senha_email"]
-
     # Conteúdo do e_mail
     assunto = f"Código de Verificação - Veredas: {codigo}"
-    corpo = f"""
-    <html>
-        <body>
-            <p style='font-size: 1.5em;'>
-                Seu código para redefinição é: <strong>{codigo}</strong>
-            </p>
-        </body>
-    </html>
-    """
-
-    # Cria o e_mail formatado com HTML
-    msg = MIMEText(corpo, "html", "utf-8")
-    msg["Subject"] = assunto
-    msg["From"] = formataddr(("Sistema Veredas", remetente))
-
-    msg["To"] = destinatario
-
-    # Tenta enviar o e_mail via SMTP seguro (SSL)
+    corpo = renderizar_email("codigo_verificacao.html", codigo=codigo)
+
+    # Grava na caixa de saída; o enviador manda em seguida
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(remetente, senha)
-            server.sendmail(remetente, destinatario, msg.as_string())
+        enfileirar_email(db, corpo, [destinatario], assunto, origem="enviar_email_codigo")
         return True
     except Exception as e:
+        registrar_falha("smtp")
         st.error(f"Erro ao enviar e-mail: {e}")
         return False
 
@@ -120,8 +105,7 @@ def primeiro_acesso_dialog():
                 elif usuario.get("codigo_convite") != codigo_input:
                     st.error("Código inválido. Verifique o e-mail enviado.")
                 else:
-                    st.success(f"Código validado! Aguarde...", icon=":material/check:")
-                    time.sleep(3)
+                    st.toast("Código validado!", icon=":material/check:")
                     # Guarda info na sessão
                     st.session_state.usuario_validado = True
                     st.session_state.usuario_id = usuario["_id"]
@@ -161,13 +145,11 @@ def primeiro_acesso_dialog():
                         st.session_state.pop(key, None)
 
                     # Mensagem final
-                    sucesso = st.success(
+                    agendar_mensagem(
                         "Senha cadastrada com sucesso.\n\nFaça o login normalmente.",
                         icon=":material/check:"
                     )
 
-                    time.sleep(3)
-                    sucesso.empty()
                     st.rerun()
 
 
@@ -224,9 +206,7 @@ def recuperar_senha_dialog():
             codigo_input = st.text_input("Informe o código recebido por e-mail", placeholder="000")
             if st.form_submit_button("Verificar", type="primary"):
                 if codigo_input == st.session_state.codigo_verificacao:
-                    sucesso = st.success("Código verificado com sucesso!")
-                    time.sleep(2)
-                    sucesso.empty()
+                    st.toast("Código verificado com sucesso!", icon=":material/check:")
                     st.session_state.codigo_validado = True
                 else:
                     st.error("Código inválido. Tente novamente.")
@@ -259,7 +239,7 @@ def recuperar_senha_dialog():
                             )
 
                             if result.matched_count > 0:
-                                st.success("Senha redefinida com sucesso!")
+                                agendar_mensagem("Senha redefinida com sucesso!")
 
 
                                 # reconstrução completa da sessão exatamente como no login
@@ -286,7 +266,6 @@ def recuperar_senha_dialog():
                                     st.session_state.pop(key, None)
 
 
-                                time.sleep(3)
                                 st.rerun()
 
 
@@ -415,6 +394,10 @@ def login():
 ##############################################################################################################
 
 
+# Mensagens agendadas antes do último st.rerun() (mensagens_flash.py)
+exibir_mensagens_agendadas()
+
+
 # controle central de autenticação
 
 # usuário NÃO autenticado
@@ -452,6 +435,7 @@ else:
             "Projetos": [
                 st.Page("projetos_home_visao_geral.py", title="Visão geral", icon=":material/analytics:"),
                 st.Page("projetos_lista.py", title="Projetos", icon=":material/list:"),
+                st.Page("projetos_arquivados.py", title="Arquivados", icon=":material/inventory_2:"),
                 st.Page("projetos_eventos.py", title="Eventos", icon=":material/event:"),
                 st.Page("mapa.py", title="Mapa", icon=":material/map:"),
                 st.Page("projeto_novo.py", title="Novo projeto", icon=":material/add_circle:"),
@@ -487,6 +471,7 @@ else:
             "Projetos": [
                 st.Page("projetos_home_visao_geral.py", title="Visão geral", icon=":material/analytics:"),
                 st.Page("projetos_lista.py", title="Projetos", icon=":material/list:"),
+                st.Page("projetos_arquivados.py", title="Arquivados", icon=":material/inventory_2:"),
                 st.Page("mapa.py", title="Mapa", icon=":material/map:"),
                 st.Page("projeto_novo.py", title="Novo projeto", icon=":material/add_circle:"),
             ],
@@ -655,5 +640,26 @@ else:
 
     # Cria e executa a navegação
     pg = st.navigation(pages)
-    pg.run()
+
+    # Painel de depuração com as consultas da última execução (só admin)
+    if tipo_usuario == "admin":
+        exibir_painel_mongo()
+
+    # Mede os comandos enviados ao MongoDB durante a execução da página.
+    # O finally também roda quando a página chama st.stop() ou st.rerun().
+    iniciar_execucao(arquivo_da_pagina(pg))
+    try:
+        pg.run()
+    except ProjetoGrandeDemaisError as erro:
+        # A escrita do projeto foi recusada e o documento não foi alterado
+        # (tamanho_projetos.py). O que a página gravou antes dela (ex.:
+        # arquivos guardados para a fila de tarefas) é desfeito pela própria
+        # página antes de repassar o erro.
+        st.error(str(erro), icon=":material/error:")
+    except Exception:
+        # st.stop() e st.rerun() não são Exception e não contam como falha
+        registrar_falha("pagina")
+        raise
+    finally:
+        finalizar_execucao(db)
 
@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
-from funcoes_auxiliares import conectar_mongo_cepf_gestao
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_colecao_referencia
+from resumo_projetos import carregar_resumos_projetos
+from arquivo_projetos import toggle_incluir_arquivados
 
 
 
@@ -18,13 +20,12 @@ st.set_page_config(page_title="Mapa", page_icon=":material/map:")
 db = conectar_mongo_cepf_gestao()
 
 col_projetos = db["projetos"]
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+# Projetos arquivados só entram com o toggle da barra lateral ligado
+df_projetos = carregar_resumos_projetos(db, incluir_arquivados=toggle_incluir_arquivados())
 
 col_editais = db["editais"]
-df_editais = pd.DataFrame(list(col_editais.find()))
+df_editais = pd.DataFrame(carregar_colecao_referencia(db, "editais"))
 
-col_organizacoes = db["organizacoes"]
-df_organizacoes = pd.DataFrame(list(col_organizacoes.find()))
 
 
 ###########################################################################################################
@@ -113,18 +114,8 @@ pontos_mapa = []
 
 for _, projeto in df_filtrado.iterrows():
 
-    encontrou_localidade = False  # <- controle por projeto
-
-    locais = projeto.get("locais")
-
-    # Garante que seja um dicionário
-    if not isinstance(locais, dict):
-        notificar_mapa(
-            f"O projeto {projeto.get('codigo')} - {projeto.get('sigla')} não tem localidades cadastradas."
-        )
-        continue
-
-    localidades = locais.get("localidades")
+    # O resumo do projeto guarda apenas as localidades com coordenadas
+    localidades = projeto.get("localidades")
 
     # Garante lista válida
     if not isinstance(localidades, list) or not localidades:
@@ -134,60 +125,21 @@ for _, projeto in df_filtrado.iterrows():
         continue
 
     for local in localidades:
-        if not isinstance(local, dict):
-            continue
-
-        lat = local.get("latitude")
-        lon = local.get("longitude")
-
-        # Ignora coordenadas inválidas
-        if lat is None or lon is None:
-            continue
-
-        encontrou_localidade = True
-
-
-
-        # Busca os dados da organização vinculada ao projeto
-        organizacao_nome = ""
-
-        id_organizacao = projeto.get("id_organizacao")
-
-        if id_organizacao is not None:
-
-            organizacao_filtrada = df_organizacoes[
-                df_organizacoes["_id"] == id_organizacao
-            ]
-
-            if not organizacao_filtrada.empty:
-                organizacao_nome = organizacao_filtrada.iloc[0].get(
-                    "nome_organizacao", ""
-                )
-
 
         pontos_mapa.append({
             "codigo": projeto.get("codigo"),
             "sigla": projeto.get("sigla"),
             "nome_projeto": projeto.get("nome_do_projeto"),
-            "organizacao": organizacao_nome,
+            "organizacao": projeto.get("nome_organizacao") or "",
             "municipio": local.get("municipio"),
             "localidade": local.get("nome_localidade"),
-            "latitude": lat,
-            "longitude": lon
+            "latitude": local.get("latitude"),
+            "longitude": local.get("longitude")
         })
 
 
 
 
-    # Se passou pelo projeto inteiro e não achou nenhuma localidade válida
-    if not encontrou_localidade:
-        notificar_mapa(
-            f"O projeto {projeto.get('codigo')} - {projeto.get('sigla')} não tem localidades cadastradas."
-        )
-
-
-
-
 
 # ============================================
 # RENDERIZAÇÃO DO MAPA
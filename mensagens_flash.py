@@ -0,0 +1,88 @@
+"""
+Mensagens de retorno que sobrevivem ao st.rerun() (flash messages).
+
+Depois de salvar, as páginas mostravam st.success, esperavam alguns
+segundos com time.sleep para dar tempo de ler e só então chamavam
+st.rerun(): a sessão ficava parada, ocupando a thread do script, a cada
+gravação. Agora a mensagem é guardada na sessão e exibida na execução
+seguinte, e a gravação custa só a escrita e o rerun:
+
+    agendar_mensagem("Despesa registrada com sucesso!", icon=":material/check:")
+    st.rerun()
+
+login_gestao.py chama exibir_mensagens_agendadas() no começo de toda
+execução. Mensagens de sucesso e informativas viram toasts (somem
+sozinhas); avisos e erros viram faixas no topo da página, que ficam até
+a próxima interação.
+"""
+
+import streamlit as st
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+CHAVE_MENSAGENS = "mensagens_agendadas"
+
+
+# Tipos aceitos (função do Streamlit usada quando a mensagem é exibida como faixa)
+TIPOS = ("success", "info", "warning", "error")
+
+# Tipos exibidos como toast quando toast não é informado
+TIPOS_TOAST = ("success", "info")
+
+
+
+
+###########################################################################################################
+# FUNÇÕES
+###########################################################################################################
+
+def agendar_mensagem(
+    texto: str,
+    icon: str | None = None,
+    tipo: str = "success",
+    toast: bool | None = None
+):
+    """
+    Guarda uma mensagem na sessão para ser exibida na próxima execução
+    (normalmente logo depois de um st.rerun()).
+
+    Parâmetros:
+        texto: texto da mensagem (aceita Markdown, como st.success).
+        icon: ícone, no formato do Streamlit (ex.: ":material/check:").
+        tipo: success, info, warning ou error.
+        toast: True para toast, False para faixa no topo da página. Por
+            padrão, toast para success e info e faixa para warning e error.
+    """
+
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de mensagem inválido: {tipo}")
+
+    if toast is None:
+        toast = tipo in TIPOS_TOAST
+
+    st.session_state.setdefault(CHAVE_MENSAGENS, []).append(
+        {"texto": texto, "icon": icon, "tipo": tipo, "toast": toast}
+    )
+
+
+def exibir_mensagens_agendadas():
+    """
+    Exibe e descarta as mensagens guardadas por agendar_mensagem.
+    """
+
+    mensagens = st.session_state.pop(CHAVE_MENSAGENS, None)
+
+    if not mensagens:
+        return
+
+    for mensagem in mensagens:
+
+        if mensagem["toast"]:
+            st.toast(mensagem["texto"], icon=mensagem["icon"])
+        else:
+            getattr(st, mensagem["tipo"])(mensagem["texto"], icon=mensagem["icon"])
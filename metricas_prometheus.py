@@ -0,0 +1,172 @@
+"""
+Métricas do Prometheus (prometheus_client) servidas em uma porta à parte.
+
+O servidor HTTP é iniciado uma vez por processo (iniciar_servidor_metricas):
+em login_gestao.py para o app e em executar_enviador (fila_emails.py) e
+executar_trabalhador (fila_tarefas.py) para os processos de fundo, que
+fazem os envios por SMTP e ao Drive. Cada processo usa a sua porta, de
+st.secrets:
+
+    [metricas]
+    porta = 9108
+    porta_enviador = 9109
+    porta_trabalhador = 9110
+
+e as métricas do app ficam em http://<servidor>:9108/metrics.
+
+Histogramas (segundos):
+- veredas_pagina_duracao_segundos{pagina}: execução do script de cada página;
+- veredas_mongo_comando_duracao_segundos{comando}: comandos do MongoDB (monitor_mongo.py);
+- veredas_drive_duracao_segundos{operacao}: chamadas ao Google Drive;
+- veredas_smtp_duracao_segundos{origem}: envios de e-mail, pela função que enviou.
+
+Contadores:
+- veredas_execucoes_pagina_total{pagina}: execuções (reruns) de cada página;
+- veredas_uploads_drive_total: arquivos enviados ao Drive;
+- veredas_falhas_total{origem}: falhas de página, Mongo, Drive e SMTP.
+
+Para medir um trecho:
+
+    with medir(DURACAO_DRIVE, operacao="enviar_arquivo"):
+        ...
+"""
+
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+from prometheus_client import Counter, Histogram, start_http_server
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+PORTA_PADRAO_METRICAS = 9108
+
+# Portas padrão de cada processo (chave em st.secrets["metricas"] -> porta)
+PORTAS_PADRAO = {
+    "porta": PORTA_PADRAO_METRICAS,
+    "porta_enviador": 9109,
+    "porta_trabalhador": 9110,
+}
+
+
+# Faixas pensadas para separar respostas rápidas das que o usuário percebe
+FAIXAS_PAGINA = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+FAIXAS_MONGO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+FAIXAS_EXTERNAS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+
+
+
+###########################################################################################################
+# MÉTRICAS
+###########################################################################################################
+
+DURACAO_PAGINA = Histogram(
+    "veredas_pagina_duracao_segundos",
+    "Duração da execução do script de cada página.",
+    ["pagina"],
+    buckets=FAIXAS_PAGINA,
+)
+
+DURACAO_MONGO = Histogram(
+    "veredas_mongo_comando_duracao_segundos",
+    "Duração dos comandos enviados ao MongoDB.",
+    ["comando"],
+    buckets=FAIXAS_MONGO,
+)
+
+DURACAO_DRIVE = Histogram(
+    "veredas_drive_duracao_segundos",
+    "Duração das chamadas ao Google Drive.",
+    ["operacao"],
+    buckets=FAIXAS_EXTERNAS,
+)
+
+DURACAO_SMTP = Histogram(
+    "veredas_smtp_duracao_segundos",
+    "Duração do envio de e-mails por SMTP.",
+    ["origem"],
+    buckets=FAIXAS_EXTERNAS,
+)
+
+
+EXECUCOES_PAGINA = Counter(
+    "veredas_execucoes_pagina",
+    "Execuções (reruns) do script de cada página.",
+    ["pagina"],
+)
+
+UPLOADS_DRIVE = Counter(
+    "veredas_uploads_drive",
+    "Arquivos enviados ao Google Drive.",
+)
+
+FALHAS = Counter(
+    "veredas_falhas",
+    "Falhas por origem (pagina, mongo, drive, smtp).",
+    ["origem"],
+)
+
+
+
+
+###########################################################################################################
+# REGISTRO
+###########################################################################################################
+
+@contextmanager
+def medir(histograma, **rotulos):
+    """
+    Observa no histograma a duração do bloco, mesmo que ele termine com erro.
+    """
+
+    inicio = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        histograma.labels(**rotulos).observe(time.perf_counter() - inicio)
+
+
+def registrar_falha(origem: str):
+    FALHAS.labels(origem=origem).inc()
+
+
+def registrar_execucao_pagina(pagina: str, duracao_segundos: float):
+    EXECUCOES_PAGINA.labels(pagina=pagina).inc()
+    DURACAO_PAGINA.labels(pagina=pagina).observe(duracao_segundos)
+
+
+
+
+###########################################################################################################
+# SERVIDOR
+###########################################################################################################
+
+@st.cache_resource
+def iniciar_servidor_metricas(chave_porta: str = "porta"):
+    """
+    Inicia, uma vez por processo, o servidor HTTP das métricas.
+
+    Parâmetros:
+        chave_porta: chave da porta em st.secrets["metricas"] (porta para o
+            app, porta_enviador e porta_trabalhador para os processos de fundo).
+
+    Retorna:
+        A porta usada, ou None se o servidor não pôde ser iniciado
+        (ex.: porta já ocupada por outro processo).
+    """
+
+    porta = int(st.secrets.get("metricas", {}).get(chave_porta, PORTAS_PADRAO[chave_porta]))
+
+    try:
+        start_http_server(porta)
+    except OSError:
+        return None
+
+    return porta
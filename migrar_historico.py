@@ -0,0 +1,135 @@
+"""
+Migração dos relatos e lançamentos para as coleções relatos e lancamentos.
+
+Para cada projeto que ainda guarda relatos dentro das atividades ou
+lançamentos dentro das despesas, regrava plano_trabalho.componentes e
+financeiro.orcamento por escrita_projetos.atualizar_projeto, que move o
+histórico para as coleções próprias (ver historico_projetos.py).
+
+Pode ser executado mais de uma vez: projetos já migrados não são tocados.
+
+Uso:
+
+    python migrar_historico.py            # migra
+    python migrar_historico.py --simular  # apenas conta o que seria migrado
+"""
+
+import sys
+
+from escrita_projetos import atualizar_projeto
+from historico_projetos import COLECAO_RELATOS, COLECAO_LANCAMENTOS
+
+
+
+
+###########################################################################################################
+# CONTAGEM DO HISTÓRICO ANINHADO
+###########################################################################################################
+
+FILTRO_PROJETOS_COM_HISTORICO = {
+    "$or": [
+        {"plano_trabalho.componentes.entregas.atividades.relatos": {"$exists": True}},
+        {"financeiro.orcamento.lancamentos": {"$exists": True}},
+    ]
+}
+
+
+def contar_historico_aninhado(projeto: dict) -> tuple[int, int]:
+    """
+    Quantidade de relatos e de lançamentos guardados dentro do projeto.
+    """
+
+    relatos = 0
+
+    for componente in (projeto.get("plano_trabalho") or {}).get("componentes") or []:
+        for entrega in componente.get("entregas") or []:
+            for atividade in entrega.get("atividades") or []:
+                relatos += len(atividade.get("relatos") or [])
+
+    lancamentos = 0
+
+    for despesa in (projeto.get("financeiro") or {}).get("orcamento") or []:
+        lancamentos += len(despesa.get("lancamentos") or [])
+
+    return relatos, lancamentos
+
+
+
+
+###########################################################################################################
+# MIGRAÇÃO
+###########################################################################################################
+
+def migrar_historico(db, simular: bool = False) -> dict:
+    """
+    Move o histórico aninhado de todos os projetos.
+
+    Retorna:
+        Totais de projetos, relatos e lançamentos migrados.
+    """
+
+    col_projetos = db["projetos"]
+
+    totais = {"projetos": 0, "relatos": 0, "lancamentos": 0}
+
+    projetos = col_projetos.find(
+        FILTRO_PROJETOS_COM_HISTORICO,
+        {"codigo": 1, "plano_trabalho.componentes": 1, "financeiro.orcamento": 1}
+    )
+
+    for projeto in projetos:
+
+        relatos, lancamentos = contar_historico_aninhado(projeto)
+
+        totais["projetos"] += 1
+        totais["relatos"] += relatos
+        totais["lancamentos"] += lancamentos
+
+        print(f"{projeto.get('codigo')}: {relatos} relatos, {lancamentos} lançamentos")
+
+        if simular:
+            continue
+
+        campos = {}
+
+        componentes = (projeto.get("plano_trabalho") or {}).get("componentes")
+        if isinstance(componentes, list):
+            campos["plano_trabalho.componentes"] = componentes
+
+        orcamento = (projeto.get("financeiro") or {}).get("orcamento")
+        if isinstance(orcamento, list):
+            campos["financeiro.orcamento"] = orcamento
+
+        atualizar_projeto(col_projetos, {"_id": projeto["_id"]}, {"$set": campos})
+
+    return totais
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    simular = "--simular" in sys.argv[1:]
+
+    totais = migrar_historico(db, simular=simular)
+
+    acao = "a migrar" if simular else "migrados"
+
+    print(
+        f"\n{totais['projetos']} projetos {acao}: "
+        f"{totais['relatos']} relatos e {totais['lancamentos']} lançamentos."
+    )
+
+    if not simular:
+        print(
+            f"Coleções: {db[COLECAO_RELATOS].count_documents({})} relatos, "
+            f"{db[COLECAO_LANCAMENTOS].count_documents({})} lançamentos."
+        )
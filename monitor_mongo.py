@@ -0,0 +1,355 @@
+"""
+Medição dos comandos enviados ao MongoDB em cada execução de página.
+
+Um CommandListener do pymongo (MONITOR_COMANDOS), registrado no MongoClient
+de conectar_mongo_cepf_gestao, conta para cada execução (rerun) do script
+do Streamlit:
+
+- quantos comandos foram enviados (e quantos de cada tipo: find, aggregate...);
+- quantos bytes voltaram nas respostas;
+- o tempo total de espera pelo banco.
+
+A execução é delimitada em login_gestao.py, em volta de pg.run():
+
+    iniciar_execucao(arquivo_da_pagina(pg))
+    try:
+        pg.run()
+    finally:
+        finalizar_execucao(db)
+
+Ao final, os números são somados por dia e página na coleção
+metricas_paginas, com um único upsert sem confirmação (w=0), e a última
+execução fica em st.session_state para o painel de depuração do admin
+(exibir_painel_mongo). Assim dá para ver, por exemplo, que um rerun de
+projeto_relatorios.py fez 15 consultas e trouxe 8 MB, e acompanhar a
+média por página ao longo do tempo (carregar_metricas_paginas).
+
+A duração de cada comando e de cada execução também vai para as métricas
+do Prometheus (metricas_prometheus.py).
+"""
+
+import datetime
+import threading
+import time
+from pathlib import Path
+
+import bson
+import pandas as pd
+import streamlit as st
+from pymongo import DESCENDING, monitoring
+from pymongo.write_concern import WriteConcern
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from metricas_prometheus import DURACAO_MONGO, registrar_falha, registrar_execucao_pagina
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_METRICAS_PAGINAS = "metricas_paginas"
+
+
+# Chave de st.session_state com os números da última execução concluída
+CHAVE_ULTIMA_EXECUCAO = "ultima_execucao_mongo"
+
+
+# Comandos internos do driver que não representam consultas da página
+COMANDOS_IGNORADOS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+
+
+
+###########################################################################################################
+# LISTENER DE COMANDOS
+###########################################################################################################
+
+# Execuções em andamento, por id da sessão do Streamlit
+_execucoes = {}
+_trava_execucoes = threading.Lock()
+
+
+def _id_sessao():
+    """
+    Id da sessão do Streamlit da thread atual (None fora de uma execução de página).
+    """
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+
+    return ctx.session_id if ctx else None
+
+
+def _execucao_atual():
+
+    id_sessao = _id_sessao()
+
+    if id_sessao is None:
+        return None
+
+    with _trava_execucoes:
+        return _execucoes.get(id_sessao)
+
+
+def _tamanho_resposta(resposta) -> int:
+
+    try:
+        return len(bson.encode(resposta))
+    except Exception:
+        return 0
+
+
+class MonitorComandos(monitoring.CommandListener):
+    """
+    Soma os comandos de cada execução de página. Os eventos chegam na mesma
+    thread que enviou o comando, o que permite achar a sessão do Streamlit.
+    Comandos fora de uma execução (linha de comando, threads) são ignorados.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._registrar(event, resposta=event.reply)
+
+    def failed(self, event):
+        self._registrar(event, falhou=True)
+
+    def _registrar(self, event, resposta=None, falhou=False):
+
+        if event.command_name in COMANDOS_IGNORADOS:
+            return
+
+        # Prometheus: todos os comandos, inclusive fora das páginas
+        DURACAO_MONGO.labels(comando=event.command_name).observe(event.duration_micros / 1_000_000)
+
+        if falhou:
+            registrar_falha("mongo")
+
+        execucao = _execucao_atual()
+
+        if execucao is None:
+            return
+
+        tamanho = _tamanho_resposta(resposta) if resposta is not None else 0
+
+        # Uma execução só recebe eventos da própria thread do script
+        execucao["comandos"] += 1
+        execucao["bytes"] += tamanho
+        execucao["duracao_mongo_ms"] += event.duration_micros / 1000
+        execucao["falhas"] += int(falhou)
+
+        por_comando = execucao["por_comando"].setdefault(
+            event.command_name, {"comandos": 0, "bytes": 0, "duracao_mongo_ms": 0.0}
+        )
+        por_comando["comandos"] += 1
+        por_comando["bytes"] += tamanho
+        por_comando["duracao_mongo_ms"] += event.duration_micros / 1000
+
+
+MONITOR_COMANDOS = MonitorComandos()
+
+
+
+
+###########################################################################################################
+# INÍCIO E FIM DE CADA EXECUÇÃO
+###########################################################################################################
+
+def arquivo_da_pagina(pagina) -> str:
+    """
+    Nome do arquivo de uma página de st.navigation (ex.: projeto_relatorios.py).
+    Para páginas definidas por função, usa o url_path.
+    """
+
+    origem = getattr(pagina, "_page", None)
+
+    if isinstance(origem, (str, Path)):
+        return Path(origem).name
+
+    return getattr(pagina, "url_path", None) or "desconhecida"
+
+
+def iniciar_execucao(pagina: str):
+    """
+    Começa a contar os comandos da execução atual da sessão.
+    """
+
+    id_sessao = _id_sessao()
+
+    if id_sessao is None:
+        return
+
+    with _trava_execucoes:
+        _execucoes[id_sessao] = {
+            "pagina": pagina,
+            "inicio": time.perf_counter(),
+            "comandos": 0,
+            "bytes": 0,
+            "duracao_mongo_ms": 0.0,
+            "falhas": 0,
+            "por_comando": {},
+        }
+
+
+def finalizar_execucao(db) -> dict | None:
+    """
+    Encerra a contagem da execução atual, guarda o resultado para o painel
+    do admin e soma os números em metricas_paginas.
+
+    Retorna:
+        Os números da execução (None se nenhuma estava em andamento).
+    """
+
+    id_sessao = _id_sessao()
+
+    with _trava_execucoes:
+        execucao = _execucoes.pop(id_sessao, None)
+
+    if execucao is None:
+        return None
+
+    execucao["duracao_total_ms"] = (time.perf_counter() - execucao.pop("inicio")) * 1000
+
+    st.session_state[CHAVE_ULTIMA_EXECUCAO] = execucao
+
+    registrar_execucao_pagina(execucao["pagina"], execucao["duracao_total_ms"] / 1000)
+
+    try:
+        _gravar_metricas(db, execucao)
+    except Exception:
+        # A medição nunca deve derrubar a página
+        pass
+
+    return execucao
+
+
+def _gravar_metricas(db, execucao: dict):
+    """
+    Soma a execução no documento do dia e da página. A gravação é feita
+    depois de retirar a execução de _execucoes, portanto não é contada.
+    """
+
+    hoje = datetime.date.today()
+
+    incrementos = {
+        "execucoes": 1,
+        "comandos": execucao["comandos"],
+        "bytes": execucao["bytes"],
+        "duracao_mongo_ms": execucao["duracao_mongo_ms"],
+        "duracao_total_ms": execucao["duracao_total_ms"],
+        "falhas": execucao["falhas"],
+    }
+
+    for comando, numeros in execucao["por_comando"].items():
+        incrementos[f"por_comando.{comando}"] = numeros["comandos"]
+
+    # Sem esperar confirmação: a métrica não deve atrasar a página
+    col_metricas = db[COLECAO_METRICAS_PAGINAS].with_options(write_concern=WriteConcern(w=0))
+
+    col_metricas.update_one(
+        {"data": datetime.datetime(hoje.year, hoje.month, hoje.day), "pagina": execucao["pagina"]},
+        {
+            "$inc": incrementos,
+            "$max": {
+                "max_comandos": execucao["comandos"],
+                "max_bytes": execucao["bytes"],
+                "max_duracao_total_ms": execucao["duracao_total_ms"],
+            },
+        },
+        upsert=True
+    )
+
+
+
+
+###########################################################################################################
+# CONSULTA E PAINEL DO ADMIN
+###########################################################################################################
+
+def formatar_bytes(quantidade) -> str:
+
+    quantidade = float(quantidade or 0)
+
+    for unidade in ("B", "KB", "MB"):
+        if quantidade < 1024:
+            return f"{quantidade:.0f} {unidade}" if unidade == "B" else f"{quantidade:.1f} {unidade}"
+        quantidade /= 1024
+
+    return f"{quantidade:.1f} GB"
+
+
+def carregar_metricas_paginas(db, inicio: datetime.date | None = None) -> pd.DataFrame:
+    """
+    Médias por execução de cada página e dia, a partir de inicio (todo o
+    período se None), do dia mais recente para o mais antigo.
+    """
+
+    filtro = {}
+
+    if inicio:
+        filtro["data"] = {"$gte": datetime.datetime(inicio.year, inicio.month, inicio.day)}
+
+    documentos = list(
+        db[COLECAO_METRICAS_PAGINAS]
+        .find(filtro, {"_id": 0, "por_comando": 0})
+        .sort([("data", DESCENDING), ("pagina", 1)])
+    )
+
+    df = pd.DataFrame(documentos)
+
+    if df.empty:
+        return df
+
+    execucoes = df["execucoes"].clip(lower=1)
+
+    df["comandos_por_execucao"] = df["comandos"] / execucoes
+    df["bytes_por_execucao"] = df["bytes"] / execucoes
+    df["duracao_mongo_ms_por_execucao"] = df["duracao_mongo_ms"] / execucoes
+    df["duracao_total_ms_por_execucao"] = df["duracao_total_ms"] / execucoes
+
+    return df
+
+
+def exibir_painel_mongo():
+    """
+    Painel na barra lateral com os números da última execução concluída da
+    sessão (a execução atual só termina depois que a página é desenhada).
+    """
+
+    execucao = st.session_state.get(CHAVE_ULTIMA_EXECUCAO)
+
+    with st.sidebar.expander("Consultas ao banco", icon=":material/database:"):
+
+        if not execucao:
+            st.caption("Nenhuma execução medida ainda.")
+            return
+
+        st.caption(f"Última execução: {execucao['pagina']}")
+
+        st.write(
+            f"**{execucao['comandos']}** comandos · "
+            f"**{formatar_bytes(execucao['bytes'])}** recebidos · "
+            f"**{execucao['duracao_mongo_ms']:.0f} ms** no banco · "
+            f"**{execucao['duracao_total_ms']:.0f} ms** no total"
+        )
+
+        if execucao["falhas"]:
+            st.write(f":red[{execucao['falhas']} comandos com erro]")
+
+        if execucao["por_comando"]:
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        "Comando": comando,
+                        "Qtd.": numeros["comandos"],
+                        "Recebido": formatar_bytes(numeros["bytes"]),
+                        "ms": round(numeros["duracao_mongo_ms"]),
+                    }
+                    for comando, numeros in sorted(
+                        execucao["por_comando"].items(), key=lambda item: -item[1]["comandos"]
+                    )
+                ]),
+                hide_index=True,
+            )
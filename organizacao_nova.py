@@ -1,11 +1,11 @@
 
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao, limpar_e_validar_cep  # Funções personalizadas
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, limpar_e_validar_cep, carregar_colecao_referencia, invalidar_cache_referencia, carregar_projetos_portfolio  # Funções personalizadas
 import pandas as pd
 import locale
 import re
-import time
 import uuid
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Nova Organização", page_icon=":material/add_business:")
@@ -25,16 +25,16 @@ col_pessoas = db["pessoas"]
 df_pessoas = pd.DataFrame(list(col_pessoas.find()))
 
 col_projetos = db["projetos"]
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+df_projetos = carregar_projetos_portfolio(db, "organizacao_nova")
 
 col_organizacoes = db["organizacoes"]
-df_organizacoes = pd.DataFrame(list(col_organizacoes.find()))
+df_organizacoes = pd.DataFrame(carregar_colecao_referencia(db, "organizacoes"))
 
 col_temas = db["temas_projetos"]
 df_temas = pd.DataFrame(list(col_temas.find()))
 
 col_publicos = db["publicos"]
-df_publicos = pd.DataFrame(list(col_publicos.find()))
+df_publicos = pd.DataFrame(carregar_colecao_referencia(db, "publicos"))
 
 
 # -------------------------------------------------------------------------------------------------
@@ -44,7 +44,7 @@ df_publicos = pd.DataFrame(list(col_publicos.find()))
 col_uf_municipios = db["ufs_municipios"]
 
 # Busca especificamente o documento que possui a chave 'ufs'
-doc_ufs = col_uf_municipios.find_one({"ufs": {"$exists": True}})
+doc_ufs = next(iter(carregar_colecao_referencia(db, "ufs_municipios", filtro={"ufs": {"$exists": True}})), None)
 
 df_ufs = pd.DataFrame(doc_ufs["ufs"])
 
@@ -426,20 +426,18 @@ if opcao_cadastro == "Cadastro individual":
 
                     # Insere o documento no MongoDB
                     col_organizacoes.insert_one(novo_doc)
+                    invalidar_cache_referencia("organizacoes")
 
                     ###########################################################################
                     # FEEDBACK E LIMPEZA DO FORMULÁRIO
                     ###########################################################################
 
                     # Mensagem de sucesso
-                    st.success("Organização cadastrada com sucesso!", icon=":material/check:")
+                    agendar_mensagem("Organização cadastrada com sucesso!", icon=":material/check:")
 
                     # Ativa flag para limpar o formulário no próximo ciclo da aplicação
                     st.session_state.limpar_form_organizacao = True
 
-                    # Pequena pausa para exibir a mensagem de sucesso ao usuário
-                    time.sleep(3)
-
                     # Recarrega a página
                     st.rerun()
 
@@ -686,10 +684,10 @@ elif opcao_cadastro == "Cadastro em massa":
         # -----------------------------------------------------------------------------------------
         if registros_validos:
             resultado = col_organizacoes.insert_many(registros_validos)
+            invalidar_cache_referencia("organizacoes")
 
-            st.success(f"{len(resultado.inserted_ids)} organizações cadastradas com sucesso!", icon=":material/check:")
+            agendar_mensagem(f"{len(resultado.inserted_ids)} organizações cadastradas com sucesso!", icon=":material/check:")
 
-            time.sleep(3)
             st.rerun()
 
 
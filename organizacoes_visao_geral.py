@@ -1,8 +1,10 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao, limpar_e_validar_cep
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, limpar_e_validar_cep, carregar_colecao_referencia, invalidar_cache_referencia
+from resumo_projetos import carregar_resumos_projetos, atualizar_resumos
+from arquivo_projetos import toggle_incluir_arquivados
 import pandas as pd
-import time
 import re
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -21,10 +23,11 @@ db = conectar_mongo_cepf_gestao()
 
 
 col_projetos = db["projetos"]
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+# Projetos arquivados só entram com o toggle da barra lateral ligado
+df_projetos = carregar_resumos_projetos(db, incluir_arquivados=toggle_incluir_arquivados())
 
 col_organizacoes = db["organizacoes"]
-df_organizacoes = pd.DataFrame(list(col_organizacoes.find()))
+df_organizacoes = pd.DataFrame(carregar_colecao_referencia(db, "organizacoes"))
 
 # Organiza em ordem alfabética pela sigla
 df_organizacoes = df_organizacoes.sort_values(by=["sigla_organizacao"])
@@ -380,14 +383,16 @@ def editar_organizacao_dialog():
                                 }
                             }
                         )
+                        invalidar_cache_referencia("organizacoes")
 
-                        st.success(
+                        # Nome e sigla da organização aparecem no resumo dos projetos
+                        atualizar_resumos(db, {"id_organizacao": org["_id"]})
+
+                        agendar_mensagem(
                             "Organização atualizada com sucesso!",
                             icon=":material/check:"
                         )
 
-                        time.sleep(3)
-
                         st.rerun()
 
 
@@ -0,0 +1,212 @@
+"""
+Fila de pendências de monitoramento (coleção pendencias).
+
+Cada documento é uma demanda exibida no painel "Demandas de monitoramento"
+da home: pendência cadastral, projeto atrasado, relatório em análise, ajuste
+(remanejamento de atividades) em análise ou remanejamento financeiro em análise.
+
+As pendências de um projeto são regravadas junto com o resumo do projeto
+(resumo_projetos.atualizar_resumos), que por sua vez é chamado a cada escrita
+em projetos (escrita_projetos.py). Assim, enviar ou aprovar um relatório ou um
+remanejamento coloca ou retira a demanda da fila na mesma operação.
+
+A home consulta a fila com uma única consulta indexada e paginada:
+
+    consultar_pendencias(db, edital="X", padrinho="Fulano", pagina=1)
+"""
+
+import datetime
+
+from pymongo import ASCENDING
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_PENDENCIAS = "pendencias"
+
+
+# Ordem de exibição dos tipos para o mesmo padrinho/madrinha
+ORDEM_TIPOS_PENDENCIA = {
+    "pendencia_cadastral": 0,
+    "projeto_atrasado": 1,
+    "relatorio": 2,
+    "ajuste": 3,
+    "remanejamento_financeiro": 4,
+}
+
+
+# Ordenação do painel, coberta pelos índices de pendencias em indices_mongo.py
+ORDENACAO_PENDENCIAS = [
+    ("padrinho", ASCENDING),
+    ("ordem_tipo", ASCENDING),
+    ("codigo", ASCENDING),
+    ("numero", ASCENDING),
+]
+
+
+PENDENCIAS_POR_PAGINA = 20
+
+
+
+
+###########################################################################################################
+# MONTAGEM A PARTIR DO RESUMO DO PROJETO
+###########################################################################################################
+
+def pendencias_do_resumo(resumo: dict) -> list[dict]:
+    """
+    Monta as pendências de um projeto a partir do seu documento em projetos_resumo.
+
+    Projetos com evento pendente no cronograma ("Em dia" ou "Atrasado") geram
+    uma pendência projeto_atrasado com a data do evento em data_referencia.
+    Ela só aparece no painel depois dessa data (ver filtro_pendencias), porque
+    o projeto fica atrasado com a passagem do tempo, sem nenhuma escrita.
+    """
+
+    base = {
+        "codigo": resumo.get("codigo"),
+        "sigla": resumo.get("sigla"),
+        "edital": resumo.get("edital"),
+        "padrinhos": resumo.get("padrinhos") or [],
+        "padrinho": resumo.get("padrinho") or "",
+    }
+
+    pendencias = []
+
+    def adicionar(tipo, demanda=None, numero=0, data_referencia=None):
+        pendencias.append({
+            **base,
+            "tipo": tipo,
+            "ordem_tipo": ORDEM_TIPOS_PENDENCIA[tipo],
+            "numero": numero,
+            "demanda": demanda,
+            "data_referencia": data_referencia,
+        })
+
+    if resumo.get("notificacao"):
+        adicionar("pendencia_cadastral", resumo["notificacao"])
+
+    if isinstance(resumo.get("data_proximo_evento"), datetime.datetime):
+        adicionar("projeto_atrasado", data_referencia=resumo["data_proximo_evento"])
+
+    for numero in resumo.get("relatorios_em_analise") or []:
+        adicionar("relatorio", f"Relatório {numero} aguardando análise.", numero=numero)
+
+    for i in range(resumo.get("qtd_remanejamentos_atividades_em_analise") or 0):
+        adicionar("ajuste", "Ajuste aguardando análise.", numero=i)
+
+    for i in range(resumo.get("qtd_remanejamentos_financeiros_em_analise") or 0):
+        adicionar("remanejamento_financeiro", "Remanejamento aguardando análise.", numero=i)
+
+    return pendencias
+
+
+def sincronizar_pendencias(db, resumos: list[dict]):
+    """
+    Substitui as pendências dos projetos informados pelas calculadas a partir
+    dos seus resumos (retira as resolvidas e coloca as novas).
+    """
+
+    codigos = [r["codigo"] for r in resumos if r.get("codigo")]
+
+    if not codigos:
+        return
+
+    col_pendencias = db[COLECAO_PENDENCIAS]
+
+    col_pendencias.delete_many({"codigo": {"$in": codigos}})
+
+    novas = [p for r in resumos for p in pendencias_do_resumo(r)]
+
+    if novas:
+        col_pendencias.insert_many(novas, ordered=False)
+
+
+def remover_pendencias_orfas(db, codigos_existentes: list[str]):
+    """
+    Remove pendências de projetos que não existem mais.
+    """
+
+    db[COLECAO_PENDENCIAS].delete_many({"codigo": {"$nin": codigos_existentes}})
+
+
+
+
+###########################################################################################################
+# CONSULTA DO PAINEL
+###########################################################################################################
+
+def filtro_pendencias(
+    hoje: datetime.date,
+    edital: str | None = None,
+    padrinho: str | None = None
+) -> dict:
+    """
+    Filtro do painel. Pendências de atraso só valem depois da data do evento.
+    """
+
+    hoje_dt = datetime.datetime(hoje.year, hoje.month, hoje.day)
+
+    filtro = {
+        "$or": [
+            {"tipo": {"$ne": "projeto_atrasado"}},
+            {"data_referencia": {"$lt": hoje_dt}},
+        ]
+    }
+
+    if edital:
+        filtro["edital"] = edital
+
+    if padrinho:
+        filtro["padrinhos"] = padrinho
+
+    return filtro
+
+
+def consultar_pendencias(
+    db,
+    edital: str | None = None,
+    padrinho: str | None = None,
+    pagina: int = 1,
+    por_pagina: int = PENDENCIAS_POR_PAGINA,
+    hoje: datetime.date | None = None
+) -> tuple[list[dict], int]:
+    """
+    Consulta uma página do painel de demandas de monitoramento.
+
+    Parâmetros:
+        edital: Código do edital (None para todos).
+        padrinho: Nome completo do padrinho/madrinha (None para todos).
+        pagina: Página a devolver, a partir de 1.
+
+    Retorna:
+        (pendências da página, total de pendências do filtro)
+    """
+
+    if hoje is None:
+        hoje = datetime.date.today()
+
+    filtro = filtro_pendencias(hoje, edital=edital, padrinho=padrinho)
+
+    col_pendencias = db[COLECAO_PENDENCIAS]
+
+    total = col_pendencias.count_documents(filtro)
+
+    pendencias = list(
+        col_pendencias.find(filtro, {"_id": 0})
+        .sort(ORDENACAO_PENDENCIAS)
+        .skip(max(pagina - 1, 0) * por_pagina)
+        .limit(por_pagina)
+    )
+
+    # O texto do atraso depende da data de hoje
+    for pendencia in pendencias:
+        if pendencia["tipo"] == "projeto_atrasado":
+            dias_atraso = (hoje - pendencia["data_referencia"].date()).days
+            pendencia["demanda"] = f"Projeto atrasado há {dias_atraso} dias."
+
+    return pendencias, total
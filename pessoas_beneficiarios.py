@@ -5,10 +5,19 @@ from funcoes_auxiliares import (
     obter_pasta_projeto, 
     add_permissao_drive
 )
+from escrita_projetos import atualizar_projeto
 import pandas as pd
 from bson import ObjectId
-import time
-from io import BytesIO
+from fila_tarefas import (
+    CONCLUIDA,
+    ERRO,
+    MIME_XLSX,
+    iniciar_tarefa_da_sessao,
+    intervalo_acompanhamento,
+    acompanhar_tarefa,
+    baixar_resultado,
+)
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Beneficiários", page_icon=":material/group:")
@@ -225,14 +234,14 @@ def editar_pessoa(_id: str):
                 }
 
                 # adiciona o contato ao projeto
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"_id": projeto["_id"]},
                     {"$push": {"contatos": novo_contato}}
                 )
 
 
-        st.success("Pessoa atualizada com sucesso!", icon=":material/check:")
-        time.sleep(3)
+        agendar_mensagem("Pessoa atualizada com sucesso!", icon=":material/check:")
         st.rerun()
 
 
@@ -263,24 +272,24 @@ st.header('Beneficiários(as)')
 
 st.write('')
 
-# Inicializa variáveis de estado caso ainda não existam
-if "xlsx_pessoas" not in st.session_state:
-    st.session_state.xlsx_pessoas = None
-
-if "tabela_gerada" not in st.session_state:
-    st.session_state.tabela_gerada = False
+# A planilha é gerada pelo trabalhador da fila de tarefas (fila_tarefas.py)
+CHAVE_TAREFA_XLSX = "tarefa_xlsx_pessoas"
 
 with st.container(horizontal=True, horizontal_alignment="right"):
 
     # Popover para download da tabela
     with st.popover("Baixar tabela", width=200):
 
-        # Fragment para isolar a renderização dos botões
-        @st.fragment
+        # Fragment para isolar a renderização dos botões. Atualiza sozinho enquanto a tabela é gerada.
+        @st.fragment(run_every=intervalo_acompanhamento(CHAVE_TAREFA_XLSX))
         def fragment_exportacao():
 
+            tarefa = acompanhar_tarefa(db, CHAVE_TAREFA_XLSX)
+
+            gerando = tarefa is not None and tarefa["status"] not in (CONCLUIDA, ERRO)
+
             # BOTÃO PARA GERAR A TABELA ------------------------------------------------
-            if st.button("Gerar tabela", icon=":material/settings:", width="stretch"):
+            if st.button("Gerar tabela", icon=":material/settings:", width="stretch", disabled=gerando):
 
                 # Filtra apenas usuários do tipo beneficiario
                 df_export = df_pessoas[
@@ -311,34 +320,37 @@ with st.container(horizontal=True, horizontal_alignment="right"):
 
                 df_export["Projetos"] = df_export["Projetos"].apply(tratar_projetos)
 
-                # Cria arquivo XLSX em memória
-                buffer = BytesIO()
-
-                # Salva dataframe no Excel
-                with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-                    df_export.to_excel(writer, index=False, sheet_name="Pessoas")
-
-                # Move o cursor do buffer para o início
-                buffer.seek(0)
+                # Pede a planilha à fila (os valores ausentes vão como vazio)
+                iniciar_tarefa_da_sessao(
+                    db,
+                    CHAVE_TAREFA_XLSX,
+                    "xlsx_tabela",
+                    {
+                        "linhas": df_export.astype(object).where(df_export.notna(), None).to_dict("records"),
+                        "colunas": list(df_export.columns),
+                        "aba": "Pessoas",
+                        "nome_arquivo": "beneficiarios.xlsx",
+                    }
+                )
 
-                # Armazena o arquivo em memória
-                st.session_state.xlsx_pessoas = buffer
 
-                # Marca que a tabela foi gerada
-                st.session_state.tabela_gerada = True
+            if gerando:
+                st.caption("Gerando tabela...")
 
+            elif tarefa is not None and tarefa["status"] == ERRO:
+                st.error("Não foi possível gerar a tabela. Tente novamente.")
 
 
             # BOTÃO DE DOWNLOAD -------------------------------------------------------
-            if st.session_state.tabela_gerada:
+            elif tarefa is not None and tarefa["status"] == CONCLUIDA:
 
                 st.caption("Tabela gerada! Clique para baixar.")
 
                 st.download_button(
                     label="Baixar tabela",
-                    data=st.session_state.xlsx_pessoas,
-                    file_name="beneficiarios.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    data=baixar_resultado(db, tarefa),
+                    file_name=tarefa["resultado"]["nome_arquivo"],
+                    mime=MIME_XLSX,
                     icon=":material/download:",
                     type="primary",
                     width="stretch"
@@ -1,16 +1,31 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao, obter_servico_drive, obter_pasta_projeto, add_permissao_drive
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, obter_servico_drive, obter_pasta_projeto, add_permissao_drive, carregar_projetos_portfolio
+from escrita_projetos import atualizar_projeto
+from resumo_projetos import atualizar_resumos_por_codigos
+from metricas_prometheus import registrar_falha
+from fila_emails import enfileirar_email
+from fila_tarefas import CONCLUIDA, ERRO, iniciar_tarefa_da_sessao, intervalo_acompanhamento, acompanhar_tarefa
+from convites_lote import (
+    ASSUNTO_CONVITE,
+    CHAVE_TAREFA_LOTE,
+    gerar_email_convite,
+    criar_lote,
+    continuar_lote,
+    AGUARDANDO_ENTREGA,
+    atualizar_entregas,
+    convites_entregues,
+    lote_parado,
+    lotes_inacabados,
+    linhas_com_falha,
+    resumo_lote,
+)
 import pandas as pd
 import locale
 import re
-import time
 import uuid
 import datetime
-import smtplib
 import random
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Convidar", page_icon=":material/person_add:")
@@ -30,7 +45,7 @@ col_pessoas = db["pessoas"]
 df_pessoas = pd.DataFrame(list(col_pessoas.find()))
 
 col_projetos = db["projetos"]
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+df_projetos = carregar_projetos_portfolio(db, "pessoas_cadastrar")
 
 
 
@@ -46,40 +61,21 @@ def gerar_codigo_aleatorio():
 
 def enviar_email_convite(nome_completo, email_destino, codigo):
     """
-    Envia um e-mail de convite com código de 6 dígitos usando credenciais do st.secrets.
-    Retorna True se enviado, False se falhou.
+    Coloca o e-mail de convite na caixa de saída (fila_emails.py).
+    Retorna True se gravado, False se falhou.
     """
     try:
-        smtp_server = st.secrets["senhas"]["smtp_server"]
-        port = st.secrets["senhas"]["port"]
-        endereco_email = st.secrets["senhas"]["endereco_email"]
-        senha_email = st.secrets["senhas"]["senha_email"]
-
-        msg = MIMEMultipart()
-        msg["From"] = formataddr(("Sistema Veredas", endereco_email))
-        msg['To'] = email_destino
-        msg['Subject'] = "Convite para o sistema Veredas"
-
-        corpo_html = f"""
-        <p>Olá {nome_completo},</p>
-        <p>Você foi convidado para utilizar o <strong>Sistema Veredas</strong>, a plataforma de gestão de projetos do IEB.</p>
-        <p>Para realizar seu cadastro, acesse o link abaixo e clique no botão <strong>"Primeiro acesso"</strong>:</p>
-        <p><a href="https://valid-veredas.streamlit.app/">Acesse aqui a Plataforma</a></p>
-        <p>Insira o seu <strong>e-mail</strong> e o <strong>código</strong> que te enviamos abaixo:</p>
-        <h2>{codigo}</h2>
-        <p>Se tiver alguma dúvida, entre em contato com a equipe do IEB.</p>
-        """
-
-        msg.attach(MIMEText(corpo_html, 'html'))
-
-        server = smtplib.SMTP(smtp_server, port)
-        server.starttls()
-        server.login(endereco_email, senha_email)
-        server.send_message(msg)
-        server.quit()
+        enfileirar_email(
+            db,
+            gerar_email_convite(nome_completo, codigo),
+            [email_destino],
+            ASSUNTO_CONVITE,
+            origem="enviar_email_convite"
+        )
 
         return True
     except Exception as e:
+        registrar_falha("smtp")
         st.error(f"Erro ao enviar e-mail para {email_destino}: {e}")
         return False
 
@@ -301,6 +297,9 @@ if opcao_cadastro == "Convite individual":
             # 4) Inserir no banco
             col_pessoas.insert_one(novo_doc)
 
+            # Padrinhos e madrinhas aparecem no resumo dos projetos
+            atualizar_resumos_por_codigos(db, novo_doc["projetos"])
+
 
 
             # ==========================================================
@@ -380,7 +379,8 @@ if opcao_cadastro == "Convite individual":
                         }
 
                         # adiciona o contato ao projeto
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {"_id": projeto["_id"]},
                             {"$push": {"contatos": novo_contato}}
                         )
@@ -397,12 +397,11 @@ if opcao_cadastro == "Convite individual":
                 codigo=codigo_6_digitos
             )
 
-            st.success(":material/check: Pessoa cadastrada com sucesso. E-mail de convite enviado.")
+            agendar_mensagem(":material/check: Pessoa cadastrada com sucesso. E-mail de convite enviado.")
 
 
             # 6) Limpar campos do formulário e rerun
             st.session_state["limpar_form_pessoa"] = True
-            time.sleep(4)
             st.rerun()
 
 
@@ -427,6 +426,72 @@ elif opcao_cadastro == "Convite em massa":
 
     st.write('')
 
+
+    # ------------------------------
+    # Lotes em processamento ou com falhas
+    # ------------------------------
+
+    # Atualiza sozinho enquanto a tarefa do lote está na fila
+    @st.fragment(run_every=intervalo_acompanhamento(CHAVE_TAREFA_LOTE))
+    def fragment_lotes():
+
+        tarefa = acompanhar_tarefa(db, CHAVE_TAREFA_LOTE)
+
+        if tarefa is not None and tarefa["status"] not in (CONCLUIDA, ERRO):
+            st.info(
+                f"Processando convites... etapa atual: {tarefa.get('progresso') or 'na fila'}.",
+                icon=":material/hourglass_top:"
+            )
+            return
+
+        for lote in lotes_inacabados(db):
+
+            # Situação real dos convites na caixa de saída
+            lote = atualizar_entregas(db, lote)
+
+            resumo = resumo_lote(lote)
+
+            with st.container(border=True):
+
+                st.write(
+                    f"**Lote de {lote['criado_em']:%d/%m/%Y %H:%M}** "
+                    f"({lote['total']} pessoas, por {lote.get('criado_por') or '-'})"
+                )
+
+                st.write(
+                    f"Cadastradas: {resumo['cadastro']['ok']}  |  "
+                    f"Convites na caixa de saída: {resumo['convite']['ok']}  |  "
+                    f"Convites enviados: {convites_entregues(lote)}  |  "
+                    f"Permissões no Drive: {resumo['permissoes']['ok']}"
+                )
+
+                if lote["status"] == AGUARDANDO_ENTREGA:
+                    st.caption("Aguardando o envio dos convites pela caixa de saída.")
+
+                falhas = linhas_com_falha(lote)
+
+                if falhas:
+                    st.warning(f"{len(falhas)} linhas com falha.", icon=":material/warning:")
+                    st.dataframe(pd.DataFrame(falhas), hide_index=True)
+
+                if st.button(
+                    "Continuar lote",
+                    icon=":material/replay:",
+                    key=f"continuar_lote_{lote['_id']}",
+                    disabled=not lote_parado(lote) or (lote["status"] == AGUARDANDO_ENTREGA and not falhas)
+                ):
+                    continuar_lote(db, lote["_id"])
+                    iniciar_tarefa_da_sessao(db, CHAVE_TAREFA_LOTE, "convites_lote", {"id_lote": str(lote["_id"])})
+
+        if tarefa is not None and tarefa["status"] == CONCLUIDA:
+            resumo = tarefa.get("resultado") or {}
+            if not any((resumo.get(etapa) or {}).get("erro") for etapa in resumo):
+                st.success(":material/check: Todas as pessoas do lote foram cadastradas e os convites foram para a caixa de saída.")
+
+    fragment_lotes()
+
+    st.write('')
+
     st.write("Baixe aqui o modelo de tabela para convite em massa:")
 
     with open("modelos/modelo_convite_pessoas_em_massa.xlsx", "rb") as f:
@@ -647,158 +712,48 @@ elif opcao_cadastro == "Convite em massa":
             # ==========================================================
             if st.button(":material/save: Confirmar e convidar pessoas", type="primary"):
 
-                with st.spinner("Enviando e-mails... Aguarde..."):
-
-
-
-                    registros = []
-                    for _, row in df_upload.iterrows():
-
-                        # gera código único para cada pessoa
-                        codigo_6_digitos_massa = gerar_codigo_aleatorio()
-
-                        doc = {
-                            "nome_completo": row["nome_completo"],
-                            "tipo_usuario": "beneficiario",
-                            "tipo_beneficiario": row["tipo_beneficiario"],
-                            "e_mail": row["e_mail"],
-                            "status": "convidado",
-                            "codigo_convite": codigo_6_digitos_massa,
-                            "data_convite": datetime.datetime.now().strftime("%d/%m/%Y"),
-                            "senha": None
-                        }
-
-                        if (
-                            pd.notna(row["telefone (opcional)"])
-                            and str(row["telefone (opcional)"]).strip()
-                        ):
-
-                            telefone_formatado = formatar_telefone(
-                                row["telefone (opcional)"]
-                            )
-
-                            doc["telefone"] = telefone_formatado
-
-                        # if pd.notna(row["telefone (opcional)"]) and str(row["telefone (opcional)"]).strip():
-                        #     doc["telefone"] = str(row["telefone (opcional)"]).strip()
-
-                        if row["projetos"]:
-                            doc["projetos"] = row["projetos"]
-
-                        registros.append(doc)
-
-
-                    # 1) Inserção em massa no banco
-                    resultado = col_pessoas.insert_many(registros)
-
-                    st.success(f":material/check: {len(resultado.inserted_ids)} pessoas cadastradas no banco de dados!")
-                    st.write('')
-
-                    # 2) Envio de e-mails com barra de progresso
-
-                    st.write('')
-
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-
-                    total = len(registros)
-                    falhas = []  # <- LISTA PARA ARMAZENAR FALHAS
-
-
-
-                    status_line = st.empty()   # <-- Placeholder que será atualizado a cada iteração
-
-
-
-                    # Inicializa serviço do Drive uma única vez
-                    servico_drive = obter_servico_drive()
-
-
-                    for i, pessoa in enumerate(registros):
-
-                        nome = pessoa["nome_completo"]
-                        email = pessoa["e_mail"]
-                        codigo = pessoa["codigo_convite"]
-
-                        # Mostra mensagem atual (não acumula)
-                        status_line.write(f"Enviando e-mail para **{email}**...")
-
-                        try:
-                            enviar_email_convite(
-                                nome_completo=nome,
-                                email_destino=email,
-                                codigo=codigo
-                            )
-
-                        except Exception as e:
-                            falhas.append((email, str(e)))
-                            status_line.error(f":material/error: Falha ao enviar e-mail para {email}. Erro: {e}")
-
-                        # ==========================================================
-                        # Concede permissões no Google Drive para os projetos da pessoa
-                        # ==========================================================
-
-                        if email:
-
-                            for codigo_projeto in pessoa.get("projetos", []):
-
-                                try:
-                                    # Busca o projeto para obter a sigla
-                                    projeto = col_projetos.find_one({"codigo": codigo_projeto})
-
-                                    if not projeto:
-                                        continue
-
-                                    sigla = projeto.get("sigla", "")
-
-                                    # Obtém (ou cria) a pasta do projeto
-                                    pasta_id = obter_pasta_projeto(
-                                        servico_drive,
-                                        codigo_projeto,
-                                        sigla
-                                    )
-
-                                    # Estrutura mínima esperada pela função
-                                    contato_drive = {
-                                        "email": email
-                                    }
-
-                                    # Aplica permissão de leitura
-                                    add_permissao_drive(servico_drive, pasta_id, contato_drive)
-
-                                except Exception:
-                                    # Falhas individuais não interrompem o fluxo
-                                    continue
-
-                        progress_bar.progress((i + 1) / total)
-
-                        time.sleep(2)
-
-
-                # Após terminar, limpar o placeholder
-                status_line.empty()
+                registros = []
+                for _, row in df_upload.iterrows():
 
+                    # gera código único para cada pessoa
+                    codigo_6_digitos_massa = gerar_codigo_aleatorio()
+
+                    doc = {
+                        "nome_completo": row["nome_completo"],
+                        "tipo_usuario": "beneficiario",
+                        "tipo_beneficiario": row["tipo_beneficiario"],
+                        "e_mail": row["e_mail"],
+                        "status": "convidado",
+                        "codigo_convite": codigo_6_digitos_massa,
+                        "data_convite": datetime.datetime.now().strftime("%d/%m/%Y"),
+                        "senha": None
+                    }
+
+                    if (
+                        pd.notna(row["telefone (opcional)"])
+                        and str(row["telefone (opcional)"]).strip()
+                    ):
+
+                        telefone_formatado = formatar_telefone(
+                            row["telefone (opcional)"]
+                        )
 
+                        doc["telefone"] = telefone_formatado
 
+                    if row["projetos"]:
+                        doc["projetos"] = row["projetos"]
 
-                # --- Relatório final ---
+                    registros.append(doc)
 
-                sucessos = total - len(falhas)
 
-                if len(falhas) == 0:
-                    st.success(f":material/check: Todos os {sucessos} convites foram enviados com sucesso!")
-                else:
-                    st.success(f":material/check: {sucessos} convites foram enviados com sucesso.")
-                    st.warning(f":material/warning: Porém, {len(falhas)} e-mails não puderam ser enviados.")
-                    
-                    st.write("### E-mails com falha:")
-                    for email, motivo in falhas:
-                        st.write(f"- **{email}** — erro: {motivo}")
+                # Cadastro, convites e permissões no Drive são feitos pela fila de
+                # tarefas (convites_lote.py), com a situação de cada linha gravada no lote
+                id_lote = criar_lote(db, registros, st.session_state.get("nome"))
 
                 # Resetar uploader
                 st.session_state['uploader_key'] = str(uuid.uuid4())
-                time.sleep(10)
-                st.rerun()
+
+                iniciar_tarefa_da_sessao(db, CHAVE_TAREFA_LOTE, "convites_lote", {"id_lote": str(id_lote)})
 
 
 
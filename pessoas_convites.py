@@ -1,8 +1,9 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_projetos_portfolio  # Função personalizada para conectar ao MongoDB
+from resumo_projetos import atualizar_resumos_por_codigos
 import pandas as pd
 from bson import ObjectId
-import time
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -34,7 +35,7 @@ col_projetos = db["projetos"]
 
 # PROJETOS
 
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+df_projetos = carregar_projetos_portfolio(db, "pessoas_convites")
 # Converte objectId para string
 df_projetos['_id'] = df_projetos['_id'].astype(str)
 
@@ -172,8 +173,10 @@ def editar_pessoa(_id: str):
         # Atualiza o registro
         col_pessoas.update_one({"_id": ObjectId(_id)}, {"$set": update_data})
 
-        st.success("Pessoa atualizada com sucesso!")
-        time.sleep(2)
+        # Atualiza o padrinho/madrinha no resumo dos projetos antigos e novos
+        atualizar_resumos_por_codigos(db, set(pessoa.get("projetos") or []) | set(projetos))
+
+        agendar_mensagem("Pessoa atualizada com sucesso!")
         st.rerun()
 
 
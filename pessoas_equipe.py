@@ -1,8 +1,9 @@
 import streamlit as st
 from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from resumo_projetos import atualizar_resumos_por_codigos
 import pandas as pd
 from bson import ObjectId
-import time
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -203,8 +204,10 @@ def editar_pessoa(_id: str):
             {"$set": update_data},
         )
 
-        st.success("Pessoa atualizada com sucesso!", icon=":material/check:")
-        time.sleep(2)
+        # Atualiza o padrinho/madrinha no resumo dos projetos antigos e novos
+        atualizar_resumos_por_codigos(db, set(projetos_pessoa) | set(projetos))
+
+        agendar_mensagem("Pessoa atualizada com sucesso!", icon=":material/check:")
         st.rerun()
 
 
@@ -2,7 +2,7 @@ import streamlit as st
 from funcoes_auxiliares import conectar_mongo_cepf_gestao, obter_servico_drive, obter_pasta_projeto, add_permissao_drive
 import pandas as pd
 from bson import ObjectId
-import time
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Visitantes", page_icon=":material/visibility:")
@@ -185,8 +185,7 @@ def editar_pessoa(_id: str):
                     # Falhas individuais não interrompem o fluxo
                     continue
 
-        st.success("Pessoa atualizada com sucesso!", icon=":material/check:")
-        time.sleep(3)
+        agendar_mensagem("Pessoa atualizada com sucesso!", icon=":material/check:")
         st.rerun()
 
 
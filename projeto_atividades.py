@@ -2,7 +2,6 @@ import streamlit as st
 import pandas as pd
 import streamlit_shadcn_ui as ui
 import datetime
-import time
 import bson
 
 from funcoes_auxiliares import (
@@ -12,6 +11,15 @@ from funcoes_auxiliares import (
     enviar_email,
     calcular_status_atividade
 )
+from escrita_projetos import (
+    atualizar_projeto,
+    atualizar_projeto_versionado,
+    MENSAGEM_CONFLITO_VERSAO,
+)
+from historico_projetos import carregar_relatos, excluir_relatos_atividade
+from fila_tarefas import envios_com_erro
+from templates_email import renderizar_email
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -127,7 +135,8 @@ def renderizar_acoes_remanejamento(item, idx):
                     ] = valor
 
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {
                         "$set": {
@@ -168,7 +177,8 @@ def renderizar_acoes_remanejamento(item, idx):
                     "porcentagem_atv": 0
                 }
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {
                         "$push": {
@@ -198,7 +208,8 @@ def renderizar_acoes_remanejamento(item, idx):
                 entrega_nome = item.get("entrega")
                 atividade_id = item.get("atividade_id")
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {
                         "$pull": {
@@ -217,6 +228,9 @@ def renderizar_acoes_remanejamento(item, idx):
                     ]
                 )
 
+                # Os relatos da atividade excluída ficam na coleção relatos
+                excluir_relatos_atividade(db, codigo_projeto_atual, atividade_id)
+
 
             # ==================================================
             # Buscar projeto atualizado
@@ -255,8 +269,7 @@ def renderizar_acoes_remanejamento(item, idx):
                 )
 
 
-            st.success("Ajuste aprovado.", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Ajuste aprovado.", icon=":material/check:")
             st.rerun()
 
 
@@ -310,7 +323,8 @@ def renderizar_acoes_remanejamento(item, idx):
 
                     log_recusa = f"Recusado por {nome} em {data}"
 
-                    col_projetos.update_one(
+                    atualizar_projeto(
+                        col_projetos,
                         {"codigo": codigo_projeto_atual},
                         {
                             "$set": {
@@ -803,139 +817,19 @@ def enviar_email_remanejamento_atividade(
     codigo = projeto.get("codigo")
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
-    
-    antes = item_remanejamento.get("antes", {})
-    depois = item_remanejamento.get("depois", {})
-
-    # atividade_nome = item_remanejamento.get("atividade_nome", "Atividade")
-
-    autor = st.session_state.get("nome", "Usuário")
-    data_solic = item_remanejamento.get("data_solicit_remanej")
-
-    # --------------------------------------------------
-    # Montar tabela de alterações
-    # --------------------------------------------------
-
-    linhas_alteracoes = ""
-
-    campos = set(list(antes.keys()) + list(depois.keys()))
-
-    nomes_campos = {
-        "atividade": "Descrição da atividade",
-        "data_inicio": "Data de início",
-        "data_fim": "Data de fim"
-    }
-
-    for campo in campos:
-
-        valor_antes = antes.get(campo, "-")
-        valor_depois = depois.get(campo, "-")
-
-        campo_legivel = nomes_campos.get(campo, campo)
-
-        linhas_alteracoes += f"""
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{campo_legivel}</td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{valor_antes}</td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{valor_depois}</td>
-        </tr>
-        """
-
 
     assunto = f"Nova solicitação de alteração de atividade - {codigo}"
 
-    logo = logo_ieb
-
-
-    # --------------------------------------------------
-    # Corpo do email
-    # --------------------------------------------------
-
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #A0C256; /* verde */
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #A0C256;
-        font-weight: bold;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi enviada uma nova solicitação de
-        <span class="highlight"><strong>ajuste de atividade</strong></span>
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <p>
-        <strong>Solicitado por:</strong> {autor}<br>
-        <strong>Data:</strong> {data_solic}
-        </p>
-
-        <br>
-
-        <p>
-        <strong>AÇÃO NECESSÁRIA:</strong><br>
-        Acesse a aba de <strong>Ajustes</strong>
-        na página de <strong>Atividades</strong>
-        para ver os detalhes desta solicitação.
-        </p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
-
+    corpo_html = renderizar_email(
+        "remanejamento_atividade.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        autor=st.session_state.get("nome", "Usuário"),
+        data_solicitacao=item_remanejamento.get("data_solicit_remanej")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remanejamento_atividade")
 
 
 
@@ -969,143 +863,24 @@ def enviar_email_remanejamento_atividade_aprovado(
     if not destinatarios:
         return
 
+
     codigo = projeto.get("codigo")
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
 
-    justificativa = item_remanejamento.get("justificativa", "")
-
-    antes = item_remanejamento.get("antes", {})
-    depois = item_remanejamento.get("depois", {})
-
-    atividade_nome = item_remanejamento.get("atividade_nome", "Atividade")
-
-    # --------------------------------------------------
-    # Montar tabela de alterações
-    # --------------------------------------------------
-
-    linhas_alteracoes = ""
-
-    campos = set(list(antes.keys()) + list(depois.keys()))
-
-    for campo in campos:
-
-        valor_antes = antes.get(campo, "-")
-        valor_depois = depois.get(campo, "-")
-
-        nomes_campos = {
-            "atividade": "Descrição da atividade",
-            "data_inicio": "Data de início",
-            "data_fim": "Data de fim"
-        }
-
-        campo_legivel = nomes_campos.get(campo, campo)
-
-        linhas_alteracoes += f"""
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{campo_legivel}</td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{valor_antes}</td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{valor_depois}</td>
-        </tr>
-        """
-
     assunto = "Ajuste de atividade aprovado"
 
-    logo = logo_ieb
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #A0C256;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #A0C256;
-        font-weight: bold;
-    }}
-
-    table {{
-        border-collapse: collapse;
-        font-size: 14px;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>aprovada</strong></span>
-        uma solicitação de ajuste de atividade
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-        <p><strong>Alterações aprovadas:</strong></p>
-
-        <table width="100%">
-        <tr style="background:#f5f5f5;">
-            <th style="padding:6px 10px; border:1px solid #ddd;">Campo</th>
-            <th style="padding:6px 10px; border:1px solid #ddd;">Antes</th>
-            <th style="padding:6px 10px; border:1px solid #ddd;">Depois</th>
-        </tr>
-
-        {linhas_alteracoes}
-
-        </table>
-
-        <br>
-
-        <p><strong>Justificativa original:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remanejamento_atividade_aprovado.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        antes=item_remanejamento.get("antes", {}),
+        depois=item_remanejamento.get("depois", {}),
+        justificativa=item_remanejamento.get("justificativa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remanejamento_atividade_aprovado")
 
 
 
@@ -1138,152 +913,25 @@ def enviar_email_remanejamento_atividade_recusado(
     if not destinatarios:
         return
 
-    # Dados principais do projeto
+
     codigo = projeto.get("codigo")
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
 
-
-    justificativa = item_remanejamento.get("justificativa", "")
-    motivo_recusa = item_remanejamento.get("motivo_recusa", "")
-
-    antes = item_remanejamento.get("antes", {})
-    depois = item_remanejamento.get("depois", {})
-
-    atividade_nome = item_remanejamento.get("atividade_nome", "Atividade")
-
-    # --------------------------------------------------
-    # Montar tabela de alterações
-    # --------------------------------------------------
-
-    linhas_alteracoes = ""
-
-    campos = set(list(antes.keys()) + list(depois.keys()))
-
-    for campo in campos:
-
-        valor_antes = antes.get(campo, "-")
-        valor_depois = depois.get(campo, "-")
-
-        nomes_campos = {
-            "atividade": "Descrição da atividade",
-            "data_inicio": "Data de início",
-            "data_fim": "Data de fim"
-        }
-
-        campo_legivel = nomes_campos.get(campo, campo)
-
-        linhas_alteracoes += f"""
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{campo_legivel}</td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{valor_antes}</td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{valor_depois}</td>
-        </tr>
-        """
-
     assunto = "Ajuste de atividade recusado"
 
-    logo = logo_ieb
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #C82333;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #C82333;
-        font-weight: bold;
-    }}
-
-    table {{
-        border-collapse: collapse;
-        font-size: 14px;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>recusada</strong></span>
-        uma solicitação de ajuste de atividade
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-        <p><strong>Alterações solicitadas:</strong></p>
-
-        <table width="100%">
-        <tr style="background:#f5f5f5;">
-            <th style="padding:6px 10px; border:1px solid #ddd;">Campo</th>
-            <th style="padding:6px 10px; border:1px solid #ddd;">Antes</th>
-            <th style="padding:6px 10px; border:1px solid #ddd;">Depois</th>
-        </tr>
-
-        {linhas_alteracoes}
-
-        </table>
-
-        <br>
-
-        <p><strong>Justificativa original:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p><strong>Motivo da recusa:</strong></p>
-        <p>{motivo_recusa}</p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remanejamento_atividade_recusado.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        antes=item_remanejamento.get("antes", {}),
+        depois=item_remanejamento.get("depois", {}),
+        justificativa=item_remanejamento.get("justificativa", ""),
+        motivo_recusa=item_remanejamento.get("motivo_recusa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remanejamento_atividade_recusado")
 
 
 
@@ -1320,88 +968,16 @@ def enviar_email_nova_atividade(
     if not destinatarios:
         return
 
-    # Dados principais do projeto
-    nome_projeto = projeto.get("nome_do_projeto")
-
-    # Busca o nome da organização vinculada ao projeto
-    organizacao = obter_nome_organizacao(projeto)
-
-
-    logo = logo_ieb
-
     assunto = f"Solicitação de nova atividade - {codigo_projeto}"
 
-    corpo_html = f"""
-    <html>
-    <head>
-    <style>
-
-    body {{
-        font-family: Arial;
-        background:#f5f5f5;
-    }}
-
-    .container {{
-        max-width:760px;
-        margin:auto;
-        background:white;
-        border-top:6px solid #A0C256;
-        padding:30px;
-    }}
-
-    .logo {{
-        text-align:center;
-        margin-bottom:20px;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi recebida uma solicitação de
-        <strong>nova atividade</strong>
-        no projeto
-        <strong>{codigo_projeto} - {nome_projeto}</strong>
-        da organização
-        <strong>{organizacao}</strong>.
-        </p>
-
-        <br>
-
-        <p>
-        <strong>AÇÃO NECESSÁRIA:</strong><br>
-        Acesse a aba de <strong>Ajustes</strong>
-        na página de <strong>Atividades</strong>
-        para ver os detalhes desta solicitação.
-        </p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "nova_atividade.html",
+        codigo=codigo_projeto,
+        nome_projeto=projeto.get("nome_do_projeto"),
+        organizacao=obter_nome_organizacao(projeto)
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_nova_atividade")
 
 
 
@@ -1439,132 +1015,22 @@ def enviar_email_nova_atividade_aprovada(
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
 
-    componente = item_remanejamento.get("componente")
-    entrega = item_remanejamento.get("entrega")
-
-    atividade = item_remanejamento.get("add_atividade")
-    data_inicio = item_remanejamento.get("data_inicio")
-    data_fim = item_remanejamento.get("data_fim")
-
-    justificativa = item_remanejamento.get("justificativa", "")
-
     assunto = "Nova atividade aprovada"
 
-    logo = logo_ieb
-
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #A0C256;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #A0C256;
-        font-weight: bold;
-    }}
-
-    table {{
-        border-collapse: collapse;
-        font-size: 14px;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>aprovada</strong></span>
-        uma solicitação de <strong>nova atividade</strong>
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-        <p><strong>Atividade criada:</strong></p>
-
-        <table width="100%">
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Componente</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{componente}</td>
-        </tr>
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Entrega</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{entrega}</td>
-        </tr>
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Descrição da atividade</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{atividade}</td>
-        </tr>
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Data de início</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{data_inicio}</td>
-        </tr>
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Data de fim</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{data_fim}</td>
-        </tr>
-
-        </table>
-
-        <br>
-
-        <p><strong>Justificativa apresentada:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "nova_atividade_aprovada.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        componente=item_remanejamento.get("componente"),
+        entrega=item_remanejamento.get("entrega"),
+        atividade=item_remanejamento.get("add_atividade"),
+        data_inicio=item_remanejamento.get("data_inicio"),
+        data_fim=item_remanejamento.get("data_fim"),
+        justificativa=item_remanejamento.get("justificativa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_nova_atividade_aprovada")
 
 
 
@@ -1598,123 +1064,21 @@ def enviar_email_nova_atividade_recusada(
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
 
-    atividade = item_remanejamento.get("add_atividade")
-    data_inicio = item_remanejamento.get("data_inicio")
-    data_fim = item_remanejamento.get("data_fim")
-
-    justificativa = item_remanejamento.get("justificativa", "")
-    motivo_recusa = item_remanejamento.get("motivo_recusa", "")
-
     assunto = "Solicitação de nova atividade recusada"
 
-    logo = logo_ieb
-
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #C82333;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #C82333;
-        font-weight: bold;
-    }}
-
-    table {{
-        border-collapse: collapse;
-        font-size: 14px;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>recusada</strong></span>
-        uma solicitação de <strong>nova atividade</strong>
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-        <p><strong>Atividade solicitada:</strong></p>
-
-        <table width="100%">
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Descrição</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{atividade}</td>
-        </tr>
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Data de início</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{data_inicio}</td>
-        </tr>
-
-        <tr>
-            <td style="padding:6px 10px; border:1px solid #ddd;"><strong>Data de fim</strong></td>
-            <td style="padding:6px 10px; border:1px solid #ddd;">{data_fim}</td>
-        </tr>
-        </table>
-
-        <br>
-
-        <p><strong>Justificativa apresentada:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p><strong>Motivo da recusa:</strong></p>
-        <p>{motivo_recusa}</p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "nova_atividade_recusada.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        atividade=item_remanejamento.get("add_atividade"),
+        data_inicio=item_remanejamento.get("data_inicio"),
+        data_fim=item_remanejamento.get("data_fim"),
+        justificativa=item_remanejamento.get("justificativa", ""),
+        motivo_recusa=item_remanejamento.get("motivo_recusa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_nova_atividade_recusada")
 
 
 
@@ -1755,87 +1119,14 @@ def enviar_email_remocao_atividade_solicitada(
 
     assunto = f"Nova solicitação de remoção de atividade - {codigo}"
 
-    logo = logo_ieb
-
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #A0C256;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #A0C256;
-        font-weight: bold;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi enviada uma nova solicitação de
-        <span class="highlight"><strong>remoção de atividade</strong></span>
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-        <p>
-        <strong>AÇÃO NECESSÁRIA:</strong><br>
-        Acesse a aba de <strong>Ajustes</strong>
-        na página de <strong>Atividades</strong>
-        para analisar esta solicitação.
-        </p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remocao_atividade_solicitada.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remocao_atividade_solicitada")
 
 
 
@@ -1865,102 +1156,18 @@ def enviar_email_remocao_atividade_aprovada(
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
 
-    atividade = item_remanejamento.get("del_atividade")
-    data_inicio = item_remanejamento.get("data_inicio")
-    data_fim = item_remanejamento.get("data_fim")
-
-    justificativa = item_remanejamento.get("justificativa", "")
-    autor = item_remanejamento.get("autor", "-")
-    data_aprov = item_remanejamento.get("data_aprov_remanej", "-")
-
     assunto = "Remoção de atividade aprovada"
 
-    logo = logo_ieb
-
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #A0C256;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #A0C256;
-        font-weight: bold;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>aprovada</strong></span>
-        uma solicitação de <strong>remoção de atividade</strong>
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-
-        <p><strong>Atividade removida:</strong></p>
-
-        <p>
-        {atividade}
-        </p>
-
-        <br>
-
-        <p><strong>Justificativa da solicitação:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remocao_atividade_aprovada.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        atividade=item_remanejamento.get("del_atividade"),
+        justificativa=item_remanejamento.get("justificativa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remocao_atividade_aprovada")
 
 
 
@@ -1998,100 +1205,19 @@ def enviar_email_remocao_atividade_recusada(
     nome_projeto = projeto.get("nome_do_projeto")
     organizacao = obter_nome_organizacao(projeto)
 
-    atividade = item_remanejamento.get("del_atividade")
-
-    justificativa = item_remanejamento.get("justificativa", "")
-    motivo_recusa = item_remanejamento.get("motivo_recusa", "")
-
     assunto = "Solicitação de remoção de atividade recusada"
 
-    logo = logo_ieb
-
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #C82333;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #C82333;
-        font-weight: bold;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>recusada</strong></span>
-        uma solicitação de <strong>remoção de atividade</strong>
-        no projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>.
-        </p>
-
-        <br>
-
-        <p><strong>Atividade solicitada para remoção:</strong></p>
-        <p>{atividade}</p>
-
-        <br>
-
-        <p><strong>Justificativa apresentada:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p><strong>Motivo da recusa:</strong></p>
-        <p>{motivo_recusa}</p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remocao_atividade_recusada.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        atividade=item_remanejamento.get("del_atividade"),
+        justificativa=item_remanejamento.get("justificativa", ""),
+        motivo_recusa=item_remanejamento.get("motivo_recusa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remocao_atividade_recusada")
 
 
 
@@ -2102,7 +1228,8 @@ def salvar_impactos(chave, impactos, codigo_projeto):
     Salva lista de impactos no banco.
     """
 
-    resultado = col_projetos.update_one(
+    resultado = atualizar_projeto(
+        col_projetos,
         {"codigo": codigo_projeto},
         {"$set": {chave: impactos}}
     )
@@ -2136,22 +1263,21 @@ def dialog_relatos():
     st.write("")
 
     # ============================================================
-    # BUSCAR RELATOS DA ATIVIDADE NO DOCUMENTO DO PROJETO
+    # BUSCAR RELATOS DA ATIVIDADE (COLEÇÃO RELATOS)
     # ============================================================
-    projeto = df_projeto.iloc[0].to_dict()
-    relatos_encontrados = []
-
-    for componente in projeto.get("plano_trabalho", {}).get("componentes", []):
-        for entrega in componente.get("entregas", []):
-            for atv in entrega.get("atividades", []):
-                if atv.get("id") == atividade.get("id"):
-                    relatos_encontrados = atv.get("relatos", [])
-                    break
+    relatos_encontrados = carregar_relatos(
+        db,
+        codigo_projeto_atual,
+        id_atividade=atividade.get("id") or atividade.get("atividade")
+    )
 
     if not relatos_encontrados:
         st.caption("Esta atividade ainda não possui relatos.")
         return
 
+    # Arquivos cujo envio ao Drive esgotou as tentativas
+    envios_falhos = envios_com_erro(db, codigo_projeto_atual)
+
     # ============================================================
     # RENDERIZAÇÃO DOS RELATOS
     # ============================================================
@@ -2254,6 +1380,10 @@ def dialog_relatos():
                                 f"[{a['nome_arquivo']}]({link})",
                                 unsafe_allow_html=True
                             )
+                        elif a.get("id_envio") in envios_falhos:
+                            c2.caption(f"{a['nome_arquivo']} (falha no envio ao Drive, ver página de relatórios)")
+                        elif a.get("envio_pendente"):
+                            c2.caption(f"{a['nome_arquivo']} (enviando ao Drive...)")
 
             # --------------------------------------------------
             # FOTOGRAFIAS
@@ -2271,6 +1401,10 @@ def dialog_relatos():
                             if f.get("fotografo"):
                                 linha += f" | {f['fotografo']}"
                             c2.markdown(linha, unsafe_allow_html=True)
+                        elif f.get("id_envio") in envios_falhos:
+                            c2.caption(f"{f['nome_arquivo']} (falha no envio ao Drive, ver página de relatórios)")
+                        elif f.get("envio_pendente"):
+                            c2.caption(f"{f['nome_arquivo']} (enviando ao Drive...)")
 
  
 
@@ -2280,10 +1414,6 @@ def dialog_relatos():
 # TRATAMENTO DE DADOS
 ###########################################################################################################
 
-# Logo hospedada no site do IEB para renderizar nos e-mails.
-logo_ieb = "https://iieb.org.br/wp-content/uploads/2021/02/IEB-logo.svg"
-
-
 codigo_projeto_atual = st.session_state.get("projeto_atual")
 
 if not codigo_projeto_atual:
@@ -3008,10 +2138,9 @@ with plano_trabalho:
                     # Persistência
                     # ------------------------------------------------------
 
-                    resultado = col_projetos.update_one(
-
-                        {"codigo": codigo_projeto_atual},
-
+                    gravou = atualizar_projeto_versionado(
+                        col_projetos,
+                        projeto_dict,
                         {
                             "$set": {
                                 "plano_trabalho.componentes": componentes_atualizados
@@ -3019,20 +2148,18 @@ with plano_trabalho:
                         }
                     )
 
-                    if resultado.matched_count == 1:
+                    if gravou:
 
-                        st.success(
+                        agendar_mensagem(
                             "Atividades atualizadas com sucesso!",
                             icon=":material/check:"
                         )
 
-                        time.sleep(3)
-
                         st.rerun()
 
                     else:
 
-                        st.error("Erro ao atualizar atividades.")
+                        st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
 
 
 
@@ -3148,13 +2275,15 @@ with plano_trabalho:
                         if c["componente"] == nome:
                             c["entregas"] = nova_lista
 
-                    col_projetos.update_one(
-                        {"codigo": codigo_projeto_atual},
+                    if not atualizar_projeto_versionado(
+                        col_projetos,
+                        projeto_dict,
                         {"$set": {"plano_trabalho.componentes": componentes}}
-                    )
+                    ):
+                        st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                        st.stop()
 
-                    st.success("Entregas atualizadas com sucesso!", icon=":material/check:")
-                    time.sleep(3)
+                    agendar_mensagem("Entregas atualizadas com sucesso!", icon=":material/check:")
                     st.rerun()
 
 
@@ -3237,13 +2366,15 @@ with plano_trabalho:
                             "entregas": []
                         })
 
-                col_projetos.update_one(
-                    {"codigo": codigo_projeto_atual},
+                if not atualizar_projeto_versionado(
+                    col_projetos,
+                    projeto_dict,
                     {"$set": {"plano_trabalho.componentes": novos_componentes}}
-                )
+                ):
+                    st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                    st.stop()
 
-                st.success("Componentes atualizados com sucesso!", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Componentes atualizados com sucesso!", icon=":material/check:")
                 st.rerun()
 
 
@@ -3483,13 +2614,11 @@ with impactos:
 
             if ok_lp and ok_cp:
 
-                st.success(
+                agendar_mensagem(
                     "Impactos de longo e curto prazo salvos com sucesso!",
                     icon=":material/check:"
                 )
 
-                time.sleep(3)
-
                 st.rerun()
 
             else:
@@ -3848,23 +2977,22 @@ with indicadores:
                         indicadores_filtrados.append(indicador_para_salvar)
 
                         # Atualiza no banco
-                        resultado = col_projetos.update_one(
-                            {"codigo": codigo_projeto_atual},
+                        gravou = atualizar_projeto_versionado(
+                            col_projetos,
+                            projeto,
                             {"$set": {"indicadores": indicadores_filtrados}}
                         )
 
                         # Mensagem de retorno
-                        if resultado.matched_count == 1:
-
-                            st.success("Indicador atualizado com sucesso!", icon=":material/check:")
+                        if gravou:
 
-                            time.sleep(3)
+                            agendar_mensagem("Indicador atualizado com sucesso!", icon=":material/check:")
 
                             st.rerun()
 
                         else:
 
-                            st.error("Erro ao salvar indicador.")
+                            st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
 
 
                 # Separador visual entre indicadores
@@ -4336,20 +3464,20 @@ with monitoramento:
                                 # --------------------------------------------------
                                 # Persistência no MongoDB
                                 # --------------------------------------------------
-                                resultado = col_projetos.update_one(
-                                    {"codigo": codigo_projeto_atual},
+                                gravou = atualizar_projeto_versionado(
+                                    col_projetos,
+                                    projeto_dict,
                                     {"$set": {"plano_trabalho.componentes": componentes_atualizados}}
                                 )
 
                                 # --------------------------------------------------
                                 # Feedback ao usuário
                                 # --------------------------------------------------
-                                if resultado.matched_count == 1:
-                                    st.success("Indicadores do projeto salvos com sucesso.", icon=":material/check:")
-                                    time.sleep(3)
+                                if gravou:
+                                    agendar_mensagem("Indicadores do projeto salvos com sucesso.", icon=":material/check:")
                                     st.rerun()
                                 else:
-                                    st.error("Erro ao salvar indicadores do projeto.")
+                                    st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
 
 
 
@@ -4598,7 +3726,8 @@ with ajustes:
                                 "autor": st.session_state.get("nome")
                             }
 
-                            col_projetos.update_one(
+                            atualizar_projeto(
+                                col_projetos,
                                 {"codigo": codigo_projeto_atual},
                                 {
                                     "$push": {
@@ -4617,9 +3746,7 @@ with ajustes:
                                 novo_remanejamento
                             )
 
-                            st.success("Solicitação enviada com sucesso!", icon=":material/check:")
-
-                            time.sleep(3)
+                            agendar_mensagem("Solicitação enviada com sucesso!", icon=":material/check:")
 
                             st.session_state["modo_remanejamento"] = "lista"
                             st.session_state.pop("atividade_remanejamento", None)
@@ -4942,7 +4069,8 @@ with ajustes:
                                 # Salvar no Mongo
                                 # --------------------------------------------------
 
-                                col_projetos.update_one(
+                                atualizar_projeto(
+                                    col_projetos,
                                     {"codigo": codigo_projeto_atual},
                                     {
                                         "$push": {
@@ -4960,12 +4088,10 @@ with ajustes:
                                     projeto_dict,
                                 )
 
-                                st.success("Solicitação enviada com sucesso!", icon=":material/check:")
+                                agendar_mensagem("Solicitação enviada com sucesso!", icon=":material/check:")
 
                                 st.session_state["mostrar_remanejamento"] = False
 
-                                time.sleep(3)
-
                                 st.rerun()
 
 
@@ -5134,7 +4260,8 @@ with ajustes:
 
 
 
-                                col_projetos.update_one(
+                                atualizar_projeto(
+                                    col_projetos,
                                     {"codigo": codigo_projeto_atual},
                                     {
                                         "$push": {
@@ -5160,15 +4287,13 @@ with ajustes:
 
 
 
-                                st.success(
+                                agendar_mensagem(
                                     "Solicitação enviada com sucesso!",
                                     icon=":material/check:"
                                 )
 
                                 st.session_state["mostrar_remanejamento"] = False
 
-                                time.sleep(3)
-
                                 st.rerun()
 
 
@@ -3,15 +3,17 @@ import pandas as pd
 from st_rsuite import date_picker
 import datetime
 from bson import ObjectId
-import time
 from streamlit_calendar import calendar
 import streamlit_antd_components as sac
 
 
 from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao,
+    carregar_colecao_referencia,
     sidebar_projeto,
 )
+from escrita_projetos import atualizar_projeto
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Eventos", page_icon=":material/event:")
@@ -99,9 +101,10 @@ projetos_edital = list(
 
 organizacoes = {
     organizacao["_id"]: organizacao["nome_organizacao"]
-    for organizacao in col_organizacoes.find(
-        {},
-        {
+    for organizacao in carregar_colecao_referencia(
+        db,
+        "organizacoes",
+        projecao={
             "nome_organizacao": 1
         }
     )
@@ -712,7 +715,8 @@ elif aba_selecionada == "Divulgar eventos":
                     # GRAVAÇÃO DO EVENTO NO PROJETO
                     ###################################################################################################
 
-                    col_projetos.update_one(
+                    atualizar_projeto(
+                        col_projetos,
                         {"codigo": codigo_projeto_atual},
                         {
                             "$push": {
@@ -721,12 +725,11 @@ elif aba_selecionada == "Divulgar eventos":
                         }
                     )
 
-                    st.success(
+                    agendar_mensagem(
                         "Evento cadastrado com sucesso!",
                         icon=":material/check:"
                     )
 
-                    time.sleep(3)
                     st.rerun()
 
 
@@ -802,7 +805,8 @@ elif aba_selecionada == "Divulgar eventos":
                             # EXCLUSÃO DO EVENTO
                             ###################################################################################################
 
-                            col_projetos.update_one(
+                            atualizar_projeto(
+                                col_projetos,
                                 {"codigo": codigo_projeto_atual},
                                 {
                                     "$pull": {
@@ -813,12 +817,11 @@ elif aba_selecionada == "Divulgar eventos":
                                 }
                             )
 
-                            st.success(
+                            agendar_mensagem(
                                 "Evento excluído com sucesso!",
                                 icon=":material/check:"
                             )
 
-                            time.sleep(3)
                             st.rerun()
 
                 st.divider()    
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import time
 import datetime
 import os
 import uuid
@@ -16,6 +15,7 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao,
+    carregar_colecao_referencia,
     sidebar_projeto,
 
     # Google Drive
@@ -28,8 +28,18 @@ from funcoes_auxiliares import (
     valor_por_extenso,
     numero_ordinal_pt,
     data_extenso_pt,
-    enviar_email
+    enviar_email,
+    enviar_emails
 )
+from escrita_projetos import (
+    atualizar_projeto,
+    atualizar_projeto_versionado,
+    MENSAGEM_CONFLITO_VERSAO,
+)
+from atualizacoes_projetos import definir_no_item, aplicar_atualizacoes
+from historico_projetos import anexar_historico
+from templates_email import renderizar_email, renderizar_emails
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -121,10 +131,6 @@ col_investidores = db["investidores"]
 # TRATAMENTO DE DADOS
 ###########################################################################################################
 
-# Logo hospedada no site do IEB para renderizar nos e-mails.
-logo_ieb = "https://iieb.org.br/wp-content/uploads/2021/02/IEB-logo.svg"
-
-
 
 codigo_projeto_atual = st.session_state.get("projeto_atual")
 
@@ -133,12 +139,14 @@ if not codigo_projeto_atual:
     st.stop()
 
 # Capturando o projeto atual no bd
+# (os lançamentos ficam na coleção lancamentos e são anexados às despesas)
 df_projeto = pd.DataFrame(
-    list(
-        col_projetos.find(
+    [
+        anexar_historico(db, projeto_doc, relatos=False)
+        for projeto_doc in col_projetos.find(
             {"codigo": codigo_projeto_atual}
         )
-    )
+    ]
 )
 
 if df_projeto.empty:
@@ -161,9 +169,7 @@ financeiro = projeto.get("financeiro", {})
 # Organizações
 
 df_organizacoes = pd.DataFrame(
-    list(
-        col_organizacoes.find()
-    )
+    carregar_colecao_referencia(db, "organizacoes")
 )
 
 mapa_org_id_nome = {
@@ -282,14 +288,20 @@ def aprovar_remanejamento(
     lista[idx]["status_remanejamento"] = "aceito"
     lista[idx]["data_aprov_remanej"] = datetime.datetime.now(datetime.UTC)
 
-    col_projetos.update_one(
-        {"codigo": codigo_projeto},
+    # Só aprova se o projeto não mudou desde a leitura acima, para que o
+    # orçamento seja efetivado sobre os valores lidos
+    if not atualizar_projeto_versionado(
+        col_projetos,
+        projeto,
         {
             "$set": {
-                "financeiro.remanejamentos_financeiros": lista
+                f"financeiro.remanejamentos_financeiros.{idx}.status_remanejamento": lista[idx]["status_remanejamento"],
+                f"financeiro.remanejamentos_financeiros.{idx}.data_aprov_remanej": lista[idx]["data_aprov_remanej"]
             }
         }
-    )
+    ):
+        st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+        st.stop()
 
     # --------------------------------------------------
     # Efetiva impacto no orçamento
@@ -334,8 +346,7 @@ def atualizar_aceite_remanejamento(
     Disparado automaticamente quando checkbox muda.
 
     • Lê estado real do checkbox via session_state
-    • Atualiza item do array em memória
-    • Regrava lista completa no Mongo (forma segura)
+    • Grava apenas o campo alterado do item no Mongo
     """
 
     marcado = st.session_state.get(checkbox_key, False)
@@ -354,23 +365,19 @@ def atualizar_aceite_remanejamento(
         return
 
     # --------------------------------------------------
-    # Atualiza item em memória
+    # Atualiza apenas o campo do item, pelo índice
     # --------------------------------------------------
+    caminho = f"financeiro.remanejamentos_financeiros.{idx}.{campo}"
+
     if marcado:
-        lista[idx][campo] = f"Aceito por {nome} em {data}"
+        atualizacao = {"$set": {caminho: f"Aceito por {nome} em {data}"}}
     else:
-        lista[idx].pop(campo, None)
+        atualizacao = {"$unset": {caminho: ""}}
 
-    # --------------------------------------------------
-    # Salva lista inteira (Mongo não atualiza por índice)
-    # --------------------------------------------------
-    col_projetos.update_one(
+    atualizar_projeto(
+        col_projetos,
         {"codigo": projeto_codigo},
-        {
-            "$set": {
-                "financeiro.remanejamentos_financeiros": lista
-            }
-        }
+        atualizacao
     )
 
 
@@ -418,141 +425,20 @@ def enviar_email_remanejamento_recusado(
     )
 
 
-    reduzidas = item_remanejamento.get("reduzidas", [])
-    aumentadas = item_remanejamento.get("aumentadas", [])
-    justificativa = item_remanejamento.get("justificativa", "")
-    motivo_recusa = item_remanejamento.get("motivo_recusa", "")
-
-    total_reduzido = sum(r.get("valor_reduzido", 0) for r in reduzidas)
-
-    # --------------------------------------------------
-    # Montar listas HTML
-    # --------------------------------------------------
-    def montar_lista_html(itens, campo_valor):
-        if not itens:
-            return "<p>Nenhuma</p>"
-
-        linhas = ""
-        for i in itens:
-            linhas += f"<li>{i['nome_despesa']}: {format_brl(i[campo_valor])}</li>"
-
-        return f"<ul>{linhas}</ul>"
-
-    lista_reduzidas = montar_lista_html(reduzidas, "valor_reduzido")
-    lista_aumentadas = montar_lista_html(aumentadas, "valor_aumentado")
-
     assunto = "Remanejamento recusado"
 
-    logo = logo_ieb
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #C82333; /* vermelho */
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #C82333;
-        font-weight: bold;
-    }}
-
-    ul {{
-        list-style: none;
-        padding-left: 0;
-        margin: 0;
-    }}
-
-    li {{
-        margin: 0;
-        padding: 0;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>recusado</strong></span>
-        o remanejamento de
-        <span class="highlight">{format_brl(total_reduzido)}</span>
-        no orçamento do projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>,
-        conforme detalhado a seguir:
-        </p>
-
-        <br>
-
-        <table width="100%">
-        <tr>
-            <td valign="top" width="50%">
-                <strong>Despesas reduzidas</strong>
-                {lista_reduzidas}
-            </td>
-
-            <td valign="top" width="50%">
-                <strong>Despesas aumentadas</strong>
-                {lista_aumentadas}
-            </td>
-        </tr>
-        </table>
-
-        <br>
-
-        <p><strong>Justificativa original:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p><strong>Motivo da recusa:</strong></p>
-        <p>{motivo_recusa}</p>
-
-        <br>
-
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-        
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remanejamento_recusado.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        reduzidas=item_remanejamento.get("reduzidas", []),
+        aumentadas=item_remanejamento.get("aumentadas", []),
+        justificativa=item_remanejamento.get("justificativa", ""),
+        motivo_recusa=item_remanejamento.get("motivo_recusa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remanejamento_recusado")
 
 
 
@@ -591,147 +477,22 @@ def enviar_email_remanejamento_aprovado(
     
     organizacao = mapa_org_id_nome.get(projeto.get("id_organizacao"), "")
     
-    reduzidas = item_remanejamento.get("reduzidas", [])
-    aumentadas = item_remanejamento.get("aumentadas", [])
-    justificativa = item_remanejamento.get("justificativa", "")
-
-    # --------------------------------------------------
-    # Soma total reduzido
-    # --------------------------------------------------
-    total_reduzido = sum(r.get("valor_reduzido", 0) for r in reduzidas)
-
-    # --------------------------------------------------
-    # Montar listas HTML (sem bolinha)
-    # --------------------------------------------------
-    def montar_lista_html(itens, campo_valor):
-        if not itens:
-            return "<p>Nenhuma</p>"
-
-        linhas = ""
-        for i in itens:
-            linhas += f"<li>{i['nome_despesa']}: {format_brl(i[campo_valor])}</li>"
-
-        return f"<ul>{linhas}</ul>"
-
-    lista_reduzidas = montar_lista_html(reduzidas, "valor_reduzido")
-    lista_aumentadas = montar_lista_html(aumentadas, "valor_aumentado")
-
     # --------------------------------------------------
     # Assunto
     # --------------------------------------------------
     assunto = "Remanejamento aprovado"
 
-    logo = logo_ieb
-
-    corpo_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <style>
-
-    body {{
-        font-family: Arial, Helvetica, sans-serif;
-        background-color: #f5f5f5;
-    }}
-
-    .container {{
-        max-width: 760px;
-        margin: 0 auto;
-        background: white;
-        border-top: 6px solid #A0C256;
-        padding: 30px;
-    }}
-
-    .logo {{
-        text-align: center;
-        margin-bottom: 20px;
-    }}
-
-    .highlight {{
-        color: #A0C256;
-        font-weight: bold;
-    }}
-
-    ul {{
-        list-style: none;
-        padding-left: 0;
-        margin: 0;
-    }}
-
-    li {{
-        margin: 0;
-        padding: 0;
-    }}
-
-    </style>
-    </head>
-
-    <body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo}" height="60">
-        </div>
-
-        <p>
-        Foi <span class="highlight"><strong>aprovado</strong></span>
-        o remanejamento de
-        <span class="highlight">{format_brl(total_reduzido)}</span>
-        no orçamento do projeto
-        <span class="highlight">{codigo} - {nome_projeto}</span>
-        da organização
-        <span class="highlight">{organizacao}</span>,
-        conforme detalhado a seguir:
-        </p>
-
-        <br>
-
-        <table width="100%">
-        <tr>
-            <td valign="top" width="50%">
-                <strong>Despesas reduzidas</strong>
-                {lista_reduzidas}
-            </td>
-
-            <td valign="top" width="50%">
-                <strong>Despesas aumentadas</strong>
-                {lista_aumentadas}
-            </td>
-        </tr>
-        </table>
-
-        <br>
-
-        <p><strong>Justificativa:</strong></p>
-        <p>{justificativa}</p>
-
-        <br>
-
-        <p>
-        O orçamento do projeto já está atualizado no sistema.
-        </p>
-
-        <br>
-        
-        <p>
-            <a 
-                href="https://veredas.streamlit.app/" 
-                target="_blank"
-                style="text-decoration: none;"
-            >
-                Sistema Veredas
-            </a>
-        </p>
-
-    </div>
-
-    </body>
-    </html>
-    """
+    corpo_html = renderizar_email(
+        "remanejamento_aprovado.html",
+        codigo=codigo,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        reduzidas=item_remanejamento.get("reduzidas", []),
+        aumentadas=item_remanejamento.get("aumentadas", []),
+        justificativa=item_remanejamento.get("justificativa", "")
+    )
 
-    enviar_email(corpo_html, destinatarios, assunto)
+    enviar_email(corpo_html, destinatarios, assunto, origem="enviar_email_remanejamento_aprovado")
 
 
 
@@ -770,26 +531,6 @@ def enviar_email_remanejamento(
     if not pessoas:
         return
 
-    # --------------------------------------------------
-    # Mensagem condicional
-    # --------------------------------------------------
-    if status_remanejamento == "aceito":
-
-        mensagem_status = (
-            "O remanejamento "
-            "<strong>foi aceito automaticamente</strong> "
-            "e o orçamento já está atualizado."
-        )
-
-    else:
-
-        mensagem_status = (
-            "<strong>AÇÃO NECESSÁRIA:</strong> "
-            "Esse remanejamento depende de análise e aprovação.<br><br>"
-            "Visite a página de remanejamentos no "
-            "Sistema Veredas para dar continuidade."
-        )
-
     # --------------------------------------------------
     # Assunto
     # --------------------------------------------------
@@ -798,113 +539,23 @@ def enviar_email_remanejamento(
         f"{codigo_projeto} - {sigla}"
     )
 
-    logo = logo_ieb
-
     # --------------------------------------------------
-    # Enviar e-mails
+    # Um corpo por pessoa (muda só o nome), todos na caixa de saída de uma vez
     # --------------------------------------------------
-    with st.spinner("Enviando..."):
-
-        for pessoa in pessoas:
-
-            nome = (
-                pessoa.get("nome_completo", "")
-                .split()[0]
-            )
-
-            corpo_html = f"""
-            <!DOCTYPE html>
-            <html>
-
-            <head>
-                <meta charset="utf-8">
-
-                <style>
-
-                body {{
-                    font-family: Arial, Helvetica, sans-serif;
-                    background-color: #f5f5f5;
-                }}
-
-                .container {{
-                    max-width: 760px;
-                    margin: 0 auto;
-                    background: white;
-                    border-top: 6px solid #A0C256;
-                    padding: 30px;
-                }}
-
-                .logo {{
-                    text-align: center;
-                    margin-bottom: 20px;
-                }}
-
-                .highlight {{
-                    color: #A0C256;
-                    font-weight: bold;
-                }}
-
-                </style>
-            </head>
-
-            <body>
-
-                <div class="container">
-
-                    <br>
-
-                    <div class="logo">
-                        <img src="{logo}" height="60">
-                    </div>
-
-                    <br>
-
-                    <p>
-                        Olá <strong>{nome}</strong>,
-                    </p>
-
-                    <p>
-                        O projeto
-                        <span class="highlight">
-                            {codigo_projeto} - {sigla} - {nome_projeto}
-                        </span>,
-                        da organização
-                        <span class="highlight">
-                            {organizacao}
-                        </span>,
-                        enviou uma nova solicitação de remanejamento financeiro.
-                    </p>
-
-                    <br>
-
-                    <p>
-                        {mensagem_status}
-                    </p>
-
-                    <br>
-
-                    <p>
-                        <a
-                            href="https://veredas.streamlit.app/"
-                            target="_blank"
-                            style="text-decoration: none;"
-                        >
-                            Sistema Veredas
-                        </a>
-                    </p>
-
-                </div>
-
-            </body>
-
-            </html>
-            """
+    corpos = renderizar_emails(
+        "remanejamento.html",
+        [{"nome": pessoa.get("nome_completo", "").split()[0]} for pessoa in pessoas],
+        codigo=codigo_projeto,
+        sigla=sigla,
+        nome_projeto=nome_projeto,
+        organizacao=organizacao,
+        aceito=status_remanejamento == "aceito"
+    )
 
-            enviar_email(
-                corpo_html,
-                [pessoa["e_mail"]],
-                assunto
-            )
+    enviar_emails([
+        {"corpo_html": corpo_html, "destinatarios": [pessoa["e_mail"]], "assunto": assunto}
+        for pessoa, corpo_html in zip(pessoas, corpos)
+    ], origem="enviar_email_remanejamento")
 
 
 
@@ -941,6 +592,8 @@ def efetivar_remanejamento(
     # --------------------------------------------------
     alteracoes = reduzidas + aumentadas
 
+    partes = []
+
     for item in orcamento_atual:
 
         nome = item.get("nome_despesa")
@@ -965,16 +618,26 @@ def efetivar_remanejamento(
 
         item["valor_total"] = alteracao["novo_valor_total"]
 
+        partes.append(
+            definir_no_item(
+                "financeiro.orcamento",
+                {"nome_despesa": nome},
+                {
+                    "quantidade": item["quantidade"],
+                    "valor_unitario": item["valor_unitario"],
+                    "valor_total": item["valor_total"],
+                },
+                identificador=f"d{len(partes)}"
+            )
+        )
+
     # --------------------------------------------------
-    # Salva orçamento atualizado
+    # Salva apenas as despesas alteradas
     # --------------------------------------------------
-    col_projetos.update_one(
+    aplicar_atualizacoes(
+        col_projetos,
         {"codigo": codigo_projeto_atual},
-        {
-            "$set": {
-                "financeiro.orcamento": orcamento_atual
-            }
-        }
+        *partes
     )
 
 
@@ -1360,7 +1023,8 @@ def gerar_recibo_docx(
 #         novas_parcelas.append(parcela_atualizada)
 
 #     # Atualiza no MongoDB
-#     col_projetos.update_one(
+#     atualizar_projeto(
+col_projetos,
 #         {"codigo": codigo_projeto},
 #         {"$set": {"financeiro.parcelas": novas_parcelas}}
 #     )
@@ -1474,7 +1138,8 @@ def criar_parcelas_a_partir_relatorios(col_projetos, codigo_projeto):
     # -----------------------------------
     # Salvar no MongoDB
     # -----------------------------------
-    col_projetos.update_one(
+    atualizar_projeto(
+        col_projetos,
         {"codigo": codigo_projeto},
         {
             "$set": {
@@ -2218,7 +1883,8 @@ with cron_desemb:
                     # Persistência no banco
                     # -----------------------------------
                     if salvar:
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {"codigo": codigo_projeto_atual},
                             {
                                 "$set": {
@@ -2229,8 +1895,7 @@ with cron_desemb:
                             }
                         )
 
-                        st.success("Valores financeiros salvos com sucesso!", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem("Valores financeiros salvos com sucesso!", icon=":material/check:")
                         st.rerun()
 
             # -----------------------------------
@@ -2615,17 +2280,19 @@ with cron_desemb:
 
                     parcelas_final.append(parcela_atualizada)
 
-                col_projetos.update_one(
-                    {"codigo": codigo_projeto_atual},
+                if not atualizar_projeto_versionado(
+                    col_projetos,
+                    projeto,
                     {
                         "$set": {
                             "financeiro.parcelas": parcelas_final
                         }
                     }
-                )
+                ):
+                    st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                    st.stop()
 
-                st.success("Parcelas salvas com sucesso!", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Parcelas salvas com sucesso!", icon=":material/check:")
                 st.rerun()
 
 
@@ -2823,21 +2490,23 @@ with cron_desemb:
                     #         }
                     #     )
 
-                    col_projetos.update_one(
-                        {"codigo": codigo_projeto_atual},
+                    if not atualizar_projeto_versionado(
+                        col_projetos,
+                        projeto,
                         {
                             "$set": {
                                 "relatorios": relatorios_salvar
                             }
                         }
-                    )
+                    ):
+                        st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                        st.stop()
 
                     # Atualiza parcelas com base nos relatórios
                     criar_parcelas_a_partir_relatorios(col_projetos, codigo_projeto_atual)
                     
 
-                    st.success("Relatórios salvos com sucesso!", icon=":material/check:")
-                    time.sleep(3)
+                    agendar_mensagem("Relatórios salvos com sucesso!", icon=":material/check:")
                     st.rerun()
 
 
@@ -2895,10 +2564,11 @@ with orcamento_tab:
     # -----------------------------------
     col_categorias_despesa = db["categorias_despesa"]
 
-    categorias = list(
-        col_categorias_despesa
-        .find({}, {"categoria": 1})
-        .sort("categoria", 1)
+    categorias = carregar_colecao_referencia(
+        db,
+        "categorias_despesa",
+        projecao={"categoria": 1},
+        ordenacao=[("categoria", 1)]
     )
 
     # -----------------------------------
@@ -3849,13 +3519,15 @@ with orcamento_tab:
             # -----------------------------------
             # Persistência
             # -----------------------------------
-            col_projetos.update_one(
-                {"codigo": codigo_projeto_atual},
+            if not atualizar_projeto_versionado(
+                col_projetos,
+                projeto,
                 {"$set": {"financeiro.orcamento": novo_orcamento}}
-            )
+            ):
+                st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                st.stop()
 
-            st.success("Orçamento salvo com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Orçamento salvo com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -3925,7 +3597,8 @@ if usuario_interno:
 
         pasta_recibos_id = obter_pasta_recibos(
             servico_drive,
-            pasta_projeto_id
+            pasta_projeto_id,
+            projeto["codigo"]
         )
 
         # ==================================================
@@ -4189,15 +3862,17 @@ if usuario_interno:
                                 arquivo
                             )
 
+                            # Exibe a mensagem de erro agendada no envio
                             if not id_arquivo:
-                                st.stop()
+                                st.rerun()
 
 
 
                             # -----------------------------------
                             # SALVAR NO MONGODB
                             # -----------------------------------
-                            col_projetos.update_one(
+                            atualizar_projeto(
+                                col_projetos,
                                 {
                                     "codigo": codigo_projeto_atual,
                                     "financeiro.parcelas.numero": numero
@@ -4218,9 +3893,8 @@ if usuario_interno:
                             # -----------------------------------
                             # Feedback + reset de estado
                             # -----------------------------------
-                            st.success("Recibo salvo com sucesso!", icon=":material/check:")
+                            agendar_mensagem("Recibo salvo com sucesso!", icon=":material/check:")
                             st.session_state["recibo_aberto_parcela"] = None
-                            time.sleep(3)
                             st.rerun()
 
                         # ----------------------------
@@ -4915,7 +4589,8 @@ with remanejamentos:
                             # --------------------------------------
                             # Salvar no banco
                             # --------------------------------------
-                            col_projetos.update_one(
+                            atualizar_projeto(
+                                col_projetos,
                                 {"codigo": codigo_projeto_atual},
                                 {
                                     "$push": {
@@ -4963,7 +4638,7 @@ with remanejamentos:
                             # --------------------------------------
                             # Feedback visual + reset de estado
                             # --------------------------------------
-                            st.success(
+                            agendar_mensagem(
                                 "Solicitação enviada.",
                                 icon=":material/check:"
                             )
@@ -4987,11 +4662,6 @@ with remanejamentos:
                                 }
                             ]
 
-                            # --------------------------------------
-                            # Aguarda atualização visual
-                            # --------------------------------------
-                            time.sleep(3)
-
                             # --------------------------------------
                             # Fecha formulário
                             # --------------------------------------
@@ -5507,7 +5177,8 @@ with remanejamentos:
 
                                     log_recusa = f"Recusado por {nome} em {data}"
 
-                                    col_projetos.update_one(
+                                    atualizar_projeto(
+                                        col_projetos,
                                         {"codigo": codigo_projeto_atual},
                                         {
                                             "$set": {
@@ -6,6 +6,7 @@ from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao,
     sidebar_projeto,
 )
+from historico_projetos import carregar_relatos
 
 
 st.set_page_config(page_title="Fotos", page_icon=":material/image:")
@@ -51,7 +52,13 @@ def gerar_urls_drive(file_id):
     }
 
 def coletar_fotos_projeto(projeto):
-    fotos = []
+    """
+    Fotos dos relatos do projeto, buscadas apenas nos relatos que têm fotos
+    (coleção relatos).
+    """
+
+    # Nome de cada atividade pelo id
+    nomes_atividades = {}
 
     plano = projeto.get("plano_trabalho", {})
     componentes = plano.get("componentes", [])
@@ -59,31 +66,45 @@ def coletar_fotos_projeto(projeto):
     for componente in componentes:
         for entrega in componente.get("entregas", []):
             for atividade in entrega.get("atividades", []):
-                nome_atividade = atividade.get("atividade")
-
-                for relato in atividade.get("relatos", []):
-                    id_relato = relato.get("id_relato")
-                    texto_relato = relato.get("relato")
-                    quando = relato.get("quando")
-                    onde = relato.get("onde")
-
-                    for foto in relato.get("fotos", []):
-                        fotos.append({
-                            # atividade
-                            "atividade": nome_atividade,
-
-                            # relato
-                            "id_relato": id_relato,
-                            "relato": texto_relato,
-                            "quando": quando,
-                            "onde": onde,
-
-                            # foto
-                            "nome_arquivo": foto.get("nome_arquivo"),
-                            "descricao": foto.get("descricao"),
-                            "fotografo": foto.get("fotografo"),
-                            "id_arquivo": foto.get("id_arquivo"),
-                        })
+                chave = atividade.get("id") or atividade.get("atividade")
+                nomes_atividades[chave] = atividade.get("atividade")
+
+    relatos = carregar_relatos(
+        db,
+        projeto.get("codigo"),
+        filtro_extra={"fotos.0": {"$exists": True}}
+    )
+
+    # Mantém a ordem do plano de trabalho
+    posicao_atividades = {chave: i for i, chave in enumerate(nomes_atividades)}
+    relatos.sort(key=lambda r: posicao_atividades.get(r.get("id_atividade"), len(posicao_atividades)))
+
+    fotos = []
+
+    for relato in relatos:
+        nome_atividade = nomes_atividades.get(relato.get("id_atividade"))
+        id_relato = relato.get("id_relato")
+        texto_relato = relato.get("relato")
+        quando = relato.get("quando")
+        onde = relato.get("onde")
+
+        for foto in relato.get("fotos", []):
+            fotos.append({
+                # atividade
+                "atividade": nome_atividade,
+
+                # relato
+                "id_relato": id_relato,
+                "relato": texto_relato,
+                "quando": quando,
+                "onde": onde,
+
+                # foto
+                "nome_arquivo": foto.get("nome_arquivo"),
+                "descricao": foto.get("descricao"),
+                "fotografo": foto.get("fotografo"),
+                "id_arquivo": foto.get("id_arquivo"),
+            })
 
     return fotos
 
@@ -98,8 +119,19 @@ if not codigo_projeto_atual:
     st.error("Nenhum projeto selecionado.")
     st.stop()
 
+# Apenas identificação e nomes das atividades; as fotos vêm da coleção relatos
 df_projeto = pd.DataFrame(
-    list(col_projetos.find({"codigo": codigo_projeto_atual}))
+    list(
+        col_projetos.find(
+            {"codigo": codigo_projeto_atual},
+            {
+                "codigo": 1,
+                "sigla": 1,
+                "plano_trabalho.componentes.entregas.atividades.id": 1,
+                "plano_trabalho.componentes.entregas.atividades.atividade": 1,
+            }
+        )
+    )
 )
 
 if df_projeto.empty:
@@ -1,5 +1,4 @@
 import streamlit as st
-import time
 import pandas as pd
 import io
 import folium
@@ -7,6 +6,7 @@ from streamlit_folium import st_folium
 
 from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao,
+    carregar_colecao_referencia,
     sidebar_projeto,
     # ajustar_altura_data_editor,
 
@@ -15,9 +15,11 @@ from funcoes_auxiliares import (
     obter_ou_criar_pasta,
     obter_pasta_locais,
     obter_pasta_projeto,
-    enviar_arquivo_drive,
+    enviar_arquivos_drive,
     gerar_link_drive
 )
+from escrita_projetos import atualizar_projeto
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Locais", page_icon=":material/map:")
@@ -138,7 +140,7 @@ projeto = col_projetos.find_one(
 # COLEÇÃO COM UFs E MUNICÍPIOS (IBGE)
 # --------------------------------------------------
 
-docs = list(col_ufs_munic.find({}))
+docs = carregar_colecao_referencia(db, "ufs_municipios")
 
 lista_ufs = []
 lista_municipios = []
@@ -165,20 +167,20 @@ locais = projeto.get("locais", {})
 
 
 # Lista completa de corredores disponíveis
-lista_corredores = list(
-    col_corredores.find(
-        {},
-        {"_id": 0, "id_corredor": 1, "nome_corredor": 1}
-    ).sort("nome_corredor", 1)
+lista_corredores = carregar_colecao_referencia(
+    db,
+    "corredores",
+    projecao={"_id": 0, "id_corredor": 1, "nome_corredor": 1},
+    ordenacao=[("nome_corredor", 1)]
 )
 
 
 # Lista completa de KBAs disponíveis
-lista_kbas = list(
-    col_kbas.find(
-        {},
-        {"_id": 0, "id_kba": 1, "nome_kba": 1}
-    ).sort("nome_kba", 1)
+lista_kbas = carregar_colecao_referencia(
+    db,
+    "kbas",
+    projecao={"_id": 0, "id_kba": 1, "nome_kba": 1},
+    ordenacao=[("nome_kba", 1)]
 )
 
 
@@ -251,7 +253,8 @@ def dialog_editar_estados():
             if uf["nome_uf"] in estados_selecionados
         ]
 
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {"codigo": codigo_projeto_atual},
             {
                 "$set": {
@@ -260,8 +263,7 @@ def dialog_editar_estados():
             }
         )
 
-        st.success("Estados atualizados com sucesso!", icon=":material/check:")
-        time.sleep(3)
+        agendar_mensagem("Estados atualizados com sucesso!", icon=":material/check:")
         st.rerun()
 
 
@@ -320,7 +322,8 @@ def dialog_editar_municipios():
                     "nome_municipio": nome_formatado
                 })
 
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {"codigo": codigo_projeto_atual},
             {
                 "$set": {
@@ -329,8 +332,7 @@ def dialog_editar_municipios():
             }
         )
 
-        st.success("Municípios atualizados com sucesso!", icon=":material/check:")
-        time.sleep(2)
+        agendar_mensagem("Municípios atualizados com sucesso!", icon=":material/check:")
         st.rerun()
 
 
@@ -468,7 +470,8 @@ def dialog_editar_localidades():
             localidades_atual = locais.get("localidades", [])
             localidades_atual.append(nova_localidade)
 
-            col_projetos.update_one(
+            atualizar_projeto(
+                col_projetos,
                 {"codigo": codigo_projeto_atual},
                 {
                     "$set": {
@@ -477,8 +480,7 @@ def dialog_editar_localidades():
                 }
             )
 
-            st.success("Localidade / Comunidade cadastrada com sucesso!", icon=":material/check:")
-            time.sleep(2)
+            agendar_mensagem("Localidade / Comunidade cadastrada com sucesso!", icon=":material/check:")
             st.rerun()
 
     # =============================================================================
@@ -522,7 +524,8 @@ def dialog_editar_localidades():
                 if l.get("nome_localidade") != localidade_para_excluir
             ]
 
-            col_projetos.update_one(
+            atualizar_projeto(
+                col_projetos,
                 {"codigo": codigo_projeto_atual},
                 {
                     "$set": {
@@ -531,8 +534,7 @@ def dialog_editar_localidades():
                 }
             )
 
-            st.success("Localidade excluída com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Localidade excluída com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -609,7 +611,8 @@ def dialog_editar_areas_protegidas():
             areas_atual = locais.get("areas_protegidas", [])
             areas_atual.append(nova_area)
 
-            col_projetos.update_one(
+            atualizar_projeto(
+                col_projetos,
                 {"codigo": codigo_projeto_atual},
                 {
                     "$set": {
@@ -618,8 +621,7 @@ def dialog_editar_areas_protegidas():
                 }
             )
 
-            st.success("Área protegida cadastrada com sucesso!", icon=":material/check:")
-            time.sleep(2)
+            agendar_mensagem("Área protegida cadastrada com sucesso!", icon=":material/check:")
             st.rerun()
 
     # =============================================================================
@@ -663,7 +665,8 @@ def dialog_editar_areas_protegidas():
                 if a.get("nome_area_protegida") != area_para_excluir
             ]
 
-            col_projetos.update_one(
+            atualizar_projeto(
+                col_projetos,
                 {"codigo": codigo_projeto_atual},
                 {
                     "$set": {
@@ -672,8 +675,7 @@ def dialog_editar_areas_protegidas():
                 }
             )
 
-            st.success("Área protegida excluída com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Área protegida excluída com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -730,7 +732,8 @@ def dialog_editar_corredores():
             if c["nome_corredor"] in corredores_selecionados
         ]
 
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {"codigo": codigo_projeto_atual},
             {
                 "$set": {
@@ -739,8 +742,7 @@ def dialog_editar_corredores():
             }
         )
 
-        st.success("Corredores atualizados com sucesso!", icon=":material/check:")
-        time.sleep(3)
+        agendar_mensagem("Corredores atualizados com sucesso!", icon=":material/check:")
         st.rerun()
 
 
@@ -805,7 +807,8 @@ def dialog_editar_kbas():
                     "nome_kba": kba["nome_kba"]
                 })
 
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {"codigo": codigo_projeto_atual},
             {
                 "$set": {
@@ -814,8 +817,7 @@ def dialog_editar_kbas():
             }
         )
 
-        st.success("KBAs atualizadas com sucesso!", icon=":material/check:")
-        time.sleep(3)
+        agendar_mensagem("KBAs atualizadas com sucesso!", icon=":material/check:")
         st.rerun()
 
 
@@ -861,18 +863,20 @@ def dialog_mapas():
                 # Obtém ou cria a pasta "Locais"
                 pasta_locais = obter_pasta_locais(
                     servico,
-                    pasta_projeto
+                    pasta_projeto,
+                    projeto["codigo"]
                 )
 
                 novos = []
 
-                # Loop de upload dos arquivos
-                for arq in arquivos:
-                    id_drive = enviar_arquivo_drive(
-                        servico,
-                        pasta_locais,
-                        arq
-                    )
+                # Upload dos arquivos em paralelo
+                ids_drive = enviar_arquivos_drive([(pasta_locais, arq) for arq in arquivos])
+
+                for arq, id_drive in zip(arquivos, ids_drive):
+
+                    # Falhas já têm a mensagem de erro agendada
+                    if not id_drive:
+                        continue
 
                     novos.append({
                         "nome": arq.name,
@@ -880,14 +884,15 @@ def dialog_mapas():
                     })
 
                 # Salva os links no MongoDB
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {"$push": {"locais.arquivos": {"$each": novos}}}
                 )
 
-            # Mensagem exibida após o spinner finalizar
-            st.success("Arquivos cadastrados com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            # Mensagem exibida após o rerun (só se todos os arquivos foram enviados)
+            if None not in ids_drive:
+                agendar_mensagem("Arquivos cadastrados com sucesso!", icon=":material/check:")
             st.rerun()
 
     # =========================================================
@@ -928,7 +933,8 @@ def dialog_mapas():
 
             # Spinner para a remoção (mesmo sendo rápida)
             with st.spinner("Removendo mapa..."):
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {
                         "$pull": {
@@ -939,8 +945,7 @@ def dialog_mapas():
                     }
                 )
 
-            st.success("Arquivo removido com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Arquivo removido com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -1,10 +1,11 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_colecao_referencia, obter_servico_drive, criar_estrutura_pastas_projeto
+from escrita_projetos import inserir_projeto
 import pandas as pd
 import bson
-import time
 
 from st_rsuite import date_picker
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -25,7 +26,7 @@ col_editais = db["editais"]
 col_publicos = db["publicos"]
 
 df_pessoas = pd.DataFrame(list(col_pessoas.find()))
-df_publicos = pd.DataFrame(list(col_publicos.find()))
+df_publicos = pd.DataFrame(carregar_colecao_referencia(db, "publicos"))
 
 ###########################################################################################################
 # SESSION STATE
@@ -91,7 +92,7 @@ lista_ids = list(mapa_id_nome.keys())
 # DADOS AUXILIARES (ORGANIZAÇÕES)
 ###########################################################################################################
 
-orgs = list(col_organizacoes.find().sort("nome_organizacao", 1))
+orgs = carregar_colecao_referencia(db, "organizacoes", ordenacao=[("nome_organizacao", 1)])
 
 # mapa id -> nome da organização (para exibição no selectbox)
 mapa_org_id_nome = {
@@ -113,7 +114,7 @@ col1, col2, col3 = st.columns(3)
 # EDITAL (FORA DO FORM)
 ###########################################################################################################
 
-editais = list(col_editais.find().sort("data_lancamento", -1))
+editais = carregar_colecao_referencia(db, "editais", ordenacao=[("data_lancamento", -1)])
 lista_editais = [e["codigo_edital"] for e in editais]
 
 edital = col1.selectbox(
@@ -286,7 +287,7 @@ if submit:
         # INSERE PROJETO
         ###################################################################################################
 
-        col_projetos.insert_one({
+        inserir_projeto(col_projetos, {
             "_id": bson.ObjectId(),
             "edital": edital,
             "codigo": codigo_projeto,
@@ -302,6 +303,23 @@ if submit:
             # "status": "Em dia"
         })
 
+        ###################################################################################################
+        # CRIA AS PASTAS DO PROJETO NO DRIVE
+        ###################################################################################################
+
+        # Pasta do projeto e subpastas padrão, já registradas para os envios de arquivos.
+        # Se o Drive falhar aqui, as pastas são criadas no primeiro envio.
+        try:
+            with st.spinner("Criando as pastas do projeto no Google Drive..."):
+                criar_estrutura_pastas_projeto(obter_servico_drive(), codigo_projeto, sigla_projeto)
+        except Exception:
+            agendar_mensagem(
+                "Não foi possível criar as pastas do projeto no Google Drive agora. "
+                "Elas serão criadas no primeiro envio de arquivo.",
+                icon=":material/warning:",
+                tipo="warning"
+            )
+
         ###################################################################################################
         # ATUALIZA PESSOA (ADICIONA CÓDIGO DO PROJETO)
         ###################################################################################################
@@ -319,7 +337,7 @@ if submit:
             )
 
 
-        st.success("Projeto cadastrado com sucesso!", icon=":material/check:")
+        agendar_mensagem("Projeto cadastrado com sucesso!", icon=":material/check:")
 
         ###################################################################################################
         # RESET FORMULÁRIO 
@@ -341,7 +359,6 @@ if submit:
         }
 
         st.session_state.form_key += 1
-        time.sleep(3)
         st.rerun()
 
 
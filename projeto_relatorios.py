@@ -1,26 +1,17 @@
 import streamlit as st
 import pandas as pd
 import streamlit_antd_components as sac
-import time
 import datetime
 from collections import defaultdict
 import uuid
-from io import BytesIO
 from zoneinfo import ZoneInfo 
-from docx import Document
-import tempfile
-import os
 from st_rsuite import date_picker
-import copy
-
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from docx.opc.constants import RELATIONSHIP_TYPE
 
 
 
 from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao,
+    carregar_colecao_referencia,
     sidebar_projeto,
     obter_servico_drive,
     obter_ou_criar_pasta,
@@ -30,9 +21,48 @@ from funcoes_auxiliares import (
     obter_pasta_extratos_bancarios,
     obter_pasta_relatorios,
     enviar_arquivo_drive,
+    enviar_arquivos_drive,
     gerar_link_drive,
-    enviar_email
+    enviar_email,
+    enviar_emails
+)
+from escrita_projetos import (
+    atualizar_projeto,
+    atualizar_projeto_versionado,
+    MENSAGEM_CONFLITO_VERSAO,
+)
+from historico_projetos import (
+    COLECAO_RELATOS,
+    anexar_historico,
+    inserir_relato,
+    inserir_lancamento,
+    atualizar_lancamento,
+    excluir_lancamento,
+)
+from contadores import proximo_id
+from atualizacoes_projetos import (
+    definir_no_item,
+    adicionar_ao_item,
+    retirar_do_item,
+    aplicar_atualizacoes,
 )
+from documentos_relatorio import MIME_DOCX, STATUS_UI_TO_DB, STATUS_DB_TO_UI
+from templates_email import renderizar_email, renderizar_emails
+from fila_tarefas import (
+    CONCLUIDA,
+    ERRO,
+    guardar_arquivo_enviado,
+    excluir_arquivo,
+    enfileirar_tarefa,
+    iniciar_tarefa_da_sessao,
+    intervalo_acompanhamento,
+    acompanhar_tarefa,
+    baixar_resultado,
+    envios_pendentes,
+    envios_com_erro,
+    reenfileirar_tarefa,
+)
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -114,7 +144,7 @@ col_publicos = db["publicos"]
 
 col_pessoas = db["pessoas"]
 
-lista_publicos = list(col_publicos.find({}, {"_id": 0, "publico": 1}))
+lista_publicos = carregar_colecao_referencia(db, "publicos", projecao={"_id": 0, "publico": 1})
 
 # SEMPRE insere a opção Outros
 opcoes_publicos = sorted({p["publico"] for p in lista_publicos} - {"Outros"})
@@ -122,20 +152,14 @@ opcoes_publicos.append("Outros")
 
 codigo_projeto_atual = st.session_state.projeto_atual
 
-df_projeto = pd.DataFrame(
-    list(
-        col_projetos.find(
-            {"codigo": codigo_projeto_atual}
-        )
-    )
-)
+# Relatos e lançamentos ficam em coleções próprias. Só os do relatório
+# aberto são anexados ao projeto, depois da escolha da aba.
+projeto = col_projetos.find_one({"codigo": codigo_projeto_atual})
 
-if df_projeto.empty:
+if projeto is None:
     st.error("Projeto não encontrado.")
     st.stop()
 
-projeto = df_projeto.iloc[0]
-
 relatorios = projeto.get("relatorios", [])
 
 edital = col_editais.find_one({"codigo_edital": projeto["edital"]})
@@ -358,881 +382,6 @@ def renderizar_pendencias(projeto, relatorio_numero):
 
 
 
-
-# Função para configurar hyperlink no docx do relatório exportado.
-def adicionar_hyperlink(paragraph, url, texto):
-    """
-    Adiciona um hyperlink clicável em um parágrafo do docx.
-    """
-
-    part = paragraph.part
-    r_id = part.relate_to(
-        url,
-        RELATIONSHIP_TYPE.HYPERLINK,
-        is_external=True
-    )
-
-    hyperlink = OxmlElement('w:hyperlink')
-    hyperlink.set(qn('r:id'), r_id)
-
-    new_run = OxmlElement('w:r')
-    rPr = OxmlElement('w:rPr')
-
-    # Estilo de link (azul + sublinhado)
-    u = OxmlElement('w:u')
-    u.set(qn('w:val'), 'single')
-
-    color = OxmlElement('w:color')
-    color.set(qn('w:val'), '0000FF')
-
-    rPr.append(color)
-    rPr.append(u)
-
-    new_run.append(rPr)
-
-    text = OxmlElement('w:t')
-    text.text = texto
-
-    new_run.append(text)
-    hyperlink.append(new_run)
-
-    paragraph._element.append(hyperlink)
-
-
-def gerar_docx_relatorio(relatorio, projeto):
-    """
-    Gera um documento .docx contendo as informações do relatório,
-    utilizando apenas o objeto de projeto como fonte principal.
-    """
-
-    with st.spinner("Gerando relatório..."):
-
-
-        # ------------------------------
-        # BUSCA ORGANIZAÇÃO
-        # ------------------------------
-        organizacao = db["organizacoes"].find_one(
-            {"_id": projeto.get("id_organizacao")}
-        )
-
-        # ------------------------------
-        # BUSCA EDITAL
-        # ------------------------------
-        edital = db["editais"].find_one(
-            {"codigo_edital": projeto.get("edital")}
-        )
-
-        # Criação do documento
-        doc = Document()
-
-
-
-
-        # ------------------------------
-        # CABEÇALHO DO RELATÓRIO
-        # ------------------------------
-
-        # Título principal
-        titulo = doc.add_heading(
-            f"Relatório {relatorio.get('numero')}",
-            level=1
-        )
-        titulo.alignment = 1  # centralizado
-
-        doc.add_paragraph("")
-
-        # Edital
-        doc.add_paragraph(
-            f"Edital {edital.get('codigo_edital') if edital else ''}"
-        )
-
-        # Código + sigla do projeto
-        doc.add_heading(
-            f"{projeto.get('codigo')} - {projeto.get('sigla')}",
-            level=2
-        )
-
-        doc.add_paragraph("")
-
-
-
-        # Datas e informações gerais
-        doc.add_paragraph(
-            f"Data de envio: {relatorio.get('data_envio', 'N/A')}"
-        )
-
-
-        # Data de aprovação do relatório
-        data_aprovacao = relatorio.get("data_aprovacao", "---")
-
-        doc.add_paragraph(f"Data de aprovação: {data_aprovacao}")
-
-
-
-        # Data de exportação (data atual)
-        data_exportacao = datetime.datetime.now().strftime("%d/%m/%Y")
-        doc.add_paragraph(f"Data de exportação: {data_exportacao}")
-
-        doc.add_paragraph("")
-
-        # Organização
-        nome_org = organizacao.get("nome_organizacao") if organizacao else ""
-        doc.add_paragraph(f"Organização: {nome_org}")
-
-        # Nome do projeto
-        doc.add_paragraph(f"Projeto: {projeto.get('nome_do_projeto')}")
-
-        # Status do projeto (não existe explícito, então inferência simples)
-        status_projeto = "Em andamento"
-
-        if projeto.get("data_fim_contrato"):
-            try:
-                data_fim = datetime.datetime.strptime(
-                    projeto.get("data_fim_contrato"),
-                    "%d/%m/%Y"
-                )
-                if data_fim < datetime.datetime.now():
-                    status_projeto = "Encerrado"
-            except:
-                pass
-
-        doc.add_paragraph(f"Status do projeto: {status_projeto}")
-
-        # Status do relatório
-        status_db = relatorio.get("status_relatorio", "")
-        status_ui = STATUS_DB_TO_UI.get(status_db, status_db)
-
-        doc.add_paragraph(f"Status do relatório: {status_ui}")
-
-
-        doc.add_paragraph("")
-        doc.add_paragraph("")
-
-
-
-
-
-        # ------------------------------
-        # RELATOS DE ATIVIDADES
-        # ------------------------------
-        doc.add_heading("Relatos de Atividades", level=2)
-
-        tem_relato = False
-
-        # Percorre estrutura do plano de trabalho
-        for componente in projeto.get("plano_trabalho", {}).get("componentes", []):
-            for entrega in componente.get("entregas", []):
-                for atividade in entrega.get("atividades", []):
-
-
-                    # Filtra apenas relatos do relatório atual
-                    relatos = [
-                        r for r in atividade.get("relatos", [])
-                        if r.get("relatorio_numero") == relatorio.get("numero")
-                    ]
-
-                    # Verifica se existem relatos após o filtro
-                    if relatos:
-
-                        tem_relato = True
-
-                        # Título da atividade
-                        doc.add_heading(
-                            f"Atividade: {atividade.get('atividade')}",
-                            level=3
-                        )
-
-                        doc.add_paragraph("")
-
-                        # Lista relatos
-                        for relato in relatos:
-
-                            doc.add_paragraph(
-                                f"{relato.get('id_relato')}: {relato.get('relato')}"
-                            )
-
-                            doc.add_paragraph(
-                                f"Status: {relato.get('status_relato')}"
-                            )
-
-                            doc.add_paragraph(
-                                f"Data de início: {relato.get('data_inicio')}"
-                            )
-
-                            doc.add_paragraph(
-                                f"Data de fim: {relato.get('data_fim')}"
-                            )
-
-                            doc.add_paragraph(
-                                f"Progresso da atividade informado: {relato.get('porc_ativ_relato')}%"
-                            )
-
-
-
-
-                            # ------------------------------
-                            # ANEXOS DO RELATO
-                            # ------------------------------
-                            anexos = relato.get("anexos", [])
-
-                            if anexos:
-                                doc.add_paragraph("Anexos:")
-                                    
-                                for anexo in anexos:
-
-                                    id_arquivo = anexo.get("id_arquivo")
-                                    nome = anexo.get("nome_arquivo", "Arquivo")
-
-                                    url = f"https://drive.google.com/file/d/{id_arquivo}/view"
-
-                                    p = doc.add_paragraph()
-                                    adicionar_hyperlink(p, url, nome)
-
-
-
-
-                            # ------------------------------
-                            # LINKS DO RELATO
-                            # ------------------------------
-                            links = relato.get("links", [])
-
-                            if links:
-
-                                doc.add_paragraph("Links:")
-
-                                for item_link in links:
-
-                                    descricao = item_link.get("descricao", "Link")
-                                    url = item_link.get("link", "")
-
-                                    # ignora links vazios
-                                    if not url:
-                                        continue
-
-                                    p = doc.add_paragraph()
-
-                                    # garante protocolo http/https
-                                    if not url.startswith(("http://", "https://")):
-                                        url = f"https://{url}"
-
-
-                                    adicionar_hyperlink(
-                                        p,
-                                        url,
-                                        descricao
-                                    )
-
-
-
-                            # ------------------------------
-                            # FOTOS DO RELATO
-                            # ------------------------------
-                            fotos = relato.get("fotos", [])
-
-                            if fotos:
-                                doc.add_paragraph("Fotos:")
-
-
-                                for foto in fotos:
-
-                                    id_arquivo = foto.get("id_arquivo")
-                                    nome = foto.get("nome_arquivo", "Foto")
-
-                                    url = f"https://drive.google.com/file/d/{id_arquivo}/view"
-
-                                    p = doc.add_paragraph()
-                                    adicionar_hyperlink(p, url, nome)
-
-
-
-
-                            doc.add_paragraph("")  # espaçamento
-
-        # Caso não existam relatos
-        if not tem_relato:
-            doc.add_paragraph("Não há relatos de atividades registrados para este projeto.")
-
-
-
-
-
-
-
-        # ------------------------------
-        # ESPAÇAMENTO
-        # ------------------------------
-        doc.add_paragraph("")
-        doc.add_paragraph("")
-
-
-
-
-        # ------------------------------
-        # REGISTROS FINANCEIROS
-        # ------------------------------
-        doc.add_heading("Registros Financeiros", level=1)
-
-        tem_despesa = False
-
-        # Percorre orçamento do projeto
-        for despesa in projeto.get("financeiro", {}).get("orcamento", []):
-
-            # Filtra lançamentos do relatório atual
-            lancamentos = [
-                l for l in despesa.get("lancamentos", [])
-                if l.get("relatorio_numero") == relatorio.get("numero")
-            ]
-
-            # Verifica se há lançamentos válidos
-            if lancamentos:
-
-                tem_despesa = True
-
-                # Título da despesa
-                doc.add_heading(
-                    despesa.get("nome_despesa"),
-                    level=2
-                )
-
-                # Lista lançamentos
-                for lanc in lancamentos:
-
-                    doc.add_paragraph(
-                        f"{lanc.get('id_lanc_despesa')}: {lanc.get('descricao_despesa')}"
-                    )
-
-                    doc.add_paragraph(
-                        f"Status: {lanc.get('status_despesa')}"
-                    )
-
-                    doc.add_paragraph(
-                        f"Data da despesa: {lanc.get('data_despesa')}"
-                    )
-
-                    doc.add_paragraph(
-                        f"Fornecedor: {lanc.get('fornecedor')}"
-                    )
-
-                    doc.add_paragraph(
-                        f"CPF/CNPJ: {lanc.get('cpf_cnpj')}"
-                    )
-
-                    # ------------------------------
-                    # TABELA DE VALORES
-                    # ------------------------------
-                    tabela = doc.add_table(rows=2, cols=3)
-
-                    # Cabeçalhos
-                    tabela.rows[0].cells[0].text = "Quantidade"
-                    tabela.rows[0].cells[1].text = "Valor unitário"
-                    tabela.rows[0].cells[2].text = "Valor da despesa"
-
-                    # Valores
-                    tabela.rows[1].cells[0].text = str(lanc.get("quantidade", ""))
-                    tabela.rows[1].cells[1].text = str(lanc.get("valor_unitario", ""))
-                    tabela.rows[1].cells[2].text = str(lanc.get("valor_despesa", ""))
-
-                    # ------------------------------
-                    # ANEXOS DO LANÇAMENTO
-                    # ------------------------------
-                    anexos = lanc.get("anexos", [])
-
-                    if anexos:
-
-                        doc.add_paragraph("")
-
-                        doc.add_paragraph("Anexos:")
-
-                        for anexo in anexos:
-
-                            id_arquivo = anexo.get("id_arquivo")
-                            nome = anexo.get("nome_arquivo", "Arquivo")
-
-                            url = f"https://drive.google.com/file/d/{id_arquivo}/view"
-
-                            p = doc.add_paragraph()
-                            adicionar_hyperlink(p, url, nome)
-
-                    doc.add_paragraph("")  # espaçamento entre lançamentos
-
-
-        # Caso não existam registros financeiros
-        if not tem_despesa:
-            doc.add_paragraph("Não há registros financeiros para este relatório.")
-
-
-
-
-
-
-
-
-
-
-
-        # ------------------------------
-        # ESPAÇAMENTO
-        # ------------------------------
-        doc.add_paragraph("")
-        doc.add_paragraph("")
-
-        # ------------------------------
-        # RESULTADOS
-        # ------------------------------
-        doc.add_heading("Resultados", level=1)
-
-        # ------------------------------
-        # INDICADORES DE PROJETO
-        # ------------------------------
-        doc.add_heading("Indicadores de projeto", level=2)
-
-        doc.add_paragraph("")
-
-        tem_indicador = False
-
-        # Percorre componentes
-        for componente in projeto.get("plano_trabalho", {}).get("componentes", []):
-
-            entregas = componente.get("entregas", [])
-
-            if entregas:
-
-                # Título do componente
-                paragrafo = doc.add_paragraph()
-                run = paragrafo.add_run(
-                    f"Componente: {componente.get('componente')}"
-                )
-                run.bold = True
-
-
-                for entrega in entregas:
-
-                    indicadores = entrega.get("indicadores_projeto", [])
-
-                    if indicadores:
-
-                        tem_indicador = True
-
-                        # Título da entrega
-                        doc.add_paragraph(
-                            f"Entrega: {entrega.get('entrega')}"
-                        )
-
-                        for indicador in indicadores:
-
-                            doc.add_paragraph(
-                                f"Indicador: {indicador.get('indicador_projeto')}"
-                            )
-
-                            doc.add_paragraph(
-                                f"Unidade de medida: {indicador.get('unidade_medida')}"
-                            )
-
-                            # ------------------------------
-                            # "3 COLUNAS" SIMPLES
-                            # ------------------------------
-                            doc.add_paragraph(
-                                f"Início do projeto: {indicador.get('linha_base')}    |    "
-                                f"Meta: {indicador.get('meta')}    |    "
-                                f"Resultado atual: {indicador.get('resultado_atual')}"
-                            )
-
-                            # ------------------------------
-                            # DATA DE COLETA FORMATADA
-                            # ------------------------------
-                            data_coleta = indicador.get("data_coleta")
-
-                            data_formatada = ""
-                            if data_coleta:
-                                try:
-                                    data_formatada = data_coleta.strftime("%d/%m/%Y")
-                                except:
-                                    data_formatada = str(data_coleta)
-
-                            doc.add_paragraph(
-                                f"Último registro em {data_formatada}"
-                            )
-
-                            doc.add_paragraph("")  # espaçamento
-
-
-        # Caso não existam indicadores
-        if not tem_indicador:
-            doc.add_paragraph("Não há indicadores registrados para este projeto.")
-
-
-
-
-
-
-
-
-        # ------------------------------
-        # ESPAÇAMENTO
-        # ------------------------------
-        doc.add_paragraph("")
-        doc.add_paragraph("")
-
-        # ------------------------------
-        # BENEFICIÁRIOS
-        # ------------------------------
-        doc.add_heading("Beneficiários", level=1)
-
-        doc.add_heading(
-            "Número de beneficiários por gênero e faixa etária",
-            level=2
-        )
-
-        doc.add_paragraph("")
-
-
-        # Dados do relatório
-        benef = relatorio.get("beneficiarios_quant", {})
-
-        mulheres = benef.get("mulheres", {})
-        homens = benef.get("homens", {})
-        nao_binarios = benef.get("nao_binarios", {})
-
-        # Totais por faixa etária
-        total_jovens = (
-            mulheres.get("jovens", 0)
-            + homens.get("jovens", 0)
-            + nao_binarios.get("jovens", 0)
-        )
-
-        total_adultos = (
-            mulheres.get("adultas", 0)
-            + homens.get("adultos", 0)
-            + nao_binarios.get("adultos", 0)
-        )
-
-        total_idosos = (
-            mulheres.get("idosas", 0)
-            + homens.get("idosos", 0)
-            + nao_binarios.get("idosos", 0)
-        )
-
-        # Totais por gênero
-        total_mulheres = sum(mulheres.values())
-        total_homens = sum(homens.values())
-        total_nb = sum(nao_binarios.values())
-
-        total_geral = total_mulheres + total_homens + total_nb
-
-        # ------------------------------
-        # TABELA (8 colunas x 4 linhas)
-        # ------------------------------
-        tabela = doc.add_table(rows=4, cols=8)
-
-        # Linha 1 - Jovens
-        tabela.rows[0].cells[0].text = "Mulheres jovens"
-        tabela.rows[0].cells[1].text = str(mulheres.get("jovens", 0))
-
-        tabela.rows[0].cells[2].text = "Homens jovens"
-        tabela.rows[0].cells[3].text = str(homens.get("jovens", 0))
-
-        tabela.rows[0].cells[4].text = "Não-binários jovens"
-        tabela.rows[0].cells[5].text = str(nao_binarios.get("jovens", 0))
-
-        tabela.rows[0].cells[6].text = "Total de jovens"
-        tabela.rows[0].cells[7].text = str(total_jovens)
-
-        # Linha 2 - Adultos
-        tabela.rows[1].cells[0].text = "Mulheres adultas"
-        tabela.rows[1].cells[1].text = str(mulheres.get("adultas", 0))
-
-        tabela.rows[1].cells[2].text = "Homens adultos"
-        tabela.rows[1].cells[3].text = str(homens.get("adultos", 0))
-
-        tabela.rows[1].cells[4].text = "Não-binários adultos"
-        tabela.rows[1].cells[5].text = str(nao_binarios.get("adultos", 0))
-
-        tabela.rows[1].cells[6].text = "Total de adultos"
-        tabela.rows[1].cells[7].text = str(total_adultos)
-
-        # Linha 3 - Idosos
-        tabela.rows[2].cells[0].text = "Mulheres idosas"
-        tabela.rows[2].cells[1].text = str(mulheres.get("idosas", 0))
-
-        tabela.rows[2].cells[2].text = "Homens idosos"
-        tabela.rows[2].cells[3].text = str(homens.get("idosos", 0))
-
-        tabela.rows[2].cells[4].text = "Não-binários idosos"
-        tabela.rows[2].cells[5].text = str(nao_binarios.get("idosos", 0))
-
-        tabela.rows[2].cells[6].text = "Total de idosos"
-        tabela.rows[2].cells[7].text = str(total_idosos)
-
-        # Linha 4 - Totais
-        tabela.rows[3].cells[0].text = "Total de mulheres"
-        tabela.rows[3].cells[1].text = str(total_mulheres)
-
-        tabela.rows[3].cells[2].text = "Total de homens"
-        tabela.rows[3].cells[3].text = str(total_homens)
-
-        tabela.rows[3].cells[4].text = "Total de não-binários"
-        tabela.rows[3].cells[5].text = str(total_nb)
-
-        tabela.rows[3].cells[6].text = "Total geral"
-        tabela.rows[3].cells[7].text = str(total_geral)
-
-
-
-
-
-
-
-
-
-
-
-
-
-        doc.add_paragraph("")  # espaçamento
-        doc.add_paragraph("")  # espaçamento
-
-
-        # ------------------------------
-        # SUBSEÇÃO: TIPOS DE BENEFICIÁRIOS
-        # ------------------------------
-        doc.add_heading(
-            "Beneficiários e Benefício",
-            level=2
-        )
-
-        doc.add_paragraph("")  # espaçamento
-
-
-        localidades = projeto.get("locais", {}).get("localidades", [])
-
-        tem_localidade = False
-
-        for loc in localidades:
-
-            beneficiarios = loc.get("beneficiarios", [])
-
-            if beneficiarios:
-
-                tem_localidade = True
-
-                # Nome da localidade em negrito
-                p = doc.add_paragraph()
-                run = p.add_run(loc.get("nome_localidade", ""))
-                run.bold = True
-
-                # Município
-                doc.add_paragraph(loc.get("municipio", ""))
-
-                # Lista de beneficiários
-                for ben in beneficiarios:
-
-                    tipo = ben.get("tipo_beneficiario", "")
-                    beneficios = ben.get("beneficios", [])
-
-
-                    # Tipo de beneficiário 
-                    p = doc.add_paragraph()
-                    run = p.add_run(f"{tipo}")
-                    # run.bold = True
-
-                    # Lista de benefícios
-                    for b in beneficios:
-                        doc.add_paragraph(b, style="List Bullet")
-
-                    # doc.add_paragraph(
-                    #     f"{tipo}    |    Benefícios: {', '.join(beneficios)}"
-                    # )
-
-                doc.add_paragraph("")  # espaçamento
-
-
-        # Caso não existam dados
-        if not tem_localidade:
-            doc.add_paragraph("Não há registros de beneficiários por localidade.")
-
-
-
-
-
-
-
-
-
-
-
-        # ------------------------------
-        # ESPAÇAMENTO
-        # ------------------------------
-        doc.add_paragraph("")
-        doc.add_paragraph("")
-
-        # ------------------------------
-        # SEÇÃO: PESQUISAS
-        # ------------------------------
-        doc.add_heading(
-            "Pesquisas / Ferramentas de Monitoramento",
-            level=1
-        )
-
-        doc.add_paragraph("")
-
-        # ------------------------------
-        # BUSCA EDITAL
-        # ------------------------------
-        edital = db["editais"].find_one(
-            {"codigo_edital": projeto.get("edital")}
-        )
-
-        pesquisas_edital = edital.get("pesquisas_relatorio", []) if edital else []
-
-        # Pesquisas respondidas no projeto
-        pesquisas_projeto = projeto.get("pesquisas", [])
-
-        # Indexa pesquisas do projeto por id (para busca rápida)
-        mapa_pesquisas = {
-            p.get("id_pesquisa"): p
-            for p in pesquisas_projeto
-        }
-
-        tem_pesquisa = False
-
-        # ------------------------------
-        # LOOP NAS PESQUISAS DO EDITAL
-        # ------------------------------
-        for pesquisa in pesquisas_edital:
-
-            tem_pesquisa = True
-
-            id_pesquisa = pesquisa.get("id")
-            nome = pesquisa.get("nome_pesquisa")
-
-            # Nome da pesquisa
-            doc.add_paragraph(nome)
-
-            # Verifica se existe no projeto
-            dados_proj = mapa_pesquisas.get(id_pesquisa)
-
-            if dados_proj:
-                respondida = "Sim" if dados_proj.get("respondida") else "Não"
-                verificada = "Sim" if dados_proj.get("verificada") else "Não"
-            else:
-                respondida = "Não"
-                verificada = "Não"
-
-            # Status
-            doc.add_paragraph(f"Respondida? {respondida}")
-            doc.add_paragraph(f"Verificada? {verificada}")
-
-            doc.add_paragraph("")  # espaçamento
-
-
-        # Caso não existam pesquisas
-        if not tem_pesquisa:
-            doc.add_paragraph("Não há pesquisas vinculadas a este edital.")
-
-
-
-
-
-
-
-
-
-
-        # ------------------------------
-        # ESPAÇAMENTO
-        # ------------------------------
-        doc.add_paragraph("")
-        doc.add_paragraph("")
-
-        # ------------------------------
-        # SEÇÃO: FORMULÁRIO
-        # ------------------------------
-        doc.add_heading("Formulário", level=1)
-
-        doc.add_paragraph("")
-
-
-        respostas = relatorio.get("respostas_formulario", {})
-
-        tem_resposta = False
-
-        # Ordena perguntas pela ordem
-        perguntas_ordenadas = sorted(
-            respostas.values(),
-            key=lambda x: x.get("ordem", 0)
-        )
-
-        for item in perguntas_ordenadas:
-
-            pergunta = item.get("pergunta", "")
-            resposta = item.get("resposta", "")
-
-            tem_resposta = True
-
-            # Pergunta em negrito
-            p = doc.add_paragraph()
-            run = p.add_run(pergunta)
-            run.bold = True
-
-            # Resposta
-            if isinstance(resposta, list):
-                for r in resposta:
-                    nome = r.get("nome", "")
-                    doc.add_paragraph(nome, style="List Bullet")
-            else:
-                doc.add_paragraph(str(resposta))
-
-            doc.add_paragraph("")  # espaçamento
-
-
-        # Caso não existam respostas
-        if not tem_resposta:
-            doc.add_paragraph("Não há respostas registradas para este formulário.")
-
-
-
-
-
-
-
-
-
-
-
-
-        # ------------------------------
-        # SALVAMENTO TEMPORÁRIO
-        # ------------------------------
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-            caminho = tmp.name
-            doc.save(caminho)
-
-        # Garantia de integridade do arquivo
-        time.sleep(3)
-
-        # ------------------------------
-        # DOWNLOAD
-        # ------------------------------
-
-        numero = relatorio.get("numero")
-        codigo_projeto = projeto.get("codigo")
-        sigla_org = organizacao.get("sigla_organizacao") if organizacao else "org"
-
-        nome_arquivo = f"relatorio_{numero}_{codigo_projeto}_{sigla_org}.docx"
-
-
-
-        # Remoção do arquivo temporário
-        os.remove(caminho)
-
-        return doc
-
-
-
-
-
-
 def calcular_saldo_parcela():
     # ==================================================
     # CÁLCULO DO SALDO DA PARCELA
@@ -1288,7 +437,8 @@ def atualizar_verificacao_relatorio(projeto_codigo, relatorio_numero, campo, che
     data = datetime.datetime.now().strftime("%d/%m/%Y")
 
     if marcado:
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {
                 "codigo": projeto_codigo,
                 "relatorios.numero": relatorio_numero
@@ -1300,7 +450,8 @@ def atualizar_verificacao_relatorio(projeto_codigo, relatorio_numero, campo, che
             }
         )
     else:
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {
                 "codigo": projeto_codigo,
                 "relatorios.numero": relatorio_numero
@@ -1380,96 +531,19 @@ def gerar_email_relatorio_aprovado(
     organizacao: str,
     logo_url: str
 ):
+    """
+    Gera o HTML do e-mail de aprovação de relatório
+    (templates_email/relatorio_aprovado.html).
+    """
 
-    return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{
-            font-family: Arial, Helvetica, sans-serif;
-            background-color: #f5f5f5;
-            margin: 0;
-            padding: 0;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-top: 6px solid #A0C256;
-            padding: 30px;
-        }}
-        .logo {{
-            text-align: center;
-            margin-bottom: 30px;
-        }}
-        .content {{
-            color: #333;
-            font-size: 15px;
-            line-height: 1.6;
-        }}
-        .footer {{
-            margin-top: 40px;
-            font-size: 12px;
-            color: #777;
-            text-align: center;
-        }}
-        .highlight {{
-            color: #A0C256;
-            font-weight: bold;
-        }}
-    </style>
-</head>
-<body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo_url}" height="70" alt="IEB">
-        </div>
-
-        <div class="content">
-
-            <p>Olá <strong>{nome_do_contato}</strong>,</p>
-
-            <p>
-                Informamos que o <span class="highlight">Relatório {relatorio_numero}</span>
-                do projeto <span class="highlight">{projeto['nome_do_projeto']}</span>
-                da organização <strong>{organizacao}</strong> foi <strong>aprovado</strong>.
-            </p>
-
-            <p>
-                O relatório já está validado no sistema e segue para os próximos encaminhamentos.
-            </p>
-
-            <p>
-                Atenciosamente,<br>
-            </p>
-
-            <p>
-                <a 
-                    href="https://veredas.streamlit.app/" 
-                    target="_blank"
-                    style="text-decoration: none;"
-                >
-                    Sistema Veredas
-                </a>
-            </p>
-                
-
-
-        </div>
-
-        <div class="footer">
-            Este é um e-mail automático. Não responda.
-        </div>
-
-    </div>
-
-</body>
-</html>
-"""
+    return renderizar_email(
+        "relatorio_aprovado.html",
+        nome_do_contato=nome_do_contato,
+        relatorio_numero=relatorio_numero,
+        nome_do_projeto=projeto["nome_do_projeto"],
+        organizacao=organizacao,
+        logo_url=logo_url
+    )
 
 
 
@@ -1482,102 +556,19 @@ def gerar_email_relatorio_reprovado(
     logo_url: str
 ):
     """
-    Gera o HTML do e-mail de reprovação de relatório.
+    Gera o HTML do e-mail de reprovação de relatório
+    (templates_email/relatorio_reprovado.html).
     Segue o mesmo padrão visual do e-mail de aprovação.
     """
 
-    return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{
-            font-family: Arial, Helvetica, sans-serif;
-            background-color: #f5f5f5;
-            margin: 0;
-            padding: 0;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-top: 6px solid #C82333;
-            padding: 30px;
-        }}
-        .logo {{
-            text-align: center;
-            margin-bottom: 30px;
-        }}
-        .content {{
-            color: #333;
-            font-size: 15px;
-            line-height: 1.6;
-        }}
-        .footer {{
-            margin-top: 40px;
-            font-size: 12px;
-            color: #777;
-            text-align: center;
-        }}
-        .highlight {{
-            color: #C82333;
-            font-weight: bold;
-        }}
-    </style>
-</head>
-<body>
-
-    <div class="container">
-
-        <div class="logo">
-            <img src="{logo_url}" height="70" alt="IEB">
-        </div>
-
-        <div class="content">
-
-            <p><strong>{nome_do_contato}</strong>,</p>
-
-            <p>
-                Informamos que o <span class="highlight">Relatório {relatorio_numero}</span>
-                do projeto {projeto['nome_do_projeto']}
-                da organização <strong>{organizacao}</strong> <span class="highlight">não foi aprovado</span>.
-            </p>
-
-            <p>
-                Acesse o sistema Veredas para ver em detalhes os ajustes necessários no Relatório.
-            </p>
-
-            <p>
-                <strong>Após realizar todos os ajustes, envie o relatório novamente.</strong>
-            </p>
-
-            <p>
-                Atenciosamente,<br>
-            </p>
-
-            <p>
-                <a 
-                    href="https://veredas.streamlit.app/" 
-                    target="_blank"
-                    style="text-decoration: none;"
-                >
-                    Sistema Veredas
-                </a>
-            </p>
-
-
-        </div>
-
-        <div class="footer">
-            Este é um e-mail automático. Não responda.
-        </div>
-
-    </div>
-
-</body>
-</html>
-"""
+    return renderizar_email(
+        "relatorio_reprovado.html",
+        nome_do_contato=nome_do_contato,
+        relatorio_numero=relatorio_numero,
+        nome_do_projeto=projeto["nome_do_projeto"],
+        organizacao=organizacao,
+        logo_url=logo_url
+    )
 
 
 
@@ -1605,20 +596,22 @@ def notificar_padrinhos_relatorio(
     if not padrinhos:
         return False
 
-    for padrinho in padrinhos:
-        html = montar_email_relatorio_envio(
-            nome=padrinho["nome_completo"],
-            numero_relatorio=numero_relatorio,
-            codigo=projeto["codigo"],
-            sigla=projeto["sigla"],
-            logo_url=logo_url
-        )
+    assunto = f"CEPF - Relatório {numero_relatorio} recebido - Projeto {projeto['codigo']} - {projeto['sigla']}"
 
-        enviar_email(
-            corpo_html=html,
-            destinatarios=[padrinho["e_mail"]],
-            assunto=f"CEPF - Relatório {numero_relatorio} recebido - Projeto {projeto['codigo']} - {projeto['sigla']}"
-        )
+    # Um corpo por padrinho (muda só o nome), todos na caixa de saída de uma vez
+    corpos = renderizar_emails(
+        "relatorio_envio.html",
+        [{"nome": padrinho["nome_completo"]} for padrinho in padrinhos],
+        numero_relatorio=numero_relatorio,
+        codigo=projeto["codigo"],
+        sigla=projeto["sigla"],
+        logo_url=logo_url
+    )
+
+    enviar_emails([
+        {"corpo_html": html, "destinatarios": [padrinho["e_mail"]], "assunto": assunto}
+        for padrinho, html in zip(padrinhos, corpos)
+    ], origem="notificar_padrinhos_relatorio")
 
     return True
 
@@ -1632,89 +625,19 @@ def montar_email_relatorio_envio(
     sigla: str,
     logo_url: str
 ):
-    return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{
-            font-family: Arial, Helvetica, sans-serif;
-            background-color: #f5f5f5;
-            margin: 0;
-            padding: 0;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-top: 6px solid #A0C256;
-            padding: 30px;
-        }}
-        .logo {{
-            text-align: center;
-            margin-bottom: 30px;
-        }}
-        .content {{
-            color: #333;
-            font-size: 15px;
-            line-height: 1.6;
-        }}
-        .footer {{
-            margin-top: 40px;
-            font-size: 12px;
-            color: #777;
-            text-align: center;
-        }}
-        .highlight {{
-            color: #A0C256;
-            font-weight: bold;
-        }}
-    </style>
-</head>
-<body>
-
-    <div class="container">
-        <div class="logo">
-            <img src="{logo_url}" height="70" alt="CEPF">
-        </div>
-
-        <div class="content">
-            <br>
-            <p>Olá <strong>{nome}</strong>,</p>
-
-            <p>
-                O relatório <span class="highlight">{numero_relatorio}</span> do projeto
-                <span class="highlight">{codigo} - {sigla}</span> está disponível para análise.
-            </p>
-
-            <p>
-                Por favor, acesse o sistema para realizar a avaliação.
-            </p>
-
-            <p>Atenciosamente,<br>
-            </p>
-                
-            <p>
-                <a 
-                    href="https://veredas.streamlit.app/" 
-                    target="_blank"
-                    style="text-decoration: none;"
-                >
-                    Sistema Veredas
-                </a>
-            </p>
-            
-        </div>
-
-        <div class="footer">
-            Este é um e-mail automático. Não responda.
-        </div>
-    </div>
+    """
+    Gera o HTML do e-mail de aviso de relatório recebido
+    (templates_email/relatorio_envio.html).
+    """
 
-</body>
-</html>
-"""
+    return renderizar_email(
+        "relatorio_envio.html",
+        nome=nome,
+        numero_relatorio=numero_relatorio,
+        codigo=codigo,
+        sigla=sigla,
+        logo_url=logo_url
+    )
 
 
 
@@ -1738,34 +661,11 @@ def buscar_padrinhos_do_projeto(col_pessoas, codigo_projeto: str):
             {
                 "nome_completo": 1,
                 "e_mail": 1
-            }
-        )
-    )
-
-    return padrinhos
-
-
-
-
-def gerar_id_lanc_despesa(projeto):
-    """
-    Gera id sequencial no formato despesa_001, despesa_002...
-    """
-
-    numeros = []
-
-    for despesa in projeto.get("financeiro", {}).get("orcamento", []):
-        for lanc in despesa.get("lancamentos", []):
-            idd = lanc.get("id_lanc_despesa")
-            if idd and idd.startswith("despesa_"):
-                try:
-                    numeros.append(int(idd.split("_")[1]))
-                except:
-                    pass
-
-    proximo = max(numeros, default=0) + 1
-    return f"despesa_{str(proximo).zfill(3)}"
+            }
+        )
+    )
 
+    return padrinhos
 
 
 
@@ -1859,9 +759,6 @@ def render_registro_despesa(relatorio_numero, projeto, col_projetos):
         # ==================================================
 
 
-        id_despesa = gerar_id_lanc_despesa(projeto)
-
-
 
         col0, col1, col2, col3 = st.columns(4)
 
@@ -2031,6 +928,9 @@ def render_registro_despesa(relatorio_numero, projeto, col_projetos):
             # ==================================================
             with area_notif_despesas.spinner("Registrando despesa..."):
 
+                # Id sequencial do lançamento (despesa_001, despesa_002...),
+                # gerado só no salvamento para não consumir números a cada rerun
+                id_despesa = proximo_id(db, projeto["codigo"], "despesa")
 
                 novo_lancamento = {
                     "id_lanc_despesa": id_despesa,
@@ -2063,53 +963,49 @@ def render_registro_despesa(relatorio_numero, projeto, col_projetos):
 
                 pasta_financeiro = obter_pasta_relatos_financeiros(
                     servico,
-                    pasta_projeto
+                    pasta_projeto,
+                    projeto["codigo"]
                 )
 
                 pasta_lanc = obter_ou_criar_pasta(
                     servico,
                     id_despesa,
-                    pasta_financeiro
+                    pasta_financeiro,
+                    projeto["codigo"]
                 )
 
-                for arq in anexos:
-                    id_drive = enviar_arquivo_drive(servico, pasta_lanc, arq)
+                ids_drive = enviar_arquivos_drive([(pasta_lanc, arq) for arq in anexos])
+
+                for arq, id_drive in zip(anexos, ids_drive):
+
+                    # Falhas já têm a mensagem de erro agendada
+                    if not id_drive:
+                        continue
+
                     novo_lancamento["anexos"].append({
                         "nome_arquivo": arq.name,
                         "id_arquivo": id_drive
                     })
 
 
-                # --------------------------------------------------
-                # Inserção no objeto do projeto
-                # --------------------------------------------------
-                for d in projeto["financeiro"]["orcamento"]:
-
-                    if d["id_despesa"] == despesa_selecionada["id_despesa"]:
-
-                        d.setdefault(
-                            "lancamentos",
-                            []
-                        ).append(novo_lancamento)
-
-                        break
-
-
                 # -------------------------------
-                # Persistência no MongoDB
+                # Persistência no MongoDB (apenas o novo lançamento)
                 # -------------------------------
-                col_projetos.update_one(
-                    {"codigo": projeto["codigo"]},
-                    {"$set": {"financeiro.orcamento": projeto["financeiro"]["orcamento"]}}
-                )
+                inserir_lancamento(db, projeto["codigo"], novo_lancamento)
 
             # --------------------------------------------------
             # Reset completo do formulário via nova chave
             # --------------------------------------------------
             st.session_state["form_despesa_key"] += 1
 
-            area_notif_despesas.success("Despesa registrada com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            if None in ids_drive:
+                agendar_mensagem(
+                    "Despesa registrada, mas nem todos os anexos foram enviados. Edite a despesa para anexá-los novamente.",
+                    icon=":material/warning:",
+                    tipo="warning"
+                )
+            else:
+                agendar_mensagem("Despesa registrada com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -2184,9 +1080,9 @@ def salvar_relato():
     """
     Salva um relato de atividade:
     - valida campos obrigatórios
-    - cria pastas no Google Drive (Relatos_atividades/relato_xxx)
-    - envia anexos e fotos
-    - grava no MongoDB
+    - guarda anexos e fotos no banco e grava o relato no MongoDB
+    - enfileira o envio ao Google Drive (Relatos_atividades/relato_xxx),
+      feito pelo trabalhador da fila de tarefas (fila_tarefas.py)
     - limpa o session_state
     - NÃO executa UI nem rerun (controlado externamente)
     """
@@ -2220,10 +1116,8 @@ def salvar_relato():
         return False
 
     # --------------------------------------------------
-    # 3. CONEXÃO COM GOOGLE DRIVE
+    # 3. PROJETO
     # --------------------------------------------------
-    servico = obter_servico_drive()
-
     projeto = st.session_state.get("projeto_mongo")
     if not projeto:
         return False
@@ -2231,18 +1125,6 @@ def salvar_relato():
     codigo = projeto["codigo"]
     sigla = projeto["sigla"]
 
-    pasta_projeto_id = obter_pasta_projeto(
-        servico,
-        codigo,
-        sigla
-    )
-
-    pasta_relatos_id = obter_ou_criar_pasta(
-        servico,
-        "Relatos_atividades",
-        pasta_projeto_id
-    )
-
     # --------------------------------------------------
     # 4. ATIVIDADE SELECIONADA
     # --------------------------------------------------
@@ -2260,63 +1142,59 @@ def salvar_relato():
         return False
 
     # --------------------------------------------------
-    # 6. GERA ID GLOBAL
+    # 6. GERA ID GLOBAL (contador do projeto)
     # --------------------------------------------------
-    maior_numero = 0
-
-    for componente in projeto["plano_trabalho"]["componentes"]:
-        for entrega in componente["entregas"]:
-            for atividade in entrega["atividades"]:
-                for relato in atividade.get("relatos", []):
-                    id_existente = relato.get("id_relato", "")
-                    if id_existente.startswith("relato_"):
-                        try:
-                            numero = int(id_existente.replace("relato_", ""))
-                            maior_numero = max(maior_numero, numero)
-                        except ValueError:
-                            pass
-
-    id_relato = f"relato_{maior_numero + 1:03d}"
+    id_relato = proximo_id(db, codigo, "relato")
 
     # --------------------------------------------------
-    # 7. PASTA DO RELATO
+    # 7. ARQUIVOS GUARDADOS PARA O ENVIO AO DRIVE
     # --------------------------------------------------
-    pasta_relato_id = obter_ou_criar_pasta(
-        servico,
-        id_relato,
-        pasta_relatos_id
-    )
+    # O envio ao Drive (pastas, upload e permissão da pasta de fotos) é
+    # feito pelo trabalhador da fila de tarefas. Aqui os arquivos são
+    # guardados no banco e os itens ficam com envio_pendente até o
+    # trabalhador gravar o id_arquivo de cada um.
+    fotos_validas = [
+        f for f in fotos
+        if f.get("arquivo") is not None
+    ]
 
-    # --------------------------------------------------
-    # 8. UPLOAD DE ANEXOS (mantido)
-    # --------------------------------------------------
-    lista_anexos = []
+    arquivos_anexos = [
+        {"id_envio": uuid.uuid4().hex, "id_gridfs": guardar_arquivo_enviado(db, arq), "nome": arq.name}
+        for arq in anexos or []
+    ]
 
-    if anexos:
-        pasta_anexos_id = obter_ou_criar_pasta(
-            servico,
-            "anexos",
-            pasta_relato_id
-        )
+    arquivos_fotos = [
+        {"id_envio": uuid.uuid4().hex, "id_gridfs": guardar_arquivo_enviado(db, foto["arquivo"]), "nome": foto["arquivo"].name}
+        for foto in fotos_validas
+    ]
 
-        for arq in anexos:
-            id_drive = enviar_arquivo_drive(
-                servico,
-                pasta_anexos_id,
-                arq
-            )
+    lista_anexos = [
+        {
+            "nome_arquivo": item["nome"],
+            "id_arquivo": None,
+            "id_envio": item["id_envio"],
+            "envio_pendente": True
+        }
+        for item in arquivos_anexos
+    ]
 
-            if id_drive:
-                lista_anexos.append({
-                    "nome_arquivo": arq.name,
-                    "id_arquivo": id_drive
-                })
+    lista_fotos = [
+        {
+            "nome_arquivo": item["nome"],
+            "descricao": foto.get("descricao", ""),
+            "fotografo": foto.get("fotografo", ""),
+            "id_arquivo": None,
+            "id_envio": item["id_envio"],
+            "envio_pendente": True
+        }
+        for foto, item in zip(fotos_validas, arquivos_fotos)
+    ]
 
 
 
 
     # --------------------------------------------------
-    # 9. LINKS
+    # 8. LINKS
     # --------------------------------------------------
     lista_links = []
 
@@ -2337,62 +1215,7 @@ def salvar_relato():
 
 
     # --------------------------------------------------
-    # 10. UPLOAD DE FOTOGRAFIAS (INTEGRALMENTE PRESERVADO)
-    # --------------------------------------------------
-    lista_fotos = []
-
-    fotos_validas = [
-        f for f in fotos
-        if f.get("arquivo") is not None
-    ]
-
-    if fotos_validas:
-
-        consulta = (
-            f"name='fotos' and "
-            f"'{pasta_relato_id}' in parents and "
-            f"mimeType='application/vnd.google-apps.folder' and trashed=false"
-        )
-
-        resultado = servico.files().list(
-            q=consulta,
-            fields="files(id)",
-            supportsAllDrives=True,
-            includeItemsFromAllDrives=True
-        ).execute()
-
-        arquivos = resultado.get("files", [])
-
-        if arquivos:
-            pasta_fotos_id = arquivos[0]["id"]
-        else:
-            pasta_fotos_id = obter_ou_criar_pasta(
-                servico,
-                "fotos",
-                pasta_relato_id
-            )
-
-            garantir_permissao_publica_leitura(servico, pasta_fotos_id)
-
-        for foto in fotos_validas:
-            arq = foto["arquivo"]
-
-            id_drive = enviar_arquivo_drive(
-                servico,
-                pasta_fotos_id,
-                arq
-            )
-
-            if id_drive:
-                lista_fotos.append({
-                    "nome_arquivo": arq.name,
-                    "descricao": foto.get("descricao", ""),
-                    "fotografo": foto.get("fotografo", ""),
-                    "id_arquivo": id_drive
-                })
-
-    # --------------------------------------------------
-    # 11. OBJETO FINAL
+    # 9. OBJETO FINAL
     # --------------------------------------------------
     data_inicio_str = data_inicio.strftime("%d/%m/%Y") if data_inicio else None
     data_fim_str = data_fim.strftime("%d/%m/%Y") if data_fim else None
@@ -2417,16 +1240,56 @@ def salvar_relato():
     if lista_fotos:
         novo_relato["fotos"] = lista_fotos
 
-    atividade_mongo.setdefault("relatos", []).append(novo_relato)
+    # O relato vai direto para a coleção relatos, sem regravar o plano de
+    # trabalho. Se a escrita falhar, os arquivos guardados são descartados.
+    try:
+        inserir_relato(db, codigo, id_atividade, novo_relato)
 
-    col_projetos.update_one(
-        {"codigo": codigo},
-        {
-            "$set": {
-                "plano_trabalho.componentes": projeto["plano_trabalho"]["componentes"]
-            }
-        }
-    )
+        # Muda a versão do projeto: uma tela aberta antes, ao gravar o plano
+        # de trabalho com atualizar_projeto_versionado, relê os relatos
+        col_projetos.update_one({"codigo": codigo}, {"$inc": {"versao": 1}})
+
+    except Exception:
+        for item in arquivos_anexos + arquivos_fotos:
+            excluir_arquivo(db, item["id_gridfs"])
+        raise
+
+    # --------------------------------------------------
+    # 10. ENVIO AO DRIVE EM SEGUNDO PLANO
+    # --------------------------------------------------
+    grupos = []
+
+    if arquivos_anexos:
+        grupos.append({
+            "campo": "anexos",
+            "pastas": ["Relatos_atividades", id_relato, "anexos"],
+            "permissao_publica": False,
+            "arquivos": arquivos_anexos
+        })
+
+    if arquivos_fotos:
+        # A pasta de fotos tem leitura pública (galeria de fotos do projeto)
+        grupos.append({
+            "campo": "fotos",
+            "pastas": ["Relatos_atividades", id_relato, "fotos"],
+            "permissao_publica": True,
+            "arquivos": arquivos_fotos
+        })
+
+    if grupos:
+        enfileirar_tarefa(
+            db,
+            "envio_drive",
+            {
+                "codigo": codigo,
+                "sigla": sigla,
+                "colecao": COLECAO_RELATOS,
+                "filtro": {"codigo": codigo, "id_relato": id_relato},
+                "grupos": grupos
+            },
+            codigo=codigo,
+            usuario=st.session_state.get("nome")
+        )
 
     # --------------------------------------------------
     # 12. LIMPEZA
@@ -2450,29 +1313,6 @@ def salvar_relato():
     return True
 
 
-# Função auxiliar para o salvar_relato, que dá permissão de leitura pública para a pasta de fotos no ato da criação da pasta no drivce
-def garantir_permissao_publica_leitura(servico, pasta_id):
-    """
-    Define permissão:
-    Qualquer pessoa com o link → Leitor
-    (somente se ainda não existir)
-    """
-
-    try:
-        servico.permissions().create(
-            fileId=pasta_id,
-            body={
-                "type": "anyone",
-                "role": "reader"
-            },
-            supportsAllDrives=True
-        ).execute()
-    except Exception as e:
-        st.error(f"Erro ao definir permissão: {str(e)}")
-        raise
-
-
-
 # ==================================================
 # RELATO DE ATIVIDADE (EXPANDER)
 # ==================================================
@@ -2798,8 +1638,7 @@ def render_relato_atividade(relatorio_numero, projeto, col_projetos):
             # ==================================================
             st.session_state["form_relato_key"] += 1
 
-            area_notif.success("Relato salvo com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            agendar_mensagem("Relato salvo com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -2814,7 +1653,9 @@ def liberar_proximo_relatorio(projeto_codigo, relatorios):
         status_proximo = relatorios[i + 1].get("status_relatorio")
 
         if status_atual == "aprovado" and status_proximo == "aguardando":
-            col_projetos.update_one(
+            relatorios[i + 1]["status_relatorio"] = "modo_edicao"
+            atualizar_projeto(
+                col_projetos,
                 {
                     "codigo": projeto_codigo,
                     "relatorios.numero": relatorios[i + 1]["numero"]
@@ -2842,15 +1683,6 @@ def renderizar_visualizacao(pergunta, resposta):
 
 # Atualiza o status do relatório no banco de dados, apoiando o segmented_control
 
-STATUS_UI_TO_DB = {
-    "Modo edição": "modo_edicao",
-    "Em análise": "em_analise",
-    "Aprovado": "aprovado",
-}
-
-STATUS_DB_TO_UI = {v: k for k, v in STATUS_UI_TO_DB.items()}
-
-
 def atualizar_status_relatorio(idx, relatorio_numero, projeto_codigo):
     """
     Atualiza o status do relatório no MongoDB quando o segmented_control muda.
@@ -2915,7 +1747,8 @@ def atualizar_status_relatorio(idx, relatorio_numero, projeto_codigo):
     # --------------------------------------------------
     # 4. ATUALIZA STATUS DO RELATÓRIO
     # --------------------------------------------------
-    col_projetos.update_one(
+    atualizar_projeto(
+        col_projetos,
         {
             "codigo": projeto_codigo,
             "relatorios.numero": relatorio_numero
@@ -2934,7 +1767,8 @@ def atualizar_status_relatorio(idx, relatorio_numero, projeto_codigo):
     # # --------------------------------------------------
     # # 3. ATUALIZA STATUS DO RELATÓRIO
     # # --------------------------------------------------
-    # col_projetos.update_one(
+    # atualizar_projeto(
+    col_projetos,
     #     {
     #         "codigo": projeto_codigo,
     #         "relatorios.numero": relatorio_numero
@@ -2963,10 +1797,13 @@ def atualizar_status_relatorio(idx, relatorio_numero, projeto_codigo):
         return  # nada a fazer nos relatos
 
     # --------------------------------------------------
-    # 5. RECARREGA O PROJETO COMPLETO
+    # 5. RECARREGA O PLANO DE TRABALHO (RELATOS DESTE RELATÓRIO)
     # --------------------------------------------------
-    projeto_atualizado = col_projetos.find_one(
-        {"codigo": projeto_codigo}
+    projeto_atualizado = anexar_historico(
+        db,
+        col_projetos.find_one({"codigo": projeto_codigo}),
+        lancamentos=False,
+        relatorio_numero=relatorio_numero
     )
 
     componentes = projeto_atualizado["plano_trabalho"]["componentes"]
@@ -3037,7 +1874,8 @@ def atualizar_status_relatorio(idx, relatorio_numero, projeto_codigo):
     # 7. SALVA NO BANCO APENAS SE HOUVE ALTERAÇÃO
     # --------------------------------------------------
     if houve_alteracao:
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {"codigo": projeto_codigo},
             {
                 "$set": {
@@ -3139,11 +1977,10 @@ def data_hoje_br():
 # -----------------------------------
 col_categorias_despesa = db["categorias_despesa"]
 
-categorias_despesa = list(
-    col_categorias_despesa.find(
-        {},
-        {"categoria": 1}
-    )
+categorias_despesa = carregar_colecao_referencia(
+    db,
+    "categorias_despesa",
+    projecao={"categoria": 1}
 )
 
 # -----------------------------------
@@ -3160,12 +1997,9 @@ mapa_categoria_id_nome = {
 
 
 # Libera automaticamente o próximo relatório, se aplicável
+# (atualiza também a lista de relatórios carregada)
 liberar_proximo_relatorio(projeto["codigo"], relatorios)
 
-# Recarrega o projeto para refletir possíveis mudanças
-projeto = col_projetos.find_one({"codigo": projeto["codigo"]})
-relatorios = projeto.get("relatorios", [])
-
 
 
 
@@ -3198,7 +2032,7 @@ with col_titulo:
 
 with col_identificacao:
     st.markdown(
-        f"<div style='text-align: right; margin-top: 30px;'>{df_projeto['codigo'].values[0]} - {df_projeto['sigla'].values[0]}</div>",
+        f"<div style='text-align: right; margin-top: 30px;'>{projeto['codigo']} - {projeto['sigla']}</div>",
         unsafe_allow_html=True
     )
 
@@ -3269,6 +2103,10 @@ relatorio = relatorios[idx]
 relatorio_numero = relatorio["numero"]
 projeto_codigo = projeto["codigo"]
 
+# Relatos e lançamentos apenas deste relatório. Ao gravar o plano de
+# trabalho, os relatos dos outros relatórios são preservados.
+anexar_historico(db, projeto, relatorio_numero=relatorio_numero)
+
 
 ###########################################################################################################
 # LINHA COM TÍTULO E BOTÃO DE OPÇÕES
@@ -3284,16 +2122,16 @@ with st.container(horizontal=True):
         icon=":material/print:", 
         type="tertiary"):
 
-        # Fragment para isolar renderização
-        @st.fragment
+        # O documento é gerado pelo trabalhador da fila de tarefas (fila_tarefas.py)
+        chave_tarefa_docx = f"tarefa_docx_relatorio_{projeto_codigo}_{relatorio_numero}"
+
+        # Fragment para isolar renderização. Atualiza sozinho enquanto o documento é gerado.
+        @st.fragment(run_every=intervalo_acompanhamento(chave_tarefa_docx))
         def fragment_exportacao_relatorio():
 
-            # Inicializa estado
-            if "docx_relatorio" not in st.session_state:
-                st.session_state.docx_relatorio = None
+            tarefa = acompanhar_tarefa(db, chave_tarefa_docx)
 
-            if "relatorio_gerado" not in st.session_state:
-                st.session_state.relatorio_gerado = False
+            gerando = tarefa is not None and tarefa["status"] not in (CONCLUIDA, ERRO)
 
 
             # BOTÃO GERAR RELATÓRIO ----------------------------------------
@@ -3301,43 +2139,36 @@ with st.container(horizontal=True):
                 "Gerar relatório",
                 icon=":material/settings:",
                 type="secondary",
-                width="stretch"
+                width="stretch",
+                disabled=gerando
             ):
 
-                # Gera o documento em memória
-                buffer = BytesIO()
+                iniciar_tarefa_da_sessao(
+                    db,
+                    chave_tarefa_docx,
+                    "docx_relatorio",
+                    {"codigo": projeto_codigo, "numero": relatorio_numero},
+                    codigo=projeto_codigo
+                )
 
-                doc = gerar_docx_relatorio(relatorio, projeto)
 
-                doc.save(buffer)
-                buffer.seek(0)
+            if gerando:
+                st.caption("Gerando relatório...")
 
-                # Armazena no session_state
-                st.session_state.docx_relatorio = buffer
-                st.session_state.relatorio_gerado = True
+            elif tarefa is not None and tarefa["status"] == ERRO:
+                st.error("Não foi possível gerar o relatório. Tente novamente.")
 
 
             # BOTÃO DOWNLOAD -----------------------------------------------
-            if st.session_state.relatorio_gerado:
+            elif tarefa is not None and tarefa["status"] == CONCLUIDA:
 
                 st.caption("Relatório gerado! Clique para baixar.")
 
-                numero = relatorio.get("numero")
-                codigo = projeto.get("codigo", "").replace("/", "-")
-
-                # Busca organização para sigla
-                organizacao = db["organizacoes"].find_one(
-                    {"_id": projeto.get("id_organizacao")}
-                )
-                sigla_org = organizacao.get("sigla_organizacao") if organizacao else "org"
-
-                nome_arquivo = f"relatorio_{numero}_{codigo}_{sigla_org}.docx"
-
                 st.download_button(
                     label="Baixar relatório",
-                    data=st.session_state.docx_relatorio,
-                    file_name=nome_arquivo,
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                    data=baixar_resultado(db, tarefa),
+                    file_name=tarefa["resultado"]["nome_arquivo"],
+                    mime=MIME_DOCX,
                     icon=":material/download:",
                     type="primary",
                     width="stretch"
@@ -3384,7 +2215,8 @@ if idx > 0:
     if status_anterior != "aprovado":
         aguardando = True
 
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {
                 "codigo": projeto_codigo,
                 "relatorios.numero": relatorio_numero,
@@ -3497,6 +2329,36 @@ if step_selecionado == "Atividades":
     st.markdown("#### Relatos de atividades")
     st.write('')
 
+    # Anexos e fotos de relatos novos são enviados ao Drive em segundo plano
+    qtd_envios_pendentes = envios_pendentes(db, projeto_codigo)
+
+    if qtd_envios_pendentes:
+        st.caption(
+            f":material/cloud_upload: {qtd_envios_pendentes} relato(s) com arquivos sendo enviados ao Drive. "
+            "Os links aparecem quando o envio terminar."
+        )
+
+    # Envios que esgotaram as tentativas: os arquivos continuam guardados
+    # até o envio ser tentado de novo
+    envios_falhos = envios_com_erro(db, projeto_codigo)
+
+    if envios_falhos:
+
+        tarefas_falhas = set(envios_falhos.values())
+
+        st.warning(
+            f"{len(tarefas_falhas)} relato(s) com arquivos que não puderam ser enviados ao Drive.",
+            icon=":material/cloud_off:"
+        )
+
+        if st.button("Tentar enviar de novo", icon=":material/replay:", key="reenviar_envios_drive"):
+
+            for id_tarefa in tarefas_falhas:
+                reenfileirar_tarefa(db, id_tarefa)
+
+            agendar_mensagem("Os arquivos voltaram para a fila de envio ao Drive.", icon=":material/cloud_upload:")
+            st.rerun()
+
 
     if pode_editar_relatorio:
         render_relato_atividade(
@@ -3676,6 +2538,10 @@ if step_selecionado == "Atividades":
                                                 f"[{a['nome_arquivo']}]({link})",
                                                 unsafe_allow_html=True
                                             )
+                                        elif a.get("id_envio") in envios_falhos:
+                                            c2.caption(f"{a['nome_arquivo']} (falha no envio ao Drive)")
+                                        elif a.get("envio_pendente"):
+                                            c2.caption(f"{a['nome_arquivo']} (enviando ao Drive...)")
 
                             # --------------------------------------------------
                             # FOTOGRAFIAS (links + metadados)
@@ -3693,6 +2559,10 @@ if step_selecionado == "Atividades":
                                             if f.get("fotografo"):
                                                 linha += f" | {f['fotografo']}"
                                             c2.markdown(linha, unsafe_allow_html=True)
+                                        elif f.get("id_envio") in envios_falhos:
+                                            c2.caption(f"{f['nome_arquivo']} (falha no envio ao Drive)")
+                                        elif f.get("envio_pendente"):
+                                            c2.caption(f"{f['nome_arquivo']} (enviando ao Drive...)")
 
 
 
@@ -3830,20 +2700,22 @@ if step_selecionado == "Atividades":
                                             relato["devolutiva"] = st.session_state.get(devolutiva_key, "")
                                             relato["status_aprovacao"] = f"Devolvido por {nome} em {data}"
 
-                                            col_projetos.update_one(
-                                                {"codigo": projeto["codigo"]},
+                                            if not atualizar_projeto_versionado(
+                                                col_projetos,
+                                                projeto,
                                                 {
                                                     "$set": {
                                                         "plano_trabalho.componentes": projeto["plano_trabalho"]["componentes"]
                                                     }
                                                 }
-                                            )
+                                            ):
+                                                st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                                                st.stop()
 
                                             st.session_state.pop(status_key, None)
                                             st.session_state.pop(devolutiva_key, None)
 
-                                            st.success("Devolutiva salva.", icon=":material/check:")
-                                            time.sleep(3)
+                                            agendar_mensagem("Devolutiva salva.", icon=":material/check:")
                                             st.rerun()
 
                                 # ==================================================
@@ -3876,14 +2748,17 @@ if step_selecionado == "Atividades":
                                     elif novo_status_db == "em_analise":
                                         relato.pop("status_aprovacao", None)
 
-                                    col_projetos.update_one(
-                                        {"codigo": projeto["codigo"]},
+                                    if not atualizar_projeto_versionado(
+                                        col_projetos,
+                                        projeto,
                                         {
                                             "$set": {
                                                 "plano_trabalho.componentes": projeto["plano_trabalho"]["componentes"]
                                             }
                                         }
-                                    )
+                                    ):
+                                        st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                                        st.stop()
 
                                     st.session_state.pop(status_key, None)
                                     st.rerun()
@@ -4470,29 +3345,56 @@ if step_selecionado == "Atividades":
                                         pasta_relatos_id = obter_ou_criar_pasta(
                                             servico,
                                             "Relatos_atividades",
-                                            pasta_projeto_id
+                                            pasta_projeto_id,
+                                            projeto["codigo"]
                                         )
 
                                         pasta_relato_id = obter_ou_criar_pasta(
                                             servico,
                                             id_relato,
-                                            pasta_relatos_id
+                                            pasta_relatos_id,
+                                            projeto["codigo"]
                                         )
 
-                                        # -----------------------------
-                                        # ANEXOS
-                                        # -----------------------------
+                                        fotos_validas = [
+                                            f for f in st.session_state[fotos_novas_key]
+                                            if f.get("arquivo") is not None
+                                        ]
+
+                                        envios = []
+
                                         if novos_anexos:
                                             pasta_anexos_id = obter_ou_criar_pasta(
                                                 servico,
                                                 "anexos",
-                                                pasta_relato_id
+                                                pasta_relato_id,
+                                                projeto["codigo"]
+                                            )
+                                            envios += [(pasta_anexos_id, arq) for arq in novos_anexos]
+
+                                        if fotos_validas:
+                                            pasta_fotos_id = obter_ou_criar_pasta(
+                                                servico,
+                                                "fotos",
+                                                pasta_relato_id,
+                                                projeto["codigo"]
                                             )
+                                            envios += [(pasta_fotos_id, foto["arquivo"]) for foto in fotos_validas]
+
+                                        # Anexos e fotos são enviados juntos, em paralelo
+                                        ids_drive = enviar_arquivos_drive(envios)
+
+                                        ids_anexos = ids_drive[:len(novos_anexos or [])]
+                                        ids_fotos = ids_drive[len(novos_anexos or []):]
+
+                                        # -----------------------------
+                                        # ANEXOS
+                                        # -----------------------------
+                                        if novos_anexos:
 
                                             relato.setdefault("anexos", [])
 
-                                            for arq in novos_anexos:
-                                                id_drive = enviar_arquivo_drive(servico, pasta_anexos_id, arq)
+                                            for arq, id_drive in zip(novos_anexos, ids_anexos):
                                                 if id_drive:
                                                     relato["anexos"].append({
                                                         "nome_arquivo": arq.name,
@@ -4502,23 +3404,12 @@ if step_selecionado == "Atividades":
                                         # -----------------------------
                                         # FOTOS
                                         # -----------------------------
-                                        fotos_validas = [
-                                            f for f in st.session_state[fotos_novas_key]
-                                            if f.get("arquivo") is not None
-                                        ]
-
                                         if fotos_validas:
-                                            pasta_fotos_id = obter_ou_criar_pasta(
-                                                servico,
-                                                "fotos",
-                                                pasta_relato_id
-                                            )
 
                                             relato.setdefault("fotos", [])
 
-                                            for foto in fotos_validas:
+                                            for foto, id_drive in zip(fotos_validas, ids_fotos):
                                                 arq = foto["arquivo"]
-                                                id_drive = enviar_arquivo_drive(servico, pasta_fotos_id, arq)
                                                 if id_drive:
                                                     relato["fotos"].append({
                                                         "nome_arquivo": arq.name,
@@ -4552,20 +3443,24 @@ if step_selecionado == "Atividades":
                                         # ==================================================
                                         # SALVA NO MONGO
                                         # ==================================================
-                                        col_projetos.update_one(
-                                            {"codigo": projeto["codigo"]},
+                                        if not atualizar_projeto_versionado(
+                                            col_projetos,
+                                            projeto,
                                             {"$set": {
                                                 "plano_trabalho.componentes": projeto["plano_trabalho"]["componentes"]
                                             }}
-                                        )
+                                        ):
+                                            st.warning(MENSAGEM_CONFLITO_VERSAO, icon=":material/sync_problem:")
+                                            st.stop()
 
                                         # Limpa estado
                                         st.session_state["relato_editando_id"] = None
                                         st.session_state.pop(fotos_novas_key, None)
                                         st.session_state.pop(links_novos_key, None)
 
-                                        st.success("Relato atualizado com sucesso!", icon=":material/check:")
-                                        time.sleep(3)
+                                        # Falhas no envio já têm a mensagem de erro agendada
+                                        if None not in ids_drive:
+                                            agendar_mensagem("Relato atualizado com sucesso!", icon=":material/check:")
                                         st.rerun()
 
 
@@ -4695,25 +3590,26 @@ if step_selecionado == "Despesas":
                             ):
 
                                 # Remove o extrato da lista
-                                relatorio["extratos_bancarios"].pop(i)
+                                extrato_removido = relatorio["extratos_bancarios"].pop(i)
 
                                 # Salva no MongoDB
-                                col_projetos.update_one(
+                                aplicar_atualizacoes(
+                                    col_projetos,
                                     {"codigo": projeto["codigo"]},
-                                    {
-                                        "$set": {
-                                            "relatorios": projeto["relatorios"]
-                                        }
-                                    }
+                                    retirar_do_item(
+                                        "relatorios",
+                                        {"numero": relatorio_numero},
+                                        "extratos_bancarios",
+                                        extrato_removido,
+                                        identificador="r"
+                                    )
                                 )
 
-                                st.success(
+                                agendar_mensagem(
                                     "Extrato bancário removido com sucesso!",
                                     icon=":material/check:"
                                 )
 
-                                time.sleep(3)
-
                                 st.rerun()
 
 
@@ -4799,22 +3695,21 @@ if step_selecionado == "Despesas":
                                 pasta_extratos = (
                                     obter_pasta_extratos_bancarios(
                                         servico,
-                                        pasta_projeto
+                                        pasta_projeto,
+                                        projeto["codigo"]
                                     )
                                 )
 
                                 lista_extratos = []
 
                                 # --------------------------------------
-                                # Upload dos arquivos
+                                # Upload dos arquivos (em paralelo)
                                 # --------------------------------------
-                                for arq in extratos_bancarios:
+                                ids_drive = enviar_arquivos_drive(
+                                    [(pasta_extratos, arq) for arq in extratos_bancarios]
+                                )
 
-                                    id_drive = enviar_arquivo_drive(
-                                        servico,
-                                        pasta_extratos,
-                                        arq
-                                    )
+                                for arq, id_drive in zip(extratos_bancarios, ids_drive):
 
                                     if not id_drive:
                                         continue
@@ -4841,21 +3736,24 @@ if step_selecionado == "Despesas":
                                 # --------------------------------------
                                 # Persistência Mongo
                                 # --------------------------------------
-                                col_projetos.update_one(
+                                aplicar_atualizacoes(
+                                    col_projetos,
                                     {"codigo": projeto["codigo"]},
-                                    {
-                                        "$set": {
-                                            "relatorios": projeto["relatorios"]
-                                        }
-                                    }
+                                    adicionar_ao_item(
+                                        "relatorios",
+                                        {"numero": relatorio_numero},
+                                        "extratos_bancarios",
+                                        lista_extratos,
+                                        identificador="r"
+                                    )
                                 )
 
-                            st.success(
-                                "Extratos bancários salvos com sucesso!",
-                                icon=":material/check:"
-                            )
-
-                            time.sleep(3)
+                            # Falhas no envio já têm a mensagem de erro agendada
+                            if None not in ids_drive:
+                                agendar_mensagem(
+                                    "Extratos bancários salvos com sucesso!",
+                                    icon=":material/check:"
+                                )
 
                             st.rerun()
 
@@ -5703,6 +4601,8 @@ if step_selecionado == "Despesas":
                                     # --------------------------------------------------
                                     # Upload de novos anexos
                                     # --------------------------------------------------
+                                    ids_drive = []
+
                                     if novos_anexos:
 
                                         servico = obter_servico_drive()
@@ -5715,24 +4615,27 @@ if step_selecionado == "Despesas":
 
                                         pasta_fin = obter_pasta_relatos_financeiros(
                                             servico,
-                                            pasta_proj
+                                            pasta_proj,
+                                            projeto["codigo"]
                                         )
 
                                         pasta_lanc = obter_ou_criar_pasta(
                                             servico,
                                             id_despesa,
-                                            pasta_fin
+                                            pasta_fin,
+                                            projeto["codigo"]
                                         )
 
                                         lanc.setdefault("anexos", [])
 
-                                        for arq in novos_anexos:
+                                        ids_drive = enviar_arquivos_drive(
+                                            [(pasta_lanc, arq) for arq in novos_anexos]
+                                        )
+
+                                        for arq, id_drive in zip(novos_anexos, ids_drive):
 
-                                            id_drive = enviar_arquivo_drive(
-                                                servico,
-                                                pasta_lanc,
-                                                arq
-                                            )
+                                            if not id_drive:
+                                                continue
 
                                             lanc["anexos"].append({
                                                 "nome_arquivo": arq.name,
@@ -5740,46 +4643,24 @@ if step_selecionado == "Despesas":
                                             })
 
                                     # --------------------------------------------------
-                                    # Move o lançamento para outra despesa (se necessário)
-                                    # --------------------------------------------------
-                                    if id_despesa_antiga != id_despesa_nova:
-
-                                        # Faz uma cópia completa do lançamento já atualizado
-                                        novo_lanc = copy.deepcopy(lanc)
-
-                                        # Adiciona primeiro na nova despesa
-                                        for d in projeto["financeiro"]["orcamento"]:
-
-                                            if d["id_despesa"] == id_despesa_nova:
-
-                                                d.setdefault("lancamentos", []).append(
-                                                    novo_lanc
-                                                )
-
-                                                break
-
-                                        # Remove da despesa antiga
-                                        for d in projeto["financeiro"]["orcamento"]:
-
-                                            if d["id_despesa"] == id_despesa_antiga:
-
-                                                d["lancamentos"] = [
-                                                    x
-                                                    for x in d.get("lancamentos", [])
-                                                    if x["id_lanc_despesa"] != id_despesa
-                                                ]
-
-                                                break
-
-                                    # --------------------------------------------------
-                                    # Persistência no Mongo
+                                    # Persistência no Mongo (apenas o lançamento editado).
+                                    # Se a despesa mudou, o lançamento vai para o fim
+                                    # da lista da nova despesa.
                                     # --------------------------------------------------
-                                    col_projetos.update_one(
-                                        {"codigo": projeto["codigo"]},
+                                    atualizar_lancamento(
+                                        db,
+                                        projeto["codigo"],
+                                        id_despesa,
                                         {
-                                            "$set": {
-                                                "financeiro.orcamento": projeto["financeiro"]["orcamento"]
-                                            }
+                                            "id_despesa": id_despesa_nova,
+                                            "data_despesa": lanc["data_despesa"],
+                                            "descricao_despesa": lanc["descricao_despesa"],
+                                            "fornecedor": lanc["fornecedor"],
+                                            "cpf_cnpj": lanc["cpf_cnpj"],
+                                            "quantidade": lanc["quantidade"],
+                                            "valor_unitario": lanc["valor_unitario"],
+                                            "valor_despesa": lanc["valor_despesa"],
+                                            "anexos": lanc.get("anexos", [])
                                         }
                                     )
 
@@ -5787,8 +4668,10 @@ if step_selecionado == "Despesas":
 
                                 # Limpa estado
                                 st.session_state["despesa_editando_id"] = None
-                                st.success("Despesa atualizada com sucesso!", icon=":material/check:")
-                                time.sleep(3)
+
+                                # Falhas no envio já têm a mensagem de erro agendada
+                                if None not in ids_drive:
+                                    agendar_mensagem("Despesa atualizada com sucesso!", icon=":material/check:")
                                 st.rerun()
 
                     
@@ -5845,33 +4728,14 @@ if step_selecionado == "Despesas":
                                             ):
                                                 with st.spinner("Excluindo despesa..."):
 
-                                                    # Remove o lançamento da estrutura
-                                                    id_despesa_orcamento = lanc.get("id_despesa")
-
-                                                    for d in projeto["financeiro"]["orcamento"]:
-
-                                                        if d.get("id_despesa") == id_despesa_orcamento:
-
-                                                            d["lancamentos"] = [
-                                                                l for l in d.get("lancamentos", [])
-                                                                if l.get("id_lanc_despesa") != id_despesa
-                                                            ]
-
-                                                            break
-
-
-                                                    # Salva no Mongo
-                                                    col_projetos.update_one(
-                                                        {"codigo": projeto["codigo"]},
-                                                        {"$set": {"financeiro.orcamento": projeto["financeiro"]["orcamento"]}}
-                                                    )
+                                                    # Remove o lançamento no Mongo
+                                                    excluir_lancamento(db, projeto["codigo"], id_despesa)
 
                                                 # Limpa estados
                                                 st.session_state["despesa_editando_id"] = None
                                                 st.session_state.pop(confirm_delete_key, None)
 
-                                                st.success("Despesa excluída com sucesso!", icon=":material/check:")
-                                                time.sleep(3)
+                                                agendar_mensagem("Despesa excluída com sucesso!", icon=":material/check:")
                                                 st.rerun()
 
                                             # Botão CANCELAR
@@ -5983,16 +4847,21 @@ if step_selecionado == "Despesas":
                                 lanc["devolutiva"] = st.session_state.get(devolutiva_key, "")
                                 lanc["status_aprovacao"] = f"Devolvido por {nome} em {data}"
 
-                                col_projetos.update_one(
-                                    {"codigo": projeto["codigo"]},
-                                    {"$set": {"financeiro.orcamento": projeto["financeiro"]["orcamento"]}}
+                                atualizar_lancamento(
+                                    db,
+                                    projeto["codigo"],
+                                    id_despesa,
+                                    {
+                                        "status_despesa": lanc["status_despesa"],
+                                        "devolutiva": lanc["devolutiva"],
+                                        "status_aprovacao": lanc["status_aprovacao"]
+                                    }
                                 )
 
                                 st.session_state.pop(status_key, None)
                                 st.session_state.pop(devolutiva_key, None)
 
-                                st.success("Devolutiva salva.", icon=":material/check:")
-                                time.sleep(3)
+                                agendar_mensagem("Devolutiva salva.", icon=":material/check:")
                                 st.rerun()
 
                     # ==================================================
@@ -6003,19 +4872,17 @@ if step_selecionado == "Despesas":
                         nome = st.session_state.get("nome", "Usuário")
                         data = data_hoje_br()
 
-                        lanc["status_despesa"] = novo_status_db
+                        definir = {"status_despesa": novo_status_db}
+                        remover = []
 
                         if novo_status_db == "aceito":
-                            lanc.pop("devolutiva", None)
-                            lanc["status_aprovacao"] = f"Verificado por {nome} em {data}"
+                            remover.append("devolutiva")
+                            definir["status_aprovacao"] = f"Verificado por {nome} em {data}"
 
                         elif novo_status_db == "em_analise":
-                            lanc.pop("status_aprovacao", None)
+                            remover.append("status_aprovacao")
 
-                        col_projetos.update_one(
-                            {"codigo": projeto["codigo"]},
-                            {"$set": {"financeiro.orcamento": projeto["financeiro"]["orcamento"]}}
-                        )
+                        atualizar_lancamento(db, projeto["codigo"], id_despesa, definir, remover)
 
                         st.session_state.pop(status_key, None)
                         st.rerun()
@@ -6147,7 +5014,8 @@ if step_selecionado == "Resultados":
 
                         }
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {
                                 "codigo": projeto_codigo,
                                 "relatorios.numero": relatorio_numero
@@ -6159,8 +5027,7 @@ if step_selecionado == "Resultados":
                             }
                         )
 
-                        st.success("Devolutiva registrada com sucesso.", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem("Devolutiva registrada com sucesso.", icon=":material/check:")
                         st.rerun()
 
             # ==================================================
@@ -6229,13 +5096,15 @@ if step_selecionado == "Resultados":
                                     relatorio["devolutiva_resultados"][idx_real]["status_devolutiva_resultado"] = novo_status
 
                                     # Persiste no Mongo
-                                    col_projetos.update_one(
+                                    aplicar_atualizacoes(
+                                        col_projetos,
                                         {"codigo": projeto_codigo},
-                                        {
-                                            "$set": {
-                                                "relatorios": projeto["relatorios"]
-                                            }
-                                        }
+                                        definir_no_item(
+                                            "relatorios",
+                                            {"numero": relatorio_numero},
+                                            {f"devolutiva_resultados.{idx_real}.status_devolutiva_resultado": novo_status},
+                                            identificador="r"
+                                        )
                                     )
 
                                     st.rerun()
@@ -6276,20 +5145,22 @@ if step_selecionado == "Resultados":
                                     ):
 
                                         # Remove da lista em memória
-                                        relatorio["devolutiva_resultados"].pop(idx_real)
+                                        devolutiva_removida = relatorio["devolutiva_resultados"].pop(idx_real)
 
                                         # Salva no Mongo
-                                        col_projetos.update_one(
+                                        aplicar_atualizacoes(
+                                            col_projetos,
                                             {"codigo": projeto_codigo},
-                                            {
-                                                "$set": {
-                                                    "relatorios": projeto["relatorios"]
-                                                }
-                                            }
+                                            retirar_do_item(
+                                                "relatorios",
+                                                {"numero": relatorio_numero},
+                                                "devolutiva_resultados",
+                                                devolutiva_removida,
+                                                identificador="r"
+                                            )
                                         )
 
-                                        st.success("Devolutiva excluída.", icon=":material/check:")
-                                        time.sleep(3)
+                                        agendar_mensagem("Devolutiva excluída.", icon=":material/check:")
 
                                         st.session_state["dev_result_apagando"] = None
                                         st.rerun()
@@ -6531,7 +5402,8 @@ if step_selecionado == "Resultados":
                             observacoes_salvar = ""
 
                         # Atualiza no MongoDB
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {
                                 "codigo": projeto_codigo
                             },
@@ -6554,8 +5426,7 @@ if step_selecionado == "Resultados":
                         indicador["observacoes_coleta"] = observacoes_salvar
                         indicador["data_coleta"] = data_coleta
 
-                        st.success("Indicador salvo com sucesso.", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem("Indicador salvo com sucesso.", icon=":material/check:")
                         st.rerun()
 
                 # Espaçamento entre indicadores
@@ -6578,8 +5449,8 @@ if step_selecionado == "Beneficiários":
     # CARREGA TIPOS DE BENEFÍCIO DO BANCO
     # =====================================================
 
-    dados_beneficios = list(
-        col_beneficios.find({}, {"beneficio": 1}).sort("beneficio", 1)
+    dados_beneficios = carregar_colecao_referencia(
+        db, "beneficios", projecao={"beneficio": 1}, ordenacao=[("beneficio", 1)]
     )
 
     OPCOES_BENEFICIOS = [
@@ -6680,7 +5551,8 @@ if step_selecionado == "Beneficiários":
 
                         }
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {
                                 "codigo": projeto_codigo,
                                 "relatorios.numero": relatorio_numero
@@ -6692,8 +5564,7 @@ if step_selecionado == "Beneficiários":
                             }
                         )
 
-                        st.success("Devolutiva registrada com sucesso.", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem("Devolutiva registrada com sucesso.", icon=":material/check:")
                         st.rerun()
 
             # ==================================================
@@ -6765,13 +5636,15 @@ if step_selecionado == "Beneficiários":
                                     relatorio["devolutiva_beneficiarios"][idx_real]["status_devolutiva_beneficiarios"] = novo_status
 
                                     # Persiste no Mongo
-                                    col_projetos.update_one(
+                                    aplicar_atualizacoes(
+                                        col_projetos,
                                         {"codigo": projeto_codigo},
-                                        {
-                                            "$set": {
-                                                "relatorios": projeto["relatorios"]
-                                            }
-                                        }
+                                        definir_no_item(
+                                            "relatorios",
+                                            {"numero": relatorio_numero},
+                                            {f"devolutiva_beneficiarios.{idx_real}.status_devolutiva_beneficiarios": novo_status},
+                                            identificador="r"
+                                        )
                                     )
 
                                     st.rerun()
@@ -6815,20 +5688,22 @@ if step_selecionado == "Beneficiários":
                                     ):
 
                                         # Remove da lista em memória
-                                        relatorio["devolutiva_beneficiarios"].pop(idx_real)
+                                        devolutiva_removida = relatorio["devolutiva_beneficiarios"].pop(idx_real)
 
                                         # Atualiza no Mongo
-                                        col_projetos.update_one(
+                                        aplicar_atualizacoes(
+                                            col_projetos,
                                             {"codigo": projeto_codigo},
-                                            {
-                                                "$set": {
-                                                    "relatorios": projeto["relatorios"]
-                                                }
-                                            }
+                                            retirar_do_item(
+                                                "relatorios",
+                                                {"numero": relatorio_numero},
+                                                "devolutiva_beneficiarios",
+                                                devolutiva_removida,
+                                                identificador="r"
+                                            )
                                         )
 
-                                        st.success("Devolutiva excluída.", icon=":material/check:")
-                                        time.sleep(3)
+                                        agendar_mensagem("Devolutiva excluída.", icon=":material/check:")
 
                                         st.session_state["dev_benef_apagando"] = None
                                         st.rerun()
@@ -7424,7 +6299,8 @@ if step_selecionado == "Beneficiários":
                 #     # sem recriar objetos da localidade
                 #     # -------------------------------------------------
 
-                #     col_projetos.update_one(
+                #     atualizar_projeto(
+                col_projetos,
                 #         {
                 #             "codigo": projeto["codigo"],
                 #             "locais.localidades.nome_localidade": nome_localidade
@@ -7633,14 +6509,14 @@ if step_selecionado == "Beneficiários":
 
                 if erros:
                     for erro in erros:
-                        st.error(erro)
-                    time.sleep(3)
+                        agendar_mensagem(erro, tipo="error")
                     st.rerun()
 
                 # -----------------------------------------
                 # SALVA NO BANCO
                 # -----------------------------------------
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {
                         "codigo": projeto["codigo"],
                         "locais.localidades.nome_localidade": nome_localidade
@@ -7663,12 +6539,11 @@ if step_selecionado == "Beneficiários":
                     # }
                 )
 
-                st.success(
+                agendar_mensagem(
                     f"Beneficiários da comunidade "
                     f"**{nome_localidade}** salvos com sucesso.",
                     icon=":material/check:"
                 )
-                time.sleep(3)
                 st.rerun()
 
 
@@ -7870,6 +6745,8 @@ if step_selecionado == "Pesquisas":
                     # Mantém URL já existente caso não exista novo upload
                     url_anexo_final = url_anexo_db
 
+                    falha_envio = False
+
                     # -------------------------------------------------
                     # Upload de novo arquivo
                     # -------------------------------------------------
@@ -7884,10 +6761,15 @@ if step_selecionado == "Pesquisas":
                             arquivo
                         )
 
-                        url_anexo_final = gerar_link_drive(id_drive)
+                        # Falha no envio: a mensagem de erro já foi agendada
+                        # e a URL anterior é mantida
+                        falha_envio = id_drive is None
 
-                        # Marca upload como concluído na sessão atual
-                        st.session_state[upload_salvo_key] = True
+                        if id_drive:
+                            url_anexo_final = gerar_link_drive(id_drive)
+
+                            # Marca upload como concluído na sessão atual
+                            st.session_state[upload_salvo_key] = True
 
                     # -------------------------------------------------
                     # Estrutura da pesquisa
@@ -7913,7 +6795,8 @@ if step_selecionado == "Pesquisas":
 
                     if existe:
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {
                                 "codigo": codigo_projeto_atual,
                                 "pesquisas.id_pesquisa": pesquisa["id"]
@@ -7927,7 +6810,8 @@ if step_selecionado == "Pesquisas":
 
                     else:
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {"codigo": codigo_projeto_atual},
                             {
                                 "$push": {
@@ -7945,8 +6829,8 @@ if step_selecionado == "Pesquisas":
                 st.session_state.pop(upload_key, None)
                 st.session_state.pop(upload_salvo_key, None)
 
-                st.success(":material/check: Salvo!")
-                time.sleep(3)
+                if not falha_envio:
+                    agendar_mensagem(":material/check: Salvo!")
                 st.rerun()
 
             # -------------------------------------------------
@@ -8043,7 +6927,8 @@ if step_selecionado == "Formulário":
 
                         }
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {
                                 "codigo": projeto_codigo,
                                 "relatorios.numero": relatorio_numero
@@ -8055,8 +6940,7 @@ if step_selecionado == "Formulário":
                             }
                         )
 
-                        st.success("Devolutiva registrada com sucesso.", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem("Devolutiva registrada com sucesso.", icon=":material/check:")
                         st.rerun()
 
             # ==================================================
@@ -8113,13 +6997,15 @@ if step_selecionado == "Formulário":
                                     relatorio["devolutiva_formulario"][idx_real]["status_devolutiva_formulario"] = novo_status
 
                                     # Persiste no Mongo
-                                    col_projetos.update_one(
+                                    aplicar_atualizacoes(
+                                        col_projetos,
                                         {"codigo": projeto_codigo},
-                                        {
-                                            "$set": {
-                                                "relatorios": projeto["relatorios"]
-                                            }
-                                        }
+                                        definir_no_item(
+                                            "relatorios",
+                                            {"numero": relatorio_numero},
+                                            {f"devolutiva_formulario.{idx_real}.status_devolutiva_formulario": novo_status},
+                                            identificador="r"
+                                        )
                                     )
 
                                     st.rerun()
@@ -8159,20 +7045,22 @@ if step_selecionado == "Formulário":
                                     ):
 
                                         # Remove da lista em memória
-                                        relatorio["devolutiva_formulario"].pop(idx_real)
+                                        devolutiva_removida = relatorio["devolutiva_formulario"].pop(idx_real)
 
                                         # Atualiza no Mongo
-                                        col_projetos.update_one(
+                                        aplicar_atualizacoes(
+                                            col_projetos,
                                             {"codigo": projeto_codigo},
-                                            {
-                                                "$set": {
-                                                    "relatorios": projeto["relatorios"]
-                                                }
-                                            }
+                                            retirar_do_item(
+                                                "relatorios",
+                                                {"numero": relatorio_numero},
+                                                "devolutiva_formulario",
+                                                devolutiva_removida,
+                                                identificador="r"
+                                            )
                                         )
 
-                                        st.success("Devolutiva excluída.", icon=":material/check:")
-                                        time.sleep(3)
+                                        agendar_mensagem("Devolutiva excluída.", icon=":material/check:")
 
                                         st.session_state["dev_form_apagando"] = None
                                         st.rerun()
@@ -8549,6 +7437,8 @@ if step_selecionado == "Formulário":
 
                 servico = None
 
+                falha_envio = False
+
                 # ---------------------------------------------------------
                 # Upload incremental (somente se houver novos arquivos)
                 # ---------------------------------------------------------
@@ -8568,17 +7458,20 @@ if step_selecionado == "Formulário":
 
                     pasta_relatorios_id = obter_pasta_relatorios(
                         servico,
-                        pasta_projeto_id
+                        pasta_projeto_id,
+                        projeto["codigo"]
                     )
 
                     novos_arquivos = []
 
-                    for arquivo in arquivos:
-                        arquivo_id = enviar_arquivo_drive(
-                            servico,
-                            pasta_relatorios_id,
-                            arquivo
-                        )
+                    ids_drive = enviar_arquivos_drive(
+                        [(pasta_relatorios_id, arquivo) for arquivo in arquivos]
+                    )
+
+                    # Falhas já têm a mensagem de erro agendada
+                    falha_envio = falha_envio or None in ids_drive
+
+                    for arquivo, arquivo_id in zip(arquivos, ids_drive):
 
                         if arquivo_id:
                             novos_arquivos.append({
@@ -8608,7 +7501,8 @@ if step_selecionado == "Formulário":
                 # ---------------------------------------------------------
                 # Salva no Mongo
                 # ---------------------------------------------------------
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {
                         "codigo": projeto["codigo"],
                         "relatorios.numero": relatorio_numero
@@ -8621,8 +7515,8 @@ if step_selecionado == "Formulário":
                     }
                 )
 
-            st.success("Respostas salvas com sucesso!", icon=":material/check:")
-            time.sleep(3)
+            if not falha_envio:
+                agendar_mensagem("Respostas salvas com sucesso!", icon=":material/check:")
             st.rerun()
 
 
@@ -8993,7 +7887,8 @@ if step_selecionado == "Enviar":
                     # --------------------------------------------------
                     # 1. ATUALIZA STATUS E DATA DO RELATÓRIO
                     # --------------------------------------------------
-                    col_projetos.update_one(
+                    atualizar_projeto(
+                        col_projetos,
                         {
                             "codigo": projeto_codigo,
                             "relatorios.numero": relatorio_numero
@@ -9010,8 +7905,11 @@ if step_selecionado == "Enviar":
                     # 2. ATUALIZA STATUS DOS RELATOS ABERTOS
                     #    (somente os relatos deste relatório)
                     # --------------------------------------------------
-                    projeto_atualizado = col_projetos.find_one(
-                        {"codigo": projeto_codigo}
+                    projeto_atualizado = anexar_historico(
+                        db,
+                        col_projetos.find_one({"codigo": projeto_codigo}),
+                        lancamentos=False,
+                        relatorio_numero=relatorio_numero
                     )
 
                     componentes = projeto_atualizado["plano_trabalho"]["componentes"]
@@ -9078,7 +7976,8 @@ if step_selecionado == "Enviar":
 
                     # Salva no Mongo apenas se houve mudança
                     if houve_alteracao:
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {"codigo": projeto_codigo},
                             {
                                 "$set": {
@@ -9101,12 +8000,11 @@ if step_selecionado == "Enviar":
                     )
 
 
-                st.success("Relatório enviado para análise.", icon=":material/check:")
+                agendar_mensagem("Relatório enviado para análise.", icon=":material/check:")
 
                 # Reseta para o rerun não se perder.
                 st.session_state.step_relatorio = "Atividades"
 
-                time.sleep(3)
                 st.rerun()
 
     # --------------------------------------------------
@@ -9285,7 +8183,8 @@ if step_selecionado == "Avaliação":
                     "autor_anotacao": st.session_state.get("nome", "Usuário")
                 }
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {
                         "codigo": projeto_codigo,
                         "relatorios.numero": relatorio_numero
@@ -9297,8 +8196,7 @@ if step_selecionado == "Avaliação":
                     }
                 )
 
-                st.success("Anotação salva com sucesso.", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Anotação salva com sucesso.", icon=":material/check:")
                 st.rerun()
 
         # --------------------------------------------------
@@ -9387,15 +8285,21 @@ if step_selecionado == "Avaliação":
                                 type="primary",
                                 icon=":material/delete:"
                             ):
-                                del projeto["relatorios"][idx]["anotacoes_avaliacao"][idx_real]
+                                anotacao_removida = projeto["relatorios"][idx]["anotacoes_avaliacao"].pop(idx_real)
 
-                                col_projetos.update_one(
+                                aplicar_atualizacoes(
+                                    col_projetos,
                                     {"codigo": projeto_codigo},
-                                    {"$set": {"relatorios": projeto["relatorios"]}}
+                                    retirar_do_item(
+                                        "relatorios",
+                                        {"numero": relatorio_numero},
+                                        "anotacoes_avaliacao",
+                                        anotacao_removida,
+                                        identificador="r"
+                                    )
                                 )
 
-                                st.success("Anotação apagada.", icon=":material/check:")
-                                time.sleep(3)
+                                agendar_mensagem("Anotação apagada.", icon=":material/check:")
 
                                 st.session_state["anotacao_apagando"] = None
                                 st.rerun()
@@ -9432,13 +8336,18 @@ if step_selecionado == "Avaliação":
                             ):
                                 projeto["relatorios"][idx]["anotacoes_avaliacao"][idx_real]["texto_anotacao"] = novo_texto
 
-                                col_projetos.update_one(
+                                aplicar_atualizacoes(
+                                    col_projetos,
                                     {"codigo": projeto_codigo},
-                                    {"$set": {"relatorios": projeto["relatorios"]}}
+                                    definir_no_item(
+                                        "relatorios",
+                                        {"numero": relatorio_numero},
+                                        {f"anotacoes_avaliacao.{idx_real}.texto_anotacao": novo_texto},
+                                        identificador="r"
+                                    )
                                 )
 
-                                st.success("Anotação atualizada.")
-                                time.sleep(3)
+                                agendar_mensagem("Anotação atualizada.")
 
                                 st.session_state["anotacao_editando"] = None
                                 st.session_state.pop(text_key, None)
@@ -9562,15 +8471,22 @@ if step_selecionado == "Avaliação":
 
                 }
 
-                col_projetos.update_one(
-                    {
-                        "codigo": projeto_codigo,
-                        "relatorios.numero": relatorio_numero
-                    },
-                    {
-                        "$push": {"relatorios.$.devolucao": nova_devolucao},
-                        "$set": {"relatorios.$.status_relatorio": "modo_edicao"}
-                    }
+                aplicar_atualizacoes(
+                    col_projetos,
+                    {"codigo": projeto_codigo},
+                    adicionar_ao_item(
+                        "relatorios",
+                        {"numero": relatorio_numero},
+                        "devolucao",
+                        nova_devolucao,
+                        identificador="r"
+                    ),
+                    definir_no_item(
+                        "relatorios",
+                        {"numero": relatorio_numero},
+                        {"status_relatorio": "modo_edicao"},
+                        identificador="r"
+                    )
                 )
 
                 # envio de email
@@ -9598,11 +8514,11 @@ if step_selecionado == "Avaliação":
                     enviar_email(
                         email_html,
                         emails_destino,
-                        f"Relatório {relatorio_numero} não aprovado"
+                        f"Relatório {relatorio_numero} não aprovado",
+                        origem="relatorio_reprovado"
                     )
 
-                st.success("Relatório reprovado e devolutiva enviada.", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Relatório reprovado e devolutiva enviada.", icon=":material/check:")
 
                 st.session_state["confirmar_reprovacao"] = False
                 st.rerun()
@@ -9658,9 +8574,26 @@ if step_selecionado == "Avaliação":
                 projeto["relatorios"][idx]["data_aprovacao"] = data_hoje
                 projeto["relatorios"][idx]["aprovado_por"] = nome_aprovador
 
-                col_projetos.update_one(
+                aplicar_atualizacoes(
+                    col_projetos,
                     {"codigo": projeto_codigo},
-                    {"$set": {"relatorios": projeto["relatorios"]}}
+                    adicionar_ao_item(
+                        "relatorios",
+                        {"numero": relatorio_numero},
+                        "devolucao",
+                        nova_devolucao,
+                        identificador="r"
+                    ),
+                    definir_no_item(
+                        "relatorios",
+                        {"numero": relatorio_numero},
+                        {
+                            "status_relatorio": "aprovado",
+                            "data_aprovacao": data_hoje,
+                            "aprovado_por": nome_aprovador
+                        },
+                        identificador="r"
+                    )
                 )
 
                 # --------------------------------------------------
@@ -9703,13 +8636,13 @@ if step_selecionado == "Avaliação":
                     enviar_email(
                         email_html,
                         emails_destino,
-                        f"Relatório {relatorio_numero} aprovado"
+                        f"Relatório {relatorio_numero} aprovado",
+                        origem="relatorio_aprovado"
                     )
 
 
 
-                st.success("Relatório aprovado com sucesso.", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Relatório aprovado com sucesso.", icon=":material/check:")
 
                 st.session_state["confirmar_aprovacao"] = False
                 st.rerun()
@@ -9812,22 +8745,24 @@ if step_selecionado == "Avaliação":
                                 # --------------------------------------------------
                                 # REMOVE DA LISTA
                                 # --------------------------------------------------
-                                relatorio["devolucao"].pop(idx_real)
+                                devolutiva_removida = relatorio["devolucao"].pop(idx_real)
 
                                 # --------------------------------------------------
                                 # ATUALIZA NO MONGO
                                 # --------------------------------------------------
-                                col_projetos.update_one(
+                                aplicar_atualizacoes(
+                                    col_projetos,
                                     {"codigo": projeto_codigo},
-                                    {
-                                        "$set": {
-                                            "relatorios": projeto["relatorios"]
-                                        }
-                                    }
+                                    retirar_do_item(
+                                        "relatorios",
+                                        {"numero": relatorio_numero},
+                                        "devolucao",
+                                        devolutiva_removida,
+                                        identificador="r"
+                                    )
                                 )
 
-                                st.success("Devolutiva excluída.", icon=":material/check:")
-                                time.sleep(3)
+                                agendar_mensagem("Devolutiva excluída.", icon=":material/check:")
 
                                 st.session_state["dev_avaliacao_apagando"] = None
                                 st.rerun()
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import time
 from docx import Document
 from io import BytesIO
 from docx.oxml import parse_xml
@@ -17,6 +16,8 @@ from funcoes_auxiliares import (
     enviar_arquivo_drive,
     gerar_link_drive
 )
+from escrita_projetos import atualizar_projeto
+from mensagens_flash import agendar_mensagem
 
 
 st.set_page_config(page_title="Salvaguardas", page_icon=":material/health_and_safety:")
@@ -225,7 +226,8 @@ def renderizar_plano_mitigacao(
                     f"{st.session_state.nome} em {data_hoje}"
                 )
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {
                         "$set": {
@@ -239,7 +241,8 @@ def renderizar_plano_mitigacao(
             # Remoção da verificação
             elif not checkbox_verificado and verificado_por:
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"codigo": codigo_projeto_atual},
                     {
                         "$unset": {
@@ -1813,7 +1816,8 @@ if st.session_state.tipo_usuario == "beneficiario":
                             # Obtém ou cria a pasta de planos de mitigação
                             pasta_planos = obter_pasta_planos_mitigacao(
                                 servico,
-                                pasta_projeto
+                                pasta_projeto,
+                                projeto["codigo"]
                             )
 
                             # Faz upload do arquivo
@@ -1835,7 +1839,8 @@ if st.session_state.tipo_usuario == "beneficiario":
 
 
                                 # Atualiza o documento no MongoDB
-                                col_projetos.update_one(
+                                atualizar_projeto(
+                                    col_projetos,
                                     {"codigo": codigo_projeto_atual},
                                     {
                                         "$set": {
@@ -1854,7 +1859,8 @@ if st.session_state.tipo_usuario == "beneficiario":
 
 
                                 # Atualiza o documento no MongoDB
-                                col_projetos.update_one(
+                                atualizar_projeto(
+                                    col_projetos,
                                     {"codigo": codigo_projeto_atual},
                                     {
                                         "$set": {
@@ -1866,7 +1872,7 @@ if st.session_state.tipo_usuario == "beneficiario":
                                     }
                                 )
 
-                                st.success(
+                                agendar_mensagem(
                                     "Plano de mitigação salvo com sucesso!",
                                     icon=":material/check:"
                                 )
@@ -1874,7 +1880,6 @@ if st.session_state.tipo_usuario == "beneficiario":
                                 # Libera a trava antes do rerun
                                 st.session_state[chave_processando] = False
 
-                                time.sleep(3)
                                 st.rerun()
 
                             else:
@@ -1882,6 +1887,9 @@ if st.session_state.tipo_usuario == "beneficiario":
                                 # Libera a trava em caso de erro
                                 st.session_state[chave_processando] = False
 
+                                # Exibe a mensagem de erro agendada no envio
+                                st.rerun()
+
 
 
             # Lista o link do arquivo já salvo, se houver
@@ -2794,7 +2802,8 @@ else:
             }
 
             # Atualiza apenas os campos editáveis
-            resultado = col_projetos.update_one(
+            resultado = atualizar_projeto(
+                col_projetos,
                 {"codigo": codigo_projeto_atual},
                 {
                     "$set": dados_update
@@ -2804,8 +2813,7 @@ else:
 
             # Mostra mensagem de sucesso
             if resultado.modified_count >= 0:
-                st.success("Respostas salvas com sucesso!", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Respostas salvas com sucesso!", icon=":material/check:")
                 st.rerun()
 
 
@@ -1,6 +1,7 @@
 import streamlit as st
 from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao, 
+    carregar_colecao_referencia,
     sidebar_projeto, 
     calcular_status_projetos, 
     calcular_status_atividade, 
@@ -12,12 +13,12 @@ from funcoes_auxiliares import (
     enviar_arquivo_drive,
     gerar_link_drive
 )
+from escrita_projetos import atualizar_projeto
 
 
 import pandas as pd
 import streamlit_shadcn_ui as ui
 import datetime
-import time
 import bson
 import io
 import re
@@ -29,6 +30,7 @@ from st_rsuite import date_picker
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -169,7 +171,8 @@ if not st.session_state["ultimo_acesso_atualizado"]:
         # ATUALIZA DOCUMENTO NO MONGODB
         ###################################################################################################
 
-        col_projetos.update_one(
+        atualizar_projeto(
+            col_projetos,
             {"codigo": projeto_codigo},
             {
                 "$set": {
@@ -184,8 +187,6 @@ if not st.session_state["ultimo_acesso_atualizado"]:
 
         st.session_state["ultimo_acesso_atualizado"] = True
 
-        time.sleep(3)
-
 
 
 
@@ -245,16 +246,16 @@ projeto = df_projeto.iloc[0].to_dict()
 df_pessoas = pd.DataFrame(list(col_pessoas.find()))
 
 # Editais
-df_editais = pd.DataFrame(list(col_editais.find()))
+df_editais = pd.DataFrame(carregar_colecao_referencia(db, "editais"))
 
 # Direções estratégicas
 # df_direcoes_estrategicas = pd.DataFrame(list(col_direcoes_estrategicas.find()))
 
 # Públicos
-df_publicos = pd.DataFrame(list(col_publicos.find()))
+df_publicos = pd.DataFrame(carregar_colecao_referencia(db, "publicos"))
 
 # Organizações
-df_organizacoes = pd.DataFrame(list(col_organizacoes.find()))
+df_organizacoes = pd.DataFrame(carregar_colecao_referencia(db, "organizacoes"))
 
 
 
@@ -807,14 +808,14 @@ if not editar_cadastro:
                     "tipo": tipo_anotacao.lower()
                 }
 
-                resultado = col_projetos.update_one(
+                resultado = atualizar_projeto(
+                    col_projetos,
                     {"codigo": st.session_state.projeto_atual},
                     {"$push": {"anotacoes": anotacao}}
                 )
 
                 if resultado.modified_count == 1:
-                    st.success("Anotação salva com sucesso!", icon=":material/check:")
-                    time.sleep(2)
+                    agendar_mensagem("Anotação salva com sucesso!", icon=":material/check:")
                     st.rerun()
                 else:
                     st.error("Erro ao salvar anotação.")
@@ -885,7 +886,8 @@ if not editar_cadastro:
                     st.warning("A anotação não pode ficar vazia.")
                     return
 
-                resultado = col_projetos.update_one(
+                resultado = atualizar_projeto(
+                    col_projetos,
                     {
                         "codigo": st.session_state.projeto_atual,
                         "anotacoes.id": anotacao_selecionada["id"],
@@ -901,8 +903,7 @@ if not editar_cadastro:
                 )
 
                 if resultado.modified_count == 1:
-                    st.success("Anotação atualizada com sucesso!", icon=":material/check:")
-                    time.sleep(2)
+                    agendar_mensagem("Anotação atualizada com sucesso!", icon=":material/check:")
                     st.rerun()
                 else:
                     st.error("Erro ao atualizar anotação.")
@@ -1023,14 +1024,14 @@ if not editar_cadastro:
                     "autor": st.session_state.nome,
                 }
 
-                resultado = col_projetos.update_one(
+                resultado = atualizar_projeto(
+                    col_projetos,
                     {"codigo": st.session_state.projeto_atual},
                     {"$push": {"visitas": visita}}
                 )
 
                 if resultado.modified_count == 1:
-                    st.success("Visita registrada com sucesso!", icon=":material/check:")
-                    time.sleep(2)
+                    agendar_mensagem("Visita registrada com sucesso!", icon=":material/check:")
                     st.rerun()
                 else:
                     st.error("Erro ao salvar visita.")
@@ -1090,7 +1091,8 @@ if not editar_cadastro:
                     st.warning("A data e o relato não podem ficar vazios.")
                     return
 
-                resultado = col_projetos.update_one(
+                resultado = atualizar_projeto(
+                    col_projetos,
                     {
                         "codigo": st.session_state.projeto_atual,
                         "visitas.id": visita_selecionada["id"],
@@ -1104,8 +1106,7 @@ if not editar_cadastro:
                 )
 
                 if resultado.modified_count == 1:
-                    st.success("Visita atualizada com sucesso!", icon=":material/check:")
-                    time.sleep(2)
+                    agendar_mensagem("Visita atualizada com sucesso!", icon=":material/check:")
                     st.rerun()
                 else:
                     st.error("Erro ao atualizar visita.")
@@ -1227,7 +1228,8 @@ if not editar_cadastro:
                 }
 
                 # Insere o contato no projeto
-                resultado = col_projetos.update_one(
+                resultado = atualizar_projeto(
+                    col_projetos,
                     {"codigo": st.session_state.projeto_atual},
                     {"$push": {"contatos": contato}}
                 )
@@ -1260,8 +1262,7 @@ if not editar_cadastro:
 
 
 
-                    st.success("Contato cadastrado com sucesso!", icon=":material/check:")
-                    time.sleep(3)
+                    agendar_mensagem("Contato cadastrado com sucesso!", icon=":material/check:")
                     st.rerun()
 
 
@@ -1375,7 +1376,8 @@ if not editar_cadastro:
                             filtro["contatos.autor"] = st.session_state.nome
 
 
-                        resultado = col_projetos.update_one(
+                        resultado = atualizar_projeto(
+                            col_projetos,
                             filtro,
                             {
                                 "$set": {
@@ -1418,8 +1420,7 @@ if not editar_cadastro:
                                 # Aplica permissão apenas para o novo e-mail
                                 add_permissao_drive(servico_drive, pasta_id, contato_atualizado)
 
-                            st.success("Contato atualizado com sucesso!", icon=":material/check:")
-                            time.sleep(3)
+                            agendar_mensagem("Contato atualizado com sucesso!", icon=":material/check:")
                             st.rerun()
 
 
@@ -1523,7 +1524,8 @@ if not editar_cadastro:
 
                             contato_remover["autor"] = st.session_state.nome
 
-                        resultado = col_projetos.update_one(
+                        resultado = atualizar_projeto(
+                            col_projetos,
                             filtro,
                             {
                                 "$pull": {
@@ -1534,13 +1536,11 @@ if not editar_cadastro:
 
                         if resultado.modified_count == 1:
 
-                            st.success(
+                            agendar_mensagem(
                                 "Contato removido com sucesso.",
                                 icon=":material/check:"
                             )
 
-                            time.sleep(3)
-
                             st.rerun()
 
                         else:
@@ -1886,7 +1886,8 @@ else:
 
 
                             # Atualizações na coleção de Projetos
-                            col_projetos.update_one(
+                            atualizar_projeto(
+                                col_projetos,
                                 {"_id": projeto_id},
                                 {
                                     "$set": {
@@ -1909,13 +1910,15 @@ else:
 
                             # Atualiza status separadamente
                             if novo_status:
-                                col_projetos.update_one(
+                                atualizar_projeto(
+                                    col_projetos,
                                     {"_id": projeto_id},
                                     {"$set": {"status": novo_status}}
                                 )
                             else:
                                 # Remove o campo se existir
-                                col_projetos.update_one(
+                                atualizar_projeto(
+                                    col_projetos,
                                     {"_id": projeto_id},
                                     {"$unset": {"status": ""}}
                                 )
@@ -1982,8 +1985,7 @@ else:
                   
 
 
-                        st.success("Projeto atualizado com sucesso!", icon=":material/check:")
-                        time.sleep(3)
+                        agendar_mensagem("Projeto atualizado com sucesso!", icon=":material/check:")
                         st.rerun()
 
 
@@ -2103,7 +2105,8 @@ else:
                 key="btn_salvar_direcoes"
             ):
 
-                col_projetos.update_one(
+                atualizar_projeto(
+                    col_projetos,
                     {"_id": projeto["_id"]},
                     {
                         "$set": {
@@ -2112,8 +2115,7 @@ else:
                     }
                 )
 
-                st.success("Direções estratégicas atualizadas com sucesso!", icon=":material/check:")
-                time.sleep(3)
+                agendar_mensagem("Direções estratégicas atualizadas com sucesso!", icon=":material/check:")
                 st.rerun()
 
 
@@ -2162,7 +2164,8 @@ else:
 
                 if salvar_publicos:
 
-                    col_projetos.update_one(
+                    atualizar_projeto(
+                        col_projetos,
                         {"_id": projeto["_id"]},
                         {
                             "$set": {
@@ -2171,8 +2174,7 @@ else:
                         }
                     )
 
-                    st.success("Públicos atualizados com sucesso!", icon=":material/check:")
-                    time.sleep(3)
+                    agendar_mensagem("Públicos atualizados com sucesso!", icon=":material/check:")
                     st.rerun()
 
 
@@ -2318,7 +2320,8 @@ else:
                         # ATUALIZA DADOS DO CONTRATO
                         # =========================================================================
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {"_id": projeto["_id"]},
                             {
                                 "$set": {
@@ -2355,7 +2358,8 @@ else:
                         pasta_contratos = obter_ou_criar_pasta(
                             servico,
                             "Contratos",
-                            pasta_projeto
+                            pasta_projeto,
+                            projeto["codigo"]
                         )
 
                         # =========================================================================
@@ -2368,6 +2372,10 @@ else:
                             arquivo_contrato
                         )
 
+                        # Exibe a mensagem de erro agendada no envio
+                        if not id_arquivo:
+                            st.rerun()
+
                         # =========================================================================
                         # GERA LINK
                         # =========================================================================
@@ -2378,7 +2386,8 @@ else:
                         # SALVA NO MONGO
                         # =========================================================================
 
-                        col_projetos.update_one(
+                        atualizar_projeto(
+                            col_projetos,
                             {"_id": projeto["_id"]},
                             {
                                 "$push": {
@@ -2396,13 +2405,11 @@ else:
                         # SUCESSO
                         # =========================================================================
 
-                        st.success(
+                        agendar_mensagem(
                             "Contrato atualizado com sucesso!",
                             icon=":material/check:"
                         )
 
-                        time.sleep(3)
-
                         st.rerun()
 
 
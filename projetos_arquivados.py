@@ -0,0 +1,230 @@
+import streamlit as st
+from funcoes_auxiliares import conectar_mongo_cepf_gestao
+from arquivo_projetos import (
+    CHAVE_PROJETO_ARQUIVADO,
+    listar_arquivados,
+    carregar_instantaneo,
+    projetos_arquivaveis,
+    arquivar_projeto,
+    restaurar_projeto,
+)
+import pandas as pd
+from mensagens_flash import agendar_mensagem
+
+
+
+st.set_page_config(page_title="Projetos arquivados", page_icon=":material/inventory_2:")
+
+
+
+
+###########################################################################################################
+# CONEXÃO COM O BANCO DE DADOS MONGODB
+###########################################################################################################
+
+# Conecta-se ao banco de dados MongoDB (usa cache automático para melhorar performance)
+db = conectar_mongo_cepf_gestao()
+
+
+eh_admin = st.session_state.get("tipo_usuario") == "admin"
+
+
+
+
+###########################################################################################################
+# FUNÇÕES
+###########################################################################################################
+
+def tabela(itens, colunas_ocultas=("_id", "codigo")) -> pd.DataFrame:
+    """
+    Lista de dicionários do instantâneo como DataFrame, sem colunas de controle
+    e com listas e dicionários internos convertidos em texto.
+    """
+
+    df = pd.DataFrame(itens or [])
+
+    df = df.drop(columns=[c for c in colunas_ocultas if c in df.columns])
+
+    for coluna in df.columns:
+        if df[coluna].map(lambda v: isinstance(v, (list, dict))).any():
+            df[coluna] = df[coluna].map(lambda v: str(v) if isinstance(v, (list, dict)) else v)
+
+    return df
+
+
+
+
+###########################################################################################################
+# INTERFACE
+###########################################################################################################
+
+
+# Logo do sidebar
+st.logo("images/ieb_logo.svg", size='large')
+
+st.header('Projetos arquivados')
+
+st.caption("Projetos concluídos e cancelados guardados em formato comprimido, somente para consulta.")
+
+st.write('')
+
+
+
+
+# --------------------------------------------------------------------------------------------------
+# ARQUIVAMENTO (SÓ ADMIN)
+# --------------------------------------------------------------------------------------------------
+
+if eh_admin:
+
+    with st.expander("Arquivar projetos concluídos e cancelados", icon=":material/archive:"):
+
+        arquivaveis = projetos_arquivaveis(db)
+
+        if not arquivaveis:
+            st.caption("Nenhum projeto concluído ou cancelado fora do arquivo.")
+
+        else:
+
+            df_arquivaveis = pd.DataFrame(arquivaveis)[["codigo", "sigla", "status"]]
+
+            selecionados = st.multiselect(
+                "Projetos a arquivar",
+                df_arquivaveis["codigo"].tolist(),
+                default=df_arquivaveis["codigo"].tolist(),
+                format_func=lambda c: f"{c} - {df_arquivaveis.set_index('codigo').loc[c, 'sigla']} "
+                                      f"({df_arquivaveis.set_index('codigo').loc[c, 'status']})"
+            )
+
+            if st.button("Arquivar", icon=":material/archive:", disabled=not selecionados):
+
+                with st.spinner("Arquivando..."):
+                    arquivados = [
+                        c for c in selecionados
+                        if arquivar_projeto(db, c, st.session_state.get("nome"))
+                    ]
+
+                agendar_mensagem(f"{len(arquivados)} projeto(s) arquivado(s).", icon=":material/check:")
+                st.rerun()
+
+
+
+
+# --------------------------------------------------------------------------------------------------
+# LISTA DE ARQUIVADOS
+# --------------------------------------------------------------------------------------------------
+
+arquivados = listar_arquivados(db)
+
+if not arquivados:
+    st.divider()
+    st.caption("Nenhum projeto arquivado.")
+    st.stop()
+
+
+df_arquivados = pd.DataFrame(arquivados)
+
+st.dataframe(
+    pd.DataFrame({
+        "Código": df_arquivados["codigo"],
+        "Sigla": df_arquivados["sigla"],
+        "Status": df_arquivados["status"],
+        "Arquivado em": pd.to_datetime(df_arquivados["arquivado_em"]).dt.strftime("%d/%m/%Y"),
+        "Arquivado por": df_arquivados["arquivado_por"],
+        "Tamanho (KB)": (df_arquivados["tamanho_original"] / 1024).round(),
+        "Comprimido (KB)": (df_arquivados["tamanho_comprimido"] / 1024).round(),
+    }),
+    hide_index=True
+)
+
+
+
+
+# --------------------------------------------------------------------------------------------------
+# CONSULTA DE UM PROJETO
+# --------------------------------------------------------------------------------------------------
+
+st.divider()
+
+codigos = df_arquivados["codigo"].tolist()
+
+# Projeto aberto pelo botão "Ver arquivo" da lista de projetos
+codigo_aberto = st.session_state.get(CHAVE_PROJETO_ARQUIVADO)
+
+codigo = st.selectbox(
+    "Projeto",
+    codigos,
+    index=codigos.index(codigo_aberto) if codigo_aberto in codigos else 0,
+    format_func=lambda c: f"{c} - {df_arquivados.set_index('codigo').loc[c, 'sigla']}",
+    width=400
+)
+
+st.session_state[CHAVE_PROJETO_ARQUIVADO] = codigo
+
+conteudo = carregar_instantaneo(db, codigo)
+
+if conteudo is None:
+    st.warning("O projeto não está mais no arquivo.")
+    st.stop()
+
+projeto = conteudo["projeto"]
+
+st.subheader(f"{projeto.get('codigo')} - {projeto.get('sigla') or ''}")
+st.write(projeto.get("nome_do_projeto") or "")
+
+
+aba_dados, aba_relatorios, aba_orcamento, aba_relatos, aba_lancamentos, aba_documento = st.tabs([
+    "Dados gerais", "Relatórios", "Orçamento", "Relatos", "Lançamentos", "Documento completo"
+])
+
+with aba_dados:
+
+    # Campos simples do projeto (textos, números e datas)
+    dados = {
+        campo: valor for campo, valor in projeto.items()
+        if campo != "_id" and not isinstance(valor, (list, dict))
+    }
+
+    st.dataframe(
+        pd.DataFrame({"Campo": list(dados.keys()), "Valor": [str(v) for v in dados.values()]}),
+        hide_index=True
+    )
+
+with aba_relatorios:
+    st.dataframe(tabela(projeto.get("relatorios")), hide_index=True)
+
+with aba_orcamento:
+    st.dataframe(tabela((projeto.get("financeiro") or {}).get("orcamento")), hide_index=True)
+
+with aba_relatos:
+    st.dataframe(tabela(conteudo["relatos"]), hide_index=True)
+
+with aba_lancamentos:
+    st.dataframe(tabela(conteudo["lancamentos"]), hide_index=True)
+
+with aba_documento:
+    st.json({**projeto, "_id": str(projeto.get("_id"))}, expanded=False)
+
+
+
+
+# --------------------------------------------------------------------------------------------------
+# RESTAURAÇÃO (SÓ ADMIN)
+# --------------------------------------------------------------------------------------------------
+
+if eh_admin:
+
+    st.write('')
+
+    if st.button("Restaurar projeto", icon=":material/unarchive:"):
+
+        with st.spinner("Restaurando..."):
+            restaurado = restaurar_projeto(db, codigo)
+
+        if restaurado:
+            st.session_state.pop(CHAVE_PROJETO_ARQUIVADO, None)
+            agendar_mensagem("Projeto restaurado. Ele volta a aparecer na lista de projetos.", icon=":material/check:")
+            st.rerun()
+
+        else:
+            st.warning("O projeto não está mais no arquivo.")
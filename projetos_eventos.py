@@ -1,7 +1,6 @@
 import re
 import streamlit as st
 from bson import ObjectId
-import time
 from streamlit_calendar import calendar
 import datetime
 import streamlit_antd_components as sac
@@ -10,7 +9,10 @@ from st_rsuite import date_picker
 
 from funcoes_auxiliares import (
     conectar_mongo_cepf_gestao,
+    carregar_colecao_referencia,
+    invalidar_cache_referencia,
 )
+from mensagens_flash import agendar_mensagem
 
 
 
@@ -40,15 +42,15 @@ db = conectar_mongo_cepf_gestao()
 # CARREGAMENTO DOS EDITAIS
 ###########################################################################################################
 
-editais = list(
-    db.editais.find(
-        {},
-        {
-            "_id": 1,
-            "codigo_edital": 1,
-            "dias_intervalo_lembrete_eventos": 1
-        }
-    ).sort("codigo_edital", 1)
+editais = carregar_colecao_referencia(
+    db,
+    "editais",
+    projecao={
+        "_id": 1,
+        "codigo_edital": 1,
+        "dias_intervalo_lembrete_eventos": 1
+    },
+    ordenacao=[("codigo_edital", 1)]
 )
 
 
@@ -575,13 +577,13 @@ if aba_selecionada == "Agenda":
 
                     )
 
-                    st.success(
+                    invalidar_cache_referencia("editais")
+
+                    agendar_mensagem(
                         "Intervalo salvo com sucesso.",
                         icon=":material/check:"
                     )
 
-                    time.sleep(3)
-
                     st.rerun()
 
 
@@ -975,12 +977,13 @@ elif aba_selecionada == "Divulgar eventos":
 
                         )
 
-                    st.success(
+                        invalidar_cache_referencia("editais")
+
+                    agendar_mensagem(
                         "Evento cadastrado com sucesso!",
                         icon=":material/check:"
                     )
 
-                    time.sleep(3)
                     st.rerun()
 
 
@@ -1137,12 +1140,13 @@ elif aba_selecionada == "Divulgar eventos":
 
                             )
 
-                            st.success(
+                            invalidar_cache_referencia("editais")
+
+                            agendar_mensagem(
                                 "Evento excluído com sucesso!",
                                 icon=":material/check:"
                             )
 
-                            time.sleep(3)
                             st.rerun()
 
                 st.divider()    
@@ -1,5 +1,9 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao, calcular_status_projetos, registrar_estatistica_sessao, verificar_envio_lembrete_eventos
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, registrar_estatistica_sessao, carregar_colecao_referencia
+from agendador import situacao_tarefa_periodica, agendador_atrasado
+from resumo_projetos import carregar_resumos_projetos
+from arquivo_projetos import toggle_incluir_arquivados
+from pendencias import consultar_pendencias, PENDENCIAS_POR_PAGINA
 import plotly.express as px
 import pandas as pd
 import datetime
@@ -29,17 +33,14 @@ db = conectar_mongo_cepf_gestao()
 
 # Importa coleções e cria dataframes
 
-# Pessoas
-col_pessoas = db["pessoas"]
-df_pessoas = pd.DataFrame(list(col_pessoas.find()))
-
 # Projetos
 col_projetos = db["projetos"]
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+# Projetos arquivados só entram com o toggle da barra lateral ligado
+df_projetos = carregar_resumos_projetos(db, incluir_arquivados=toggle_incluir_arquivados())
 
 # Editais
 col_editais = db["editais"]
-df_editais = pd.DataFrame(list(col_editais.find()))
+df_editais = pd.DataFrame(carregar_colecao_referencia(db, "editais"))
 
 
 
@@ -69,10 +70,6 @@ if "notificacoes" not in st.session_state:
 
 
 
-# Lista utilizada para consolidar todas as demandas exibidas na página
-lista_demandas = []
-
-
 ###########################################################################################################
 # TRATAMENTO DE DADOS
 ###########################################################################################################
@@ -86,65 +83,16 @@ if not df_projetos.empty:
 
 
     # ------------------------------------------------------------------------------
-    # 2. Calcula status dos projetos (status, dias_atraso, próximo evento, etc.)
+    # 2. Status, próximo evento e padrinhos já vêm do resumo dos projetos
+    #    (coleção projetos_resumo)
     # ------------------------------------------------------------------------------
-    df_projetos = calcular_status_projetos(df_projetos)
 
 
     # ------------------------------------------------------------------------------
-    # 3. Filtra usuários relevantes (admin e equipe)
-    # ------------------------------------------------------------------------------
-    df_pessoas = df_pessoas[
-        df_pessoas["tipo_usuario"].isin(["admin", "equipe"])
-    ]
-
-
-    # ------------------------------------------------------------------------------
-    # 4. Relaciona projetos aos padrinhos
-    # ------------------------------------------------------------------------------
-
-    # Seleciona apenas colunas necessárias
-    df_pessoas_proj = df_pessoas[["nome_completo", "projetos"]].copy()
-
-    # Garante que "projetos" seja sempre uma lista
-    df_pessoas_proj["projetos"] = df_pessoas_proj["projetos"].apply(
-        lambda x: x if isinstance(x, list) else []
-    )
-
-    # Cria uma linha por projeto (explode)
-    df_pessoas_proj = df_pessoas_proj.explode("projetos")
-
-    # Remove registros sem código de projeto
-    df_pessoas_proj = df_pessoas_proj.dropna(subset=["projetos"])
-
-    # Renomeia colunas para facilitar o merge
-    df_pessoas_proj = df_pessoas_proj.rename(columns={
-        "projetos": "codigo",
-        "nome_completo": "padrinho"
-    })
-
-    # Agrupa padrinhos por projeto (caso haja mais de um)
-    df_padrinhos = (
-        df_pessoas_proj
-        .groupby("codigo")["padrinho"]
-        .apply(lambda nomes: ", ".join(sorted(set(nomes))))
-        .reset_index()
-    )
-
-    # Junta padrinhos ao dataframe de projetos
-    df_projetos = df_projetos.merge(
-        df_padrinhos,
-        on="codigo",
-        how="left"
-    )
-
-
-    # ------------------------------------------------------------------------------
-    # 5. Ajustes de tipos (IDs e datas)
+    # 3. Ajustes de tipos (IDs e datas)
     # ------------------------------------------------------------------------------
 
     # Converte ObjectId para string (evita problemas com Streamlit)
-    df_pessoas["_id"] = df_pessoas["_id"].astype(str)
     df_projetos["_id"] = df_projetos["_id"].astype(str)
 
     # Converte datas do contrato para datetime
@@ -166,14 +114,29 @@ if not df_projetos.empty:
 
 
 ###########################################################################################################
-# VERIFICA O ENVIO AUTOMÁTICO DOS LEMBRETES DE EVENTOS
+# SITUAÇÃO DO ENVIO AUTOMÁTICO DOS LEMBRETES DE EVENTOS
 ###########################################################################################################
 
+# O envio é feito pelo agendador (python agendador.py); a página só lê o
+# resultado da última execução e avisa os administradores se algo falhou.
 
+if st.session_state.get("tipo_usuario") == "admin":
 
-verificar_envio_lembrete_eventos(
-    db=db
-)
+    situacao_lembretes = situacao_tarefa_periodica(db, "lembrete_eventos")
+
+    ultima_execucao = (situacao_lembretes or {}).get("ultima_execucao") or {}
+
+    if agendador_atrasado(situacao_lembretes, "lembrete_eventos"):
+        st.warning(
+            "O agendador não está em execução: os lembretes de eventos não estão sendo enviados.",
+            icon=":material/schedule:"
+        )
+
+    elif ultima_execucao.get("status") == "erro":
+        st.warning(
+            f"Falha no envio dos lembretes de eventos em {ultima_execucao['fim']:%d/%m/%Y %H:%M}.",
+            icon=":material/error:"
+        )
 
 
 ###########################################################################################################
@@ -340,170 +303,31 @@ with col2:
 
 
 # ------------------------------------------------------------------------------
-# Adiciona pendências cadastrais
-# ------------------------------------------------------------------------------
-
-for _, projeto in df_filtrado.iterrows():
-
-    notificacao = projeto.get("notificacao")
-
-    if not notificacao:
-        continue
-
-    lista_demandas.append({
-        "codigo": projeto["codigo"],
-        "sigla": projeto["sigla"],
-        "padrinho": (
-            projeto["padrinho"]
-            if isinstance(projeto["padrinho"], str)
-            else ""
-        ),
-        "tipo": "pendencia_cadastral",
-        "demanda": notificacao
-    })
-
-
-
-# ------------------------------------------------------------------------------
-# Adiciona projetos atrasados
-# ------------------------------------------------------------------------------
-
-for _, projeto in df_filtrado.iterrows():
-
-    if projeto["status"] != "Atrasado":
-        continue
-
-    lista_demandas.append({
-        "codigo": projeto["codigo"],
-        "sigla": projeto["sigla"],
-        "padrinho": (
-            projeto["padrinho"]
-            if isinstance(projeto["padrinho"], str)
-            else ""
-        ),
-        "tipo": "projeto_atrasado",
-        "demanda": (
-            f"Projeto atrasado há {projeto['dias_atraso']} dias."
-        )
-    })
-
-
-
-
-
-
-# ------------------------------------------------------------------------------
-# Adiciona relatórios aguardando análise
-# ------------------------------------------------------------------------------
-
-for _, projeto in df_filtrado.iterrows():
-
-    relatorios = projeto.get("relatorios")
-
-    if not isinstance(relatorios, list):
-        continue
-
-    for relatorio in relatorios:
-
-        if not isinstance(relatorio, dict):
-            continue
-
-        if relatorio.get("status_relatorio") != "em_analise":
-            continue
-
-        lista_demandas.append({
-            "codigo": projeto["codigo"],
-            "sigla": projeto["sigla"],
-            "padrinho": (
-                projeto["padrinho"]
-                if isinstance(projeto["padrinho"], str)
-                else ""
-            ),
-            "tipo": "relatorio",
-            "demanda": (
-                f"Relatório {relatorio.get('numero')} aguardando análise."
-            )
-        })
-
-
-
-
-
-# ------------------------------------------------------------------------------
-# Adiciona remanejamentos aguardando análise
-# ------------------------------------------------------------------------------
-
-for _, projeto in df_filtrado.iterrows():
-
-    plano_trabalho = projeto.get("plano_trabalho")
-
-    if not isinstance(plano_trabalho, dict):
-        continue
-
-    remanejamentos = plano_trabalho.get("remanejamentos_atividades")
-
-    if not isinstance(remanejamentos, list):
-        continue
-
-    for remanejamento in remanejamentos:
-
-        if not isinstance(remanejamento, dict):
-            continue
-
-        if remanejamento.get("status_remanejamento") != "em_analise":
-            continue
-
-        lista_demandas.append({
-            "codigo": projeto["codigo"],
-            "sigla": projeto["sigla"],
-            "padrinho": (
-                projeto["padrinho"]
-                if isinstance(projeto["padrinho"], str)
-                else ""
-            ),
-            "tipo": "ajuste",
-            "demanda": "Ajuste aguardando análise."
-        })
-
-
-
-
-
-# ------------------------------------------------------------------------------
-# Adiciona remanejamentos financeiros aguardando análise
+# Consulta a fila de pendências (coleção pendencias)
 # ------------------------------------------------------------------------------
 
-for _, projeto in df_filtrado.iterrows():
-
-    financeiro = projeto.get("financeiro")
-
-    if not isinstance(financeiro, dict):
-        continue
+# A fila é mantida a cada escrita nos projetos. Aqui é feita uma única
+# consulta indexada, já filtrada por edital e padrinho e paginada.
 
-    remanejamentos = financeiro.get("remanejamentos_financeiros")
+if "pagina_demandas" not in st.session_state:
+    st.session_state.pagina_demandas = 1
 
-    if not isinstance(remanejamentos, list):
-        continue
-
-    for remanejamento in remanejamentos:
-
-        if not isinstance(remanejamento, dict):
-            continue
+lista_demandas, total_demandas = consultar_pendencias(
+    db,
+    edital=edital_selecionado if edital_selecionado != "Todos" else None,
+    padrinho=st.session_state.nome if ver_meus_projetos else None,
+    pagina=st.session_state.pagina_demandas
+)
 
-        if remanejamento.get("status_remanejamento") != "em_analise":
-            continue
+# Volta para a primeira página quando os filtros reduzem o total
+if not lista_demandas and st.session_state.pagina_demandas > 1:
+    st.session_state.pagina_demandas = 1
+    st.rerun()
 
-        lista_demandas.append({
-            "codigo": projeto["codigo"],
-            "sigla": projeto["sigla"],
-            "padrinho": (
-                projeto["padrinho"]
-                if isinstance(projeto["padrinho"], str)
-                else ""
-            ),
-            "tipo": "remanejamento_financeiro",
-            "demanda": "Remanejamento aguardando análise."
-        })
+total_paginas_demandas = max(
+    (total_demandas + PENDENCIAS_POR_PAGINA - 1) // PENDENCIAS_POR_PAGINA,
+    1
+)
 
 
 
@@ -515,11 +339,6 @@ for _, projeto in df_filtrado.iterrows():
 
 if lista_demandas:
 
-    lista_demandas = sorted(
-        lista_demandas,
-        key=lambda x: x["padrinho"] or ""
-    )
-
     st.markdown(
     "<p style='font-size:22px; font-weight:600;'>Demandas de monitoramento</p>",
     unsafe_allow_html=True
@@ -597,6 +416,40 @@ if lista_demandas:
             st.rerun()
 
 
+    # ------------------------------------------------------------------------------
+    # Paginação das demandas
+    # ------------------------------------------------------------------------------
+
+    if total_paginas_demandas > 1:
+
+        st.write("")
+
+        col_anterior, col_pagina, col_proxima = st.columns([2, 4, 2])
+
+        if col_anterior.button(
+            "Anterior",
+            icon=":material/chevron_left:",
+            disabled=st.session_state.pagina_demandas <= 1,
+            key="demandas_anterior"
+        ):
+            st.session_state.pagina_demandas -= 1
+            st.rerun()
+
+        col_pagina.caption(
+            f"Página {st.session_state.pagina_demandas} de {total_paginas_demandas} "
+            f"({total_demandas} demandas)"
+        )
+
+        if col_proxima.button(
+            "Próxima",
+            icon=":material/chevron_right:",
+            disabled=st.session_state.pagina_demandas >= total_paginas_demandas,
+            key="demandas_proxima"
+        ):
+            st.session_state.pagina_demandas += 1
+            st.rerun()
+
+
 
 
 # Cronograma de contratos
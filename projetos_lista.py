@@ -1,5 +1,7 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao, calcular_status_projetos
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, carregar_colecao_referencia
+from resumo_projetos import carregar_resumos_projetos
+from arquivo_projetos import toggle_incluir_arquivados, CHAVE_PROJETO_ARQUIVADO
 # import plotly.express as px
 import pandas as pd
 
@@ -24,15 +26,16 @@ df_pessoas = pd.DataFrame(list(col_pessoas.find()))
 
 # Projetos
 col_projetos = db["projetos"]
-df_projetos = pd.DataFrame(list(col_projetos.find()))
+# Projetos arquivados só entram com o toggle da barra lateral ligado
+df_projetos = carregar_resumos_projetos(db, incluir_arquivados=toggle_incluir_arquivados())
 
 # Editais
 col_editais = db["editais"]
-df_editais = pd.DataFrame(list(col_editais.find()))
+df_editais = pd.DataFrame(carregar_colecao_referencia(db, "editais"))
 
 # Organizações
 col_organizacoes = db["organizacoes"]
-df_organizacoes = pd.DataFrame(list(col_organizacoes.find()))
+df_organizacoes = pd.DataFrame(carregar_colecao_referencia(db, "organizacoes"))
 
 
 ###########################################################################################################
@@ -40,28 +43,13 @@ df_organizacoes = pd.DataFrame(list(col_organizacoes.find()))
 ###########################################################################################################
 
 
-###########################################################################################################
-# MAPA ID -> NOME DA ORGANIZAÇÃO
-###########################################################################################################
-
-# cria um dicionário para acessar rapidamente o nome da organização pelo _id
-mapa_org_id_nome = {
-    row["_id"]: row["nome_organizacao"]
-    for _, row in df_organizacoes.iterrows()
-}
-
-
-
-
 ###########################################################################################################
 # TRATAMENTO DE DADOS   
 ###########################################################################################################
 
 if not df_projetos.empty:
-    
-    # Inclulir o status no dataframe de projetos
-    df_projetos = calcular_status_projetos(df_projetos)
 
+    # Status, padrinho e nome da organização já vêm do resumo dos projetos
 
     # Converter object_id para string
     df_pessoas['_id'] = df_pessoas['_id'].astype(str)
@@ -85,43 +73,6 @@ if not df_projetos.empty:
     # Filtar somente tipos de usuário admin e equipe em df_pessoas
     df_pessoas = df_pessoas[(df_pessoas["tipo_usuario"] == "admin") | (df_pessoas["tipo_usuario"] == "equipe")]
 
-    # Incluir padrinho no dataframe de projetos
-    # Fazendo um dataframe auxiliar de relacionamento
-    # Seleciona apenas colunas necessárias
-    df_pessoas_proj = df_pessoas[["nome_completo", "projetos"]].copy()
-
-    # Garante que "projetos" seja sempre lista
-    df_pessoas_proj["projetos"] = df_pessoas_proj["projetos"].apply(
-        lambda x: x if isinstance(x, list) else []
-    )
-
-    # Explode: uma linha por projeto
-    df_pessoas_proj = df_pessoas_proj.explode("projetos")
-
-    # Remove linhas sem código de projeto
-    df_pessoas_proj = df_pessoas_proj.dropna(subset=["projetos"])
-
-    # Renomeia para facilitar o merge
-    df_pessoas_proj = df_pessoas_proj.rename(columns={
-        "projetos": "codigo",
-        "nome_completo": "padrinho"
-    })
-
-    # Agrupar (caso haja mais de um padrinho por projeto)
-    df_padrinhos = (
-        df_pessoas_proj
-        .groupby("codigo")["padrinho"]
-        .apply(lambda nomes: ", ".join(sorted(set(nomes))))
-        .reset_index()
-    )
-
-    # Fazer o merge
-    df_projetos = df_projetos.merge(
-        df_padrinhos,
-        on="codigo",
-        how="left"
-    )
-
 ###########################################################################################################
 # INTERFACE PRINCIPAL DA PÁGINA
 ###########################################################################################################
@@ -355,8 +306,8 @@ for index, projeto in df_filtrado.iterrows():
     cols[1].write(projeto['sigla'])
 
     # NOME DA ORGANIZAÇÃO
-    # recupera o nome da organização usando o id armazenado no projeto
-    nome_org = mapa_org_id_nome.get(projeto["id_organizacao"], "")
+    # o nome da organização vem do resumo do projeto
+    nome_org = projeto.get("nome_organizacao") or ""
 
     cols[2].write(nome_org)
 
@@ -426,8 +377,14 @@ for index, projeto in df_filtrado.iterrows():
     cols[5].markdown(html, unsafe_allow_html=True)
 
 
+    # Projeto arquivado: abre a consulta do arquivo (somente leitura)
+    if projeto.get("arquivado") is True:
+        if cols[6].button("Ver arquivo", key=f"ver_{projeto['codigo']}", icon=":material/inventory_2:"):
+            st.session_state[CHAVE_PROJETO_ARQUIVADO] = projeto["codigo"]
+            st.switch_page("projetos_arquivados.py")
+
     # Botão “Ver projeto”
-    if cols[6].button("Ver projeto", key=f"ver_{projeto['codigo']}"):
+    elif cols[6].button("Ver projeto", key=f"ver_{projeto['codigo']}"):
         st.session_state.pagina_atual = "ver_projeto"
         st.session_state.projeto_atual = projeto["codigo"]
         st.rerun()
@@ -1,6 +1,6 @@
 import streamlit as st
 from funcoes_auxiliares import conectar_mongo_cepf_gestao  
-import pandas as pd
+from estatistica_acessos import carregar_acessos
 import plotly.express as px
 from datetime import datetime, timedelta
 
@@ -52,34 +52,23 @@ periodo = st.selectbox(
 # CARREGAMENTO DOS DADOS DO MONGODB
 # --------------------------------------------------------------------------------------------------
 
-colecao = db["estatistica"]
-doc = colecao.find_one({"_id": "controle_acessos"})
-
-if not doc or "total_sessoes" not in doc:
-    st.warning("Nenhum dado de acesso encontrado.")
-    st.stop()
-
-df = pd.DataFrame(doc["total_sessoes"])
-
-# --------------------------------------------------------------------------------------------------
-# TRATAMENTO DE DATAS
-# --------------------------------------------------------------------------------------------------
-
-df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
-
-# --------------------------------------------------------------------------------------------------
-# FILTRO DE PERÍODO
-# --------------------------------------------------------------------------------------------------
-
+# O período é filtrado no banco (um documento por dia, índice em data)
 hoje = datetime.now()
 
 if periodo == "Últimos 30 dias":
-    df = df[df["data"] >= hoje - timedelta(days=30)]
+    inicio = hoje - timedelta(days=30)
 
 elif periodo == "Últimos 12 meses":
-    df = df[df["data"] >= hoje - timedelta(days=365)]
+    inicio = hoje - timedelta(days=365)
 
-df = df.sort_values("data")
+else:
+    inicio = None
+
+df = carregar_acessos(db, inicio=inicio)
+
+if df.empty:
+    st.warning("Nenhum dado de acesso encontrado.")
+    st.stop()
 
 # --------------------------------------------------------------------------------------------------
 # PREPARAÇÃO DOS DADOS
@@ -1,6 +1,27 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao  # Função personalizada para conectar ao MongoDB
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, RESULTADO_CRIACAO_INDICES  # Função personalizada para conectar ao MongoDB
+from indices_mongo import relatorio_indices
+from monitor_mongo import carregar_metricas_paginas, formatar_bytes
+from armazenamento import (
+    CAPACIDADE_ATLAS_MB,
+    SUBARVORES_PROJETO,
+    estatisticas_colecoes,
+    maiores_projetos,
+    registrar_armazenamento_diario,
+    carregar_armazenamento_diario,
+    projetar_limite,
+)
+from tamanho_projetos import (
+    LIMITE_ALERTA_BYTES,
+    LIMITE_BLOQUEIO_BYTES,
+    LIMITE_DOCUMENTO_MONGO,
+    projetos_acima_do_alerta,
+    carregar_bloqueios,
+)
+import plotly.express as px
 import plotly.graph_objects as go
+import pandas as pd
+import datetime
 
 
 
@@ -46,7 +67,7 @@ stats = db.command("dbStats")
 
 # Extrai o tamanho total usado (em MB)
 usado_mb = stats.get("storageSize", 0) / (1024 * 1024)
-capacidade_total_mb = 500
+capacidade_total_mb = CAPACIDADE_ATLAS_MB
 porcentagem_usada = (usado_mb / capacidade_total_mb) * 100
 
 if porcentagem_usada <= 50:
@@ -82,3 +103,266 @@ fig_gauge.update_layout(
 
 col1.plotly_chart(fig_gauge)
 
+
+# Estatísticas por coleção, também gravadas no histórico diário (um documento por dia)
+df_colecoes = estatisticas_colecoes(db)
+registrar_armazenamento_diario(db, df_colecoes)
+
+df_historico = carregar_armazenamento_diario(db)
+projecao = projetar_limite(df_historico)
+
+with col2:
+
+    st.write('')
+    st.write('')
+
+    if projecao["crescimento_mb_dia"] is None:
+        st.metric("Crescimento por dia", "-")
+        st.caption("O histórico diário ainda não tem dias suficientes para a projeção.")
+
+    else:
+        st.metric("Crescimento por dia", f"{projecao['crescimento_mb_dia']:.2f} MB")
+
+        if projecao["data_prevista"] is None:
+            st.metric(f"Limite de {CAPACIDADE_ATLAS_MB} MB", "Sem crescimento")
+        else:
+            st.metric(
+                f"Limite de {CAPACIDADE_ATLAS_MB} MB previsto para",
+                projecao["data_prevista"].strftime("%d/%m/%Y"),
+                f"em {projecao['dias_restantes']} dias",
+                delta_color="off"
+            )
+
+
+
+
+###########################################################################################################
+# COLEÇÕES
+###########################################################################################################
+
+
+st.divider()
+
+st.subheader("Coleções")
+
+st.dataframe(
+    df_colecoes.rename(columns={
+        "colecao": "Coleção",
+        "documentos": "Documentos",
+        "dados_mb": "Dados (MB)",
+        "armazenamento_mb": "Armazenamento (MB)",
+        "indices_mb": "Índices (MB)",
+        "tamanho_medio_kb": "Tamanho médio (KB)",
+    }).round(2),
+    hide_index=True
+)
+
+
+
+
+###########################################################################################################
+# MAIORES PROJETOS
+###########################################################################################################
+
+
+st.divider()
+
+st.subheader("Maiores projetos")
+
+st.caption(
+    f"Tamanho de cada documento de projeto em BSON, por parte do documento. "
+    f"O limite do MongoDB é {LIMITE_DOCUMENTO_MONGO // (1024 * 1024)} MB por documento e as escritas são "
+    f"recusadas a partir de {LIMITE_BLOQUEIO_BYTES // (1024 * 1024)} MB."
+)
+
+
+# Projetos perto do limite e escritas já recusadas (tamanho_projetos.py)
+for _, alerta in projetos_acima_do_alerta(db).iterrows():
+    st.warning(
+        f"O projeto {alerta['codigo']} - {alerta['sigla']} tem {formatar_bytes(alerta['tamanho'])} "
+        f"(alerta a partir de {formatar_bytes(LIMITE_ALERTA_BYTES)}).",
+        icon=":material/warning:"
+    )
+
+for _, bloqueio in carregar_bloqueios(db).iterrows():
+    st.error(
+        f"O projeto {bloqueio['codigo']} teve {bloqueio['escritas_bloqueadas']} escrita(s) recusada(s) por tamanho. "
+        f"Última em {bloqueio['ultimo_bloqueio']:%d/%m/%Y %H:%M}, "
+        f"com {formatar_bytes(bloqueio['tamanho_estimado'])} estimados.",
+        icon=":material/block:"
+    )
+
+df_maiores = maiores_projetos(db)
+
+if df_maiores.empty:
+    st.caption("Nenhum projeto cadastrado.")
+
+else:
+
+    df_maiores["outros_kb"] = (
+        df_maiores["total_kb"] - df_maiores[[f"{s}_kb" for s in SUBARVORES_PROJETO]].sum(axis=1)
+    ).clip(lower=0)
+
+    df_maiores["projeto"] = df_maiores["codigo"].fillna("") + " - " + df_maiores["sigla"].fillna("")
+
+    df_partes = df_maiores.melt(
+        id_vars="projeto",
+        value_vars=[f"{s}_kb" for s in SUBARVORES_PROJETO] + ["outros_kb"],
+        var_name="Parte",
+        value_name="KB"
+    )
+    df_partes["Parte"] = df_partes["Parte"].str.removesuffix("_kb")
+
+    fig_projetos = px.bar(
+        df_partes,
+        x="KB",
+        y="projeto",
+        color="Parte",
+        orientation="h",
+        category_orders={"projeto": df_maiores["projeto"].tolist()},
+    )
+
+    fig_projetos.update_layout(yaxis_title="", height=max(300, 30 * len(df_maiores)))
+
+    st.plotly_chart(fig_projetos, width='stretch')
+
+
+
+
+###########################################################################################################
+# CRESCIMENTO DIÁRIO
+###########################################################################################################
+
+
+st.divider()
+
+st.subheader("Crescimento diário")
+
+if len(df_historico) < 2:
+    st.caption("O histórico começa a ser gravado hoje. O gráfico aparece a partir do segundo dia.")
+
+else:
+
+    # Uma linha por coleção, com as maiores de hoje
+    maiores_colecoes = df_colecoes["colecao"].head(6).tolist()
+
+    df_por_colecao = pd.DataFrame(
+        [{"data": linha["data"], **(linha["por_colecao"] or {})} for _, linha in df_historico.iterrows()]
+    ).set_index("data")
+
+    st.line_chart(
+        df_historico.set_index("data")[["armazenamento_mb"]].rename(columns={"armazenamento_mb": "Total (MB)"})
+        .join(df_por_colecao.reindex(columns=maiores_colecoes))
+    )
+
+
+
+
+###########################################################################################################
+# ÍNDICES
+###########################################################################################################
+
+
+st.divider()
+
+st.subheader("Índices")
+
+# Falhas na criação dos índices ao iniciar o processo (ex.: dados duplicados em campo único)
+falhas_indices = [r for r in RESULTADO_CRIACAO_INDICES if not r["ok"]]
+
+for falha in falhas_indices:
+    st.warning(
+        f"Não foi possível criar o índice {falha['colecao']}.{falha['nome']}: {falha['erro']}",
+        icon=":material/warning:"
+    )
+
+
+if st.button("Verificar índices e planos de consulta", icon=":material/manage_search:"):
+
+    with st.spinner("Consultando o banco de dados..."):
+        relatorio = relatorio_indices(db)
+
+    st.write("**Índices faltantes**")
+    if relatorio["faltantes"]:
+        st.dataframe(pd.DataFrame(relatorio["faltantes"]), hide_index=True)
+    else:
+        st.caption("Todos os índices esperados existem.")
+
+    st.write("**Índices sem uso desde o último reinício do servidor**")
+    if relatorio["sem_uso"]:
+        st.dataframe(pd.DataFrame(relatorio["sem_uso"]), hide_index=True)
+    else:
+        st.caption("Nenhum índice sem uso.")
+
+    st.write("**Planos das consultas frequentes**")
+    st.dataframe(pd.DataFrame(relatorio["planos"]), hide_index=True)
+
+
+
+
+###########################################################################################################
+# CONSULTAS POR PÁGINA
+###########################################################################################################
+
+
+st.divider()
+
+st.subheader("Consultas por página")
+
+st.caption("Média por execução de cada página, medida em monitor_mongo.py. Use para acompanhar regressões.")
+
+dias_metricas = st.selectbox("Período", [7, 30, 90], format_func=lambda d: f"Últimos {d} dias", width=200)
+
+df_metricas = carregar_metricas_paginas(db, inicio=datetime.date.today() - datetime.timedelta(days=dias_metricas))
+
+if df_metricas.empty:
+    st.caption("Nenhuma execução medida no período.")
+
+else:
+
+    # Soma do período por página, do maior volume recebido por execução para o menor
+    df_paginas = df_metricas.groupby("pagina", as_index=False).agg(
+        execucoes=("execucoes", "sum"),
+        comandos=("comandos", "sum"),
+        bytes=("bytes", "sum"),
+        duracao_mongo_ms=("duracao_mongo_ms", "sum"),
+        duracao_total_ms=("duracao_total_ms", "sum"),
+        max_comandos=("max_comandos", "max"),
+        max_bytes=("max_bytes", "max"),
+    )
+
+    execucoes = df_paginas["execucoes"].clip(lower=1)
+
+    df_paginas = df_paginas.assign(
+        comandos_medio=(df_paginas["comandos"] / execucoes).round(1),
+        bytes_medio=df_paginas["bytes"] / execucoes,
+        mongo_ms_medio=(df_paginas["duracao_mongo_ms"] / execucoes).round(),
+        total_ms_medio=(df_paginas["duracao_total_ms"] / execucoes).round(),
+    ).sort_values("bytes_medio", ascending=False)
+
+    st.dataframe(
+        pd.DataFrame({
+            "Página": df_paginas["pagina"],
+            "Execuções": df_paginas["execucoes"],
+            "Comandos / execução": df_paginas["comandos_medio"],
+            "Recebido / execução": df_paginas["bytes_medio"].map(formatar_bytes),
+            "Banco (ms) / execução": df_paginas["mongo_ms_medio"],
+            "Total (ms) / execução": df_paginas["total_ms_medio"],
+            "Máx. comandos": df_paginas["max_comandos"],
+            "Máx. recebido": df_paginas["max_bytes"].map(formatar_bytes),
+        }),
+        hide_index=True
+    )
+
+    # Evolução diária de uma página
+    pagina_escolhida = st.selectbox("Evolução diária da página", df_paginas["pagina"].tolist(), width=300)
+
+    df_pagina = df_metricas[df_metricas["pagina"] == pagina_escolhida].sort_values("data")
+
+    st.line_chart(
+        df_pagina.set_index("data")[["comandos_por_execucao", "duracao_mongo_ms_por_execucao"]]
+        .rename(columns={
+            "comandos_por_execucao": "Comandos / execução",
+            "duracao_mongo_ms_por_execucao": "Banco (ms) / execução",
+        })
+    )
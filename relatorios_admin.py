@@ -1,9 +1,9 @@
 import streamlit as st
-from funcoes_auxiliares import conectar_mongo_cepf_gestao, calcular_status_projetos  # Função personalizada para conectar ao MongoDB
+from funcoes_auxiliares import conectar_mongo_cepf_gestao, calcular_status_projetos, carregar_colecao_referencia  # Função personalizada para conectar ao MongoDB
+from historico_projetos import somar_lancamentos_por_projeto
 import pandas as pd
 import io
 import datetime
-import time
 
 
 st.set_page_config(page_title="Relatórios", page_icon=":material/assignment:")
@@ -23,18 +23,23 @@ db = conectar_mongo_cepf_gestao()
 
 
 @st.cache_data(ttl=600)  # 10 minutos
+def carregar_pessoas():
+    return list(db["pessoas"].find())
+
+
 def carregar_dados_base():
 
+    # Coleções de referência vêm do cache do processo, invalidado a cada escrita
     return {
-        "publicos": list(db["publicos"].find()),
-        "beneficios": list(db["beneficios"].find()),
-        "categorias_despesa": list(db["categorias_despesa"].find()),
-        "corredores": list(db["corredores"].find()),
-        "kbas": list(db["kbas"].find()),
-        "editais": list(db["editais"].find()),
-        "ciclos": list(db["ciclos_investimento"].find()),
-        "organizacoes": list(db["organizacoes"].find()),
-        "pessoas": list(db["pessoas"].find()) 
+        "publicos": carregar_colecao_referencia(db, "publicos"),
+        "beneficios": carregar_colecao_referencia(db, "beneficios"),
+        "categorias_despesa": carregar_colecao_referencia(db, "categorias_despesa"),
+        "corredores": carregar_colecao_referencia(db, "corredores"),
+        "kbas": carregar_colecao_referencia(db, "kbas"),
+        "editais": carregar_colecao_referencia(db, "editais"),
+        "ciclos": carregar_colecao_referencia(db, "ciclos_investimento"),
+        "organizacoes": carregar_colecao_referencia(db, "organizacoes"),
+        "pessoas": carregar_pessoas()
     }
 
 dados_base = carregar_dados_base()
@@ -279,7 +284,6 @@ if opcao_relatorio == "Relatório de salvaguardas":
             if not projetos:
                 st.warning("Nenhum projeto encontrado para o edital selecionado.", icon=":material/warning:")
                 st.session_state.arquivo_salvaguardas = None
-                time.sleep(3)
 
             else:
 
@@ -1132,7 +1136,6 @@ elif opcao_relatorio == "Relatório de acompanhamento de desembolsos por parcela
 
         if not projetos:
             st.warning("Nenhum projeto no edital selecionado.")
-            time.sleep(3)
 
         else:
 
@@ -1241,7 +1244,6 @@ elif opcao_relatorio == "Relatório de acompanhamento de desembolsos por parcela
         if valores.isnull().any() or any(v == 0 for v in valores):
 
             st.warning("Preencha a cotação de todos os meses.")
-            time.sleep(3)
 
         else:
 
@@ -1708,7 +1710,6 @@ elif opcao_relatorio == "Relatório de acompanhamento completo":
             if not projetos:
                 st.warning("Nenhum projeto encontrado para o edital selecionado.", icon=":material/warning:")
                 st.session_state.arquivo_acompanhamento_completo = None
-                time.sleep(3)
 
             else:
 
@@ -1737,6 +1738,13 @@ elif opcao_relatorio == "Relatório de acompanhamento completo":
 
 
 
+                    # soma dos lançamentos de despesas por projeto (coleção lancamentos)
+                    total_lancamentos_por_projeto = somar_lancamentos_por_projeto(
+                        db,
+                        [p.get("codigo") for p in projetos]
+                    )
+
+
                     for p in projetos:
 
 
@@ -1946,23 +1954,8 @@ elif opcao_relatorio == "Relatório de acompanhamento completo":
                         ###################################################################################################
                         # VALOR TOTAL FINAL (SOMA DOS LANÇAMENTOS)
                         ###################################################################################################
-                        orcamentos = financeiro.get("orcamento", [])
-
-                        valor_total_final = 0
-
-                        # percorre todas as despesas do orçamento
-                        for despesa in orcamentos:
-
-                            lancamentos = despesa.get("lancamentos", [])
-
-                            # soma todos os lançamentos de cada despesa
-                            for lanc in lancamentos:
-
-                                valor = lanc.get("valor_despesa", 0)
-
-                                # garante que apenas valores válidos sejam somados
-                                if isinstance(valor, (int, float)):
-                                    valor_total_final += valor
+                        # soma calculada de uma vez para todos os projetos (coleção lancamentos)
+                        valor_total_final = total_lancamentos_por_projeto.get(codigo_projeto, 0)
 
 
 
@@ -2432,7 +2425,6 @@ if opcao_relatorio == "Relatório de Indicadores e Resultados":
                 )
 
                 st.session_state.arquivo_indicadores_resultados = None
-                time.sleep(3)
 
             else:
 
@@ -2647,8 +2639,6 @@ elif opcao_relatorio == "Lista de comunidades":
 
                     st.session_state.arquivo_lista_comunidades = None
 
-                    time.sleep(3)
-
                 else:
 
                     with st.spinner("Gerando relatório..."):
@@ -0,0 +1,420 @@
+"""
+Coleção materializada projetos_resumo.
+
+Guarda, para cada projeto, apenas o que as páginas de portfólio (home, lista,
+mapa e organizações) exibem: código, sigla, edital, organização, padrinhos,
+datas do contrato, status do cronograma, contagens de pendências, fotos e os
+pontos das localidades. Assim essas páginas leem alguns KB em vez dos
+documentos completos de projetos.
+
+- atualizar_resumos(db, filtro): recalcula os resumos dos projetos do filtro.
+  É chamada pelas funções de escrita de escrita_projetos.py a cada alteração.
+- reconstruir_resumos(db): recalcula todos os resumos (recuperação).
+- carregar_resumos_projetos(db, filtro): leitura usada pelas páginas.
+
+Os resumos de projetos arquivados (arquivo_projetos.py) ficam na coleção
+com arquivado=True e só são lidos com incluir_arquivados=True.
+
+A fila de pendências da home (pendencias.py) é derivada dos resumos e
+regravada junto com eles.
+
+Reconstrução completa pela linha de comando:
+
+    python resumo_projetos.py
+"""
+
+import datetime
+
+import pandas as pd
+from pymongo import ReplaceOne
+
+from funcoes_auxiliares import consultar_status_projetos, carregar_colecao_referencia
+from historico_projetos import contar_fotos_por_projeto
+from pendencias import COLECAO_PENDENCIAS, sincronizar_pendencias, remover_pendencias_orfas
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_RESUMO = "projetos_resumo"
+
+
+# Campos do projeto lidos para montar o resumo (o status vem de consultar_status_projetos)
+CAMPOS_ORIGEM_RESUMO = {
+    "codigo": 1,
+    "sigla": 1,
+    "nome_do_projeto": 1,
+    "edital": 1,
+    "id_organizacao": 1,
+    "ultimo_acesso": 1,
+    "data_inicio_contrato": 1,
+    "data_fim_contrato": 1,
+    "relatorios.numero": 1,
+    "relatorios.status_relatorio": 1,
+    "plano_trabalho.remanejamentos_atividades.status_remanejamento": 1,
+    "financeiro.remanejamentos_financeiros.status_remanejamento": 1,
+    "locais.localidades.latitude": 1,
+    "locais.localidades.longitude": 1,
+    "locais.localidades.municipio": 1,
+    "locais.localidades.nome_localidade": 1,
+}
+
+
+# Caminhos do projeto que alteram o resumo. Escritas que não tocam nenhum
+# deles (contatos, salvaguardas, beneficiários...) não precisam recalculá-lo.
+CAMINHOS_RELEVANTES_RESUMO = (
+    "codigo",
+    "sigla",
+    "nome_do_projeto",
+    "edital",
+    "id_organizacao",
+    "status",
+    "ultimo_acesso",
+    "data_inicio_contrato",
+    "data_fim_contrato",
+    "relatorios",
+    "financeiro.parcelas",
+    "financeiro.remanejamentos_financeiros",
+    "plano_trabalho.remanejamentos_atividades",
+    "plano_trabalho.componentes",
+    "locais",
+)
+
+
+# Campos copiados sem transformação: um $set só com eles é repetido no resumo
+# diretamente, sem recalcular o projeto.
+CAMPOS_COPIADOS_RESUMO = {
+    "sigla",
+    "nome_do_projeto",
+    "ultimo_acesso",
+    "data_inicio_contrato",
+    "data_fim_contrato",
+}
+
+
+
+
+###########################################################################################################
+# MONTAGEM DOS RESUMOS
+###########################################################################################################
+
+def _lista(valor):
+    return valor if isinstance(valor, list) else []
+
+
+def _dicionario(valor):
+    return valor if isinstance(valor, dict) else {}
+
+
+def _contar_em_analise(itens, campo_status):
+    return sum(
+        1 for item in _lista(itens)
+        if isinstance(item, dict) and item.get(campo_status) == "em_analise"
+    )
+
+
+def _pontos_localidades(localidades):
+    """
+    Localidades com latitude e longitude, apenas com os campos usados no mapa.
+    """
+
+    pontos = []
+
+    for local in localidades:
+
+        if local.get("latitude") is None or local.get("longitude") is None:
+            continue
+
+        pontos.append({
+            "latitude": local.get("latitude"),
+            "longitude": local.get("longitude"),
+            "municipio": local.get("municipio"),
+            "nome_localidade": local.get("nome_localidade"),
+        })
+
+    return pontos
+
+
+def _padrinhos_por_projeto(db, codigos):
+    """
+    Nomes das pessoas admin/equipe associadas a cada código de projeto.
+    """
+
+    padrinhos = {}
+
+    pessoas = db["pessoas"].find(
+        {"tipo_usuario": {"$in": ["admin", "equipe"]}, "projetos": {"$in": codigos}},
+        {"nome_completo": 1, "projetos": 1}
+    )
+
+    for pessoa in pessoas:
+
+        nome = pessoa.get("nome_completo")
+
+        if not nome:
+            continue
+
+        for codigo in _lista(pessoa.get("projetos")):
+            padrinhos.setdefault(codigo, set()).add(nome)
+
+    return {codigo: sorted(nomes) for codigo, nomes in padrinhos.items()}
+
+
+def montar_resumos(db, filtro: dict | None = None) -> list[dict]:
+    """
+    Monta os documentos de resumo dos projetos que atendem ao filtro.
+    O _id do resumo é o mesmo _id do projeto.
+    """
+
+    hoje = datetime.date.today()
+
+    projetos = list(db["projetos"].find(filtro or {}, CAMPOS_ORIGEM_RESUMO))
+
+    if not projetos:
+        return []
+
+    codigos = [p["codigo"] for p in projetos if p.get("codigo")]
+
+    status_por_id = {
+        s["_id"]: s
+        for s in consultar_status_projetos(db, hoje=hoje, filtro={"_id": {"$in": [p["_id"] for p in projetos]}})
+    }
+
+    organizacoes = {
+        org["_id"]: org
+        for org in carregar_colecao_referencia(
+            db, "organizacoes", projecao={"nome_organizacao": 1, "sigla_organizacao": 1}
+        )
+    }
+
+    padrinhos = _padrinhos_por_projeto(db, codigos)
+
+    fotos = contar_fotos_por_projeto(db, codigos)
+
+    agora = datetime.datetime.now()
+
+    resumos = []
+
+    for projeto in projetos:
+
+        status = status_por_id.get(projeto["_id"], {})
+        organizacao = organizacoes.get(projeto.get("id_organizacao"), {})
+        nomes_padrinhos = padrinhos.get(projeto.get("codigo"), [])
+
+        relatorios = _lista(projeto.get("relatorios"))
+        localidades = [l for l in _lista(_dicionario(projeto.get("locais")).get("localidades")) if isinstance(l, dict)]
+
+        data_proximo_evento = status.get("data_proximo_evento")
+        if isinstance(data_proximo_evento, datetime.date):
+            # BSON só aceita datetime
+            data_proximo_evento = datetime.datetime(
+                data_proximo_evento.year, data_proximo_evento.month, data_proximo_evento.day
+            )
+
+        resumos.append({
+            "_id": projeto["_id"],
+            "codigo": projeto.get("codigo"),
+            "sigla": projeto.get("sigla"),
+            "nome_do_projeto": projeto.get("nome_do_projeto"),
+            "edital": projeto.get("edital"),
+            "id_organizacao": projeto.get("id_organizacao"),
+            "nome_organizacao": organizacao.get("nome_organizacao"),
+            "sigla_organizacao": organizacao.get("sigla_organizacao"),
+            "padrinhos": nomes_padrinhos,
+            "padrinho": ", ".join(nomes_padrinhos) or None,
+            "ultimo_acesso": projeto.get("ultimo_acesso"),
+            "data_inicio_contrato": projeto.get("data_inicio_contrato"),
+            "data_fim_contrato": projeto.get("data_fim_contrato"),
+
+            # Cronograma
+            "status": status.get("status"),
+            "dias_atraso": status.get("dias_atraso"),
+            "proximo_evento": status.get("proximo_evento"),
+            "data_proximo_evento": data_proximo_evento,
+            "notificacao": status.get("notificacao"),
+
+            # Pendências de análise
+            "relatorios_em_analise": [
+                r.get("numero") for r in relatorios
+                if isinstance(r, dict) and r.get("status_relatorio") == "em_analise"
+            ],
+            "qtd_remanejamentos_atividades_em_analise": _contar_em_analise(
+                _dicionario(projeto.get("plano_trabalho")).get("remanejamentos_atividades"),
+                "status_remanejamento"
+            ),
+            "qtd_remanejamentos_financeiros_em_analise": _contar_em_analise(
+                _dicionario(projeto.get("financeiro")).get("remanejamentos_financeiros"),
+                "status_remanejamento"
+            ),
+
+            # Fotos e localidades
+            "qtd_fotos": fotos.get(projeto.get("codigo"), 0),
+            "qtd_localidades": len(localidades),
+            "localidades": _pontos_localidades(localidades),
+
+            # Projetos na coleção projetos nunca estão arquivados
+            "arquivado": False,
+
+            "atualizado_em": agora,
+        })
+
+    return resumos
+
+
+
+
+###########################################################################################################
+# ATUALIZAÇÃO E RECONSTRUÇÃO
+###########################################################################################################
+
+def atualizar_resumos(db, filtro: dict) -> int:
+    """
+    Recalcula e grava os resumos dos projetos que atendem ao filtro, junto
+    com as pendências desses projetos.
+
+    Retorna:
+        Quantidade de resumos gravados.
+    """
+
+    resumos = montar_resumos(db, filtro)
+
+    if not resumos:
+        return 0
+
+    db[COLECAO_RESUMO].bulk_write(
+        [ReplaceOne({"_id": r["_id"]}, r, upsert=True) for r in resumos],
+        ordered=False
+    )
+
+    sincronizar_pendencias(db, resumos)
+
+    return len(resumos)
+
+
+def atualizar_resumo_projeto(db, codigo: str) -> int:
+    """
+    Recalcula o resumo de um projeto pelo código.
+    """
+
+    return atualizar_resumos(db, {"codigo": codigo})
+
+
+def atualizar_resumos_por_codigos(db, codigos) -> int:
+    """
+    Recalcula os resumos de vários projetos, por exemplo quando muda o
+    padrinho ou a madrinha de uma lista de projetos.
+    """
+
+    codigos = sorted({c for c in codigos if c})
+
+    if not codigos:
+        return 0
+
+    return atualizar_resumos(db, {"codigo": {"$in": codigos}})
+
+
+def copiar_campos_para_resumo(db, codigo: str, campos: dict):
+    """
+    Repete no resumo um $set de campos copiados sem transformação
+    (ver CAMPOS_COPIADOS_RESUMO).
+    """
+
+    db[COLECAO_RESUMO].update_one(
+        {"codigo": codigo},
+        {"$set": {**campos, "atualizado_em": datetime.datetime.now()}}
+    )
+
+    if "sigla" in campos:
+        db[COLECAO_PENDENCIAS].update_many({"codigo": codigo}, {"$set": {"sigla": campos["sigla"]}})
+
+
+def reconstruir_resumos(db) -> int:
+    """
+    Recalcula todos os resumos e pendências e remove os de projetos que não
+    existem mais (os de projetos arquivados são mantidos).
+
+    Retorna:
+        Quantidade de resumos gravados.
+    """
+
+    gravados = atualizar_resumos(db, {})
+
+    ids_projetos = db["projetos"].distinct("_id")
+
+    db[COLECAO_RESUMO].delete_many({"_id": {"$nin": ids_projetos}, "arquivado": {"$ne": True}})
+
+    remover_pendencias_orfas(db, db["projetos"].distinct("codigo"))
+
+    return gravados
+
+
+
+
+###########################################################################################################
+# LEITURA PELAS PÁGINAS
+###########################################################################################################
+
+def carregar_resumos_projetos(
+    db,
+    filtro: dict | None = None,
+    hoje: datetime.date | None = None,
+    incluir_arquivados: bool = False
+) -> pd.DataFrame:
+    """
+    Carrega os resumos dos projetos como DataFrame.
+
+    O atraso dos projetos "Em dia" e "Atrasado" depende da data de hoje, por
+    isso dias_atraso e status são recalculados aqui a partir de
+    data_proximo_evento. Se a coleção ainda não existir, ela é reconstruída.
+
+    Os projetos arquivados ficam de fora, a não ser com incluir_arquivados=True.
+    """
+
+    if hoje is None:
+        hoje = datetime.date.today()
+
+    filtro_leitura = dict(filtro or {})
+
+    if not incluir_arquivados:
+        filtro_leitura["arquivado"] = {"$ne": True}
+
+    resumos = list(db[COLECAO_RESUMO].find(filtro_leitura))
+
+    if not resumos and not filtro and db["projetos"].estimated_document_count() > 0:
+        reconstruir_resumos(db)
+        resumos = list(db[COLECAO_RESUMO].find(filtro_leitura))
+
+    for resumo in resumos:
+
+        data_proximo_evento = resumo.get("data_proximo_evento")
+
+        if isinstance(data_proximo_evento, datetime.datetime):
+            data_proximo_evento = data_proximo_evento.date()
+            dias_atraso = (hoje - data_proximo_evento).days
+
+            resumo["data_proximo_evento"] = data_proximo_evento
+            resumo["dias_atraso"] = dias_atraso
+            resumo["status"] = "Atrasado" if dias_atraso > 0 else "Em dia"
+
+    return pd.DataFrame(resumos)
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    from funcoes_auxiliares import conectar_mongo_cepf_gestao
+
+    db = conectar_mongo_cepf_gestao()
+
+    inicio = datetime.datetime.now()
+    total = reconstruir_resumos(db)
+
+    print(f"{total} resumos reconstruídos em {(datetime.datetime.now() - inicio).total_seconds():.1f} s.")
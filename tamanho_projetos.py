@@ -0,0 +1,235 @@
+"""
+Controle do tamanho dos documentos de projetos.
+
+O MongoDB recusa documentos acima de 16 MB, e a recusa aconteceria no meio
+de uma gravação (ex.: o envio de um relatório). Antes de cada escrita,
+escrita_projetos.atualizar_projeto chama verificar_tamanho, que estima o
+tamanho do projeto depois da atualização:
+
+    tamanho atual (medido no servidor com $bsonSize)
+    - tamanho atual dos campos substituídos por $set
+    + tamanho dos valores gravados ($set, $push, $addToSet, $setOnInsert)
+
+Acima de LIMITE_BLOQUEIO_BYTES a escrita não é feita: a tentativa é
+registrada em alertas_tamanho_projetos e ProjetoGrandeDemaisError é
+levantada. login_gestao.py trata essa exceção mostrando uma mensagem e
+encerrando a página, sem gravar nada pela metade.
+
+A página de armazenamento mostra aos admins os projetos acima de
+LIMITE_ALERTA_BYTES e as escritas bloqueadas.
+"""
+
+import datetime
+
+import bson
+import pandas as pd
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+COLECAO_ALERTAS_TAMANHO = "alertas_tamanho_projetos"
+
+
+MB = 1024 * 1024
+
+
+# Limite do MongoDB para um documento
+LIMITE_DOCUMENTO_MONGO = 16 * MB
+
+# A partir daqui o projeto aparece nos alertas da página de armazenamento
+LIMITE_ALERTA_BYTES = 10 * MB
+
+# A partir daqui a escrita é recusada, com folga para o limite do MongoDB
+LIMITE_BLOQUEIO_BYTES = 15 * MB
+
+
+# Operadores que acrescentam dados ao documento
+OPERADORES_QUE_ACRESCENTAM = ("$set", "$push", "$addToSet", "$setOnInsert")
+
+
+
+
+###########################################################################################################
+# EXCEÇÃO
+###########################################################################################################
+
+class ProjetoGrandeDemaisError(Exception):
+    """
+    A escrita deixaria o documento do projeto acima de LIMITE_BLOQUEIO_BYTES.
+    """
+
+    def __init__(self, codigo, tamanho_estimado: int):
+
+        self.codigo = codigo
+        self.tamanho_estimado = tamanho_estimado
+
+        super().__init__(
+            f"O projeto {codigo or ''} atingiu o limite de tamanho do banco de dados "
+            f"({tamanho_estimado / MB:.1f} MB de {LIMITE_DOCUMENTO_MONGO / MB:.0f} MB) "
+            "e a alteração não foi salva. A equipe administradora foi avisada."
+        )
+
+
+
+
+###########################################################################################################
+# ESTIMATIVA
+###########################################################################################################
+
+def _tamanho_valor(valor) -> int:
+    """
+    Tamanho de um valor em BSON, medido dentro de {"v": valor}, como no servidor.
+    """
+
+    return len(bson.encode({"v": valor}))
+
+
+def _caminho_simples(caminho: str) -> bool:
+    """
+    True para caminhos sem operador posicional nem índice, que podem ser
+    medidos no servidor com "$caminho".
+    """
+
+    return not any(parte.startswith("$") or parte.isdigit() for parte in caminho.split("."))
+
+
+def estimar_tamanho_apos_atualizacao(col_projetos, filtro: dict, atualizacao) -> int | None:
+    """
+    Tamanho estimado, em bytes, do projeto do filtro depois da atualização.
+
+    A estimativa é para mais: valores gravados em itens de listas ($[r],
+    índices) somam sem descontar o que substituem.
+
+    Retorna:
+        None para atualizações em pipeline, cujo efeito não dá para prever.
+    """
+
+    if not isinstance(atualizacao, dict):
+        return None
+
+    acrescimo = 0
+    substituidos = []
+
+    for operador in OPERADORES_QUE_ACRESCENTAM:
+
+        for caminho, valor in (atualizacao.get(operador) or {}).items():
+
+            acrescimo += _tamanho_valor(valor)
+
+            if operador == "$set" and _caminho_simples(caminho):
+                substituidos.append(caminho)
+
+    medidas = {
+        f"s{i}": {"$bsonSize": {"v": f"${caminho}"}}
+        for i, caminho in enumerate(substituidos)
+    }
+
+    atual = next(
+        col_projetos.aggregate([
+            {"$match": filtro},
+            {"$limit": 1},
+            {"$project": {"_id": 0, "total": {"$bsonSize": "$$ROOT"}, **medidas}},
+        ]),
+        None
+    )
+
+    # Documento novo (upsert)
+    if atual is None:
+        return acrescimo
+
+    return atual["total"] - sum(atual[chave] for chave in medidas) + acrescimo
+
+
+
+
+###########################################################################################################
+# VERIFICAÇÃO ANTES DA ESCRITA
+###########################################################################################################
+
+def registrar_bloqueio(db, codigo, tamanho_estimado: int):
+    """
+    Registra (um documento por projeto) uma escrita recusada pelo tamanho.
+    """
+
+    agora = datetime.datetime.now()
+
+    db[COLECAO_ALERTAS_TAMANHO].update_one(
+        {"codigo": codigo},
+        {
+            "$set": {"ultimo_bloqueio": agora, "tamanho_estimado": tamanho_estimado},
+            "$setOnInsert": {"primeiro_bloqueio": agora},
+            "$inc": {"escritas_bloqueadas": 1},
+        },
+        upsert=True
+    )
+
+
+def verificar_tamanho(col_projetos, filtro: dict, atualizacao, codigo=None) -> int | None:
+    """
+    Levanta ProjetoGrandeDemaisError (e registra o bloqueio) se a atualização
+    deixar o projeto acima de LIMITE_BLOQUEIO_BYTES.
+
+    Retorna:
+        O tamanho estimado (None se não pôde ser estimado).
+    """
+
+    tamanho = estimar_tamanho_apos_atualizacao(col_projetos, filtro, atualizacao)
+
+    if tamanho is not None and tamanho >= LIMITE_BLOQUEIO_BYTES:
+        registrar_bloqueio(col_projetos.database, codigo, tamanho)
+        raise ProjetoGrandeDemaisError(codigo, tamanho)
+
+    return tamanho
+
+
+def verificar_tamanho_documento(col_projetos, documento: dict) -> int:
+    """
+    Mesma verificação para um documento novo, antes do insert.
+    """
+
+    tamanho = len(bson.encode(documento))
+
+    if tamanho >= LIMITE_BLOQUEIO_BYTES:
+        registrar_bloqueio(col_projetos.database, documento.get("codigo"), tamanho)
+        raise ProjetoGrandeDemaisError(documento.get("codigo"), tamanho)
+
+    return tamanho
+
+
+
+
+###########################################################################################################
+# ALERTAS PARA A PÁGINA DE ARMAZENAMENTO
+###########################################################################################################
+
+def projetos_acima_do_alerta(db, limite_bytes: int = LIMITE_ALERTA_BYTES) -> pd.DataFrame:
+    """
+    Projetos cujo documento passa de limite_bytes, do maior para o menor.
+    """
+
+    documentos = list(db["projetos"].aggregate([
+        {"$project": {"_id": 0, "codigo": 1, "sigla": 1, "tamanho": {"$bsonSize": "$$ROOT"}}},
+        {"$match": {"tamanho": {"$gte": limite_bytes}}},
+        {"$sort": {"tamanho": -1}},
+    ]))
+
+    return pd.DataFrame(documentos, columns=["codigo", "sigla", "tamanho"])
+
+
+def carregar_bloqueios(db) -> pd.DataFrame:
+    """
+    Projetos com escritas recusadas pelo tamanho, da mais recente para a mais antiga.
+    """
+
+    documentos = list(
+        db[COLECAO_ALERTAS_TAMANHO].find({}, {"_id": 0}).sort("ultimo_bloqueio", -1)
+    )
+
+    return pd.DataFrame(
+        documentos,
+        columns=["codigo", "tamanho_estimado", "escritas_bloqueadas", "primeiro_bloqueio", "ultimo_bloqueio"]
+    )
@@ -0,0 +1,274 @@
+"""
+Templates Jinja2 dos e-mails em HTML (pasta templates_email).
+
+Todos os e-mails estendem templates_email/base.html, que tem o CSS, o logo,
+o link do sistema e o rodapé; cada template preenche só o bloco conteudo.
+Trechos repetidos (tabela de alterações, listas de despesas, parágrafos de
+justificativa) são macros de templates_email/_componentes.html.
+
+O ambiente do Jinja2 é criado uma vez por processo (st.cache_resource) e
+compila todos os templates na criação. Com auto_reload desligado, as
+chamadas seguintes usam o template compilado sem olhar o disco:
+
+    html = renderizar_email("relatorio_aprovado.html", nome_do_contato=..., ...)
+
+Quando um mesmo evento gera um e-mail para cada destinatário, renderizar_emails
+busca o template uma vez e renderiza todos os contextos:
+
+    corpos = renderizar_emails("remanejamento.html", [{"nome": "Ana"}, {"nome": "Rui"}], codigo=...)
+
+Os valores são escapados (autoescape): textos digitados pelos usuários, como
+justificativas, não quebram o HTML do e-mail.
+
+Linha de comando (benchmark: tempo de renderização de cada template, com o
+template compilado e compilando a cada e-mail):
+
+    python templates_email.py
+    python templates_email.py 5000
+"""
+
+import os
+import sys
+import time
+
+import streamlit as st
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+
+
+
+###########################################################################################################
+# DEFINIÇÕES
+###########################################################################################################
+
+PASTA_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates_email")
+
+
+LOGO_IEB = "https://iieb.org.br/wp-content/uploads/2021/02/IEB-logo.svg"
+
+URL_SISTEMA = "https://veredas.streamlit.app/"
+
+
+# Nomes legíveis dos campos de uma atividade (tabela de alterações dos ajustes)
+NOMES_CAMPOS_ATIVIDADE = {
+    "atividade": "Descrição da atividade",
+    "data_inicio": "Data de início",
+    "data_fim": "Data de fim",
+}
+
+
+
+
+###########################################################################################################
+# FILTROS
+###########################################################################################################
+
+def formatar_brl(valor):
+    """
+    Valor em reais no formato R$ 1.234,56 (vazio para zero ou nenhum valor).
+    """
+
+    return (
+        f"R$ {valor:,.2f}"
+        .replace(",", "X")
+        .replace(".", ",")
+        .replace("X", ".")
+    ) if valor else ""
+
+
+
+
+###########################################################################################################
+# AMBIENTE
+###########################################################################################################
+
+def criar_ambiente() -> Environment:
+    """
+    Ambiente do Jinja2 com todos os templates já compilados.
+    """
+
+    ambiente = Environment(
+        loader=FileSystemLoader(PASTA_TEMPLATES),
+        autoescape=select_autoescape(["html"]),
+        undefined=StrictUndefined,
+        auto_reload=False,
+        # Mantém no cache todos os templates compilados
+        cache_size=-1,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+
+    ambiente.filters["brl"] = formatar_brl
+
+    ambiente.globals.update(
+        LOGO_IEB=LOGO_IEB,
+        URL_SISTEMA=URL_SISTEMA,
+        NOMES_CAMPOS_ATIVIDADE=NOMES_CAMPOS_ATIVIDADE,
+    )
+
+    for nome in ambiente.list_templates(extensions=["html"]):
+        ambiente.get_template(nome)
+
+    return ambiente
+
+
+@st.cache_resource
+def obter_ambiente() -> Environment:
+    """
+    Ambiente do Jinja2 do processo (criado uma única vez).
+    """
+
+    return criar_ambiente()
+
+
+
+
+###########################################################################################################
+# RENDERIZAÇÃO
+###########################################################################################################
+
+def renderizar_email(nome_template: str, **contexto) -> str:
+    """
+    Corpo HTML de um e-mail a partir de um template da pasta templates_email.
+    """
+
+    return obter_ambiente().get_template(nome_template).render(contexto)
+
+
+def renderizar_emails(nome_template: str, contextos: list[dict], **comum) -> list[str]:
+    """
+    Vários corpos HTML do mesmo template, um por contexto (ex.: um por
+    destinatário). Os valores de comum valem para todos; os de cada
+    contexto têm prioridade.
+    """
+
+    template = obter_ambiente().get_template(nome_template)
+
+    return [template.render({**comum, **contexto}) for contexto in contextos]
+
+
+
+
+###########################################################################################################
+# BENCHMARK
+###########################################################################################################
+
+# Contexto de exemplo de cada template, usado no benchmark
+EXEMPLO_PROJETO = {"codigo": "CEPF-001", "nome_projeto": "Projeto de exemplo", "organizacao": "Organização"}
+
+EXEMPLO_DESPESAS = {
+    "reduzidas": [{"nome_despesa": "Diárias", "valor_reduzido": 1500.0}],
+    "aumentadas": [{"nome_despesa": "Combustível", "valor_aumentado": 1500.0}],
+}
+
+EXEMPLOS = {
+    "lembrete_eventos.html": {},
+    "convite.html": {"nome_completo": "Maria da Silva", "codigo": "123456"},
+    "codigo_verificacao.html": {"codigo": "123456"},
+    "relatorio_aprovado.html": {
+        "nome_do_contato": "Maria", "relatorio_numero": 1, "nome_do_projeto": "Projeto", "organizacao": "Org"
+    },
+    "relatorio_reprovado.html": {
+        "nome_do_contato": "Maria", "relatorio_numero": 1, "nome_do_projeto": "Projeto", "organizacao": "Org"
+    },
+    "relatorio_envio.html": {"nome": "Maria", "numero_relatorio": 1, "codigo": "CEPF-001", "sigla": "EX"},
+    "remanejamento_atividade.html": {**EXEMPLO_PROJETO, "autor": "Maria", "data_solicitacao": "01/01/2026"},
+    "remanejamento_atividade_aprovado.html": {
+        **EXEMPLO_PROJETO,
+        "antes": {"atividade": "Oficina", "data_fim": "01/02/2026"},
+        "depois": {"atividade": "Oficina ampliada", "data_fim": "01/03/2026"},
+        "justificativa": "Chuvas",
+    },
+    "remanejamento_atividade_recusado.html": {
+        **EXEMPLO_PROJETO,
+        "antes": {"data_fim": "01/02/2026"}, "depois": {"data_fim": "01/03/2026"},
+        "justificativa": "Chuvas", "motivo_recusa": "Fora do prazo",
+    },
+    "nova_atividade.html": EXEMPLO_PROJETO,
+    "nova_atividade_aprovada.html": {
+        **EXEMPLO_PROJETO, "componente": "1", "entrega": "1.1", "atividade": "Oficina",
+        "data_inicio": "01/01/2026", "data_fim": "01/02/2026", "justificativa": "Demanda",
+    },
+    "nova_atividade_recusada.html": {
+        **EXEMPLO_PROJETO, "atividade": "Oficina", "data_inicio": "01/01/2026", "data_fim": "01/02/2026",
+        "justificativa": "Demanda", "motivo_recusa": "Sem orçamento",
+    },
+    "remocao_atividade_solicitada.html": EXEMPLO_PROJETO,
+    "remocao_atividade_aprovada.html": {**EXEMPLO_PROJETO, "atividade": "Oficina", "justificativa": "Cancelada"},
+    "remocao_atividade_recusada.html": {
+        **EXEMPLO_PROJETO, "atividade": "Oficina", "justificativa": "Cancelada", "motivo_recusa": "Necessária"
+    },
+    "remanejamento_aprovado.html": {**EXEMPLO_PROJETO, **EXEMPLO_DESPESAS, "justificativa": "Ajuste"},
+    "remanejamento_recusado.html": {
+        **EXEMPLO_PROJETO, **EXEMPLO_DESPESAS, "justificativa": "Ajuste", "motivo_recusa": "Valor alto"
+    },
+    "remanejamento.html": {**EXEMPLO_PROJETO, "nome": "Maria", "sigla": "EX", "aceito": False},
+}
+
+
+def medir_renderizacao(repeticoes: int = 1000) -> list[dict]:
+    """
+    Para cada template (com o contexto de EXEMPLOS), o tempo médio por
+    renderização usando o template compilado do ambiente e compilando o
+    template a cada e-mail (como seria sem o cache).
+    """
+
+    ambiente = criar_ambiente()
+
+    # Mesmo ambiente, sem guardar templates compilados
+    sem_cache = ambiente.overlay(cache_size=0)
+
+    resultados = []
+
+    for nome, contexto in EXEMPLOS.items():
+
+        template = ambiente.get_template(nome)
+
+        inicio = time.perf_counter()
+
+        for _ in range(repeticoes):
+            template.render(contexto)
+
+        compilado = (time.perf_counter() - inicio) / repeticoes
+
+        # Compilar é bem mais lento: poucas repetições bastam
+        repeticoes_sem_cache = max(1, repeticoes // 20)
+
+        inicio = time.perf_counter()
+
+        for _ in range(repeticoes_sem_cache):
+            sem_cache.get_template(nome).render(contexto)
+
+        compilando = (time.perf_counter() - inicio) / repeticoes_sem_cache
+
+        resultados.append({
+            "template": nome,
+            "compilado_us": compilado * 1e6,
+            "compilando_us": compilando * 1e6,
+        })
+
+    return resultados
+
+
+
+
+###########################################################################################################
+# EXECUÇÃO DIRETA
+###########################################################################################################
+
+if __name__ == "__main__":
+
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    inicio = time.perf_counter()
+    criar_ambiente()
+    print(f"Criação do ambiente (compila todos os templates): {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    print()
+
+    print(f"{'template':<40} {'compilado (µs)':>16} {'compilando (µs)':>16}")
+
+    for resultado in medir_renderizacao(repeticoes):
+        print(
+            f"{resultado['template']:<40} "
+            f"{resultado['compilado_us']:>16.1f} {resultado['compilando_us']:>16.1f}"
+        )